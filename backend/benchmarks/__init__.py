@@ -0,0 +1 @@
+"""Performance benchmarks. They are not collected by pytest, run them as modules (see `make bench`)."""
@@ -0,0 +1,144 @@
+"""Requests per second of `/api/submit` and `/api/history` with the database replaced by an in-memory DAL.
+
+Measures the cost of everything above the DAL: routing, validation, DTOs, use cases, serialization and middlewares.
+`/api/submit (400)` is the path of invalid forms, which fail in the use case and are answered by the error middleware.
+Also compares construction of the legacy pydantic DTOs with the slots-based ones.
+
+    python -m benchmarks.api_rps --duration 5 --concurrency 32
+"""
+import argparse
+import asyncio
+import json
+import time
+import timeit
+from contextlib import asynccontextmanager
+from datetime import date
+from typing import Any
+from typing import AsyncIterator
+from typing import Callable
+from unittest.mock import patch
+
+import httpx
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from benchmarks.fakes import InMemoryFormHistoryDAL
+from benchmarks.fakes import make_records
+from main import app
+from project.apps.history.api.v1.dependencies import get_form_history_dal
+from project.apps.history.models import HistoryItem as APIHistoryItem
+from project.apps.history.models import HistoryPayload
+from project.apps.history.models import HistoryResponse
+from project.apps.responses import DataclassJSONResponse
+from project.core.uc.base import UCResponse
+from project.core.uc.history.dto import GetHistoryResponse
+from project.core.uc.history.dto import HistoryItem
+
+
+class _PydanticHistoryItem(BaseModel):
+    date: date
+    first_name: str
+    last_name: str
+    count: int
+
+
+class _PydanticGetHistoryResponse(UCResponse):
+    items: list[_PydanticHistoryItem]
+    total: int
+
+
+async def _drive(
+    client: httpx.AsyncClient, request: Callable[[httpx.AsyncClient], Any], duration: float, concurrency: int
+) -> dict[str, Any]:
+    done = 0
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker() -> None:
+        nonlocal done, errors
+        while time.perf_counter() < deadline:
+            response = await request(client)
+            done += 1
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {"requests": done, "errors": errors, "rps": round(done / elapsed, 1)}
+
+
+async def bench_endpoints(duration: float, concurrency: int, records: int) -> dict[str, Any]:
+    dal = InMemoryFormHistoryDAL(make_records(records))
+    app.dependency_overrides[get_form_history_dal] = lambda: dal
+
+    @asynccontextmanager
+    async def open_dal() -> AsyncIterator[InMemoryFormHistoryDAL]:
+        yield dal
+
+    submit_body = {"date": "2025-01-15", "first_name": "Ivan", "last_name": "Ivanov"}
+    invalid_body = {"date": "2025-01-15", "first_name": "Ivan Ivan", "last_name": "Ivanov"}
+    transport = httpx.ASGITransport(app=app)
+    try:
+        # Use case simulates a random delay up to 3 seconds, which is not what we measure here
+        with (
+            patch("project.core.uc.history.submit_form.random.uniform", return_value=0.0),
+            patch("project.apps.history.api.v1.dependencies.open_form_history_dal", open_dal),
+        ):
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                submit = await _drive(client, lambda c: c.post("/api/submit", json=submit_body), duration, concurrency)
+                invalid = await _drive(
+                    client, lambda c: c.post("/api/submit", json=invalid_body), duration, concurrency
+                )
+                # Keep dataset size stable for the history part
+                del dal.records[records:]
+                history = await _drive(client, lambda c: c.get("/api/history?date=2025-02-01"), duration, concurrency)
+    finally:
+        app.dependency_overrides.pop(get_form_history_dal, None)
+    return {"/api/submit": submit, "/api/submit (400)": invalid, "/api/history": history}
+
+
+def bench_dto(number: int) -> dict[str, Any]:
+    rows = [(date(2025, 1, 1 + i), f"First{i}", f"Last{i}", i) for i in range(10)]
+
+    def pydantic_path() -> bytes:
+        uc_response = _PydanticGetHistoryResponse(
+            items=[_PydanticHistoryItem(date=d, first_name=f, last_name=ln, count=c) for d, f, ln, c in rows], total=10
+        )
+        api_items = [
+            APIHistoryItem(date=i.date, first_name=i.first_name, last_name=i.last_name, count=i.count)
+            for i in uc_response.items
+        ]
+        # What FastAPI does with a returned model and `response_model`: dump, validate again, serialize
+        content = HistoryResponse(items=api_items, total=uc_response.total).model_dump()
+        return JSONResponse(HistoryResponse.model_validate(content).model_dump(mode="json")).body
+
+    def slots_path() -> bytes:
+        uc_response = GetHistoryResponse(items=[HistoryItem(d, f, ln, c) for d, f, ln, c in rows], total=10)
+        return DataclassJSONResponse(HistoryPayload(items=uc_response.items, total=uc_response.total)).body
+
+    assert json.loads(pydantic_path()) == json.loads(slots_path())
+    result = {}
+    for name, func in (("pydantic", pydantic_path), ("slots", slots_path)):
+        seconds = min(timeit.repeat(func, number=number, repeat=5))
+        result[name] = {"us_per_response": round(seconds / number * 1e6, 2)}
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds to drive each endpoint")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent in-flight requests")
+    parser.add_argument("--records", type=int, default=1000, help="Rows in the in-memory DAL")
+    parser.add_argument("--dto-number", type=int, default=2000, help="Iterations of the DTO micro-benchmark")
+    args = parser.parse_args()
+
+    report = {
+        "endpoints": asyncio.run(bench_endpoints(args.duration, args.concurrency, args.records)),
+        "history_dto_and_render": bench_dto(args.dto_number),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
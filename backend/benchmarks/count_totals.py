@@ -0,0 +1,175 @@
+"""Totals of `/api/history` from per-date and per-person counts compared with summing over form_history rows.
+
+Seeds a separate database (`<database>_bench`, recreated) with uniformly random data: `--rows` entries spread over
+`--days` dates and `--names` first and last names, then times both ways of counting for random filters. Also reports
+time of `rebuild_form_history_counts()` and the cost of the counting trigger for inserts.
+
+    python -m benchmarks.count_totals --rows 10000000 --queries 200
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from datetime import date
+from datetime import timedelta
+from typing import Any
+from typing import Awaitable
+from typing import Callable
+
+from sqlalchemy import create_engine
+from sqlalchemy import func
+from sqlalchemy import select
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy_utils import create_database
+from sqlalchemy_utils import database_exists
+from sqlalchemy_utils import drop_database
+
+from project.core.db.postgres.form_history import FormHistoryDAL
+from project.core.db.postgres.models import Base
+from project.core.db.postgres.models import FormHistory
+from project.core.settings import settings
+
+_FIRST_DAY = date(2015, 1, 1)
+_SEED_BATCH = 1_000_000
+
+# Rows are generated into a temporary table first, so persons can be created before rows referring to them (the
+# trigger setting person_id is disabled during the bulk load)
+_SEED = (
+    """
+    CREATE TEMPORARY TABLE seed ON COMMIT DROP AS
+    SELECT DATE '2015-01-01' + floor(random() * :days)::int AS date,
+        'First' || floor(random() * :names)::int AS first_name, 'Last' || floor(random() * :names)::int AS last_name
+    FROM generate_series(1, :rows)
+    """,
+    "INSERT INTO person (first_name, last_name) SELECT DISTINCT first_name, last_name FROM seed ON CONFLICT DO NOTHING",
+    """
+    INSERT INTO form_history AS f (id, date, first_name, last_name, person_id, occurrences, created_at, updated_at)
+    SELECT gen_random_uuid(), s.date, s.first_name, s.last_name, p.id, count(*), now(), now()
+    FROM seed s JOIN person p ON p.first_name = s.first_name AND p.last_name = s.last_name
+    GROUP BY s.date, s.first_name, s.last_name, p.id
+    ON CONFLICT (person_id, date) DO UPDATE SET occurrences = f.occurrences + EXCLUDED.occurrences
+    """,
+    "DROP TABLE seed",
+)
+
+
+def _seed_batch(connection: Connection, days: int, names: int, rows: int) -> None:
+    for statement in _SEED:
+        connection.execute(text(statement), {"days": days, "names": names, "rows": rows})
+
+
+def seed(url: str, rows: int, days: int, names: int) -> dict[str, float]:
+    if database_exists(url):
+        drop_database(url)
+    create_database(url, template="template0")
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    timings = {}
+    with engine.begin() as connection:
+        # Bulk load without row triggers, counts are computed once afterwards
+        connection.execute(
+            text("SELECT ensure_form_history_partitions(:first, :last)"),
+            {"first": _FIRST_DAY, "last": _FIRST_DAY + timedelta(days=days)},
+        )
+        connection.execute(text("ALTER TABLE form_history DISABLE TRIGGER USER"))
+        for start in range(0, rows, _SEED_BATCH):
+            _seed_batch(connection, days, names, min(_SEED_BATCH, rows - start))
+        connection.execute(text("ALTER TABLE form_history ENABLE TRIGGER USER"))
+        started = time.perf_counter()
+        connection.execute(text("SELECT rebuild_form_history_counts()"))
+        timings["rebuild_s"] = round(time.perf_counter() - started, 2)
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.execute(text("VACUUM ANALYZE"))
+    # Insert cost with the counting trigger (and the notification one) against none, rolled back
+    for name, toggle in (("insert_10k_with_triggers_ms", "ENABLE"), ("insert_10k_without_triggers_ms", "DISABLE")):
+        with engine.connect() as connection:
+            connection.execute(text(f"ALTER TABLE form_history {toggle} TRIGGER USER"))
+            started = time.perf_counter()
+            _seed_batch(connection, days, names, 10000)
+            timings[name] = round((time.perf_counter() - started) * 1000, 1)
+            connection.rollback()
+    engine.dispose()
+    return timings
+
+
+async def _count_scan(
+    session: AsyncSession, date_filter: date, first_name: str | None = None, last_name: str | None = None
+) -> int:
+    # The query `count_filtered_history()` ran before counts tables (rows are weighted by repeated submissions now)
+    query = select(func.sum(FormHistory.occurrences)).where(FormHistory.date <= date_filter)
+    if first_name:
+        query = query.where(FormHistory.first_name == first_name)
+    if last_name:
+        query = query.where(FormHistory.last_name == last_name)
+    return (await session.execute(query)).scalar() or 0
+
+
+async def _time(
+    queries: list[dict[str, Any]], count: Callable[..., Awaitable[Any]]
+) -> tuple[dict[str, float], list[Any]]:
+    latencies, totals = [], []
+    for filters in queries:
+        started = time.perf_counter()
+        totals.append(await count(**filters))
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    return {
+        "p50_ms": round(statistics.median(latencies), 3),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 3),
+        "max_ms": round(latencies[-1], 3),
+    }, totals
+
+
+async def bench_counts(url: str, days: int, names: int, queries: int) -> dict[str, Any]:
+    engine = create_async_engine(url)
+    rng = random.Random(42)
+    report: dict[str, Any] = {}
+    async with async_sessionmaker(engine)() as session:
+        dal = FormHistoryDAL(session)
+        kinds = {
+            "date": lambda: {},
+            "first_name": lambda: {"first_name": f"First{rng.randrange(names)}"},
+            "last_name": lambda: {"last_name": f"Last{rng.randrange(names)}"},
+            "person": lambda: {
+                "first_name": f"First{rng.randrange(names)}",
+                "last_name": f"Last{rng.randrange(names)}",
+            },
+        }
+        for kind, make_filters in kinds.items():
+            filters = [
+                {"date_filter": _FIRST_DAY + timedelta(days=rng.randrange(days)), **make_filters()}
+                for _ in range(queries)
+            ]
+            scan, scan_totals = await _time(filters, lambda **f: _count_scan(session, **f))
+            counts, counts_totals = await _time(filters, dal.count_filtered_history)
+            assert scan_totals == counts_totals, f"Totals differ for {kind} filters"
+            report[kind] = {"form_history": scan, "counts_tables": counts}
+    await engine.dispose()
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000_000, help="Rows in form_history")
+    parser.add_argument("--days", type=int, default=3650, help="Distinct dates")
+    parser.add_argument("--names", type=int, default=10000, help="Distinct first and last names each")
+    parser.add_argument("--queries", type=int, default=200, help="Timed queries per kind of filters")
+    args = parser.parse_args()
+
+    url = f"{settings.database_url}_bench"
+    report = {
+        "rows": args.rows,
+        "seed": seed(url.replace("+asyncpg", ""), args.rows, args.days, args.names),
+        "totals": asyncio.run(bench_counts(url, args.days, args.names, args.queries)),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
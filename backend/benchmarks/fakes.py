@@ -0,0 +1,99 @@
+from dataclasses import dataclass
+from dataclasses import field
+from datetime import date
+from datetime import datetime
+from datetime import timezone
+from typing import Any
+from typing import Callable
+from uuid import UUID
+from uuid import uuid4
+
+
+@dataclass(slots=True)
+class FakeFormHistory:
+    date: date
+    first_name: str
+    last_name: str
+    id: UUID = field(default_factory=uuid4)
+    person_id: int | None = None
+    created_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+class FakeSession:
+    async def rollback(self) -> None:
+        ...
+
+
+class InMemoryFormHistoryDAL:
+    """In-memory double of `FormHistoryDAL` with the same semantics, used to measure code above the database."""
+
+    def __init__(self, records: list[FakeFormHistory] | None = None):
+        self.records = records if records is not None else []
+        self.session: Any = FakeSession()
+
+    async def create_form_entry(
+        self, date: date, first_name: str, last_name: str, person_id: int | None = None
+    ) -> FakeFormHistory:
+        # A record per submission, which is what `FormHistoryDAL` answers like with repeats stored as occurrences
+        record = FakeFormHistory(date=date, first_name=first_name, last_name=last_name, person_id=person_id)
+        self.records.append(record)
+        return record
+
+    def on_commit(self, callback: Callable[[], None]) -> None:
+        # Nothing is rolled back here
+        callback()
+
+    async def get_filtered_history_with_counts(
+        self,
+        date_filter: date,
+        first_name: str | None = None,
+        last_name: str | None = None,
+        limit: int = 10,
+    ) -> list[tuple[FakeFormHistory, int]]:
+        records = sorted(self._filter(date_filter, first_name, last_name), key=_history_order)[:limit]
+        return [(r, await self.count_previous_entries(r.date, r.first_name, r.last_name)) for r in records]
+
+    async def count_filtered_history(
+        self,
+        date_filter: date,
+        first_name: str | None = None,
+        last_name: str | None = None,
+    ) -> int:
+        return sum(1 for _ in self._filter(date_filter, first_name, last_name))
+
+    async def count_previous_entries(self, record_date: date, first_name: str, last_name: str) -> int:
+        return sum(
+            1 for r in self.records if r.first_name == first_name and r.last_name == last_name and r.date < record_date
+        )
+
+    async def get_unique_first_names(self) -> list[str]:
+        return list({r.first_name for r in self.records})
+
+    async def get_unique_last_names(self) -> list[str]:
+        return list({r.last_name for r in self.records})
+
+    def _filter(self, date_filter: date, first_name: str | None, last_name: str | None) -> Any:
+        for r in self.records:
+            if r.date > date_filter:
+                continue
+            if first_name and r.first_name != first_name:
+                continue
+            if last_name and r.last_name != last_name:
+                continue
+            yield r
+
+
+def _history_order(record: FakeFormHistory) -> tuple[int, str, str]:
+    return -record.date.toordinal(), record.first_name, record.last_name
+
+
+def make_records(count: int, names: int = 50, start: date = date(2025, 1, 1), days: int = 60) -> list[FakeFormHistory]:
+    """Deterministic dataset: `names` people spread over `days` days."""
+    return [
+        FakeFormHistory(
+            date=date.fromordinal(start.toordinal() + i % days),
+            first_name=f"First{i % names}",
+            last_name=f"Last{(i * 7) % names}",
+        )
+        for i in range(count)
+    ]
@@ -0,0 +1,97 @@
+"""Insert throughput of rows keyed by random UUIDv4 compared with time-ordered UUIDv7.
+
+Recreates `<database>_bench` with a table per kind of key (columns of form_history, primary key on the id) and
+inserts `--rows` rows in batches of `--batch` into each, with ids generated by the application like `FormHistory`
+does. Reports rows per second overall and for the last tenth of rows (the index is at its largest there), WAL written
+and size of the primary key index.
+
+    python -m benchmarks.insert_keys --rows 10000000
+"""
+import argparse
+import json
+import time
+from typing import Any
+from typing import Callable
+from uuid import UUID
+from uuid import uuid4
+
+from sqlalchemy import create_engine
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy_utils import create_database
+from sqlalchemy_utils import database_exists
+from sqlalchemy_utils import drop_database
+
+from project.core.db.ids import uuid7
+from project.core.settings import settings
+
+_KINDS: dict[str, Callable[[], UUID]] = {"uuid4": uuid4, "uuid7": uuid7}
+
+_CREATE = """
+    CREATE TABLE keys_{kind} (
+        id uuid PRIMARY KEY, date date NOT NULL, first_name varchar(255) NOT NULL, last_name varchar(255) NOT NULL,
+        created_at timestamptz NOT NULL, updated_at timestamptz NOT NULL
+    )
+"""
+_INSERT = """
+    INSERT INTO keys_{kind} (id, date, first_name, last_name, created_at, updated_at)
+    SELECT id, DATE '2015-01-01' + floor(random() * 3650)::int, 'First' || floor(random() * 10000)::int,
+        'Last' || floor(random() * 10000)::int, now(), now()
+    FROM unnest(CAST(:ids AS uuid[])) AS id
+"""
+
+
+def _wal_lsn(connection: Connection) -> str:
+    return connection.execute(text("SELECT pg_current_wal_lsn()")).scalar_one()
+
+
+def bench_inserts(connection: Connection, kind: str, rows: int, batch: int) -> dict[str, Any]:
+    connection.execute(text(_CREATE.format(kind=kind)))
+    connection.execute(text("CHECKPOINT"))
+    insert = text(_INSERT.format(kind=kind))
+    generate = _KINDS[kind]
+    wal_start = _wal_lsn(connection)
+    elapsed = tail_elapsed = 0.0
+    tail_start = rows - rows // 10
+    for start in range(0, rows, batch):
+        ids = [str(generate()) for _ in range(min(batch, rows - start))]
+        started = time.perf_counter()
+        connection.execute(insert, {"ids": ids})
+        batch_elapsed = time.perf_counter() - started
+        elapsed += batch_elapsed
+        if start >= tail_start:
+            tail_elapsed += batch_elapsed
+    wal_bytes = connection.execute(
+        text("SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), :start)"), {"start": wal_start}
+    ).scalar_one()
+    index_bytes = connection.execute(text(f"SELECT pg_relation_size('keys_{kind}_pkey')")).scalar_one()
+    return {
+        "rows_per_s": round(rows / elapsed),
+        "last_tenth_rows_per_s": round((rows - tail_start) / tail_elapsed) if tail_elapsed else None,
+        "wal_mb": round(float(wal_bytes) / 2**20, 1),
+        "pkey_mb": round(index_bytes / 2**20, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000_000, help="Rows inserted per kind of key")
+    parser.add_argument("--batch", type=int, default=10000, help="Rows per INSERT")
+    args = parser.parse_args()
+
+    url = f"{settings.database_url}_bench".replace("+asyncpg", "")
+    if database_exists(url):
+        drop_database(url)
+    create_database(url, template="template0")
+    engine = create_engine(url)
+    report: dict[str, Any] = {"rows": args.rows, "batch": args.batch}
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        for kind in _KINDS:
+            report[kind] = bench_inserts(connection, kind, args.rows, args.batch)
+    engine.dispose()
+    drop_database(url)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
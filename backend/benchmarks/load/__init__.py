@@ -0,0 +1 @@
+"""Load test of the running service: `seed` fills its database, `run` drives its API and prints `report` as JSON."""
@@ -0,0 +1,48 @@
+import math
+from collections import Counter
+from collections import defaultdict
+from typing import Any
+from typing import NamedTuple
+
+
+class Sample(NamedTuple):
+    endpoint: str
+    # Seconds from the time the request was due to its response, None if there is no response
+    latency: float | None
+    # HTTP status, or the kind of failure: "dropped" (too many requests in flight), "timeout", "connection"
+    outcome: int | str
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    """Nearest-rank percentile of sorted values."""
+    return sorted_values[max(math.ceil(q / 100 * len(sorted_values)) - 1, 0)]
+
+
+def summarize(samples: list[Sample], duration: float) -> dict[str, Any]:
+    """Throughput, error rate and latency percentiles per endpoint and for all of them."""
+    by_endpoint: dict[str, list[Sample]] = defaultdict(list)
+    for sample in samples:
+        by_endpoint[sample.endpoint].append(sample)
+    report = {endpoint: _summarize(by_endpoint[endpoint], duration) for endpoint in sorted(by_endpoint)}
+    report["all"] = _summarize(samples, duration)
+    return report
+
+
+def _summarize(samples: list[Sample], duration: float) -> dict[str, Any]:
+    succeeded = sum(1 for s in samples if isinstance(s.outcome, int) and s.outcome < 400)
+    errors = Counter(str(s.outcome) for s in samples if not (isinstance(s.outcome, int) and s.outcome < 400))
+    latencies = sorted(s.latency * 1000 for s in samples if s.latency is not None)
+    summary: dict[str, Any] = {
+        "requests": len(samples),
+        "throughput_rps": round(succeeded / duration, 1) if duration else None,
+        "error_rate": round((len(samples) - succeeded) / len(samples), 4) if samples else 0,
+        "errors": dict(sorted(errors.items())),
+    }
+    if latencies:
+        summary["latency_ms"] = {
+            "p50": round(percentile(latencies, 50), 2),
+            "p95": round(percentile(latencies, 95), 2),
+            "p99": round(percentile(latencies, 99), 2),
+            "max": round(latencies[-1], 2),
+        }
+    return summary
@@ -0,0 +1,164 @@
+"""Open-loop load of the running service (`python main.py`) at a target rate of requests, reported as JSON.
+
+Requests are sent at Poisson arrivals of `--rps` per second whether earlier ones have been answered or not, so a
+slow service gets a queue instead of a gentler load. Latency is counted from the time a request was due, which
+includes waiting for a connection of the client. A request due while `--max-in-flight` are unanswered is dropped.
+Endpoints are mixed by `--mix` weights. Names of submissions and filters follow the Zipf law of `benchmarks.load.seed`
+with the same `--names` and `--zipf`, dates are within the seeded days. Submissions wait up to 3 seconds by design.
+
+    python -m benchmarks.load.run --url http://localhost:8000 --rps 200 --duration 60 --warmup 10
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from datetime import date
+from datetime import timedelta
+from typing import Any
+from typing import Callable
+
+import httpx
+
+from benchmarks.load.report import Sample
+from benchmarks.load.report import summarize
+from benchmarks.load.seed import zipf_rank
+
+Request = tuple[str, str, dict[str, Any]]
+
+
+class Workload:
+    """Random requests of the endpoints mix, with names and dates like the seeded ones."""
+
+    def __init__(self, mix: dict[str, float], start: date, days: int, names: int, s: float, rng: random.Random):
+        self._rng = rng
+        self._start = start
+        self._days = days
+        self._names = names
+        self._s = s
+        self._makers: dict[str, Callable[[], Request]] = {
+            "submit": self._submit,
+            "history": self._history,
+            "unique-names": lambda: ("GET", "/api/unique-names", {}),
+        }
+        unknown = set(mix) - set(self._makers)
+        if unknown:
+            raise ValueError(f"Unknown endpoints in mix: {sorted(unknown)}")
+        self._endpoints = list(mix)
+        self._weights = list(mix.values())
+
+    def next(self) -> tuple[str, Request]:
+        endpoint = self._rng.choices(self._endpoints, self._weights)[0]
+        return endpoint, self._makers[endpoint]()
+
+    def _name(self, prefix: str) -> str:
+        return f"{prefix}{zipf_rank(self._rng.random(), self._names, self._s)}"
+
+    def _date(self) -> str:
+        return (self._start + timedelta(days=self._rng.randrange(self._days))).isoformat()
+
+    def _submit(self) -> Request:
+        body = {"date": self._date(), "first_name": self._name("First"), "last_name": self._name("Last")}
+        return "POST", "/api/submit", {"json": body}
+
+    def _history(self) -> Request:
+        params = {"date": self._date()}
+        # Filters by none, either or both of the names equally often
+        kind = self._rng.randrange(4)
+        if kind & 1:
+            params["first_name"] = self._name("First")
+        if kind & 2:
+            params["last_name"] = self._name("Last")
+        return "GET", "/api/history", {"params": params}
+
+
+async def run(
+    client: httpx.AsyncClient, workload: Workload, rps: float, duration: float, warmup: float, max_in_flight: int
+) -> list[Sample]:
+    """Send requests for warmup and duration seconds, returns samples of requests due after the warmup."""
+    samples: list[Sample] = []
+    tasks: set[asyncio.Task[None]] = set()
+    rng = random.Random(0)
+    started = time.perf_counter()
+    due = started
+
+    async def send(endpoint: str, request: Request, due: float, measured: bool) -> None:
+        method, path, kwargs = request
+        try:
+            response = await client.request(method, path, **kwargs)
+            outcome: int | str = response.status_code
+        except httpx.TimeoutException:
+            outcome = "timeout"
+        except httpx.TransportError:
+            outcome = "connection"
+        latency = time.perf_counter() - due if isinstance(outcome, int) else None
+        if measured:
+            samples.append(Sample(endpoint, latency, outcome))
+
+    while True:
+        due += rng.expovariate(rps)
+        if due - started >= warmup + duration:
+            break
+        await asyncio.sleep(max(due - time.perf_counter(), 0))
+        endpoint, request = workload.next()
+        measured = due - started >= warmup
+        if len(tasks) >= max_in_flight:
+            if measured:
+                samples.append(Sample(endpoint, None, "dropped"))
+            continue
+        task = asyncio.create_task(send(endpoint, request, due, measured))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    await asyncio.gather(*tasks)
+    return samples
+
+
+def _parse_mix(value: str) -> dict[str, float]:
+    mix = {}
+    for item in value.split(","):
+        endpoint, _, weight = item.partition("=")
+        mix[endpoint.strip()] = float(weight)
+    return mix
+
+
+async def main_async(args: argparse.Namespace) -> dict[str, Any]:
+    workload = Workload(args.mix, args.start, args.days, args.names, args.zipf, random.Random(args.seed))
+    limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+        samples = await run(client, workload, args.rps, args.duration, args.warmup, args.max_in_flight)
+    return {
+        "target_rps": args.rps,
+        "duration_s": args.duration,
+        "mix": args.mix,
+        "endpoints": summarize(samples, args.duration),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000", help="Base URL of the service")
+    parser.add_argument("--rps", type=float, default=100, help="Target requests per second")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds of measured load")
+    parser.add_argument("--warmup", type=float, default=5, help="Seconds of load before measuring")
+    parser.add_argument(
+        "--mix", type=_parse_mix, default="submit=1,history=8,unique-names=1", help="Weights of endpoints"
+    )
+    parser.add_argument("--max-in-flight", type=int, default=1000, help="Unanswered requests before dropping")
+    parser.add_argument("--timeout", type=float, default=10, help="Seconds to wait for a response")
+    parser.add_argument("--start", type=date.fromisoformat, default=date(2015, 1, 1), help="First seeded date")
+    parser.add_argument("--days", type=int, default=3650, help="Seeded days")
+    parser.add_argument("--names", type=int, default=100000, help="Seeded first and last names each")
+    parser.add_argument("--zipf", type=float, default=1.1, help="Seeded exponent of names popularity")
+    parser.add_argument("--seed", type=int, default=42, help="Seed of the requests")
+    parser.add_argument("--output", help="Also write the report to the file")
+    args = parser.parse_args()
+
+    report = json.dumps(asyncio.run(main_async(args)), indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(report + "\n")
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Fill the service's database (migrated, see `make migrate`) with synthetic submissions for a load test.
+
+Names are drawn by a Zipf law like real ones: rank `k` of `--names` first (and independently last) names is drawn with
+probability about proportional to `1 / k ** s`, so `First1` is the most popular. Dates are uniform over `--days` days
+from `--start`. Rows are generated by Postgres in batches with row triggers disabled, counts are rebuilt at the end.
+Start the service after seeding: caches of a running one don't see the bulk load.
+
+    python -m benchmarks.load.seed --rows 5000000 --names 100000 --zipf 1.1 --truncate
+"""
+import argparse
+import json
+import time
+from datetime import date
+from datetime import timedelta
+from typing import Any
+
+from sqlalchemy import create_engine
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from project.core.settings import settings
+
+_SEED_BATCH = 1_000_000
+
+# Rank of a name by the inverse of the continuous approximation of Zipf's CDF over [1, names + 1)
+_ZIPF_RANK = "least(floor(power((power(:names + 1, 1 - :s) - 1) * random() + 1, 1 / (1 - :s)))::int, :names)"
+_ZIPF_RANK_HARMONIC = "least(floor(power(:names + 1, random()))::int, :names)"
+
+_SEED = (
+    """
+    CREATE TEMPORARY TABLE seed ON COMMIT DROP AS
+    SELECT CAST(:start AS date) + floor(random() * :days)::int AS date,
+        'First' || {rank} AS first_name, 'Last' || {rank} AS last_name
+    FROM generate_series(1, :rows)
+    """,
+    "INSERT INTO person (first_name, last_name) SELECT DISTINCT first_name, last_name FROM seed ON CONFLICT DO NOTHING",
+    """
+    INSERT INTO form_history AS f (id, date, first_name, last_name, person_id, occurrences, created_at, updated_at)
+    SELECT uuid_generate_v7(), s.date, s.first_name, s.last_name, p.id, count(*), now(), now()
+    FROM seed s JOIN person p ON p.first_name = s.first_name AND p.last_name = s.last_name
+    GROUP BY s.date, s.first_name, s.last_name, p.id
+    ON CONFLICT (person_id, date) DO UPDATE SET occurrences = f.occurrences + EXCLUDED.occurrences
+    """,
+    "DROP TABLE seed",
+)
+
+
+def zipf_rank(u: float, names: int, s: float) -> int:
+    """Rank of a name for a uniform `u` in [0, 1), the same law the seeded names follow."""
+    if s == 1:
+        return min(int((names + 1) ** u), names)
+    return min(int((((names + 1) ** (1 - s) - 1) * u + 1) ** (1 / (1 - s))), names)
+
+
+def _seed_batch(connection: Connection, params: dict[str, Any]) -> None:
+    rank = _ZIPF_RANK_HARMONIC if params["s"] == 1 else _ZIPF_RANK
+    for statement in _SEED:
+        connection.execute(text(statement.format(rank=rank)), params)
+
+
+def seed(
+    url: str, rows: int, start: date, days: int, names: int, s: float, truncate: bool, random_seed: float
+) -> dict[str, Any]:
+    engine = create_engine(url)
+    started = time.perf_counter()
+    with engine.begin() as connection:
+        if truncate:
+            connection.execute(
+                text(
+                    "TRUNCATE form_history, form_history_date_counts, form_history_person_date_counts, person, "
+                    "form_history_spool_applied"
+                )
+            )
+        connection.execute(
+            text("SELECT ensure_form_history_partitions(:first, :last)"),
+            {"first": start, "last": start + timedelta(days=days)},
+        )
+        connection.execute(text("SELECT setseed(:seed)"), {"seed": random_seed})
+        connection.execute(text("ALTER TABLE form_history DISABLE TRIGGER USER"))
+        for batch_start in range(0, rows, _SEED_BATCH):
+            params = {
+                "start": start,
+                "days": days,
+                "names": names,
+                "s": s,
+                "rows": min(_SEED_BATCH, rows - batch_start),
+            }
+            _seed_batch(connection, params)
+        connection.execute(text("ALTER TABLE form_history ENABLE TRIGGER USER"))
+        connection.execute(text("SELECT rebuild_form_history_counts()"))
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.execute(text("VACUUM ANALYZE"))
+        report = {
+            "rows": rows,
+            "form_history_rows": connection.execute(text("SELECT count(*) FROM form_history")).scalar(),
+            "persons": connection.execute(text("SELECT count(*) FROM person")).scalar(),
+            "seconds": round(time.perf_counter() - started, 1),
+        }
+    engine.dispose()
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Submissions added")
+    parser.add_argument("--start", type=date.fromisoformat, default=date(2015, 1, 1), help="First date")
+    parser.add_argument("--days", type=int, default=3650, help="Distinct dates from the first one")
+    parser.add_argument("--names", type=int, default=100000, help="Distinct first and last names each")
+    parser.add_argument("--zipf", type=float, default=1.1, help="Exponent of the Zipf law of names popularity")
+    parser.add_argument("--truncate", action="store_true", help="Delete all submissions and persons first")
+    parser.add_argument("--seed", type=float, default=0.42, help="Seed of Postgres random(), from -1 to 1")
+    args = parser.parse_args()
+
+    url = settings.database_url.replace("+asyncpg", "")
+    report = seed(url, args.rows, args.start, args.days, args.names, args.zipf, args.truncate, args.seed)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
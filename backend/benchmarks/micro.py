@@ -0,0 +1,300 @@
+"""Micro-benchmarks of the code a request runs through, compared with a stored baseline to make regressions visible.
+
+Cases time one call each, in nanoseconds (best of `--repeat` rounds of at least `--min-time` seconds):
+- `dal.*`: building a query of `FormHistoryDAL` and its cache key, as SQLAlchemy does on every execution, with
+  a session double that doesn't run it;
+- `uc.*`: `GetHistory.execute` and `SubmitForm.execute` over the in-memory DAL (without the simulated delay);
+- `middleware.*`: `ExceptionTraceHandlerMiddleware` around an app that answers, fails with an application error or
+  fails unexpectedly, and `validation_exception_handler` for an invalid form;
+- `models.*`: construction and validation of pydantic models of `project.apps.history.models`.
+
+`run --save` writes a baseline (`benchmarks/baselines/micro.json` is kept in the repository, together with versions
+of Python and libraries it was measured with). `compare` runs the cases and exits with 1 if any is slower than its
+baseline by more than `--tolerance`. Timings are comparable only on the same machine, refresh the baseline there
+before comparing a change.
+
+    python -m benchmarks.micro run --save benchmarks/baselines/micro.json
+    python -m benchmarks.micro compare --tolerance 0.15
+"""
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import platform
+import sys
+import time
+from datetime import date
+from datetime import datetime
+from datetime import timezone
+from importlib.metadata import version
+from pathlib import Path
+from typing import Any
+from typing import Awaitable
+from typing import Callable
+from unittest.mock import patch
+
+from fastapi import FastAPI
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
+from starlette.responses import JSONResponse
+
+from benchmarks.fakes import InMemoryFormHistoryDAL
+from benchmarks.fakes import make_records
+from project.apps.history.models import HistoryBatchRequest
+from project.apps.history.models import HistoryItem
+from project.apps.history.models import HistoryResponse
+from project.apps.history.models import SubmitFormErrorResponse
+from project.apps.history.models import SubmitFormRequest
+from project.core.db.postgres.form_history import FormHistoryDAL
+from project.core.db.postgres.models import FormHistory
+from project.core.exceptions import FormFieldError
+from project.core.middlewares import ExceptionTraceHandlerMiddleware
+from project.core.middlewares import add_middlewares
+from project.core.uc.history.dto import GetHistoryRequest
+from project.core.uc.history.dto import SubmitFormRequest as UCSubmitFormRequest
+from project.core.uc.history.get_history import GetHistory
+from project.core.uc.history.submit_form import SubmitForm
+
+DEFAULT_BASELINE = Path(__file__).parent / "baselines" / "micro.json"
+_BASELINE_FORMAT = 1
+
+Case = Callable[[], Any] | Callable[[], Awaitable[Any]]
+
+
+class _Result:
+    """Result double answering every way `FormHistoryDAL` reads results."""
+
+    def __init__(self, record: FormHistory):
+        self._record = record
+
+    def all(self) -> list[Any]:
+        return []
+
+    def one(self) -> FormHistory:
+        return self._record
+
+    def scalar(self) -> int:
+        return 0
+
+
+class _QuerySession:
+    """Session double which only computes the cache key of a statement, the part of execution done per call."""
+
+    def __init__(self) -> None:
+        self._result = _Result(FormHistory(date=date(2025, 1, 15), first_name="Ivan", last_name="Ivanov"))
+
+    async def execute(self, statement: Any, *args: Any, **kwargs: Any) -> _Result:
+        statement._generate_cache_key()
+        return self._result
+
+    scalars = execute
+
+
+def dal_cases() -> dict[str, Case]:
+    dal = FormHistoryDAL(_QuerySession())  # type: ignore[arg-type]
+    day = date(2025, 2, 1)
+    return {
+        "dal.create_form_entry": lambda: dal.create_form_entry(day, "Ivan", "Ivanov", person_id=7),
+        "dal.get_filtered_history_with_counts": lambda: dal.get_filtered_history_with_counts(day, "Ivan", "Ivanov"),
+        "dal.count_filtered_history": lambda: dal.count_filtered_history(day, "Ivan"),
+        "dal.count_previous_entries": lambda: dal.count_previous_entries(day, "Ivan", "Ivanov"),
+    }
+
+
+def uc_cases() -> dict[str, Case]:
+    records = 1000
+    dal = InMemoryFormHistoryDAL(make_records(records))
+    get_history = GetHistory(dal)  # type: ignore[arg-type]
+    submit_form = SubmitForm(dal)  # type: ignore[arg-type]
+    history_request = GetHistoryRequest(date_filter=date(2025, 2, 1), first_name="First1")
+    submit_request = UCSubmitFormRequest(date=date(2025, 1, 15), first_name="Ivan", last_name="Ivanov")
+
+    async def submit() -> None:
+        await submit_form.execute(submit_request)
+        # Keep the dataset of the history case as it is
+        del dal.records[records:]
+
+    return {"uc.get_history": lambda: get_history.execute(history_request), "uc.submit_form": submit}
+
+
+def middleware_cases() -> dict[str, Case]:
+    logger = logging.getLogger("benchmarks.micro.middleware")
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+
+    async def answer(scope: Any, receive: Any, send: Any) -> None:
+        await JSONResponse({"success": True})(scope, receive, send)
+
+    async def fail_with_app_error(scope: Any, receive: Any, send: Any) -> None:
+        raise FormFieldError(field_name="first_name", error_message="No whitespace in first_name is allowed")
+
+    async def fail(scope: Any, receive: Any, send: Any) -> None:
+        raise RuntimeError("Unexpected")
+
+    scope = {"type": "http", "method": "POST", "path": "/api/submit", "headers": []}
+
+    async def receive() -> dict[str, Any]:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: Any) -> None:
+        ...
+
+    def call(app: Any) -> Callable[[], Awaitable[None]]:
+        middleware = ExceptionTraceHandlerMiddleware(app, logger)
+        return lambda: middleware(scope, receive, send)
+
+    app = FastAPI()
+    add_middlewares(app, logger)
+    handler = app.exception_handlers[RequestValidationError]
+    try:
+        SubmitFormRequest.model_validate({"date": "not a date", "first_name": "", "last_name": "Ivanov"})
+    except ValidationError as error:
+        validation_error = RequestValidationError([{**e, "loc": ("body", *e["loc"])} for e in error.errors()])
+
+    return {
+        "middleware.exception_trace.success": call(answer),
+        "middleware.exception_trace.app_error": call(fail_with_app_error),
+        "middleware.exception_trace.server_error": call(fail),
+        "middleware.validation_exception_handler": lambda: handler(None, validation_error),  # type: ignore[arg-type]
+    }
+
+
+def model_cases() -> dict[str, Case]:
+    submit_body = {"date": "2025-01-15", "first_name": "Ivan", "last_name": "Ivanov"}
+    items: list[dict[str, Any]] = [
+        {"date": date(2025, 1, 1 + i), "first_name": f"First{i}", "last_name": f"Last{i}", "count": i}
+        for i in range(10)
+    ]
+    batch_body = {"filters": [{"date": "2025-02-01", "first_name": f"First{i}"} for i in range(5)]}
+    return {
+        "models.submit_form_request": lambda: SubmitFormRequest.model_validate(submit_body),
+        "models.history_response": lambda: HistoryResponse(items=[HistoryItem(**i) for i in items], total=10),
+        "models.history_batch_request": lambda: HistoryBatchRequest.model_validate(batch_body),
+        "models.submit_form_error_response": lambda: SubmitFormErrorResponse(
+            error={"first_name": ["No whitespace in first_name is allowed"]}
+        ).model_dump(),
+    }
+
+
+def measure(case: Case, loop: asyncio.AbstractEventLoop, min_time: float, repeat: int) -> float:
+    """Nanoseconds per call of the case, best of `repeat` rounds of at least `min_time` seconds each."""
+    is_async = asyncio.iscoroutine(probe := case())
+    if is_async:
+        loop.run_until_complete(probe)
+
+    async def run_async(number: int) -> None:
+        for _ in range(number):
+            await case()
+
+    def run(number: int) -> float:
+        # As timeit does, garbage collection pauses would be attributed to whichever case happens to trigger them
+        gc.collect()
+        gc.disable()
+        try:
+            started = time.perf_counter()
+            if is_async:
+                loop.run_until_complete(run_async(number))
+            else:
+                for _ in range(number):
+                    case()
+            return time.perf_counter() - started
+        finally:
+            gc.enable()
+
+    number = 1
+    while (elapsed := run(number)) < min_time:
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9) * 1.1))
+    best = min([elapsed] + [run(number) for _ in range(repeat - 1)])
+    return best / number * 1e9
+
+
+def run_cases(pattern: str | None, min_time: float, repeat: int) -> dict[str, float]:
+    cases = {**dal_cases(), **uc_cases(), **middleware_cases(), **model_cases()}
+    loop = asyncio.new_event_loop()
+    results = {}
+    # Use case simulates a random delay up to 3 seconds, which is not what we measure here
+    with patch("project.core.uc.history.submit_form.random.uniform", return_value=0.0):
+        for name, case in cases.items():
+            if pattern is None or pattern in name:
+                results[name] = round(measure(case, loop, min_time, repeat), 1)
+    loop.close()
+    return results
+
+
+def environment() -> dict[str, str]:
+    return {
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()} {platform.processor() or ''}".strip(),
+        **{package: version(package) for package in ("fastapi", "pydantic", "sqlalchemy", "starlette")},
+    }
+
+
+def compare(results: dict[str, float], baseline: dict[str, Any], tolerance: float) -> tuple[dict[str, Any], bool]:
+    """Change of every case against its baseline, and whether any is slower by more than the tolerance."""
+    report: dict[str, Any] = {}
+    regressed = False
+    for name, ns in results.items():
+        base = baseline["results"].get(name)
+        if base is None:
+            report[name] = {"ns": ns, "status": "new"}
+            continue
+        change = ns / base - 1
+        status = "ok"
+        if change > tolerance:
+            status, regressed = "regression", True
+        elif change < -tolerance:
+            status = "improvement"
+        report[name] = {"ns": ns, "baseline_ns": base, "change": round(change, 3), "status": status}
+    return report, regressed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=("run", "compare"))
+    parser.add_argument("--filter", help="Only cases with the substring in the name")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Seconds of every round")
+    parser.add_argument("--repeat", type=int, default=5, help="Rounds per case")
+    parser.add_argument("--save", type=Path, help="run: write results as a baseline to the file")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="compare: baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="compare: allowed slowdown, 0.15 is 15%%")
+    args = parser.parse_args()
+
+    results = run_cases(args.filter, args.min_time, args.repeat)
+    if args.command == "run":
+        output = {
+            "format": _BASELINE_FORMAT,
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "environment": environment(),
+            "results": results,
+        }
+        if args.save:
+            args.save.parent.mkdir(parents=True, exist_ok=True)
+            args.save.write_text(json.dumps(output, indent=2) + "\n")
+        print(json.dumps(output, indent=2))
+        return
+
+    baseline = json.loads(args.baseline.read_text())
+    if baseline.get("format") != _BASELINE_FORMAT:
+        sys.exit(f"Unsupported format of baseline {args.baseline}")
+    report, regressed = compare(results, baseline, args.tolerance)
+    current = environment()
+    print(
+        json.dumps(
+            {
+                "baseline": str(args.baseline),
+                "tolerance": args.tolerance,
+                "environment_differs": {
+                    k: [v, current.get(k)] for k, v in baseline["environment"].items() if v != current.get(k)
+                },
+                "cases": report,
+            },
+            indent=2,
+        )
+    )
+    if regressed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""Queries of `/api/history` by integer person ids compared with the same queries by names, before `person` table.
+
+Seeds `<database>_bench` like `count_totals` and adds the former counts table keyed by names next to the current one.
+Reports sizes of both counts tables, of the `person` table, and of the (person_id, date) index of form_history against
+an equivalent index on names, then times DAL queries against the queries it ran before, checking that answers match.
+
+    python -m benchmarks.person_dimension --rows 10000000 --queries 200
+"""
+import argparse
+import asyncio
+import json
+import random
+from datetime import date
+from datetime import timedelta
+from typing import Any
+
+from sqlalchemy import create_engine
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from benchmarks.count_totals import _FIRST_DAY
+from benchmarks.count_totals import _time
+from benchmarks.count_totals import seed
+from project.core.db.postgres.form_history import FormHistoryDAL
+from project.core.settings import settings
+
+# Both counts tables are laid out by date, like the rows of them are added by the trigger as entries come
+_LEGACY_COUNTS = (
+    """
+    CREATE TABLE legacy_person_date_counts AS
+    SELECT first_name, last_name, date, sum(occurrences)::int AS count FROM form_history
+    GROUP BY first_name, last_name, date
+    ORDER BY date
+    """,
+    "ALTER TABLE legacy_person_date_counts ADD PRIMARY KEY (first_name, last_name, date)",
+    "CREATE INDEX ix_legacy_person_date_counts_last_name_date ON legacy_person_date_counts (last_name, date)",
+    "TRUNCATE form_history_person_date_counts",
+    """
+    INSERT INTO form_history_person_date_counts (person_id, date, count)
+    SELECT person_id, date, sum(occurrences) FROM form_history GROUP BY person_id, date ORDER BY date
+    """,
+)
+
+# Queries of FormHistoryDAL by names, as they were before persons
+_LEGACY_COUNT_FILTERED = """
+    SELECT coalesce(sum(count), 0) FROM legacy_person_date_counts
+    WHERE date <= :date_filter AND (CAST(:first_name AS varchar) IS NULL OR first_name = :first_name)
+        AND (CAST(:last_name AS varchar) IS NULL OR last_name = :last_name)
+"""
+_LEGACY_COUNT_PREVIOUS = """
+    SELECT coalesce(sum(count), 0) FROM legacy_person_date_counts
+    WHERE first_name = :first_name AND last_name = :last_name AND date < :date_filter
+"""
+_LEGACY_HISTORY_WITH_COUNTS = """
+    SELECT f.date, f.first_name, f.last_name, coalesce((
+        SELECT sum(c.count) FROM legacy_person_date_counts c
+        WHERE c.first_name = f.first_name AND c.last_name = f.last_name AND c.date < f.date
+    ), 0)
+    FROM form_history f CROSS JOIN generate_series(1, f.occurrences)
+    WHERE f.date <= :date_filter AND (CAST(:first_name AS varchar) IS NULL OR f.first_name = :first_name)
+        AND (CAST(:last_name AS varchar) IS NULL OR f.last_name = :last_name)
+    ORDER BY f.date DESC, f.first_name, f.last_name
+    LIMIT 10
+"""
+_LEGACY_UNIQUE_FIRST_NAMES = "SELECT DISTINCT first_name FROM form_history"
+
+
+def compare_sizes(url: str) -> dict[str, Any]:
+    engine = create_engine(url)
+    sizes: dict[str, Any] = {}
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+
+        def size(query: str) -> int:
+            return int(connection.execute(text(query)).scalar() or 0)
+
+        for statement in _LEGACY_COUNTS:
+            connection.execute(text(statement))
+        connection.execute(
+            text("CREATE INDEX ix_legacy_form_history_names_date ON form_history (first_name, last_name, date)")
+        )
+        connection.execute(text("VACUUM ANALYZE"))
+        for table in ("legacy_person_date_counts", "form_history_person_date_counts", "person"):
+            sizes[table] = {
+                "table_bytes": size(f"SELECT pg_table_size('{table}')"),
+                "indexes_bytes": size(f"SELECT pg_indexes_size('{table}')"),
+            }
+        # Partitioned indexes have no storage of their own, sizes are sums over partitions
+        for index in ("ix_legacy_form_history_names_date", "uq_form_history_person_id_date_folded"):
+            sizes[index] = size(
+                f"SELECT sum(pg_relation_size(inhrelid)) FROM pg_inherits WHERE inhparent = '{index}'::regclass"
+            )
+        connection.execute(text("DROP INDEX ix_legacy_form_history_names_date"))
+    engine.dispose()
+    return sizes
+
+
+async def _legacy(session: AsyncSession, query: str, **params: Any) -> Any:
+    params = {"first_name": None, "last_name": None, **params}
+    result = await session.execute(text(query), params)
+    if query is _LEGACY_HISTORY_WITH_COUNTS:
+        return [tuple(row) for row in result.all()]
+    if query is _LEGACY_UNIQUE_FIRST_NAMES:
+        return sorted(name for name in result.scalars().all() if name)
+    return result.scalar()
+
+
+async def bench_queries(url: str, days: int, names: int, queries: int) -> dict[str, Any]:
+    engine = create_async_engine(url)
+    rng = random.Random(42)
+    report: dict[str, Any] = {}
+    async with async_sessionmaker(engine)() as session:
+        dal = FormHistoryDAL(session)
+
+        async def history_with_counts(**filters: Any) -> list[tuple[date, str, str, int]]:
+            rows = await dal.get_filtered_history_with_counts(**filters)
+            return [(r.date, r.first_name, r.last_name, count) for r, count in rows]
+
+        async def unique_first_names() -> list[str]:
+            return sorted(await dal.get_unique_first_names())
+
+        def person() -> dict[str, str]:
+            return {"first_name": f"First{rng.randrange(names)}", "last_name": f"Last{rng.randrange(names)}"}
+
+        def day() -> date:
+            return _FIRST_DAY + timedelta(days=rng.randrange(days))
+
+        cases: dict[str, tuple[Any, Any, Any]] = {
+            "count_filtered_history_person": (dal.count_filtered_history, _LEGACY_COUNT_FILTERED, person),
+            "count_filtered_history_last_name": (
+                dal.count_filtered_history,
+                _LEGACY_COUNT_FILTERED,
+                lambda: {"last_name": f"Last{rng.randrange(names)}"},
+            ),
+            "count_previous_entries": (
+                lambda date_filter, **person_names: dal.count_previous_entries(record_date=date_filter, **person_names),
+                _LEGACY_COUNT_PREVIOUS,
+                person,
+            ),
+            "history_with_counts_person": (history_with_counts, _LEGACY_HISTORY_WITH_COUNTS, person),
+            "history_with_counts_first_name": (
+                history_with_counts,
+                _LEGACY_HISTORY_WITH_COUNTS,
+                lambda: {"first_name": f"First{rng.randrange(names)}"},
+            ),
+        }
+        for name, (current, legacy, make_filters) in cases.items():
+            filters = [{"date_filter": day(), **make_filters()} for _ in range(queries)]
+            legacy_timings, legacy_results = await _time(
+                filters, lambda query=legacy, **f: _legacy(session, query, **f)
+            )
+            timings, results = await _time(filters, current)
+            assert legacy_results == results, f"Answers differ for {name}"
+            report[name] = {"names": legacy_timings, "person_ids": timings}
+
+        legacy_timings, legacy_results = await _time([{}] * 5, lambda: _legacy(session, _LEGACY_UNIQUE_FIRST_NAMES))
+        timings, results = await _time([{}] * 5, unique_first_names)
+        assert legacy_results == results, "Unique first names differ"
+        report["unique_first_names"] = {"names": legacy_timings, "person_ids": timings}
+    await engine.dispose()
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000_000, help="Rows in form_history")
+    parser.add_argument("--days", type=int, default=3650, help="Distinct dates")
+    parser.add_argument("--names", type=int, default=10000, help="Distinct first and last names each")
+    parser.add_argument("--queries", type=int, default=200, help="Timed queries per case")
+    args = parser.parse_args()
+
+    url = f"{settings.database_url}_bench"
+    sync_url = url.replace("+asyncpg", "")
+    seed(sync_url, args.rows, args.days, args.names)
+    report = {
+        "rows": args.rows,
+        "sizes": compare_sizes(sync_url),
+        "queries": asyncio.run(bench_queries(url, args.days, args.names, args.queries)),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""Replay requests captured from a running service (`REQUEST_CAPTURE_ENABLED`) against an instance, reported as JSON.
+
+Requests of all given files (or `.jsonl.gz` files of given directories) are sent in order of their capture at the
+captured intervals divided by `--speed`, so the instance gets the real mix and arrival pattern (at `--speed 2` twice
+as fast). A request due while `--max-in-flight` are unanswered is dropped. With `--speed 0` requests are sent as fast
+as `--max-in-flight` concurrent ones allow. Latency is counted from the time a request was due (or sent at
+`--speed 0`) and compared with the captured duration of the same request, per method and path: percentiles of both,
+of their difference, and how many responses have a status other than the captured one. Submissions are added again,
+replay against a disposable copy of the database.
+
+    python -m benchmarks.replay /var/lib/hooligapps_test_backend/capture --url http://localhost:8000 --speed 1
+"""
+import argparse
+import asyncio
+import heapq
+import json
+import os
+import time
+from collections import Counter
+from collections import defaultdict
+from itertools import chain
+from typing import Any
+from typing import Iterable
+from typing import NamedTuple
+
+import httpx
+
+from benchmarks.load.report import percentile
+from project.core.capture import CapturedRequest
+from project.core.capture import capture_files
+from project.core.capture import read_capture
+
+
+class Replayed(NamedTuple):
+    request: CapturedRequest
+    # Seconds from the time the request was due to its response, None if there is no response
+    latency: float | None
+    # HTTP status, or the kind of failure: "dropped" (too many requests in flight), "timeout", "connection"
+    outcome: int | str
+
+
+def load(paths: list[str], limit: int | None) -> list[CapturedRequest]:
+    """Captured requests of the files in order of their arrival."""
+    files = [f for path in paths for f in (sorted(capture_files(path)) if os.path.isdir(path) else [path])]
+    # Requests are captured as their responses finish, so no file is in order of arrival: a slow request comes after
+    # the ones which started later
+    requests: Iterable[CapturedRequest] = chain.from_iterable(read_capture(f) for f in files)
+    if limit is not None:
+        return heapq.nsmallest(limit, requests, key=lambda r: r.started_at)
+    return sorted(requests, key=lambda r: r.started_at)
+
+
+async def replay(
+    client: httpx.AsyncClient, requests: list[CapturedRequest], speed: float, max_in_flight: int
+) -> list[Replayed]:
+    results: list[Replayed] = []
+    tasks: set[asyncio.Task[None]] = set()
+    semaphore = asyncio.Semaphore(max_in_flight)
+
+    async def send(request: CapturedRequest, due: float) -> None:
+        headers = {"content-type": request.content_type} if request.content_type else None
+        try:
+            response = await client.request(
+                request.method, request.path, params=request.query or None, content=request.body, headers=headers
+            )
+            outcome: int | str = response.status_code
+        except httpx.TimeoutException:
+            outcome = "timeout"
+        except httpx.TransportError:
+            outcome = "connection"
+        latency = time.perf_counter() - due if isinstance(outcome, int) else None
+        results.append(Replayed(request, latency, outcome))
+
+    async def send_limited(request: CapturedRequest) -> None:
+        async with semaphore:
+            await send(request, time.perf_counter())
+
+    started = time.perf_counter()
+    for request in requests:
+        if speed == 0:
+            task = asyncio.create_task(send_limited(request))
+        else:
+            due = started + (request.started_at - requests[0].started_at) / speed
+            await asyncio.sleep(max(due - time.perf_counter(), 0))
+            if len(tasks) >= max_in_flight:
+                results.append(Replayed(request, None, "dropped"))
+                continue
+            task = asyncio.create_task(send(request, due))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    await asyncio.gather(*tasks)
+    return results
+
+
+def _percentiles(values: list[float]) -> dict[str, float]:
+    values = sorted(v * 1000 for v in values)
+    return {f"p{q}": round(percentile(values, q), 2) for q in (50, 95, 99)}
+
+
+def _compare(results: list[Replayed]) -> dict[str, Any]:
+    answered = [(r.request, r.latency, r.outcome) for r in results if r.latency is not None]
+    summary: dict[str, Any] = {
+        "requests": len(results),
+        "errors": dict(sorted(Counter(str(r.outcome) for r in results if not isinstance(r.outcome, int)).items())),
+        "status_mismatches": sum(1 for request, _, outcome in answered if outcome != request.status),
+    }
+    if answered:
+        summary["captured_ms"] = _percentiles([request.duration for request, _, _ in answered])
+        summary["replayed_ms"] = _percentiles([latency for _, latency, _ in answered])
+        # Percentiles of per-request differences, positive when the replayed request was slower
+        summary["delta_ms"] = _percentiles([latency - request.duration for request, latency, _ in answered])
+    return summary
+
+
+def report(results: list[Replayed]) -> dict[str, Any]:
+    by_endpoint: dict[str, list[Replayed]] = defaultdict(list)
+    for result in results:
+        by_endpoint[f"{result.request.method} {result.request.path}"].append(result)
+    endpoints = {endpoint: _compare(by_endpoint[endpoint]) for endpoint in sorted(by_endpoint)}
+    endpoints["all"] = _compare(results)
+    return endpoints
+
+
+async def main_async(args: argparse.Namespace) -> dict[str, Any]:
+    requests = load(args.paths, args.limit)
+    if not requests:
+        raise SystemExit("No captured requests")
+    limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+    started = time.perf_counter()
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+        results = await replay(client, requests, args.speed, args.max_in_flight)
+    return {
+        "speed": args.speed,
+        "captured_span_s": round(requests[-1].started_at - requests[0].started_at, 1),
+        "replay_s": round(time.perf_counter() - started, 1),
+        "endpoints": report(results),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="Capture files or directories")
+    parser.add_argument("--url", default="http://localhost:8000", help="Base URL of the instance")
+    parser.add_argument("--speed", type=float, default=1, help="Multiplier of the captured rate, 0 is unlimited")
+    parser.add_argument("--max-in-flight", type=int, default=1000, help="Unanswered requests before dropping")
+    parser.add_argument("--timeout", type=float, default=10, help="Seconds to wait for a response")
+    parser.add_argument("--limit", type=int, help="Replay only the first requests")
+    parser.add_argument("--output", help="Also write the report to the file")
+    args = parser.parse_args()
+
+    result = json.dumps(asyncio.run(main_async(args)), indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(result + "\n")
+    print(result)
+
+
+if __name__ == "__main__":
+    main()
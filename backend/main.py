@@ -2,6 +2,7 @@
 import os
 
 import uvicorn
+from uvicorn.config import LOGGING_CONFIG
 
 from project.core.application import get_app
 from project.core.settings import settings
@@ -17,4 +18,7 @@ if __name__ == "__main__":
         host=settings.host,
         port=settings.port,
         log_level=settings.log_level.lower(),
+        # With JSON logs uvicorn's loggers go through the root one, and requests are logged by AccessLogMiddleware
+        log_config=None if settings.log_json else LOGGING_CONFIG,
+        access_log=not settings.log_json,
     )
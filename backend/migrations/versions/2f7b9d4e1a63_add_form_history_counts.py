@@ -0,0 +1,92 @@
+"""add_form_history_counts
+
+Revision ID: 2f7b9d4e1a63
+Revises: 8d3c2a6e4f10
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2f7b9d4e1a63'
+down_revision = '8d3c2a6e4f10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('form_history_date_counts',
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('date')
+    )
+    op.create_table('form_history_person_date_counts',
+    sa.Column('first_name', sa.String(length=255), nullable=False),
+    sa.Column('last_name', sa.String(length=255), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('first_name', 'last_name', 'date')
+    )
+    op.create_index(
+        'ix_form_history_person_date_counts_last_name_date',
+        'form_history_person_date_counts',
+        ['last_name', 'date'],
+        unique=False,
+    )
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION count_form_history_change() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'UPDATE' AND (OLD.date, OLD.first_name, OLD.last_name)
+                    IS NOT DISTINCT FROM (NEW.date, NEW.first_name, NEW.last_name) THEN
+                RETURN NULL;
+            END IF;
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                UPDATE form_history_date_counts SET count = count - 1 WHERE date = OLD.date;
+                UPDATE form_history_person_date_counts SET count = count - 1
+                WHERE first_name = OLD.first_name AND last_name = OLD.last_name AND date = OLD.date;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO form_history_date_counts AS c (date, count) VALUES (NEW.date, 1)
+                ON CONFLICT (date) DO UPDATE SET count = c.count + 1;
+                INSERT INTO form_history_person_date_counts AS c (first_name, last_name, date, count)
+                VALUES (NEW.first_name, NEW.last_name, NEW.date, 1)
+                ON CONFLICT (first_name, last_name, date) DO UPDATE SET count = c.count + 1;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION rebuild_form_history_counts() RETURNS void AS $$
+        BEGIN
+            LOCK TABLE form_history IN SHARE MODE;
+            DELETE FROM form_history_date_counts;
+            DELETE FROM form_history_person_date_counts;
+            INSERT INTO form_history_date_counts (date, count)
+            SELECT date, count(*) FROM form_history GROUP BY date;
+            INSERT INTO form_history_person_date_counts (first_name, last_name, date, count)
+            SELECT first_name, last_name, date, count(*) FROM form_history GROUP BY first_name, last_name, date;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        "CREATE TRIGGER form_history_count AFTER INSERT OR UPDATE OR DELETE ON form_history "
+        "FOR EACH ROW EXECUTE FUNCTION count_form_history_change()"
+    )
+    # Backfill existing rows, the lock keeps them from changing until the trigger is committed
+    op.execute("SELECT rebuild_form_history_counts()")
+
+
+def downgrade():
+    op.execute("DROP TRIGGER form_history_count ON form_history")
+    op.execute("DROP FUNCTION rebuild_form_history_counts()")
+    op.execute("DROP FUNCTION count_form_history_change()")
+    op.drop_index('ix_form_history_person_date_counts_last_name_date', table_name='form_history_person_date_counts')
+    op.drop_table('form_history_person_date_counts')
+    op.drop_table('form_history_date_counts')
@@ -0,0 +1,182 @@
+"""partition_form_history_by_month
+
+Revision ID: 4c8e1b7d2f95
+Revises: 2f7b9d4e1a63
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '4c8e1b7d2f95'
+down_revision = '2f7b9d4e1a63'
+branch_labels = None
+depends_on = None
+
+ENSURE_PARTITIONS = """
+        CREATE OR REPLACE FUNCTION ensure_form_history_partitions(first_month date, last_month date) RETURNS integer AS $$
+        DECLARE
+            month date := date_trunc('month', first_month)::date;
+            next_month date;
+            partition_name text;
+            created integer := 0;
+        BEGIN
+            -- Workers maintain partitions concurrently
+            PERFORM pg_advisory_xact_lock(hashtext('form_history_partitions'));
+            WHILE month <= last_month LOOP
+                next_month := (month + interval '1 month')::date;
+                partition_name := 'form_history_' || to_char(month, '"y"YYYY"m"MM');
+                IF to_regclass(partition_name) IS NULL
+                        AND to_regclass('form_history_archive_' || substr(partition_name, 14)) IS NULL
+                        AND NOT EXISTS (SELECT FROM form_history_default WHERE date >= month AND date < next_month) THEN
+                    -- Unlike CREATE TABLE ... PARTITION OF, ATTACH doesn't block queries to form_history
+                    EXECUTE format('CREATE TABLE %I (LIKE form_history INCLUDING DEFAULTS)', partition_name);
+                    EXECUTE format(
+                        'ALTER TABLE form_history ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                        partition_name, month, next_month
+                    );
+                    created := created + 1;
+                END IF;
+                month := next_month;
+            END LOOP;
+            RETURN created;
+        END;
+        $$ LANGUAGE plpgsql
+"""
+
+ARCHIVE_PARTITIONS = """
+        CREATE OR REPLACE FUNCTION archive_form_history_partitions(before date, archive_tablespace text DEFAULT NULL)
+        RETURNS SETOF text AS $$
+        DECLARE
+            partition_name text;
+            month date;
+            archive_name text;
+            archived integer := 0;
+        BEGIN
+            PERFORM pg_advisory_xact_lock(hashtext('form_history_partitions'));
+            FOR partition_name IN
+                SELECT child.relname FROM pg_inherits
+                JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+                WHERE pg_inherits.inhparent = 'form_history'::regclass
+                    AND child.relname ~ '^form_history_y[0-9]{4}m[0-9]{2}$'
+                ORDER BY child.relname
+            LOOP
+                month := to_date(substr(partition_name, 14), '"y"YYYY"m"MM');
+                CONTINUE WHEN (month + interval '1 month')::date > before;
+                archive_name := 'form_history_archive_' || substr(partition_name, 14);
+                EXECUTE format('ALTER TABLE form_history DETACH PARTITION %I', partition_name);
+                EXECUTE format('ALTER TABLE %I RENAME TO %I', partition_name, archive_name);
+                IF archive_tablespace IS NOT NULL THEN
+                    EXECUTE format('ALTER TABLE %I SET TABLESPACE %I', archive_name, archive_tablespace);
+                END IF;
+                -- Rows of the month are gone from form_history, the default partition can't have any
+                DELETE FROM form_history_date_counts WHERE date >= month AND date < month + interval '1 month';
+                DELETE FROM form_history_person_date_counts WHERE date >= month AND date < month + interval '1 month';
+                archived := archived + 1;
+                RETURN NEXT archive_name;
+            END LOOP;
+            IF archived > 0 THEN
+                PERFORM pg_notify('form_history_changes', '');
+            END IF;
+        END;
+        $$ LANGUAGE plpgsql
+"""
+
+
+def upgrade():
+    # Writes wait until the end of the migration, reads keep using the old table until it's swapped
+    op.execute("LOCK TABLE form_history IN EXCLUSIVE MODE")
+    op.execute(
+        """
+        CREATE TABLE form_history_partitioned (
+            id UUID NOT NULL,
+            date DATE NOT NULL,
+            first_name VARCHAR(255) NOT NULL,
+            last_name VARCHAR(255) NOT NULL,
+            created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+            updated_at TIMESTAMP WITH TIME ZONE NOT NULL,
+            CONSTRAINT form_history_partitioned_pkey PRIMARY KEY (id, date)
+        ) PARTITION BY RANGE (date)
+        """
+    )
+    op.execute("CREATE TABLE form_history_default PARTITION OF form_history_partitioned DEFAULT")
+    # A partition for every month having rows, so the default partition starts empty
+    op.execute(
+        """
+        DO $$
+        DECLARE
+            month date;
+        BEGIN
+            FOR month IN SELECT DISTINCT date_trunc('month', date)::date FROM form_history LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF form_history_partitioned FOR VALUES FROM (%L) TO (%L)',
+                    'form_history_' || to_char(month, '"y"YYYY"m"MM'), month, (month + interval '1 month')::date
+                );
+            END LOOP;
+        END;
+        $$
+        """
+    )
+    op.execute(
+        "INSERT INTO form_history_partitioned (id, date, first_name, last_name, created_at, updated_at) "
+        "SELECT id, date, first_name, last_name, created_at, updated_at FROM form_history"
+    )
+    op.execute("CREATE INDEX ix_form_history_partitioned_created_at ON form_history_partitioned (created_at)")
+
+    op.execute("DROP TABLE form_history")
+    op.execute("ALTER TABLE form_history_partitioned RENAME TO form_history")
+    op.execute("ALTER TABLE form_history RENAME CONSTRAINT form_history_partitioned_pkey TO form_history_pkey")
+    op.execute("ALTER INDEX ix_form_history_partitioned_created_at RENAME TO ix_form_history_created_at")
+    # Triggers were dropped with the old table, counts are still valid for the same rows
+    op.execute(
+        "CREATE TRIGGER form_history_notify AFTER INSERT OR UPDATE OR DELETE ON form_history "
+        "FOR EACH ROW EXECUTE FUNCTION notify_form_history_change()"
+    )
+    op.execute(
+        "CREATE TRIGGER form_history_count AFTER INSERT OR UPDATE OR DELETE ON form_history "
+        "FOR EACH ROW EXECUTE FUNCTION count_form_history_change()"
+    )
+    op.execute(ENSURE_PARTITIONS)
+    op.execute(ARCHIVE_PARTITIONS)
+    op.execute(
+        "SELECT ensure_form_history_partitions(date_trunc('month', now())::date, "
+        "(date_trunc('month', now()) + interval '3 months')::date)"
+    )
+
+
+def downgrade():
+    # Archived partitions are left as they are
+    op.execute("LOCK TABLE form_history IN EXCLUSIVE MODE")
+    op.execute("DROP FUNCTION archive_form_history_partitions(date, text)")
+    op.execute("DROP FUNCTION ensure_form_history_partitions(date, date)")
+    op.execute(
+        """
+        CREATE TABLE form_history_plain (
+            id UUID NOT NULL,
+            date DATE NOT NULL,
+            first_name VARCHAR(255) NOT NULL,
+            last_name VARCHAR(255) NOT NULL,
+            created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+            updated_at TIMESTAMP WITH TIME ZONE NOT NULL,
+            CONSTRAINT form_history_plain_pkey PRIMARY KEY (id)
+        )
+        """
+    )
+    op.execute(
+        "INSERT INTO form_history_plain (id, date, first_name, last_name, created_at, updated_at) "
+        "SELECT id, date, first_name, last_name, created_at, updated_at FROM form_history"
+    )
+    op.execute("CREATE INDEX ix_form_history_plain_created_at ON form_history_plain (created_at)")
+    op.execute("DROP TABLE form_history")
+    op.execute("ALTER TABLE form_history_plain RENAME TO form_history")
+    op.execute("ALTER TABLE form_history RENAME CONSTRAINT form_history_plain_pkey TO form_history_pkey")
+    op.execute("ALTER INDEX ix_form_history_plain_created_at RENAME TO ix_form_history_created_at")
+    op.execute(
+        "CREATE TRIGGER form_history_notify AFTER INSERT OR UPDATE OR DELETE ON form_history "
+        "FOR EACH ROW EXECUTE FUNCTION notify_form_history_change()"
+    )
+    op.execute(
+        "CREATE TRIGGER form_history_count AFTER INSERT OR UPDATE OR DELETE ON form_history "
+        "FOR EACH ROW EXECUTE FUNCTION count_form_history_change()"
+    )
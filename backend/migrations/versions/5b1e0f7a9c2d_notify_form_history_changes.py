@@ -0,0 +1,48 @@
+"""notify_form_history_changes
+
+Revision ID: 5b1e0f7a9c2d
+Revises: c65c6f4133e9
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '5b1e0f7a9c2d'
+down_revision = 'c65c6f4133e9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION notify_form_history_change() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                PERFORM pg_notify('form_history_changes', json_build_object(
+                    'op', TG_OP, 'id', OLD.id, 'date', OLD.date, 'first_name', OLD.first_name,
+                    'last_name', OLD.last_name, 'created_at', OLD.created_at
+                )::text);
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                PERFORM pg_notify('form_history_changes', json_build_object(
+                    'op', TG_OP, 'id', NEW.id, 'date', NEW.date, 'first_name', NEW.first_name,
+                    'last_name', NEW.last_name, 'created_at', NEW.created_at
+                )::text);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        "CREATE TRIGGER form_history_notify AFTER INSERT OR UPDATE OR DELETE ON form_history "
+        "FOR EACH ROW EXECUTE FUNCTION notify_form_history_change()"
+    )
+
+
+def downgrade():
+    op.execute("DROP TRIGGER form_history_notify ON form_history")
+    op.execute("DROP FUNCTION notify_form_history_change()")
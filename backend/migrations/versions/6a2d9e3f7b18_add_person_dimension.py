@@ -0,0 +1,249 @@
+"""add_person_dimension
+
+Revision ID: 6a2d9e3f7b18
+Revises: 4c8e1b7d2f95
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6a2d9e3f7b18'
+down_revision = '4c8e1b7d2f95'
+branch_labels = None
+depends_on = None
+
+SET_PERSON_ID = """
+    CREATE OR REPLACE FUNCTION set_form_history_person_id() RETURNS trigger AS $$
+    BEGIN
+        IF NEW.person_id IS NULL OR (
+            TG_OP = 'UPDATE' AND NEW.person_id = OLD.person_id
+            AND (NEW.first_name, NEW.last_name) IS DISTINCT FROM (OLD.first_name, OLD.last_name)
+        ) THEN
+            -- A concurrent transaction creating the same person is waited for, then its row is found
+            INSERT INTO person (first_name, last_name) VALUES (NEW.first_name, NEW.last_name) ON CONFLICT DO NOTHING;
+            SELECT id INTO NEW.person_id FROM person WHERE first_name = NEW.first_name AND last_name = NEW.last_name;
+        END IF;
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+
+NOTIFY_CHANGE = """
+    CREATE OR REPLACE FUNCTION notify_form_history_change() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'UPDATE' AND (OLD.date, OLD.first_name, OLD.last_name)
+                IS NOT DISTINCT FROM (NEW.date, NEW.first_name, NEW.last_name) THEN
+            RETURN NULL;
+        END IF;
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            PERFORM pg_notify('form_history_changes', json_build_object(
+                'op', TG_OP, 'id', OLD.id, 'date', OLD.date, 'first_name', OLD.first_name,
+                'last_name', OLD.last_name, 'created_at', OLD.created_at
+            )::text);
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            PERFORM pg_notify('form_history_changes', json_build_object(
+                'op', TG_OP, 'id', NEW.id, 'date', NEW.date, 'first_name', NEW.first_name,
+                'last_name', NEW.last_name, 'created_at', NEW.created_at
+            )::text);
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+
+COUNT_CHANGE_BY_PERSON_ID = """
+    CREATE OR REPLACE FUNCTION count_form_history_change() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'UPDATE' AND (OLD.date, OLD.person_id) IS NOT DISTINCT FROM (NEW.date, NEW.person_id) THEN
+            RETURN NULL;
+        END IF;
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            UPDATE form_history_date_counts SET count = count - 1 WHERE date = OLD.date;
+            UPDATE form_history_person_date_counts SET count = count - 1
+            WHERE person_id = OLD.person_id AND date = OLD.date;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO form_history_date_counts AS c (date, count) VALUES (NEW.date, 1)
+            ON CONFLICT (date) DO UPDATE SET count = c.count + 1;
+            INSERT INTO form_history_person_date_counts AS c (person_id, date, count)
+            VALUES (NEW.person_id, NEW.date, 1)
+            ON CONFLICT (person_id, date) DO UPDATE SET count = c.count + 1;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+
+REBUILD_COUNTS_BY_PERSON_ID = """
+    CREATE OR REPLACE FUNCTION rebuild_form_history_counts() RETURNS void AS $$
+    BEGIN
+        LOCK TABLE form_history IN SHARE MODE;
+        DELETE FROM form_history_date_counts;
+        DELETE FROM form_history_person_date_counts;
+        INSERT INTO form_history_date_counts (date, count)
+        SELECT date, count(*) FROM form_history GROUP BY date;
+        INSERT INTO form_history_person_date_counts (person_id, date, count)
+        SELECT person_id, date, count(*) FROM form_history GROUP BY person_id, date;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+
+COUNT_CHANGE_BY_NAMES = """
+    CREATE OR REPLACE FUNCTION count_form_history_change() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'UPDATE' AND (OLD.date, OLD.first_name, OLD.last_name)
+                IS NOT DISTINCT FROM (NEW.date, NEW.first_name, NEW.last_name) THEN
+            RETURN NULL;
+        END IF;
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            UPDATE form_history_date_counts SET count = count - 1 WHERE date = OLD.date;
+            UPDATE form_history_person_date_counts SET count = count - 1
+            WHERE first_name = OLD.first_name AND last_name = OLD.last_name AND date = OLD.date;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO form_history_date_counts AS c (date, count) VALUES (NEW.date, 1)
+            ON CONFLICT (date) DO UPDATE SET count = c.count + 1;
+            INSERT INTO form_history_person_date_counts AS c (first_name, last_name, date, count)
+            VALUES (NEW.first_name, NEW.last_name, NEW.date, 1)
+            ON CONFLICT (first_name, last_name, date) DO UPDATE SET count = c.count + 1;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+
+REBUILD_COUNTS_BY_NAMES = """
+    CREATE OR REPLACE FUNCTION rebuild_form_history_counts() RETURNS void AS $$
+    BEGIN
+        LOCK TABLE form_history IN SHARE MODE;
+        DELETE FROM form_history_date_counts;
+        DELETE FROM form_history_person_date_counts;
+        INSERT INTO form_history_date_counts (date, count)
+        SELECT date, count(*) FROM form_history GROUP BY date;
+        INSERT INTO form_history_person_date_counts (first_name, last_name, date, count)
+        SELECT first_name, last_name, date, count(*) FROM form_history GROUP BY first_name, last_name, date;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+
+
+def _get_partitions():
+    result = op.get_bind().execute(
+        sa.text(
+            "SELECT child.relname FROM pg_inherits JOIN pg_class child ON child.oid = inhrelid "
+            "WHERE inhparent = 'form_history'::regclass ORDER BY 1"
+        )
+    )
+    return [name for name, in result]
+
+
+def upgrade():
+    # Only the last step blocks writes, for a copy of the (small) counts table. Everything else works row by row or
+    # partition by partition with committed batches, while form_history is being used.
+    op.create_table('person',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('first_name', sa.String(length=255), nullable=False),
+    sa.Column('last_name', sa.String(length=255), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('first_name', 'last_name', name='uq_person_first_name_last_name')
+    )
+    op.create_index('ix_person_last_name', 'person', ['last_name'], unique=False)
+    op.add_column('form_history', sa.Column('person_id', sa.Integer(), nullable=True))
+    # Changes of person_id alone (the backfill) are not announced
+    op.execute(NOTIFY_CHANGE)
+    op.execute(SET_PERSON_ID)
+    op.execute(
+        "CREATE TRIGGER form_history_person_id BEFORE INSERT OR UPDATE ON form_history "
+        "FOR EACH ROW EXECUTE FUNCTION set_form_history_person_id()"
+    )
+    op.execute("CREATE INDEX ix_form_history_person_id_date ON ONLY form_history (person_id, date)")
+
+    partitions = _get_partitions()
+    with op.get_context().autocommit_block():
+        op.execute(
+            "INSERT INTO person (first_name, last_name) SELECT DISTINCT first_name, last_name FROM form_history "
+            "ON CONFLICT DO NOTHING"
+        )
+        for partition in partitions:
+            # New rows get person_id from the trigger, old ones of the partition are updated by one statement
+            op.execute(
+                f"UPDATE {partition} f SET person_id = p.id FROM person p "
+                "WHERE f.person_id IS NULL AND p.first_name = f.first_name AND p.last_name = f.last_name"
+            )
+            # Validated CHECK and FK of every partition let the parent's constraints skip scanning the rows
+            op.execute(
+                f"ALTER TABLE {partition} ADD CONSTRAINT {partition}_person_id_not_null "
+                "CHECK (person_id IS NOT NULL) NOT VALID"
+            )
+            op.execute(f"ALTER TABLE {partition} VALIDATE CONSTRAINT {partition}_person_id_not_null")
+            op.execute(
+                f"ALTER TABLE {partition} ADD CONSTRAINT form_history_person_id_fkey "
+                "FOREIGN KEY (person_id) REFERENCES person (id) NOT VALID"
+            )
+            op.execute(f"ALTER TABLE {partition} VALIDATE CONSTRAINT form_history_person_id_fkey")
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {partition}_person_id_date_idx "
+                f"ON {partition} (person_id, date)"
+            )
+            op.execute(f"ALTER INDEX ix_form_history_person_id_date ATTACH PARTITION {partition}_person_id_date_idx")
+
+    op.alter_column('form_history', 'person_id', nullable=False)
+    op.create_foreign_key('form_history_person_id_fkey', 'form_history', 'person', ['person_id'], ['id'])
+    for partition in partitions:
+        op.execute(f"ALTER TABLE {partition} DROP CONSTRAINT {partition}_person_id_not_null")
+
+    # Counts per person are re-keyed from names to ids, writes wait so none is counted in the old table only
+    op.execute("LOCK TABLE form_history IN SHARE MODE")
+    op.execute("ALTER TABLE form_history_person_date_counts RENAME TO form_history_person_date_counts_by_names")
+    op.execute("ALTER INDEX form_history_person_date_counts_pkey RENAME TO form_history_person_date_counts_by_names_pkey")
+    op.create_table('form_history_person_date_counts',
+    sa.Column('person_id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('person_id', 'date')
+    )
+    op.execute(
+        "INSERT INTO form_history_person_date_counts (person_id, date, count) "
+        "SELECT p.id, c.date, c.count FROM form_history_person_date_counts_by_names c "
+        "JOIN person p ON p.first_name = c.first_name AND p.last_name = c.last_name"
+    )
+    op.drop_table('form_history_person_date_counts_by_names')
+    op.execute(COUNT_CHANGE_BY_PERSON_ID)
+    op.execute(REBUILD_COUNTS_BY_PERSON_ID)
+
+
+def downgrade():
+    op.execute("LOCK TABLE form_history IN SHARE MODE")
+    op.execute("ALTER TABLE form_history_person_date_counts RENAME TO form_history_person_date_counts_by_ids")
+    op.execute("ALTER INDEX form_history_person_date_counts_pkey RENAME TO form_history_person_date_counts_by_ids_pkey")
+    op.create_table('form_history_person_date_counts',
+    sa.Column('first_name', sa.String(length=255), nullable=False),
+    sa.Column('last_name', sa.String(length=255), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('first_name', 'last_name', 'date')
+    )
+    op.create_index(
+        'ix_form_history_person_date_counts_last_name_date',
+        'form_history_person_date_counts',
+        ['last_name', 'date'],
+        unique=False,
+    )
+    op.execute(
+        "INSERT INTO form_history_person_date_counts (first_name, last_name, date, count) "
+        "SELECT p.first_name, p.last_name, c.date, c.count FROM form_history_person_date_counts_by_ids c "
+        "JOIN person p ON p.id = c.person_id"
+    )
+    op.drop_table('form_history_person_date_counts_by_ids')
+    op.execute(COUNT_CHANGE_BY_NAMES)
+    op.execute(REBUILD_COUNTS_BY_NAMES)
+
+    op.execute("DROP TRIGGER form_history_person_id ON form_history")
+    op.execute("DROP FUNCTION set_form_history_person_id()")
+    op.drop_column('form_history', 'person_id')
+    op.drop_index('ix_person_last_name', table_name='person')
+    op.drop_table('person')
@@ -0,0 +1,35 @@
+"""time_ordered_form_history_ids
+
+Revision ID: 9b4e7c2a5d31
+Revises: 6a2d9e3f7b18
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '9b4e7c2a5d31'
+down_revision = '6a2d9e3f7b18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The application generates UUIDv7 itself, the default is for rows inserted by SQL. Only the default changes, which
+    # doesn't touch rows: existing UUIDv4 ids stay as they are and both versions fit the same uuid column.
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION uuid_generate_v7() RETURNS uuid AS $$
+            SELECT encode(set_bit(set_bit(overlay(uuid_send(gen_random_uuid()) PLACING
+                substring(int8send(floor(extract(epoch FROM clock_timestamp()) * 1000)::bigint) FROM 3) FROM 1 FOR 6),
+                52, 1), 53, 1), 'hex')::uuid
+        $$ LANGUAGE sql VOLATILE
+        """
+    )
+    op.execute("ALTER TABLE form_history ALTER COLUMN id SET DEFAULT uuid_generate_v7()")
+
+
+def downgrade():
+    op.execute("ALTER TABLE form_history ALTER COLUMN id DROP DEFAULT")
+    op.execute("DROP FUNCTION uuid_generate_v7()")
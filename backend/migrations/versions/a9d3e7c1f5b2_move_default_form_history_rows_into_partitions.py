@@ -0,0 +1,115 @@
+"""move_default_form_history_rows_into_partitions
+
+Revision ID: a9d3e7c1f5b2
+Revises: f2b6d8e4a1c7
+Create Date: 2026-10-19 23:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9d3e7c1f5b2'
+down_revision = 'f2b6d8e4a1c7'
+branch_labels = None
+depends_on = None
+
+# Also creates partitions of months up to the end of the range which have rows in the default partition, and moves
+# the rows there
+ENSURE_PARTITIONS = """
+        CREATE OR REPLACE FUNCTION ensure_form_history_partitions(first_month date, last_month date) RETURNS integer AS $$
+        DECLARE
+            month date;
+            next_month date;
+            partition_name text;
+            columns text;
+            detached boolean := false;
+            created integer := 0;
+        BEGIN
+            -- Workers maintain partitions concurrently
+            PERFORM pg_advisory_xact_lock(hashtext('form_history_partitions'));
+            SELECT string_agg(quote_ident(attname), ', ' ORDER BY attnum) INTO columns FROM pg_attribute
+            WHERE attrelid = 'form_history'::regclass AND attnum > 0 AND NOT attisdropped;
+            FOR month IN
+                SELECT generate_series(
+                    date_trunc('month', first_month), date_trunc('month', last_month), interval '1 month'
+                )::date
+                UNION
+                SELECT DISTINCT date_trunc('month', date)::date FROM form_history_default
+                WHERE date < date_trunc('month', last_month) + interval '1 month'
+                ORDER BY 1
+            LOOP
+                next_month := (month + interval '1 month')::date;
+                partition_name := 'form_history_' || to_char(month, '"y"YYYY"m"MM');
+                CONTINUE WHEN to_regclass(partition_name) IS NOT NULL;
+                IF to_regclass('form_history_archive_' || substr(partition_name, 14)) IS NOT NULL THEN
+                    IF EXISTS (SELECT FROM form_history_default WHERE date >= month AND date < next_month) THEN
+                        RAISE WARNING 'form_history_default has rows of archived month %', month;
+                    END IF;
+                    CONTINUE;
+                END IF;
+                -- Unlike CREATE TABLE ... PARTITION OF, ATTACH doesn't block queries to form_history
+                EXECUTE format('CREATE TABLE %I (LIKE form_history INCLUDING DEFAULTS)', partition_name);
+                IF EXISTS (SELECT FROM form_history_default WHERE date >= month AND date < next_month) THEN
+                    IF NOT detached THEN
+                        ALTER TABLE form_history DETACH PARTITION form_history_default;
+                        detached := true;
+                    END IF;
+                    EXECUTE format(
+                        'INSERT INTO %I (%s) SELECT %s FROM form_history_default WHERE date >= %L AND date < %L',
+                        partition_name, columns, columns, month, next_month
+                    );
+                    DELETE FROM form_history_default WHERE date >= month AND date < next_month;
+                END IF;
+                EXECUTE format(
+                    'ALTER TABLE form_history ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                    partition_name, month, next_month
+                );
+                created := created + 1;
+            END LOOP;
+            IF detached THEN
+                ALTER TABLE form_history ATTACH PARTITION form_history_default DEFAULT;
+            END IF;
+            RETURN created;
+        END;
+        $$ LANGUAGE plpgsql
+"""
+
+ENSURE_PARTITIONS_SKIPPING_DEFAULT_ROWS = """
+        CREATE OR REPLACE FUNCTION ensure_form_history_partitions(first_month date, last_month date) RETURNS integer AS $$
+        DECLARE
+            month date := date_trunc('month', first_month)::date;
+            next_month date;
+            partition_name text;
+            created integer := 0;
+        BEGIN
+            -- Workers maintain partitions concurrently
+            PERFORM pg_advisory_xact_lock(hashtext('form_history_partitions'));
+            WHILE month <= last_month LOOP
+                next_month := (month + interval '1 month')::date;
+                partition_name := 'form_history_' || to_char(month, '"y"YYYY"m"MM');
+                IF to_regclass(partition_name) IS NULL
+                        AND to_regclass('form_history_archive_' || substr(partition_name, 14)) IS NULL
+                        AND NOT EXISTS (SELECT FROM form_history_default WHERE date >= month AND date < next_month) THEN
+                    -- Unlike CREATE TABLE ... PARTITION OF, ATTACH doesn't block queries to form_history
+                    EXECUTE format('CREATE TABLE %I (LIKE form_history INCLUDING DEFAULTS)', partition_name);
+                    EXECUTE format(
+                        'ALTER TABLE form_history ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                        partition_name, month, next_month
+                    );
+                    created := created + 1;
+                END IF;
+                month := next_month;
+            END LOOP;
+            RETURN created;
+        END;
+        $$ LANGUAGE plpgsql
+"""
+
+
+def upgrade():
+    op.execute(ENSURE_PARTITIONS)
+
+
+def downgrade():
+    op.execute(ENSURE_PARTITIONS_SKIPPING_DEFAULT_ROWS)
@@ -0,0 +1,225 @@
+"""fold_repeated_form_history_submissions
+
+Revision ID: c3f8a1d6e274
+Revises: 9b4e7c2a5d31
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3f8a1d6e274'
+down_revision = '9b4e7c2a5d31'
+branch_labels = None
+depends_on = None
+
+NOTIFY_CHANGE_WITH_OCCURRENCES = """
+    CREATE OR REPLACE FUNCTION notify_form_history_change() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'UPDATE' AND (OLD.date, OLD.first_name, OLD.last_name)
+                IS NOT DISTINCT FROM (NEW.date, NEW.first_name, NEW.last_name) THEN
+            IF NEW.occurrences > OLD.occurrences THEN
+                PERFORM pg_notify('form_history_changes', json_build_object(
+                    'op', 'INSERT', 'id', NEW.id, 'date', NEW.date, 'first_name', NEW.first_name,
+                    'last_name', NEW.last_name, 'created_at', NEW.created_at, 'occurrences', NEW.occurrences
+                )::text);
+            END IF;
+            RETURN NULL;
+        END IF;
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            PERFORM pg_notify('form_history_changes', json_build_object(
+                'op', TG_OP, 'id', OLD.id, 'date', OLD.date, 'first_name', OLD.first_name,
+                'last_name', OLD.last_name, 'created_at', OLD.created_at, 'occurrences', OLD.occurrences
+            )::text);
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            PERFORM pg_notify('form_history_changes', json_build_object(
+                'op', TG_OP, 'id', NEW.id, 'date', NEW.date, 'first_name', NEW.first_name,
+                'last_name', NEW.last_name, 'created_at', NEW.created_at, 'occurrences', NEW.occurrences
+            )::text);
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+
+COUNT_CHANGE_WITH_OCCURRENCES = """
+    CREATE OR REPLACE FUNCTION count_form_history_change() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'UPDATE' AND (OLD.date, OLD.person_id) IS NOT DISTINCT FROM (NEW.date, NEW.person_id) THEN
+            -- Repeated submission, the count rows exist since the row does
+            IF NEW.occurrences <> OLD.occurrences THEN
+                UPDATE form_history_date_counts SET count = count + NEW.occurrences - OLD.occurrences
+                WHERE date = NEW.date;
+                UPDATE form_history_person_date_counts SET count = count + NEW.occurrences - OLD.occurrences
+                WHERE person_id = NEW.person_id AND date = NEW.date;
+            END IF;
+            RETURN NULL;
+        END IF;
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            UPDATE form_history_date_counts SET count = count - OLD.occurrences WHERE date = OLD.date;
+            UPDATE form_history_person_date_counts SET count = count - OLD.occurrences
+            WHERE person_id = OLD.person_id AND date = OLD.date;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO form_history_date_counts AS c (date, count) VALUES (NEW.date, NEW.occurrences)
+            ON CONFLICT (date) DO UPDATE SET count = c.count + EXCLUDED.count;
+            INSERT INTO form_history_person_date_counts AS c (person_id, date, count)
+            VALUES (NEW.person_id, NEW.date, NEW.occurrences)
+            ON CONFLICT (person_id, date) DO UPDATE SET count = c.count + EXCLUDED.count;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+
+REBUILD_COUNTS_WITH_OCCURRENCES = """
+    CREATE OR REPLACE FUNCTION rebuild_form_history_counts() RETURNS void AS $$
+    BEGIN
+        LOCK TABLE form_history IN SHARE MODE;
+        DELETE FROM form_history_date_counts;
+        DELETE FROM form_history_person_date_counts;
+        INSERT INTO form_history_date_counts (date, count)
+        SELECT date, sum(occurrences) FROM form_history GROUP BY date;
+        INSERT INTO form_history_person_date_counts (person_id, date, count)
+        SELECT person_id, date, sum(occurrences) FROM form_history GROUP BY person_id, date;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+
+NOTIFY_CHANGE = """
+    CREATE OR REPLACE FUNCTION notify_form_history_change() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'UPDATE' AND (OLD.date, OLD.first_name, OLD.last_name)
+                IS NOT DISTINCT FROM (NEW.date, NEW.first_name, NEW.last_name) THEN
+            RETURN NULL;
+        END IF;
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            PERFORM pg_notify('form_history_changes', json_build_object(
+                'op', TG_OP, 'id', OLD.id, 'date', OLD.date, 'first_name', OLD.first_name,
+                'last_name', OLD.last_name, 'created_at', OLD.created_at
+            )::text);
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            PERFORM pg_notify('form_history_changes', json_build_object(
+                'op', TG_OP, 'id', NEW.id, 'date', NEW.date, 'first_name', NEW.first_name,
+                'last_name', NEW.last_name, 'created_at', NEW.created_at
+            )::text);
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+
+COUNT_CHANGE = """
+    CREATE OR REPLACE FUNCTION count_form_history_change() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'UPDATE' AND (OLD.date, OLD.person_id) IS NOT DISTINCT FROM (NEW.date, NEW.person_id) THEN
+            RETURN NULL;
+        END IF;
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            UPDATE form_history_date_counts SET count = count - 1 WHERE date = OLD.date;
+            UPDATE form_history_person_date_counts SET count = count - 1
+            WHERE person_id = OLD.person_id AND date = OLD.date;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO form_history_date_counts AS c (date, count) VALUES (NEW.date, 1)
+            ON CONFLICT (date) DO UPDATE SET count = c.count + 1;
+            INSERT INTO form_history_person_date_counts AS c (person_id, date, count)
+            VALUES (NEW.person_id, NEW.date, 1)
+            ON CONFLICT (person_id, date) DO UPDATE SET count = c.count + 1;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+
+REBUILD_COUNTS = """
+    CREATE OR REPLACE FUNCTION rebuild_form_history_counts() RETURNS void AS $$
+    BEGIN
+        LOCK TABLE form_history IN SHARE MODE;
+        DELETE FROM form_history_date_counts;
+        DELETE FROM form_history_person_date_counts;
+        INSERT INTO form_history_date_counts (date, count)
+        SELECT date, count(*) FROM form_history GROUP BY date;
+        INSERT INTO form_history_person_date_counts (person_id, date, count)
+        SELECT person_id, date, count(*) FROM form_history GROUP BY person_id, date;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+
+# Keeps the earliest row of every person and date with the sum of occurrences, the rest are deleted. Counts don't
+# change: the trigger adds the occurrences to the kept row and subtracts the deleted ones.
+FOLD_PARTITION = """
+    DO $$
+    BEGIN
+        LOCK TABLE {partition} IN SHARE ROW EXCLUSIVE MODE;
+        WITH ranked AS (
+            SELECT id, date, sum(occurrences) OVER (PARTITION BY person_id, date) AS total,
+                row_number() OVER (PARTITION BY person_id, date ORDER BY created_at, id) AS n
+            FROM {partition}
+        ), kept AS (
+            UPDATE {partition} f SET occurrences = r.total FROM ranked r
+            WHERE f.id = r.id AND f.date = r.date AND r.n = 1 AND r.total > f.occurrences
+        )
+        DELETE FROM {partition} f USING ranked r WHERE f.id = r.id AND f.date = r.date AND r.n > 1;
+        CREATE UNIQUE INDEX {partition}_person_id_date_key ON {partition} (person_id, date);
+        ALTER INDEX uq_form_history_person_id_date ATTACH PARTITION {partition}_person_id_date_key;
+    END
+    $$
+"""
+
+
+def _get_partitions():
+    result = op.get_bind().execute(
+        sa.text(
+            "SELECT child.relname FROM pg_inherits JOIN pg_class child ON child.oid = inhrelid "
+            "WHERE inhparent = 'form_history'::regclass ORDER BY 1"
+        )
+    )
+    return [name for name, in result]
+
+
+def upgrade():
+    # Writes of a month wait while its duplicates are folded and its unique index is built, other months and reads
+    # go on. Exact repeats submitted by the previous version of the application fail once their month is folded, so
+    # it's to be deployed together with the migration.
+    op.add_column('form_history', sa.Column('occurrences', sa.Integer(), server_default='1', nullable=False))
+    op.execute(COUNT_CHANGE_WITH_OCCURRENCES)
+    op.execute(REBUILD_COUNTS_WITH_OCCURRENCES)
+    op.execute("CREATE UNIQUE INDEX uq_form_history_person_id_date ON ONLY form_history (person_id, date)")
+    # Repeats update rows, so the replica follows updated_at instead of created_at
+    op.execute("CREATE INDEX ix_form_history_updated_at ON ONLY form_history (updated_at)")
+
+    partitions = _get_partitions()
+    with op.get_context().autocommit_block():
+        for partition in partitions:
+            op.execute(FOLD_PARTITION.format(partition=partition))
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {partition}_updated_at_idx ON {partition} (updated_at)"
+            )
+            op.execute(f"ALTER INDEX ix_form_history_updated_at ATTACH PARTITION {partition}_updated_at_idx")
+
+    op.drop_index('ix_form_history_person_id_date', table_name='form_history')
+    op.drop_index('ix_form_history_created_at', table_name='form_history')
+    op.execute(NOTIFY_CHANGE_WITH_OCCURRENCES)
+
+
+def downgrade():
+    op.create_index('ix_form_history_created_at', 'form_history', ['created_at'], unique=False)
+    op.create_index('ix_form_history_person_id_date', 'form_history', ['person_id', 'date'], unique=False)
+    op.drop_index('ix_form_history_updated_at', table_name='form_history')
+    op.drop_index('uq_form_history_person_id_date', table_name='form_history')
+    op.execute(NOTIFY_CHANGE)
+    # A row per submission again: copies are counted by the trigger, and as much is subtracted from the original
+    op.execute(
+        "INSERT INTO form_history (id, date, first_name, last_name, person_id, created_at, updated_at) "
+        "SELECT uuid_generate_v7(), f.date, f.first_name, f.last_name, f.person_id, f.created_at, f.updated_at "
+        "FROM form_history f CROSS JOIN generate_series(2, f.occurrences)"
+    )
+    op.execute("UPDATE form_history SET occurrences = 1 WHERE occurrences > 1")
+    op.execute(COUNT_CHANGE)
+    op.execute(REBUILD_COUNTS)
+    op.drop_column('form_history', 'occurrences')
@@ -0,0 +1,143 @@
+"""optional_form_history_folding
+
+Revision ID: f2b6d8e4a1c7
+Revises: e5a7c9b1d3f2
+Create Date: 2026-10-19 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2b6d8e4a1c7'
+down_revision = 'e5a7c9b1d3f2'
+branch_labels = None
+depends_on = None
+
+NOTIFY_CHANGE_WITH_REPEAT_TIME = """
+    CREATE OR REPLACE FUNCTION notify_form_history_change() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'UPDATE' AND (OLD.date, OLD.first_name, OLD.last_name)
+                IS NOT DISTINCT FROM (NEW.date, NEW.first_name, NEW.last_name) THEN
+            IF NEW.occurrences > OLD.occurrences THEN
+                PERFORM pg_notify('form_history_changes', json_build_object(
+                    'op', 'INSERT', 'id', NEW.id, 'date', NEW.date, 'first_name', NEW.first_name,
+                    'last_name', NEW.last_name, 'created_at', NEW.created_at, 'occurrences', NEW.occurrences,
+                    'updated_at', NEW.updated_at
+                )::text);
+            END IF;
+            RETURN NULL;
+        END IF;
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            PERFORM pg_notify('form_history_changes', json_build_object(
+                'op', TG_OP, 'id', OLD.id, 'date', OLD.date, 'first_name', OLD.first_name,
+                'last_name', OLD.last_name, 'created_at', OLD.created_at, 'occurrences', OLD.occurrences
+            )::text);
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            PERFORM pg_notify('form_history_changes', json_build_object(
+                'op', TG_OP, 'id', NEW.id, 'date', NEW.date, 'first_name', NEW.first_name,
+                'last_name', NEW.last_name, 'created_at', NEW.created_at, 'occurrences', NEW.occurrences
+            )::text);
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+
+NOTIFY_CHANGE_WITH_OCCURRENCES = """
+    CREATE OR REPLACE FUNCTION notify_form_history_change() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'UPDATE' AND (OLD.date, OLD.first_name, OLD.last_name)
+                IS NOT DISTINCT FROM (NEW.date, NEW.first_name, NEW.last_name) THEN
+            IF NEW.occurrences > OLD.occurrences THEN
+                PERFORM pg_notify('form_history_changes', json_build_object(
+                    'op', 'INSERT', 'id', NEW.id, 'date', NEW.date, 'first_name', NEW.first_name,
+                    'last_name', NEW.last_name, 'created_at', NEW.created_at, 'occurrences', NEW.occurrences
+                )::text);
+            END IF;
+            RETURN NULL;
+        END IF;
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            PERFORM pg_notify('form_history_changes', json_build_object(
+                'op', TG_OP, 'id', OLD.id, 'date', OLD.date, 'first_name', OLD.first_name,
+                'last_name', OLD.last_name, 'created_at', OLD.created_at, 'occurrences', OLD.occurrences
+            )::text);
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            PERFORM pg_notify('form_history_changes', json_build_object(
+                'op', TG_OP, 'id', NEW.id, 'date', NEW.date, 'first_name', NEW.first_name,
+                'last_name', NEW.last_name, 'created_at', NEW.created_at, 'occurrences', NEW.occurrences
+            )::text);
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+
+# Rows of single submissions are folded back into the earliest row of their person and date, see
+# c3f8a1d6e274_fold_repeated_form_history_submissions
+FOLD_PARTITION = """
+    DO $$
+    BEGIN
+        LOCK TABLE {partition} IN SHARE ROW EXCLUSIVE MODE;
+        WITH ranked AS (
+            SELECT id, date, sum(occurrences) OVER (PARTITION BY person_id, date) AS total,
+                row_number() OVER (PARTITION BY person_id, date ORDER BY created_at, id) AS n
+            FROM {partition}
+        ), kept AS (
+            UPDATE {partition} f SET occurrences = r.total FROM ranked r
+            WHERE f.id = r.id AND f.date = r.date AND r.n = 1 AND r.total > f.occurrences
+        )
+        DELETE FROM {partition} f USING ranked r WHERE f.id = r.id AND f.date = r.date AND r.n > 1;
+        CREATE UNIQUE INDEX {partition}_person_id_date_key ON {partition} (person_id, date);
+        ALTER INDEX uq_form_history_person_id_date ATTACH PARTITION {partition}_person_id_date_key;
+    END
+    $$
+"""
+
+
+def _get_partitions():
+    result = op.get_bind().execute(
+        sa.text(
+            "SELECT child.relname FROM pg_inherits JOIN pg_class child ON child.oid = inhrelid "
+            "WHERE inhparent = 'form_history'::regclass ORDER BY 1"
+        )
+    )
+    return [name for name, in result]
+
+
+def upgrade():
+    # Existing rows are folded (true by the default, set without rewriting the table), rows of single submissions get
+    # NULL and never conflict with each other. Partition indexes are built without blocking writes.
+    op.add_column('form_history', sa.Column('folded', sa.Boolean(), server_default=sa.true(), nullable=True))
+    op.execute(
+        "CREATE UNIQUE INDEX uq_form_history_person_id_date_folded ON ONLY form_history (person_id, date, folded)"
+    )
+
+    partitions = _get_partitions()
+    with op.get_context().autocommit_block():
+        for partition in partitions:
+            op.execute(
+                f"CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {partition}_person_id_date_folded_key "
+                f"ON {partition} (person_id, date, folded)"
+            )
+            op.execute(
+                f"ALTER INDEX uq_form_history_person_id_date_folded "
+                f"ATTACH PARTITION {partition}_person_id_date_folded_key"
+            )
+
+    op.drop_index('uq_form_history_person_id_date', table_name='form_history')
+    op.execute(NOTIFY_CHANGE_WITH_REPEAT_TIME)
+
+
+def downgrade():
+    op.execute(NOTIFY_CHANGE_WITH_OCCURRENCES)
+    op.execute("CREATE UNIQUE INDEX uq_form_history_person_id_date ON ONLY form_history (person_id, date)")
+    partitions = _get_partitions()
+    with op.get_context().autocommit_block():
+        for partition in partitions:
+            op.execute(FOLD_PARTITION.format(partition=partition))
+    op.drop_index('uq_form_history_person_id_date_folded', table_name='form_history')
+    op.drop_column('form_history', 'folded')
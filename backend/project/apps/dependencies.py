@@ -1,8 +1,11 @@
+from contextlib import asynccontextmanager
 from typing import AsyncGenerator
+from typing import AsyncIterator
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from project.core.settings import async_session
+from project.core.timing import span
 
 
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
@@ -10,7 +13,15 @@ async def get_session() -> AsyncGenerator[AsyncSession, None]:
     async with async_session() as session:
         try:
             yield session
-            await session.commit()
+            with span("db.commit"):
+                await session.commit()
         except Exception:
             await session.rollback()
             raise
+
+
+@asynccontextmanager
+async def open_session() -> AsyncIterator[AsyncSession]:
+    """Open read-only database session outside of request's session, e.g. to run several queries concurrently."""
+    async with async_session() as session:
+        yield session
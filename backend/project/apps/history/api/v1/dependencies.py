@@ -1,26 +1,220 @@
+import os
+from contextlib import asynccontextmanager
+from datetime import date
+from typing import AsyncIterator
+from uuid import UUID
+
 from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from project.apps.dependencies import get_session
+from project.apps.dependencies import open_session
+from project.core.broadcast import Broadcast
+from project.core.cache.bloom import KnownNames
+from project.core.cache.lru import LRUCache
+from project.core.cache.shared import SharedMemoryCache
+from project.core.cache.singleflight import SingleFlight
+from project.core.cache.swr import StaleWhileRevalidate
+from project.core.db.columnar.form_history import NAMES_COLLATION
+from project.core.db.columnar.form_history import FormHistoryReplica
 from project.core.db.postgres.form_history import FormHistoryDAL
+from project.core.db.postgres.form_history import SpooledFormEntry
+from project.core.db.postgres.partitions import FormHistoryPartitions
+from project.core.db.spool import Spool
+from project.core.db.spool import SpooledRecord
+from project.core.settings import async_session
+from project.core.settings import settings
+from project.core.uc.history.dto import FormSubmitted
+from project.core.uc.history.dto import GetHistoryResponse
+from project.core.uc.history.dto import GetUniqueNamesResponse
+from project.core.uc.history.get_history import CoalescedGetHistory
 from project.core.uc.history.get_history import GetHistory
+from project.core.uc.history.get_history import ReplicaGetHistory
+from project.core.uc.history.get_history import StaleWhileRevalidateGetHistory
+from project.core.uc.history.get_history_batch import GetHistoryBatch
+from project.core.uc.history.get_unique_names import CoalescedGetUniqueNames
+from project.core.uc.history.get_unique_names import GetUniqueNames
+from project.core.uc.history.get_unique_names import ReplicaGetUniqueNames
+from project.core.uc.history.get_unique_names import StaleWhileRevalidateGetUniqueNames
 from project.core.uc.history.submit_form import SubmitForm
 
+HistoryUC = GetHistory | CoalescedGetHistory | StaleWhileRevalidateGetHistory | ReplicaGetHistory
+UniqueNamesUC = GetUniqueNames | CoalescedGetUniqueNames | StaleWhileRevalidateGetUniqueNames | ReplicaGetUniqueNames
+
+# Process-wide, so concurrent requests handled by this worker can share their queries
+history_flight = SingleFlight[GetHistoryResponse]("history")
+unique_names_flight = SingleFlight[GetUniqueNamesResponse]("unique_names")
+history_swr = StaleWhileRevalidate[GetHistoryResponse](
+    "history",
+    capacity=settings.history_swr_capacity,
+    max_staleness=settings.history_swr_max_staleness,
+    latency_budget=settings.history_swr_latency_budget,
+)
+unique_names_swr = StaleWhileRevalidate[GetUniqueNamesResponse](
+    "unique_names",
+    capacity=1,
+    max_staleness=settings.history_swr_max_staleness,
+    latency_budget=settings.history_swr_latency_budget,
+)
+# Committed submissions, streamed to clients of this worker
+form_submissions = Broadcast[FormSubmitted]("form_submissions")
+person_ids = LRUCache[tuple[str, str], int]("person_ids", capacity=settings.person_id_cache_size)
+
+
+def _open_shared_cache(name: str, slots: int, slot_size: int) -> SharedMemoryCache | None:
+    if not settings.shared_cache_enabled:
+        return None
+    path = os.path.join(settings.shared_cache_dir, f"{settings.service_name}_{name}.cache")
+    return SharedMemoryCache(name, path, slots=slots, slot_size=slot_size, ttl=settings.shared_cache_ttl)
+
+
+# Host-wide, shared by all workers of the host
+history_shared_cache = _open_shared_cache(
+    "history", settings.history_shared_cache_slots, settings.history_shared_cache_slot_size
+)
+# Slots for the value and its compressed variants
+unique_names_shared_cache = _open_shared_cache("unique_names", 4, settings.unique_names_shared_cache_slot_size)
+history_replica = (
+    FormHistoryReplica(overlap=settings.history_replica_sync_overlap) if settings.history_replica_enabled else None
+)
+known_names = (
+    KnownNames(
+        "history_known_names",
+        capacity=settings.history_known_names_capacity,
+        false_positive_rate=settings.history_known_names_false_positive_rate,
+    )
+    if settings.history_known_names_enabled
+    else None
+)
+form_history_partitions = FormHistoryPartitions(
+    async_session,
+    ahead=settings.history_partitions_ahead_months,
+    retention=settings.history_partitions_retention_months,
+    archive_tablespace=settings.history_partitions_archive_tablespace,
+)
+
+# History is ordered the same whether the replica is ready or not
+_history_names_collation = NAMES_COLLATION if settings.history_replica_enabled else None
+
+submit_spool = (
+    Spool("submit", settings.submit_spool_dir, max_bytes=settings.submit_spool_max_bytes)
+    if settings.submit_spool_enabled
+    else None
+)
+
 
 def get_form_history_dal(session: AsyncSession = Depends(get_session)) -> FormHistoryDAL:
     """Dependency for FormHistoryDAL."""
-    return FormHistoryDAL(session)
+    return FormHistoryDAL(
+        session, fold_repeats=settings.history_fold_repeats_enabled, names_collation=_history_names_collation
+    )
+
+
+@asynccontextmanager
+async def open_form_history_dal() -> AsyncIterator[FormHistoryDAL]:
+    """Open FormHistoryDAL with its own read-only session."""
+    async with open_session() as session:
+        yield FormHistoryDAL(session, names_collation=_history_names_collation)
+
+
+async def load_known_names() -> tuple[list[str], list[str]]:
+    """Load all first and last names to build Bloom filters of known names."""
+    async with open_form_history_dal() as form_history_dal:
+        return await form_history_dal.get_unique_first_names(), await form_history_dal.get_unique_last_names()
+
+
+async def apply_spooled_submissions(records: list[SpooledRecord]) -> None:
+    """Add a batch of spooled submissions to form_history in one transaction."""
+    entries = [
+        SpooledFormEntry(
+            record.id,
+            date.fromisoformat(record.data["date"]),
+            record.data["first_name"],
+            record.data["last_name"],
+        )
+        for record in records
+    ]
+    async with async_session() as session, session.begin():
+        await FormHistoryDAL(session, fold_repeats=settings.history_fold_repeats_enabled).add_spooled_entries(entries)
+
+
+async def forget_spooled_submissions(ids: list[UUID]) -> None:
+    """Drop ids of spooled submissions of a drained segment."""
+    async with async_session() as session, session.begin():
+        await FormHistoryDAL(session).forget_spooled_entries(ids)
 
 
 def get_submit_form_uc(
     form_history_dal: FormHistoryDAL = Depends(get_form_history_dal),
 ) -> SubmitForm:
     """Dependency for SubmitForm use case."""
-    return SubmitForm(form_history_dal)
+    if settings.history_notifications_enabled:
+        # Submissions of all workers are published from database notifications
+        return SubmitForm(
+            form_history_dal,
+            known_names=known_names,
+            person_ids=person_ids,
+            spool=submit_spool,
+            spool_timeout=settings.submit_spool_timeout,
+        )
+    return SubmitForm(
+        form_history_dal,
+        form_submissions,
+        known_names,
+        person_ids,
+        spool=submit_spool,
+        spool_timeout=settings.submit_spool_timeout,
+    )
+
+
+def get_form_submissions() -> Broadcast[FormSubmitted]:
+    """Dependency for the broadcast of committed submissions."""
+    return form_submissions
 
 
 def get_history_uc(
     form_history_dal: FormHistoryDAL = Depends(get_form_history_dal),
-) -> GetHistory:
+) -> HistoryUC:
     """Dependency for GetHistory use case."""
-    return GetHistory(form_history_dal)
+    if history_replica is not None and history_replica.ready:
+        return ReplicaGetHistory(history_replica)
+    if settings.history_swr_enabled:
+        # Background refresh outlives the request, so it can't use request's session
+        return StaleWhileRevalidateGetHistory(
+            CoalescedGetHistory(open_form_history_dal, history_flight, known_names), history_swr
+        )
+    if settings.history_single_flight_enabled:
+        return CoalescedGetHistory(open_form_history_dal, history_flight, known_names)
+    return GetHistory(form_history_dal, known_names)
+
+
+def get_unique_names_uc(
+    form_history_dal: FormHistoryDAL = Depends(get_form_history_dal),
+) -> UniqueNamesUC:
+    """Dependency for GetUniqueNames use case."""
+    if history_replica is not None and history_replica.ready:
+        return ReplicaGetUniqueNames(history_replica)
+    if settings.history_swr_enabled:
+        return StaleWhileRevalidateGetUniqueNames(
+            CoalescedGetUniqueNames(open_form_history_dal, unique_names_flight), unique_names_swr
+        )
+    if settings.history_single_flight_enabled:
+        return CoalescedGetUniqueNames(open_form_history_dal, unique_names_flight)
+    return GetUniqueNames(form_history_dal)
+
+
+def get_history_shared_cache() -> SharedMemoryCache | None:
+    """Dependency for host-wide cache of rendered history, None if it's disabled."""
+    return history_shared_cache
+
+
+def get_unique_names_shared_cache() -> SharedMemoryCache | None:
+    """Dependency for host-wide cache of rendered unique names, None if it's disabled."""
+    return unique_names_shared_cache
+
+
+def get_history_batch_uc() -> GetHistoryBatch:
+    """Dependency for GetHistoryBatch use case."""
+    return GetHistoryBatch(
+        open_form_history_dal, concurrency=settings.history_batch_concurrency, known_names=known_names
+    )
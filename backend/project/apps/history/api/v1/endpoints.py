@@ -1,25 +1,70 @@
+import asyncio
+import json
+import secrets
 from datetime import date
+from typing import AsyncIterator
+from typing import Callable
 
 from fastapi import APIRouter
 from fastapi import Depends
+from fastapi import HTTPException
 from fastapi import Query
+from fastapi import Request
+from starlette import status
+from starlette.responses import Response
+from starlette.responses import StreamingResponse
 
-from project.apps.history.api.v1.dependencies import get_form_history_dal
+from project.apps.history.api.v1.dependencies import HistoryUC
+from project.apps.history.api.v1.dependencies import UniqueNamesUC
+from project.apps.history.api.v1.dependencies import get_form_submissions
+from project.apps.history.api.v1.dependencies import get_history_batch_uc
+from project.apps.history.api.v1.dependencies import get_history_shared_cache
 from project.apps.history.api.v1.dependencies import get_history_uc
 from project.apps.history.api.v1.dependencies import get_submit_form_uc
-from project.apps.history.models import HistoryItem
+from project.apps.history.api.v1.dependencies import get_unique_names_shared_cache
+from project.apps.history.api.v1.dependencies import get_unique_names_uc
+from project.apps.history.models import HistoryBatchPayload
+from project.apps.history.models import HistoryBatchRequest
+from project.apps.history.models import HistoryBatchResponse
+from project.apps.history.models import HistoryBatchResultPayload
+from project.apps.history.models import HistoryPayload
 from project.apps.history.models import HistoryResponse
+from project.apps.history.models import SubmitFormPayload
+from project.apps.history.models import SubmitFormQueuedPayload
+from project.apps.history.models import SubmitFormQueuedResponse
 from project.apps.history.models import SubmitFormRequest
 from project.apps.history.models import SubmitFormResponse
+from project.apps.history.models import UniqueNamesPayload
 from project.apps.history.models import UniqueNamesResponse
+from project.apps.responses import DataclassJSONResponse
+from project.apps.responses import get_type_adapter
+from project.apps.routing import TimedAPIRoute
+from project.core.broadcast import Broadcast
+from project.core.broadcast import SubscriptionOverflow
+from project.core.cache.shared import SharedMemoryCache
+from project.core.compression import available_encodings
+from project.core.compression import compress
+from project.core.compression import negotiate
 from project.core.exceptions import FormFieldError
 from project.core.exceptions import MultipleFormFieldError
+from project.core.settings import settings
+from project.core.uc.history.dto import FormSubmitted
+from project.core.uc.history.dto import GetHistoryBatchRequest
 from project.core.uc.history.dto import GetHistoryRequest
 from project.core.uc.history.dto import SubmitFormRequest as UCSubmitFormRequest
-from project.core.uc.history.get_history import GetHistory
+from project.core.uc.history.get_history import get_history_key
+from project.core.uc.history.get_history import is_history_key_affected
+from project.core.uc.history.get_history_batch import GetHistoryBatch
 from project.core.uc.history.submit_form import SubmitForm
 
-history_router = APIRouter(prefix="/api", tags=["History"])
+history_router = APIRouter(prefix="/api", tags=["History"], route_class=TimedAPIRoute)
+
+_UNIQUE_NAMES_CACHE_KEY = b"unique_names"
+# Never in JSON of history keys, so the key of a compressed variant is split back into the key of its body
+_VARIANT_SEPARATOR = b"\0"
+# Bodies are cached after a random stamp of their own, compressed variants are keyed by the stamp of their body
+_STAMP_SIZE = 16
+_COMPRESSION_ENCODINGS = available_encodings(settings.compression_encodings) if settings.compression_enabled else ()
 
 
 @history_router.post(
@@ -27,11 +72,12 @@ history_router = APIRouter(prefix="/api", tags=["History"])
     response_model=SubmitFormResponse,
     operation_id="submit_form",
     summary="Submit form",
+    responses={202: {"model": SubmitFormQueuedResponse, "description": "Database is unavailable, form is queued"}},
 )
 async def submit_form(
     form_data: SubmitFormRequest,
     submit_form_uc: SubmitForm = Depends(get_submit_form_uc),
-) -> SubmitFormResponse:
+) -> Response:
     """Submit form with validation and random delay up to 3 seconds."""
 
     uc_request = UCSubmitFormRequest(
@@ -62,7 +108,9 @@ async def submit_form(
             else:
                 raise MultipleFormFieldError(field_errors=field_errors)
 
-    return SubmitFormResponse(success=uc_response.success)
+    if uc_response.queued:
+        return DataclassJSONResponse(SubmitFormQueuedPayload(), status_code=status.HTTP_202_ACCEPTED)
+    return DataclassJSONResponse(SubmitFormPayload(success=uc_response.success))
 
 
 @history_router.get(
@@ -72,11 +120,13 @@ async def submit_form(
     summary="Get history with filtering",
 )
 async def get_history(
+    request: Request,
     date_filter: date = Query(..., alias="date", description="Filter by date"),
     first_name: str | None = Query(None, description="Filter by first name"),
     last_name: str | None = Query(None, description="Filter by last name"),
-    get_history_uc: GetHistory = Depends(get_history_uc),
-) -> HistoryResponse:
+    get_history_uc: HistoryUC = Depends(get_history_uc),
+    shared_cache: SharedMemoryCache | None = Depends(get_history_shared_cache),
+) -> Response:
     """Get history of form submissions with filtering."""
     uc_request = GetHistoryRequest(
         date_filter=date_filter,
@@ -84,18 +134,127 @@ async def get_history(
         last_name=last_name,
     )
 
+    if shared_cache is not None:
+        cache_key = json.dumps(get_history_key(uc_request), default=str).encode()
+        generation = shared_cache.generation
+        cached = shared_cache.get(cache_key)
+        if cached is not None:
+            return await _cached_response(request, shared_cache, cache_key, cached, generation)
+
     uc_response = await get_history_uc.execute(uc_request)
+    response = DataclassJSONResponse(HistoryPayload(items=uc_response.items, total=uc_response.total))
+    _set_age_header(response, uc_response.age)
+    if shared_cache is not None and uc_response.age is None:
+        _put_cached_body(shared_cache, cache_key, response.body, generation)
+    return response
 
-    items = [
-        HistoryItem(
-            date=item.date,
-            first_name=item.first_name,
-            last_name=item.last_name,
-            count=item.count,
-        )
-        for item in uc_response.items
+
+@history_router.post(
+    "/history/batch",
+    response_model=HistoryBatchResponse,
+    operation_id="get_history_batch",
+    summary="Get history for several filters at once",
+)
+async def get_history_batch(
+    batch: HistoryBatchRequest,
+    get_history_batch_uc: GetHistoryBatch = Depends(get_history_batch_uc),
+) -> Response:
+    """Get history for every filter, results are in the same order as filters.
+
+    Filters are independent: if one of them fails, its result has `error` set and the others are returned as usual.
+    """
+    uc_request = GetHistoryBatchRequest(
+        requests=[
+            GetHistoryRequest(date_filter=f.date, first_name=f.first_name, last_name=f.last_name) for f in batch.filters
+        ]
+    )
+
+    uc_response = await get_history_batch_uc.execute(uc_request)
+
+    results = [
+        HistoryBatchResultPayload(items=r.items, total=r.total, error=_render_batch_error(r.first_error))
+        for r in uc_response.results
     ]
-    return HistoryResponse(items=items, total=uc_response.total)
+    return DataclassJSONResponse(HistoryBatchPayload(results=results))
+
+
+@history_router.get(
+    "/history/stream",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"text/event-stream": {}}}},
+    operation_id="stream_history",
+    summary="Stream new submissions",
+)
+async def stream_history(
+    first_name: str | None = Query(None, description="Filter by first name"),
+    last_name: str | None = Query(None, description="Filter by last name"),
+    submissions: Broadcast[FormSubmitted] = Depends(get_form_submissions),
+) -> Response:
+    """Server-sent events with submissions committed after connecting, instead of polling `/api/history`.
+
+    Every submission is a `submission` event with JSON data. A client that doesn't read events fast enough gets an
+    `overflow` event and the stream is closed: it has to reload history and reconnect.
+    """
+    if len(submissions) >= settings.history_stream_max_subscribers:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many streaming clients",
+            headers={"Retry-After": "5"},
+        )
+
+    return StreamingResponse(
+        stream_submissions(
+            submissions,
+            _submission_filter(first_name, last_name),
+            queue_size=settings.history_stream_queue_size,
+            heartbeat=settings.history_stream_heartbeat,
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def stream_submissions(
+    submissions: Broadcast[FormSubmitted],
+    predicate: Callable[[FormSubmitted], bool] | None,
+    queue_size: int,
+    heartbeat: float,
+) -> AsyncIterator[bytes]:
+    """Format submissions as server-sent events, a comment is sent every `heartbeat` idle seconds."""
+    # Subscribe inside of the generator: its `finally` runs on client disconnect, so the subscription can't leak
+    subscription = submissions.subscribe(queue_size, predicate)
+    adapter = get_type_adapter(FormSubmitted)
+    try:
+        yield b"retry: 3000\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.get(), heartbeat)
+            except asyncio.TimeoutError:
+                # Keeps proxies from closing an idle connection and detects clients gone away
+                yield b": heartbeat\n\n"
+                continue
+            except SubscriptionOverflow:
+                yield b"event: overflow\ndata: {}\n\n"
+                return
+            yield b"event: submission\nid: %s\ndata: %s\n\n" % (event.event_id.encode(), adapter.dump_json(event))
+    finally:
+        submissions.unsubscribe(subscription)
+
+
+def _submission_filter(first_name: str | None, last_name: str | None) -> Callable[[FormSubmitted], bool] | None:
+    if not first_name and not last_name:
+        return None
+    return lambda event: (not first_name or event.first_name == first_name) and (
+        not last_name or event.last_name == last_name
+    )
+
+
+def _render_batch_error(error: Exception | None) -> str | None:
+    if error is None:
+        return None
+    if settings.debug:
+        return f"Internal Server Error: {error.__class__.__name__}: {error}"
+    return "Internal Server Error"
 
 
 @history_router.get(
@@ -105,9 +264,64 @@ async def get_history(
     summary="Get unique first and last names",
 )
 async def get_unique_names(
-    form_history_dal=Depends(get_form_history_dal),
-) -> UniqueNamesResponse:
+    request: Request,
+    get_unique_names_uc: UniqueNamesUC = Depends(get_unique_names_uc),
+    shared_cache: SharedMemoryCache | None = Depends(get_unique_names_shared_cache),
+) -> Response:
     """Get all unique first and last names from history."""
-    first_names = await form_history_dal.get_unique_first_names()
-    last_names = await form_history_dal.get_unique_last_names()
-    return UniqueNamesResponse(first_names=first_names, last_names=last_names)
+    if shared_cache is not None:
+        generation = shared_cache.generation
+        cached = shared_cache.get(_UNIQUE_NAMES_CACHE_KEY)
+        if cached is not None:
+            return await _cached_response(request, shared_cache, _UNIQUE_NAMES_CACHE_KEY, cached, generation)
+
+    uc_response = await get_unique_names_uc.execute()
+    response = DataclassJSONResponse(
+        UniqueNamesPayload(first_names=uc_response.first_names, last_names=uc_response.last_names)
+    )
+    _set_age_header(response, uc_response.age)
+    if shared_cache is not None and uc_response.age is None:
+        _put_cached_body(shared_cache, _UNIQUE_NAMES_CACHE_KEY, response.body, generation)
+    return response
+
+
+def is_history_cache_key_affected(key: bytes, row_date: date, first_name: str, last_name: str) -> bool:
+    """Whether history cached under `key` in the shared cache (or its compressed variant) may change with the row."""
+    date_filter, key_first_name, key_last_name = json.loads(key.partition(_VARIANT_SEPARATOR)[0])
+    return is_history_key_affected(
+        (date.fromisoformat(date_filter), key_first_name, key_last_name), row_date, first_name, last_name
+    )
+
+
+def _put_cached_body(shared_cache: SharedMemoryCache, key: bytes, body: bytes, generation: int) -> None:
+    shared_cache.put(key, secrets.token_bytes(_STAMP_SIZE) + body, generation)
+
+
+async def _cached_response(
+    request: Request, shared_cache: SharedMemoryCache, key: bytes, cached: bytes, generation: int
+) -> Response:
+    """Response of a body from the shared cache, compressed for the client by a variant cached next to the body.
+
+    The variant is keyed by the stamp the body was cached with, so it can't be served for any other body.
+    Bodies are compressed in a thread, unique names take up to a slot (1 MiB by default) and would block the loop.
+    """
+    stamp, body = cached[:_STAMP_SIZE], cached[_STAMP_SIZE:]
+    encoding = negotiate(request.headers.get("accept-encoding"), _COMPRESSION_ENCODINGS)
+    if encoding is None or len(body) < settings.compression_minimum_size:
+        return Response(body, media_type=DataclassJSONResponse.media_type)
+    variant_key = b"%s%s%s;%s" % (key, _VARIANT_SEPARATOR, encoding.encode(), stamp)
+    compressed = shared_cache.get(variant_key)
+    if compressed is None:
+        compressed = await asyncio.to_thread(compress, body, encoding)
+        shared_cache.put(variant_key, compressed, generation)
+    return Response(
+        compressed,
+        media_type=DataclassJSONResponse.media_type,
+        headers={"Content-Encoding": encoding, "Vary": "Accept-Encoding"},
+    )
+
+
+def _set_age_header(response: Response, age: float | None) -> None:
+    """Mark stale response (served from cache because database is slow or down) with its age in seconds."""
+    if age is not None:
+        response.headers["Age"] = str(int(age))
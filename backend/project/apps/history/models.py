@@ -1,8 +1,12 @@
+from dataclasses import dataclass
 from datetime import date
 
 from pydantic import BaseModel
 from pydantic import Field
 
+from project.core.settings import settings
+from project.core.uc.history.dto import HistoryItem as HistoryItemDTO
+
 
 class SubmitFormRequest(BaseModel):
     date: date
@@ -14,6 +18,11 @@ class SubmitFormResponse(BaseModel):
     success: bool
 
 
+class SubmitFormQueuedResponse(BaseModel):
+    success: bool = True
+    queued: bool = True
+
+
 class SubmitFormErrorResponse(BaseModel):
     success: bool = False
     error: dict[str, list[str]]
@@ -31,6 +40,64 @@ class HistoryResponse(BaseModel):
     total: int
 
 
+class HistoryFilter(BaseModel):
+    date: date
+    first_name: str | None = None
+    last_name: str | None = None
+
+
+class HistoryBatchRequest(BaseModel):
+    filters: list[HistoryFilter] = Field(..., min_length=1, max_length=settings.history_batch_max_size)
+
+
+class HistoryBatchResult(BaseModel):
+    items: list[HistoryItem]
+    total: int
+    error: str | None = None
+
+
+class HistoryBatchResponse(BaseModel):
+    results: list[HistoryBatchResult]
+
+
 class UniqueNamesResponse(BaseModel):
     first_names: list[str]
     last_names: list[str]
+
+
+# Slots-based twins of the response models above. Endpoints render them with `DataclassJSONResponse` without building
+# pydantic models, while the pydantic models are kept as `response_model` to describe the API in openapi.json.
+# ----------------------------------------------------------------------------------------------------------------------
+@dataclass(slots=True)
+class SubmitFormPayload:
+    success: bool
+
+
+@dataclass(slots=True)
+class SubmitFormQueuedPayload:
+    success: bool = True
+    queued: bool = True
+
+
+@dataclass(slots=True)
+class HistoryPayload:
+    items: list[HistoryItemDTO]
+    total: int
+
+
+@dataclass(slots=True)
+class HistoryBatchResultPayload:
+    items: list[HistoryItemDTO]
+    total: int
+    error: str | None = None
+
+
+@dataclass(slots=True)
+class HistoryBatchPayload:
+    results: list[HistoryBatchResultPayload]
+
+
+@dataclass(slots=True)
+class UniqueNamesPayload:
+    first_names: list[str]
+    last_names: list[str]
@@ -0,0 +1,85 @@
+from project.apps.history.api.v1.dependencies import form_submissions
+from project.apps.history.api.v1.dependencies import history_replica
+from project.apps.history.api.v1.dependencies import history_shared_cache
+from project.apps.history.api.v1.dependencies import history_swr
+from project.apps.history.api.v1.dependencies import known_names
+from project.apps.history.api.v1.dependencies import unique_names_shared_cache
+from project.apps.history.api.v1.dependencies import unique_names_swr
+from project.apps.history.api.v1.endpoints import is_history_cache_key_affected
+from project.apps.responses import get_type_adapter
+from project.core.db.postgres.form_history import FormHistoryEntry
+from project.core.db.postgres.listener import PostgresListener
+from project.core.db.postgres.listener import asyncpg_dsn
+from project.core.db.postgres.models import FORM_HISTORY_CHANNEL
+from project.core.settings import settings
+from project.core.uc.history.dto import FormHistoryChange
+from project.core.uc.history.dto import FormSubmitted
+from project.core.uc.history.get_history import is_history_key_affected
+
+form_history_listener = PostgresListener(
+    "form_history",
+    asyncpg_dsn(settings.database_url),
+    reconnect_min=settings.notifications_reconnect_min,
+    reconnect_max=settings.notifications_reconnect_max,
+    keepalive=settings.notifications_keepalive,
+)
+
+
+def on_form_history_change(payload: str | None) -> None:
+    """Drop cached data the change makes outdated and stream new submissions to clients of this worker."""
+    # Every worker of the host gets the notification and invalidates shared caches, which is harmless to repeat
+    if unique_names_shared_cache is not None:
+        unique_names_shared_cache.invalidate()
+
+    if not payload:
+        if history_shared_cache is not None:
+            history_shared_cache.invalidate()
+        history_swr.invalidate()
+        unique_names_swr.invalidate()
+        if known_names is not None:
+            # Names committed while listener was disconnected are unknown to the filters
+            known_names.invalidate()
+        if payload == "" and history_replica is not None:
+            # Partitions were archived, the replica still has their rows
+            history_replica.request_reload()
+        return
+
+    change = get_type_adapter(FormHistoryChange).validate_json(payload)
+    history_swr.invalidate(lambda key: is_history_key_affected(key, change.date, change.first_name, change.last_name))
+    if history_shared_cache is not None:
+        history_shared_cache.invalidate(
+            lambda key: is_history_cache_key_affected(key, change.date, change.first_name, change.last_name)
+        )
+    unique_names_swr.invalidate()
+    if known_names is not None and change.op in ("INSERT", "UPDATE"):
+        known_names.add(change.first_name, change.last_name)
+    if history_replica is not None:
+        if change.op == "INSERT":
+            history_replica.apply(
+                [
+                    FormHistoryEntry(
+                        change.id,
+                        change.date,
+                        change.first_name,
+                        change.last_name,
+                        change.created_at,
+                        change.occurrences,
+                    )
+                ]
+            )
+        else:
+            history_replica.request_reload()
+    if change.op == "INSERT":
+        form_submissions.publish(
+            FormSubmitted(
+                id=change.id,
+                date=change.date,
+                first_name=change.first_name,
+                last_name=change.last_name,
+                created_at=change.updated_at or change.created_at,
+                occurrence=change.occurrences,
+            )
+        )
+
+
+form_history_listener.subscribe(FORM_HISTORY_CHANNEL, on_form_history_change)
@@ -0,0 +1,29 @@
+from typing import Any
+
+from pydantic import TypeAdapter
+from starlette.responses import JSONResponse
+
+from project.core.timing import span
+
+_type_adapters: dict[type[Any], TypeAdapter[Any]] = {}
+
+
+def get_type_adapter(tp: type[Any]) -> TypeAdapter[Any]:
+    """Returns pydantic adapter for the type. Building an adapter is much more expensive than using it."""
+    adapter = _type_adapters.get(tp)
+    if adapter is None:
+        adapter = _type_adapters[tp] = TypeAdapter(tp)
+    return adapter
+
+
+class DataclassJSONResponse(JSONResponse):
+    """JSON response rendered straight from a slots dataclass by pydantic-core.
+
+    Returning a `Response` from an endpoint bypasses FastAPI's `response_model` round trip (dump to dict, validate into
+    the model again, serialize, `jsonable_encoder`), so `response_model` on the route is only used for openapi.json.
+    Output is byte-for-byte the same as `JSONResponse` renders for the equivalent pydantic model.
+    """
+
+    def render(self, content: Any) -> bytes:
+        with span("render"):
+            return get_type_adapter(type(content)).dump_json(content)
@@ -2,8 +2,12 @@ from fastapi import APIRouter
 
 from project.apps.service.api.v1.health import route as health
 from project.apps.service.api.v1.metrics import route as metrics
+from project.apps.service.api.v1.profiling import route as profiling
+from project.core.settings import settings
 
 service_router = APIRouter()
 
 service_router.include_router(health)
 service_router.include_router(metrics)
+if settings.profiling_endpoints_enabled:
+    service_router.include_router(profiling)
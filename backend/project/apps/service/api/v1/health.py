@@ -1,8 +1,36 @@
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from starlette import status
+
+from project.core.readiness import ReadinessProbe
+from project.core.settings import engine
+from project.core.settings import settings
 
 route = APIRouter(prefix="/api/v1")
 
+# Per worker: the database is probed in the background by every worker (see lifespan)
+readiness = ReadinessProbe(
+    engine,
+    max_connections=settings.postgres_pool_size + settings.postgres_max_overflow,
+    timeout=settings.readiness_probe_timeout,
+    max_pool_saturation=settings.readiness_max_pool_saturation,
+    max_loop_lag=settings.readiness_max_loop_lag,
+)
+
 
 @route.get("/health", tags=["Health"])
 async def health() -> dict[str, str]:
     return {"message": "pong"}
+
+
+@route.get("/ready", tags=["Health"])
+async def ready() -> JSONResponse:
+    """Readiness of the worker: database reachable, pool not saturated, event loop not lagging. 503 when not ready.
+
+    Answers from the state gathered in the background, never queries the database.
+    """
+    is_ready, checks = readiness.check()
+    return JSONResponse(
+        {"ready": is_ready, "checks": checks},
+        status_code=status.HTTP_200_OK if is_ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
@@ -1,3 +1,12 @@
 from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from project.core.metrics import registry
 
 route = APIRouter()
+
+
+@route.get("/metrics", tags=["Health"], response_class=PlainTextResponse)
+async def metrics() -> PlainTextResponse:
+    """Metrics of this worker process in Prometheus text format."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
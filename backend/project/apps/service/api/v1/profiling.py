@@ -0,0 +1,65 @@
+import asyncio
+import hmac
+import os
+import time
+from typing import Any
+
+from fastapi import APIRouter
+from fastapi import Depends
+from fastapi import Header
+from fastapi import HTTPException
+from fastapi import Query
+from fastapi.responses import PlainTextResponse
+from starlette import status
+
+from project.core.profiling import AllocationTracker
+from project.core.profiling import ProfilerBusy
+from project.core.profiling import SamplingProfiler
+from project.core.settings import settings
+
+# Per worker: a request profiles only the worker which gets it
+profiler = SamplingProfiler()
+allocations = AllocationTracker(frames=settings.profiling_tracemalloc_frames)
+
+
+async def check_token(authorization: str | None = Header(None)) -> None:
+    if settings.profiling_token is None:
+        return
+    if authorization is None or not hmac.compare_digest(authorization, f"Bearer {settings.profiling_token}"):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid profiling token")
+
+
+route = APIRouter(prefix="/api/v1/profiling", tags=["Profiling"], dependencies=[Depends(check_token)])
+
+
+@route.get("/cpu", response_class=PlainTextResponse)
+async def profile_cpu(
+    seconds: float = Query(10.0, gt=0, le=settings.profiling_max_seconds, description="Seconds to sample"),
+    requests: int | None = Query(None, gt=0, description="Stop once the worker has handled the requests"),
+    interval: float = Query(0.005, ge=0.001, le=1.0, description="Seconds between samples"),
+) -> PlainTextResponse:
+    """Sample stacks of the worker's threads, as collapsed stacks for flame graphs (`flamegraph.pl`, speedscope)."""
+    try:
+        stacks = await profiler.profile(seconds, requests, interval)
+    except ProfilerBusy:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Worker is being profiled already")
+    filename = f"cpu-{os.getpid()}-{int(time.time())}.folded"
+    return PlainTextResponse(stacks, headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+
+@route.post("/memory/snapshot")
+async def snapshot_memory(
+    top: int = Query(20, gt=0, le=1000, description="Allocation sites to return"),
+    group_by: str = Query("lineno", pattern="^(lineno|filename|traceback)$", description="Grouping of allocations"),
+) -> dict[str, Any]:
+    """Top allocation sites of the worker by growth since the previous snapshot.
+
+    The first snapshot starts tracing allocations, which slows the worker down until tracing is stopped.
+    """
+    return await asyncio.to_thread(allocations.snapshot, top, group_by)
+
+
+@route.delete("/memory", status_code=status.HTTP_204_NO_CONTENT)
+async def stop_memory_tracing() -> None:
+    """Stop tracing allocations of the worker and drop its snapshot."""
+    allocations.stop()
@@ -1,17 +1,90 @@
 import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
 from typing import cast
 
 from fastapi import FastAPI
 
 from project.apps.history import history_router
+from project.apps.history.api.v1.dependencies import apply_spooled_submissions
+from project.apps.history.api.v1.dependencies import forget_spooled_submissions
+from project.apps.history.api.v1.dependencies import form_history_partitions
+from project.apps.history.api.v1.dependencies import history_replica
+from project.apps.history.api.v1.dependencies import known_names
+from project.apps.history.api.v1.dependencies import load_known_names
+from project.apps.history.api.v1.dependencies import open_form_history_dal
+from project.apps.history.api.v1.dependencies import submit_spool
+from project.apps.history.notifications import form_history_listener
 from project.apps.service import service_router
+from project.apps.service.api.v1.health import readiness
+from project.core.capture import RequestCapture
 from project.core.log import setup_logging
+from project.core.loop_monitor import EventLoopMonitor
 from project.core.middlewares import add_middlewares
 from project.core.settings import settings
 
 _app: FastAPI | None = None
 _app_logger = logging.getLogger(__package__ or "project.core")
 
+request_capture = (
+    RequestCapture(
+        settings.request_capture_dir,
+        settings.request_capture_sample_rate,
+        settings.request_capture_paths,
+        settings.request_capture_max_body,
+        settings.request_capture_file_bytes,
+        settings.request_capture_files,
+    )
+    if settings.request_capture_enabled
+    else None
+)
+loop_monitor = (
+    EventLoopMonitor(settings.event_loop_monitor_interval, settings.event_loop_block_threshold)
+    if settings.event_loop_monitor_enabled
+    else None
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Start and stop background services of the worker."""
+    if settings.history_notifications_enabled:
+        form_history_listener.start()
+    if history_replica is not None:
+        history_replica.start(open_form_history_dal, settings.history_replica_sync_interval)
+    if known_names is not None:
+        known_names.start(load_known_names, settings.history_known_names_rebuild_interval)
+    if settings.history_partitions_maintenance_enabled:
+        form_history_partitions.start(settings.history_partitions_maintenance_interval)
+    if submit_spool is not None:
+        submit_spool.start(
+            apply_spooled_submissions,
+            forget_spooled_submissions,
+            settings.submit_spool_drain_interval,
+            settings.submit_spool_batch_size,
+        )
+    if request_capture is not None:
+        request_capture.start(settings.request_capture_flush_interval)
+    if loop_monitor is not None:
+        loop_monitor.start()
+    readiness.start(settings.readiness_probe_interval, loop_monitor)
+    try:
+        yield
+    finally:
+        await form_history_listener.stop()
+        if history_replica is not None:
+            await history_replica.stop()
+        if known_names is not None:
+            await known_names.stop()
+        await form_history_partitions.stop()
+        if submit_spool is not None:
+            await submit_spool.stop()
+        if request_capture is not None:
+            await request_capture.stop()
+        if loop_monitor is not None:
+            await loop_monitor.stop()
+        await readiness.stop()
+
 
 def get_app() -> FastAPI:
     """Get or create FastAPI application instance."""
@@ -27,9 +100,9 @@ def get_app() -> FastAPI:
         if not settings.generate_docs:
             app_params |= dict(openapi_url=None, docs_url=None, redocs_url=None)  # type: ignore
 
-        _app = FastAPI(**app_params)  # type: ignore
+        _app = FastAPI(lifespan=lifespan, **app_params)  # type: ignore
 
-        add_middlewares(_app, _app_logger)
+        add_middlewares(_app, _app_logger, request_capture, loop_monitor)
         _app.include_router(history_router)
         _app.include_router(service_router)
 
@@ -0,0 +1,77 @@
+import asyncio
+from typing import Callable
+from typing import Generic
+from typing import TypeVar
+
+from project.core.metrics import registry
+
+T = TypeVar("T")
+
+broadcast_subscribers = registry.gauge("broadcast_subscribers", "Active subscribers.", labelnames=("broadcast",))
+broadcast_messages = registry.counter(
+    "broadcast_messages_total",
+    "Messages by result: delivered to a subscriber queue, or overflowed and the slow subscriber was dropped.",
+    labelnames=("broadcast", "result"),
+)
+
+
+class SubscriptionOverflow(Exception):
+    """Subscriber didn't keep up with messages and was dropped, it has to resync and subscribe again."""
+
+
+class Subscription(Generic[T]):
+    __slots__ = ("_queue", "_predicate", "overflowed")
+
+    def __init__(self, predicate: Callable[[T], bool] | None, queue_size: int):
+        self._queue: asyncio.Queue[T] = asyncio.Queue(maxsize=queue_size)
+        self._predicate = predicate
+        self.overflowed = False
+
+    async def get(self) -> T:
+        if self.overflowed:
+            raise SubscriptionOverflow()
+        return await self._queue.get()
+
+    def _offer(self, message: T) -> bool:
+        """Put message to the queue if it's interesting for subscriber, returns False on overflow."""
+        if self._predicate is not None and not self._predicate(message):
+            return True
+        try:
+            self._queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            return False
+        return True
+
+
+class Broadcast(Generic[T]):
+    """In-process fan-out of messages from one source to many subscribers.
+
+    Publishing never waits: every subscriber has a bounded queue, and a subscriber whose queue is full is dropped
+    (`get()` raises `SubscriptionOverflow`) instead of slowing down the publisher or buffering without limit. An idle
+    subscriber costs only its empty queue. Must be used from the event loop thread.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._subscriptions: set[Subscription[T]] = set()
+        broadcast_subscribers.set_function(lambda: len(self._subscriptions), broadcast=name)
+
+    def subscribe(self, queue_size: int, predicate: Callable[[T], bool] | None = None) -> Subscription[T]:
+        subscription = Subscription(predicate, queue_size)
+        self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription[T]) -> None:
+        self._subscriptions.discard(subscription)
+
+    def publish(self, message: T) -> None:
+        for subscription in list(self._subscriptions):
+            if subscription._offer(message):
+                broadcast_messages.inc(broadcast=self.name, result="delivered")
+            else:
+                broadcast_messages.inc(broadcast=self.name, result="overflowed")
+                self.unsubscribe(subscription)
+
+    def __len__(self) -> int:
+        return len(self._subscriptions)
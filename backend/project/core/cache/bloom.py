@@ -0,0 +1,190 @@
+import asyncio
+import hashlib
+import logging
+import math
+from functools import partial
+from typing import Awaitable
+from typing import Callable
+from typing import Iterable
+
+from project.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+bloom_filter_checks = registry.counter(
+    "bloom_filter_checks_total",
+    "Bloom filter lookups: absent (definitely not added) or maybe (added or a false positive).",
+    labelnames=("filter", "result"),
+)
+bloom_filter_bytes = registry.gauge("bloom_filter_bytes", "Memory of Bloom filter bits.", labelnames=("filter",))
+bloom_filter_items = registry.gauge("bloom_filter_items", "Distinct values added to Bloom filter.", ("filter",))
+bloom_filter_false_positive_rate = registry.gauge(
+    "bloom_filter_false_positive_rate", "Current false positive rate of Bloom filter.", labelnames=("filter",)
+)
+
+# Loads all first and last names
+NamesLoader = Callable[[], Awaitable[tuple[list[str], list[str]]]]
+
+
+class BloomFilter:
+    """Set of strings which may answer "maybe" for a value never added, but never "no" for an added one.
+
+    Sized for `capacity` values with `false_positive_rate`; adding more values raises the rate.
+    """
+
+    def __init__(self, capacity: int, false_positive_rate: float):
+        capacity = max(capacity, 1)
+        self.size = max(8, math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def add(self, value: str) -> None:
+        added = False
+        for position in self._positions(value):
+            byte, bit = divmod(position, 8)
+            if not self._bits[byte] & (1 << bit):
+                self._bits[byte] |= 1 << bit
+                added = True
+        # All bits already set means the value (or a false positive) was there, so it's not counted
+        if added:
+            self.count += 1
+
+    def __contains__(self, value: str) -> bool:
+        for position in self._positions(value):
+            byte, bit = divmod(position, 8)
+            if not self._bits[byte] & (1 << bit):
+                return False
+        return True
+
+    @property
+    def memory(self) -> int:
+        return len(self._bits)
+
+    def false_positive_rate(self) -> float:
+        """Probability that a value never added is reported as present, estimated by share of set bits."""
+        return (int.from_bytes(self._bits, "little").bit_count() / self.size) ** self.hashes
+
+    def _positions(self, value: str) -> Iterable[int]:
+        # Double hashing: k positions from two independent 64-bit hashes
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+
+class KnownNames:
+    """Pair of Bloom filters over first and last names ever submitted, to skip queries for names which don't exist.
+
+    Filters are built from all names by `rebuild()` and then every committed name has to be `add()`ed, otherwise
+    history of a new name would be reported as empty. They are rebuilt periodically, so names of deleted rows go away
+    and filters are resized to the number of names. Until filters are built, and after `invalidate()` until the next
+    rebuild, every name is reported as possibly known.
+    """
+
+    def __init__(self, name: str, capacity: int, false_positive_rate: float):
+        self.name = name
+        self._capacity = capacity
+        self._false_positive_rate = false_positive_rate
+        self._first: BloomFilter | None = None
+        self._last: BloomFilter | None = None
+        # Names added while rebuild loads names, they may be missing in the loaded ones
+        self._pending: list[tuple[str, str]] | None = None
+        # Bumped by invalidation, so a rebuild which started before it isn't trusted
+        self._generation = 0
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task[None] | None = None
+        for column in ("first_name", "last_name"):
+            label = f"{name}_{column}"
+            bloom_filter_bytes.set_function(partial(self._get_metric, column, "memory"), filter=label)
+            bloom_filter_items.set_function(partial(self._get_metric, column, "count"), filter=label)
+            bloom_filter_false_positive_rate.set_function(
+                partial(self._get_metric, column, "false_positive_rate"), filter=label
+            )
+
+    @property
+    def ready(self) -> bool:
+        return self._first is not None and self._last is not None
+
+    def might_contain(self, first_name: str | None, last_name: str | None) -> bool:
+        """False if any of given names has definitely never been added, empty names are ignored."""
+        if self._first is None or self._last is None:
+            return True
+        for value, bloom_filter, column in (
+            (first_name, self._first, "first_name"),
+            (last_name, self._last, "last_name"),
+        ):
+            if not value:
+                continue
+            if value not in bloom_filter:
+                bloom_filter_checks.inc(filter=f"{self.name}_{column}", result="absent")
+                return False
+            bloom_filter_checks.inc(filter=f"{self.name}_{column}", result="maybe")
+        return True
+
+    def add(self, first_name: str, last_name: str) -> None:
+        if self._pending is not None:
+            self._pending.append((first_name, last_name))
+        if self._first is not None and self._last is not None:
+            self._first.add(first_name)
+            self._last.add(last_name)
+
+    def invalidate(self) -> None:
+        """Stop trusting the filters (e.g. some names might have been missed) until the next rebuild, and start it."""
+        self._first = self._last = None
+        self._generation += 1
+        self._wakeup.set()
+
+    async def rebuild(self, load: NamesLoader) -> None:
+        self._pending = []
+        generation = self._generation
+        try:
+            first_names, last_names = await load()
+            first = BloomFilter(max(self._capacity, 2 * len(first_names)), self._false_positive_rate)
+            last = BloomFilter(max(self._capacity, 2 * len(last_names)), self._false_positive_rate)
+            for first_name in first_names:
+                first.add(first_name)
+            for last_name in last_names:
+                last.add(last_name)
+            for first_name, last_name in self._pending:
+                first.add(first_name)
+                last.add(last_name)
+            if generation == self._generation:
+                self._first, self._last = first, last
+        finally:
+            self._pending = None
+
+    def start(self, load: NamesLoader, interval: float) -> None:
+        """Rebuild now and then every `interval` seconds (or at once after `invalidate()`) in the background."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(load, interval), name=f"{self.name}_bloom_filters")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self, load: NamesLoader, interval: float) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                await self.rebuild(load)
+            except Exception:
+                logger.exception("Rebuild of %s Bloom filters failed", self.name)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def _get_metric(self, column: str, metric: str) -> float:
+        bloom_filter = self._first if column == "first_name" else self._last
+        if bloom_filter is None:
+            return 0
+        if metric == "false_positive_rate":
+            return bloom_filter.false_positive_rate()
+        return getattr(bloom_filter, metric)
@@ -0,0 +1,44 @@
+from collections import OrderedDict
+from typing import Generic
+from typing import Hashable
+from typing import TypeVar
+
+from project.core.metrics import registry
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+lru_cache_requests = registry.counter(
+    "lru_cache_requests_total",
+    "Lookups in per-process LRU caches by result (hit, miss).",
+    labelnames=("cache", "result"),
+)
+lru_cache_entries = registry.gauge("lru_cache_entries", "Values kept by per-process LRU caches.", labelnames=("cache",))
+
+
+class LRUCache(Generic[K, V]):
+    """Per-process mapping which keeps at most `capacity` values, least recently used ones are evicted."""
+
+    def __init__(self, name: str, capacity: int):
+        self.name = name
+        self._capacity = capacity
+        self._entries: OrderedDict[K, V] = OrderedDict()
+        lru_cache_entries.set_function(lambda: len(self._entries), cache=name)
+
+    def get(self, key: K) -> V | None:
+        value = self._entries.get(key)
+        if value is None:
+            lru_cache_requests.inc(cache=self.name, result="miss")
+            return None
+        self._entries.move_to_end(key)
+        lru_cache_requests.inc(cache=self.name, result="hit")
+        return value
+
+    def put(self, key: K, value: V) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self._capacity:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,259 @@
+import fcntl
+import hashlib
+import mmap
+import os
+import random
+import struct
+import time
+from typing import Callable
+
+from project.core.metrics import registry
+
+shared_cache_requests = registry.counter(
+    "shared_cache_requests_total",
+    "Host-wide shared memory caches: hit/miss of reads, stored/skipped (slot locked by another worker or value too "
+    "big) writes.",
+    labelnames=("cache", "result"),
+)
+
+_MAGIC = b"HGCACHE1"
+_VERSION = 2
+# magic, version, slots, slot size, ways, generation (of valid slots), epoch (changed by every invalidation)
+_HEADER = struct.Struct("<8sIIIIQQ")
+_HEADER_SIZE = 64
+_GENERATION = struct.Struct("<Q")
+_GENERATION_OFFSET = _HEADER.size - 2 * _GENERATION.size
+_EPOCH_OFFSET = _HEADER.size - _GENERATION.size
+# seq (odd while the slot is written), key hash, generation, expires at, value length, key length, referenced
+_SLOT = struct.Struct("<QQQdIHB")
+_SLOT_HEADER_SIZE = 40
+_SEQ = struct.Struct("<Q")
+_EXPIRES_AT = struct.Struct("<d")
+_EXPIRES_AT_OFFSET = struct.calcsize("<QQQ")
+_REFERENCED_OFFSET = _SLOT.size - 1
+_READ_ATTEMPTS = 3
+
+
+class SharedMemoryCache:
+    """Byte values shared by all worker processes of the host through a memory-mapped file.
+
+    The file is a table of `slots` fixed-size slots grouped in sets of `ways`, a key can only be stored in the slots
+    of its set. Reads don't lock anything: every slot has a sequence number which is odd while the slot is written
+    and changes with every write, a read retries when it changes under it (seqlock). Writes lock only the set of the
+    key and never wait for a lock: if another worker writes the set at the same moment, the value is just not stored.
+    When the set is full, a slot is evicted by CLOCK (slot read since it was stored or since the last pass of the
+    clock hand gets a second chance).
+
+    Values live `ttl` seconds at most. `invalidate()` drops all values at once by changing the generation written in
+    the file header, or values of the keys matching a predicate by expiring their slots set by set. Either way values
+    computed before are not stored, whatever their keys are, like in `StaleWhileRevalidateCache`. The file outlives
+    workers, so a restarted worker finds the cache warm; file with another layout
+    (version, slots or slot size changed) is replaced on open by a new empty one, workers which still have the old
+    file open go on using it until they restart.
+
+    Both reads and writes copy at most one slot and are safe to call from the event loop. Invalidation by keys reads
+    the key of every slot, which is fine from the event loop for a few thousand slots.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        path: str,
+        slots: int,
+        slot_size: int,
+        ttl: float,
+        ways: int = 8,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.name = name
+        self._slots = slots
+        self._slot_size = slot_size
+        self._ways = min(ways, slots)
+        self._sets = slots // self._ways
+        self._ttl = ttl
+        self._clock = clock
+        self._max_payload = slot_size - _SLOT_HEADER_SIZE
+        size = _HEADER_SIZE + self._sets * self._ways * slot_size
+        # Workers open the cache one at a time, so the ones starting together create or replace the file once
+        lock_fd = os.open(f"{path}.lock", os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX)
+            self._fd = self._open(path, size)
+            self._mm = mmap.mmap(self._fd, size)
+        finally:
+            os.close(lock_fd)
+
+    @property
+    def generation(self) -> int:
+        """Pass value read before computing a value to `put()`, so it's not stored if invalidated in the meantime."""
+        return _GENERATION.unpack_from(self._mm, _EPOCH_OFFSET)[0]
+
+    def get(self, key: bytes) -> bytes | None:
+        key_hash = _hash(key)
+        generation = self._slots_generation
+        for offset in self._set_offsets(key_hash):
+            value = self._read(offset, key, key_hash, generation)
+            if value is not None:
+                shared_cache_requests.inc(cache=self.name, result="hit")
+                return value
+        shared_cache_requests.inc(cache=self.name, result="miss")
+        return None
+
+    def put(self, key: bytes, value: bytes, generation: int) -> bool:
+        """Store value unless it's too big, the cache was invalidated after `generation` or the set is locked."""
+        if len(key) + len(value) > self._max_payload or generation != self.generation:
+            shared_cache_requests.inc(cache=self.name, result="skipped")
+            return False
+
+        key_hash = _hash(key)
+        set_start, set_size = self._set_range(key_hash % self._sets)
+        try:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB, set_size, set_start)
+        except OSError:
+            shared_cache_requests.inc(cache=self.name, result="skipped")
+            return False
+        try:
+            # Checked again under the lock: invalidation by keys takes it, so it either sees the value or stops it
+            stored = generation == self.generation
+            if stored:
+                slots_generation = self._slots_generation
+                offset = self._choose_slot(key_hash, slots_generation)
+                self._write(offset, key, key_hash, value, slots_generation)
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, set_size, set_start)
+        shared_cache_requests.inc(cache=self.name, result="stored" if stored else "skipped")
+        return stored
+
+    def invalidate(self, predicate: Callable[[bytes], bool] | None = None) -> None:
+        """Drop values whose keys match `predicate` (all values without predicate)."""
+        # Any new value works, so concurrent invalidations by several workers need no lock
+        _GENERATION.pack_into(self._mm, _EPOCH_OFFSET, _new_generation())
+        if predicate is None:
+            _GENERATION.pack_into(self._mm, _GENERATION_OFFSET, _new_generation())
+            return
+
+        slots_generation = self._slots_generation
+        for set_index in range(self._sets):
+            set_start, set_size = self._set_range(set_index)
+            # Waits for a write of the set in progress, writes hold the lock for one slot copy
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, set_size, set_start)
+            try:
+                for offset in range(set_start, set_start + set_size, self._slot_size):
+                    self._expire_if(offset, predicate, slots_generation)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, set_size, set_start)
+
+    def close(self) -> None:
+        self._mm.close()
+        os.close(self._fd)
+
+    @property
+    def _slots_generation(self) -> int:
+        return _GENERATION.unpack_from(self._mm, _GENERATION_OFFSET)[0]
+
+    def _open(self, path: str, size: int) -> int:
+        try:
+            fd = os.open(path, os.O_RDWR)
+        except FileNotFoundError:
+            pass
+        else:
+            if self._has_layout(fd, size):
+                return fd
+            os.close(fd)
+        # Never resized in place: workers which still have the file mapped keep its inode, a new file replaces it
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        fd = os.open(tmp_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            os.ftruncate(fd, size)
+            header = _HEADER.pack(
+                _MAGIC, _VERSION, self._slots, self._slot_size, self._ways, _new_generation(), _new_generation()
+            )
+            os.pwrite(fd, header, 0)
+            os.rename(tmp_path, path)
+        except BaseException:
+            os.close(fd)
+            os.unlink(tmp_path)
+            raise
+        return fd
+
+    def _has_layout(self, fd: int, size: int) -> bool:
+        if os.fstat(fd).st_size != size:
+            return False
+        magic, version, slots, slot_size, ways, *_ = _HEADER.unpack(os.pread(fd, _HEADER.size, 0))
+        return (magic, version, slots, slot_size, ways) == (_MAGIC, _VERSION, self._slots, self._slot_size, self._ways)
+
+    def _set_range(self, set_index: int) -> tuple[int, int]:
+        set_size = self._ways * self._slot_size
+        return _HEADER_SIZE + set_index * set_size, set_size
+
+    def _set_offsets(self, key_hash: int) -> range:
+        start, set_size = self._set_range(key_hash % self._sets)
+        return range(start, start + set_size, self._slot_size)
+
+    def _read(self, offset: int, key: bytes, key_hash: int, generation: int) -> bytes | None:
+        mm = self._mm
+        for _ in range(_READ_ATTEMPTS):
+            seq, slot_hash, slot_generation, expires_at, value_len, key_len, _ = _SLOT.unpack_from(mm, offset)
+            if seq & 1:
+                continue
+            if slot_hash != key_hash:
+                return None
+            data_start = offset + _SLOT_HEADER_SIZE
+            data = mm[data_start : data_start + min(key_len + value_len, self._max_payload)]
+            if _SEQ.unpack_from(mm, offset)[0] != seq:
+                continue
+            if slot_generation != generation or expires_at < self._clock() or data[:key_len] != key:
+                return None
+            mm[offset + _REFERENCED_OFFSET] = 1
+            return data[key_len:]
+        return None
+
+    def _choose_slot(self, key_hash: int, generation: int) -> int:
+        mm = self._mm
+        offsets = self._set_offsets(key_hash)
+        now = self._clock()
+        for offset in offsets:
+            _, slot_hash, slot_generation, expires_at, *_ = _SLOT.unpack_from(mm, offset)
+            if slot_hash == key_hash or slot_generation != generation or expires_at < now:
+                return offset
+        # CLOCK from a random hand: clear reference bits until a slot without one is found
+        hand = random.randrange(self._ways)  # noqa: S311
+        for i in range(self._ways):
+            offset = offsets[(hand + i) % self._ways]
+            if not mm[offset + _REFERENCED_OFFSET]:
+                return offset
+            mm[offset + _REFERENCED_OFFSET] = 0
+        return offsets[hand]
+
+    def _expire_if(self, offset: int, predicate: Callable[[bytes], bool], generation: int) -> None:
+        # Called with the set locked, so the slot can't change under it
+        mm = self._mm
+        seq, _, slot_generation, expires_at, _, key_len, _ = _SLOT.unpack_from(mm, offset)
+        if slot_generation != generation or expires_at < self._clock():
+            return
+        data_start = offset + _SLOT_HEADER_SIZE
+        if not predicate(mm[data_start : data_start + key_len]):
+            return
+        _SEQ.pack_into(mm, offset, seq | 1)
+        _EXPIRES_AT.pack_into(mm, offset + _EXPIRES_AT_OFFSET, 0.0)
+        _SEQ.pack_into(mm, offset, (seq | 1) + 1)
+
+    def _write(self, offset: int, key: bytes, key_hash: int, value: bytes, generation: int) -> None:
+        mm = self._mm
+        seq = _SEQ.unpack_from(mm, offset)[0]
+        _SEQ.pack_into(mm, offset, seq | 1)
+        data_start = offset + _SLOT_HEADER_SIZE
+        mm[data_start : data_start + len(key)] = key
+        mm[data_start + len(key) : data_start + len(key) + len(value)] = value
+        expires_at = self._clock() + self._ttl
+        _SLOT.pack_into(mm, offset, seq | 1, key_hash, generation, expires_at, len(value), len(key), 0)
+        _SEQ.pack_into(mm, offset, (seq | 1) + 1)
+
+
+def _hash(key: bytes) -> int:
+    # Built-in hash() is randomized per process, workers have to agree on slots
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+
+def _new_generation() -> int:
+    return random.getrandbits(64)  # noqa: S311
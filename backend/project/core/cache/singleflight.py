@@ -0,0 +1,71 @@
+import asyncio
+from functools import partial
+from typing import Awaitable
+from typing import Callable
+from typing import Generic
+from typing import Hashable
+from typing import TypeVar
+
+from project.core.metrics import registry
+
+T = TypeVar("T")
+
+singleflight_calls = registry.counter(
+    "singleflight_calls_total",
+    "Calls to single-flight groups: executed ran the function, coalesced joined an already running execution.",
+    labelnames=("group", "result"),
+)
+
+
+class _Call(Generic[T]):
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: "asyncio.Task[T]"):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight(Generic[T]):
+    """Shares one in-flight execution between concurrent callers with the same key.
+
+    The first caller starts `func()` as a separate task, callers which come while it is running await the same task
+    and get the same result (or exception). Nothing is cached: once the task is done, the next call starts a new one.
+
+    A cancelled caller (e.g. client disconnected) doesn't cancel the shared task while someone else waits for it. The
+    task is cancelled only when the last waiter is gone, so nobody pays for a result which nobody needs.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: dict[Hashable, _Call[T]] = {}
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(func()))
+            self._calls[key] = call
+            call.task.add_done_callback(partial(self._forget, key, call))
+            singleflight_calls.inc(group=self.name, result="executed")
+        else:
+            singleflight_calls.inc(group=self.name, result="coalesced")
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Forget it at once: a caller coming before the task is done must start a new one, not join this one
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+                call.task.cancel()
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    def _forget(self, key: Hashable, call: _Call[T], task: "asyncio.Task[T]") -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        # Exception is delivered to waiters, mark it as retrieved even if all of them were cancelled
+        if not task.cancelled():
+            task.exception()
@@ -0,0 +1,115 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable
+from typing import Callable
+from typing import Generic
+from typing import Hashable
+from typing import TypeVar
+
+from project.core.metrics import registry
+
+T = TypeVar("T")
+
+swr_responses = registry.counter(
+    "swr_responses_total",
+    "Reads through stale-while-revalidate caches: fresh came from the database in time, stale_slow/stale_error were "
+    "served from cache because the database was slow/failed, miss_error failed without a usable cached value.",
+    labelnames=("cache", "result"),
+)
+swr_entries = registry.gauge("swr_entries", "Values kept by stale-while-revalidate caches.", labelnames=("cache",))
+
+
+class _Entry(Generic[T]):
+    __slots__ = ("value", "stored_at")
+
+    def __init__(self, value: T, stored_at: float):
+        self.value = value
+        self.stored_at = stored_at
+
+
+class StaleWhileRevalidate(Generic[T]):
+    """Keeps the last good value per key and serves it when the source is slow or down.
+
+    Every read still goes to the source. If the source answers within `latency_budget` seconds, its value is returned
+    and remembered. If it's slower, the remembered value is returned at once and the source call keeps running in the
+    background to refresh the cache; if it fails, the remembered value is returned as well. Values older than
+    `max_staleness` seconds are never served, and at most `capacity` keys are kept (least recently used are evicted).
+
+    There is at most one source call per key at a time, later reads of the key join it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        capacity: int,
+        max_staleness: float,
+        latency_budget: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self._capacity = capacity
+        self._max_staleness = max_staleness
+        self._latency_budget = latency_budget
+        self._clock = clock
+        self._entries: OrderedDict[Hashable, _Entry[T]] = OrderedDict()
+        self._refreshes: dict[Hashable, asyncio.Future[T]] = {}
+        # Bumped by invalidation, so a refresh started before it can't store an outdated value
+        self._generation = 0
+        swr_entries.set_function(lambda: len(self._entries), cache=name)
+
+    async def get(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> tuple[T, float | None]:
+        """Returns value and its age in seconds, age is None if the value has just been read from the source."""
+        refresh = self._refreshes.get(key)
+        if refresh is None:
+            generation = self._generation
+            refresh = self._refreshes[key] = asyncio.ensure_future(func())
+            refresh.add_done_callback(lambda f: self._on_refreshed(key, f, generation))
+
+        entry = self._get_entry(key)
+        if entry is None:
+            try:
+                # Shield: refresh is shared with other readers of the key and must survive cancellation of this one
+                value = await asyncio.shield(refresh)
+            except Exception:
+                swr_responses.inc(cache=self.name, result="miss_error")
+                raise
+            swr_responses.inc(cache=self.name, result="fresh")
+            return value, None
+
+        try:
+            value = await asyncio.wait_for(asyncio.shield(refresh), self._latency_budget)
+        except asyncio.TimeoutError:
+            swr_responses.inc(cache=self.name, result="stale_slow")
+        except Exception:
+            swr_responses.inc(cache=self.name, result="stale_error")
+        else:
+            swr_responses.inc(cache=self.name, result="fresh")
+            return value, None
+        return entry.value, self._clock() - entry.stored_at
+
+    def invalidate(self, predicate: Callable[[Hashable], bool] | None = None) -> None:
+        """Forget values whose keys match `predicate` (all values without predicate)."""
+        self._generation += 1
+        for key in [k for k in self._entries if predicate is None or predicate(k)]:
+            del self._entries[key]
+
+    def _get_entry(self, key: Hashable) -> _Entry[T] | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if self._clock() - entry.stored_at > self._max_staleness:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _on_refreshed(self, key: Hashable, refresh: "asyncio.Future[T]", generation: int) -> None:
+        if self._refreshes.get(key) is refresh:
+            del self._refreshes[key]
+        if refresh.cancelled() or refresh.exception() is not None or generation != self._generation:
+            return
+        self._entries[key] = _Entry(refresh.result(), self._clock())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._capacity:
+            self._entries.popitem(last=False)
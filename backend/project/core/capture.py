@@ -0,0 +1,264 @@
+"""Capture of sampled requests to replay production-shaped traffic against another instance (`benchmarks.replay`)."""
+import asyncio
+import base64
+import gzip
+import json
+import logging
+import os
+import random
+import threading
+import time
+import zlib
+from typing import IO
+from typing import Any
+from typing import Iterable
+from typing import Iterator
+from typing import NamedTuple
+
+from starlette.types import ASGIApp
+from starlette.types import Message
+from starlette.types import Receive
+from starlette.types import Scope
+from starlette.types import Send
+
+from project.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+captured_requests = registry.counter(
+    "request_capture_requests_total",
+    "Sampled requests: captured, dropped (buffer full) or skipped (streams, bodies over the limit).",
+    ("action",),
+)
+
+SUFFIX = ".jsonl.gz"
+
+
+class CapturedRequest(NamedTuple):
+    # Unix time the request came at
+    started_at: float
+    method: str
+    path: str
+    query: str
+    content_type: str | None
+    body: bytes
+    status: int
+    # Seconds from the request to the end of its response
+    duration: float
+
+
+class RequestCapture:
+    """Sampled requests written to gzip'd JSON lines files of the directory.
+
+    Requests are buffered in memory and written every interval seconds by a thread, a request coming while the buffer
+    is full is dropped. Every process writes its own file and starts a new one after `max_file_bytes` of JSON,
+    only the last `files` files of the directory are kept. Only the method, path, query, content type and body of a
+    request are captured, no other headers.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        sample_rate: float,
+        paths: Iterable[str],
+        max_body: int,
+        max_file_bytes: int,
+        files: int,
+        buffer_size: int = 10000,
+    ):
+        self._directory = directory
+        self._sample_rate = sample_rate
+        self._paths = tuple(paths)
+        self.max_body = max_body
+        self._max_file_bytes = max_file_bytes
+        self._files = files
+        self._buffer_size = buffer_size
+        self._buffer: list[CapturedRequest] = []
+        self._lock = threading.Lock()
+        self._file: IO[str] | None = None
+        self._written = 0
+        self._task: asyncio.Task[None] | None = None
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+
+    def sampled(self, path: str) -> bool:
+        return path.startswith(self._paths) and random.random() < self._sample_rate
+
+    def record(self, request: CapturedRequest) -> None:
+        if len(self._buffer) >= self._buffer_size:
+            captured_requests.inc(action="dropped")
+            return
+        self._buffer.append(request)
+        captured_requests.inc(action="captured")
+
+    async def flush(self) -> None:
+        """Write buffered requests."""
+        requests, self._buffer = self._buffer, []
+        if requests:
+            await asyncio.to_thread(self._write, requests)
+
+    def start(self, interval: float) -> None:
+        """Write buffered requests every `interval` seconds in the background."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(interval), name="request_capture")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        with self._lock:
+            self._close()
+
+    async def _run(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush()
+            except OSError:
+                logger.warning("Failed to write captured requests", exc_info=True)
+
+    def _write(self, requests: list[CapturedRequest]) -> None:
+        with self._lock:
+            file = self._file or self._open()
+            for request in requests:
+                line = json.dumps(_encode(request), separators=(",", ":")) + "\n"
+                file.write(line)
+                self._written += len(line)
+            # Sync flush makes written requests readable from a file which is still open
+            file.flush()
+            if self._written >= self._max_file_bytes:
+                self._close()
+
+    def _open(self) -> IO[str]:
+        path = os.path.join(self._directory, f"{time.time_ns()}-{os.getpid()}{SUFFIX}")
+        # Bodies hold personal data, the file is readable by the owner only
+        os.close(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600))
+        self._file = file = gzip.open(path, "wt")
+        self._written = 0
+        # File names start with their creation time, the oldest ones are the first
+        for name in sorted(capture_files(self._directory))[: -self._files]:
+            try:
+                os.unlink(name)
+            except FileNotFoundError:
+                pass
+        return file
+
+    def _close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class RequestCaptureMiddleware:
+    """Records sampled HTTP requests with the status and duration of their responses to a `RequestCapture`."""
+
+    def __init__(self, app: ASGIApp, capture: RequestCapture):
+        self.app = app
+        self.capture = capture
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.capture.sampled(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        started_at = time.time()
+        started = time.perf_counter()
+        body = bytearray()
+        status = 0
+        skipped = False
+
+        async def receive_body() -> Message:
+            nonlocal skipped
+            message = await receive()
+            if message["type"] == "http.request" and not skipped:
+                body.extend(message.get("body", b""))
+                skipped = len(body) > self.capture.max_body
+            return message
+
+        async def send_status(message: Message) -> None:
+            nonlocal status, skipped
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                # Replay can't reproduce a stream, which lasts as long as its client wants
+                skipped = skipped or any(
+                    k == b"content-type" and v.startswith(b"text/event-stream") for k, v in message.get("headers", ())
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive_body, send_status)
+        finally:
+            if skipped:
+                captured_requests.inc(action="skipped")
+            else:
+                headers = dict(scope["headers"])
+                content_type = headers.get(b"content-type")
+                request = CapturedRequest(
+                    started_at=started_at,
+                    method=scope["method"],
+                    path=scope["path"],
+                    query=scope["query_string"].decode("latin-1"),
+                    content_type=content_type.decode("latin-1") if content_type else None,
+                    body=bytes(body),
+                    status=status,
+                    duration=time.perf_counter() - started,
+                )
+                self.capture.record(request)
+
+
+def capture_files(directory: str) -> list[str]:
+    return [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(SUFFIX)]
+
+
+def read_capture(path: str) -> Iterator[CapturedRequest]:
+    """Captured requests of a file, up to the last complete one of a file which is still written or was cut off."""
+    with gzip.open(path, "rt") as file:
+        try:
+            for line in file:
+                try:
+                    yield _decode(json.loads(line))
+                except (ValueError, KeyError):
+                    logger.warning("Skipped a torn line of captured requests %s", path)
+        except (EOFError, zlib.error, gzip.BadGzipFile):
+            pass
+
+
+def _encode(request: CapturedRequest) -> dict[str, Any]:
+    data: dict[str, Any] = {
+        "t": round(request.started_at, 6),
+        "m": request.method,
+        "p": request.path,
+        "s": request.status,
+        "d": round(request.duration, 6),
+    }
+    if request.query:
+        data["q"] = request.query
+    if request.content_type:
+        data["c"] = request.content_type
+    if request.body:
+        try:
+            data["b"] = request.body.decode()
+        except UnicodeDecodeError:
+            data["b64"] = base64.b64encode(request.body).decode()
+    return data
+
+
+def _decode(data: dict[str, Any]) -> CapturedRequest:
+    if "b64" in data:
+        body = base64.b64decode(data["b64"])
+    else:
+        body = data.get("b", "").encode()
+    return CapturedRequest(
+        started_at=data["t"],
+        method=data["m"],
+        path=data["p"],
+        query=data.get("q", ""),
+        content_type=data.get("c"),
+        body=body,
+        status=data["s"],
+        duration=data["d"],
+    )
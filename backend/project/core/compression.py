@@ -0,0 +1,219 @@
+"""Negotiated compression of responses: zstd, brotli and gzip.
+
+zstd and brotli need the `zstandard` and `brotli` packages, encodings whose package isn't installed are never
+negotiated. Levels are the ones meant for compressing on the fly, a few times faster than the best ones.
+"""
+import zlib
+from typing import Iterable
+from typing import Protocol
+
+from starlette.datastructures import Headers
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp
+from starlette.types import Message
+from starlette.types import Receive
+from starlette.types import Scope
+from starlette.types import Send
+
+from project.core.metrics import registry
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None  # type: ignore[assignment]
+
+compressed_responses = registry.counter(
+    "http_compressed_responses_total", "Responses compressed by the compression middleware.", ("encoding",)
+)
+
+_GZIP_LEVEL = 6
+_BROTLI_QUALITY = 4
+_ZSTD_LEVEL = 3
+
+
+class Encoder(Protocol):
+    def compress(self, data: bytes) -> bytes:
+        ...
+
+    def flush(self) -> bytes:
+        """Compressed data of everything given so far, for a client to decode it without waiting for the end."""
+
+    def finish(self) -> bytes:
+        ...
+
+
+class _GzipEncoder:
+    def __init__(self) -> None:
+        self._compressor = zlib.compressobj(_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class _BrotliEncoder:
+    def __init__(self) -> None:
+        self._compressor = brotli.Compressor(quality=_BROTLI_QUALITY)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class _ZstdEncoder:
+    def __init__(self) -> None:
+        self._compressor = zstandard.ZstdCompressor(level=_ZSTD_LEVEL).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+_ENCODERS: dict[str, type[Encoder]] = {"gzip": _GzipEncoder}
+if brotli is not None:
+    _ENCODERS["br"] = _BrotliEncoder
+if zstandard is not None:
+    _ENCODERS["zstd"] = _ZstdEncoder
+
+
+def available_encodings(preferred: Iterable[str]) -> tuple[str, ...]:
+    """Encodings of the preferred ones which can be used here, in the same order."""
+    return tuple(encoding for encoding in preferred if encoding in _ENCODERS)
+
+
+def negotiate(accept_encoding: str | None, encodings: tuple[str, ...]) -> str | None:
+    """The first of the encodings the client accepts by `Accept-Encoding`, None for the response as is.
+
+    The order of the encodings is ours, `q` of the client only tells whether it accepts an encoding at all (q > 0).
+    """
+    if not accept_encoding:
+        return None
+    accepted: dict[str, bool] = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding.strip().lower()] = q > 0
+    wildcard = accepted.get("*", False)
+    return next((encoding for encoding in encodings if accepted.get(encoding, wildcard)), None)
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    encoder = _ENCODERS[encoding]()
+    return encoder.compress(data) + encoder.finish()
+
+
+class CompressionMiddleware:
+    """Compresses bodies of responses with the encoding negotiated by `Accept-Encoding`.
+
+    A complete body shorter than the minimum size is sent as is. A streamed body is compressed chunk by chunk and
+    every chunk is flushed, so the client gets it when the app sends it. Event streams and responses which already
+    have `Content-Encoding` (precompressed by the app) are never compressed.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int, encodings: Iterable[str]):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encodings = available_encodings(encodings)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding"), self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _CompressionResponder(encoding, self.minimum_size, send).handle(self.app, scope, receive)
+
+
+class _CompressionResponder:
+    def __init__(self, encoding: str, minimum_size: int, send: Send):
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.send = send
+        # Headers depend on the body, the start of the response is held until its first part
+        self.start: Message | None = None
+        self.encoder: Encoder | None = None
+        self.passthrough = False
+
+    async def handle(self, app: ASGIApp, scope: Scope, receive: Receive) -> None:
+        await app(scope, receive, self.send_compressed)
+
+    async def send_compressed(self, message: Message) -> None:
+        if self.passthrough:
+            await self.send(message)
+            return
+
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            self.passthrough = (
+                "content-encoding" in headers
+                or headers.get("content-type", "").startswith("text/event-stream")
+                or message["status"] in (204, 304)
+            )
+            if self.passthrough:
+                await self.send(message)
+            else:
+                self.start = message
+            return
+
+        if message["type"] != "http.response.body" or self.start is None:
+            await self.send(message)
+            return
+
+        body: bytes = message.get("body", b"")
+        more_body: bool = message.get("more_body", False)
+
+        if self.encoder is None:
+            if not more_body and len(body) < self.minimum_size:
+                self.passthrough = True
+                await self.send(self.start)
+                await self.send(message)
+                return
+            headers = MutableHeaders(raw=self.start["headers"])
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            compressed_responses.inc(encoding=self.encoding)
+            if not more_body:
+                body = compress(body, self.encoding)
+                headers["Content-Length"] = str(len(body))
+                self.passthrough = True
+                await self.send(self.start)
+                await self.send({"type": "http.response.body", "body": body})
+                return
+            del headers["Content-Length"]
+            self.encoder = _ENCODERS[self.encoding]()
+            await self.send(self.start)
+
+        if more_body:
+            chunk = self.encoder.compress(body) + self.encoder.flush()
+        else:
+            chunk = self.encoder.compress(body) + self.encoder.finish()
+        await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
@@ -0,0 +1,307 @@
+import asyncio
+import logging
+from datetime import date
+from datetime import datetime
+from datetime import timedelta
+from typing import Any
+from typing import Sequence
+from typing import cast
+from uuid import UUID
+
+from project.core.db.postgres.form_history import FormHistoryDALFactory
+from project.core.db.postgres.form_history import FormHistoryEntry
+from project.core.metrics import registry
+from project.core.uc.history.dto import HistoryItem
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+replica_rows = registry.gauge("history_replica_rows", "Rows in the in-memory columnar replica of form_history.")
+replica_syncs = registry.counter(
+    "history_replica_syncs_total", "Syncs of the columnar replica by kind (full, incremental, failed).", ("kind",)
+)
+
+# Sort keys pack several int columns into one int64: names codes/ranks take 20 bits (~1M distinct names per column),
+# day numbers (proleptic Gregorian ordinal) take 22 bits
+_CODE_BITS = 20
+_DAY_BITS = 22
+_MAX_CODES = 1 << _CODE_BITS
+_MAX_DAY = (1 << _DAY_BITS) - 1
+
+# Collation ordering names by code points like the replica, `FormHistoryDAL` must use it while the replica is used
+NAMES_COLLATION = "C"
+
+
+class _Names:
+    """Dictionary encoding of a names column: codes are given in order of appearance and never change."""
+
+    def __init__(self) -> None:
+        self.values: list[str] = []
+        self.codes: dict[str, int] = {}
+        # Position of every code in alphabetical order, recomputed when new names appear
+        self.ranks = np.zeros(0, dtype=np.int64)
+
+    def encode(self, names: Sequence[str]) -> "np.ndarray[Any, Any]":
+        size = len(self.values)
+        codes = np.fromiter((self._code(name) for name in names), dtype=np.int32, count=len(names))
+        if len(self.values) > _MAX_CODES:
+            raise OverflowError(f"Columnar replica supports at most {_MAX_CODES} distinct names")
+        if len(self.values) != size:
+            ranks = np.empty(len(self.values), dtype=np.int64)
+            ranks[sorted(range(len(self.values)), key=self.values.__getitem__)] = np.arange(len(self.values))
+            self.ranks = ranks
+        return codes
+
+    def _code(self, name: str) -> int:
+        code = self.codes.get(name)
+        if code is None:
+            code = self.codes[name] = len(self.values)
+            self.values.append(name)
+        return code
+
+
+class _Table:
+    """Immutable columns and sort orders, replaced as a whole on every change so readers never see a partial one."""
+
+    def __init__(self) -> None:
+        self.days = np.zeros(0, dtype=np.int32)
+        self.first = np.zeros(0, dtype=np.int32)
+        self.last = np.zeros(0, dtype=np.int32)
+        # Row numbers sorted by (first, last, day), (last, first, day) and (day desc, first name, last name), and
+        # sorted keys of the first two orders and negated days of the third one to search in them
+        self.by_person = np.zeros(0, dtype=np.int32)
+        self.by_last = np.zeros(0, dtype=np.int32)
+        self.by_date = np.zeros(0, dtype=np.int32)
+        self.person_keys = np.zeros(0, dtype=np.int64)
+        self.last_keys = np.zeros(0, dtype=np.int64)
+        self.neg_days = np.zeros(0, dtype=np.int32)
+
+
+class FormHistoryReplica:
+    """In-memory copy of form_history answering history queries like `FormHistoryDAL` without the database.
+
+    Columns are NumPy arrays: dates as int32 day numbers and names as int32 codes of per-column dictionaries. Rows are
+    kept in three sort orders, so a history query is a binary search plus vectorized work on the rows of one name at
+    most. Names are compared and ordered by code points: `FormHistoryDAL` orders them the same with `NAMES_COLLATION`.
+
+    A row of form_history stands for `occurrences` submissions of its date and names, the replica keeps a row per
+    submission and the number of occurrences it has of every row id. It follows the table by `updated_at` (repeats
+    folded into a row update it): every sync reads rows updated since the newest one it has minus `overlap` seconds
+    (transactions may commit rows with older `updated_at` later) and adds submissions it doesn't have yet. Rows can
+    also be applied directly as they are committed (e.g. from notifications). Otherwise the table is append-only for
+    the replica: after rows are updated or deleted, `request_reload()` makes the next sync load the whole table again.
+    """
+
+    def __init__(self, overlap: float = 60.0, chunk_size: int = 50000):
+        if np is None:
+            raise RuntimeError("Columnar replica of form_history requires numpy")
+        self._overlap = timedelta(seconds=overlap)
+        self._chunk_size = chunk_size
+        self._first = _Names()
+        self._last = _Names()
+        self._table = _Table()
+        self._occurrences: dict[UUID, int] = {}
+        self._loaded = False
+        self._watermark: datetime | None = None
+        self._reload = False
+        self._task: asyncio.Task[None] | None = None
+        replica_rows.set_function(lambda: len(self._table.days))
+
+    @property
+    def ready(self) -> bool:
+        """Whether the table has been loaded, a replica which isn't ready must not answer queries."""
+        return self._loaded and not self._reload
+
+    def request_reload(self) -> None:
+        self._reload = True
+
+    # Sync
+    # ----------------------------------------------------------------------------------------------------------------
+    def start(self, form_history_dal_factory: FormHistoryDALFactory, interval: float) -> None:
+        """Sync every `interval` seconds in the background."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(form_history_dal_factory, interval), name="history_replica")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def sync(self, form_history_dal_factory: FormHistoryDALFactory) -> int:
+        """Load rows updated since the last sync (all of them on the first one), returns number of added submissions."""
+        full = not self._loaded or self._reload
+        since = None if full or self._watermark is None else self._watermark - self._overlap
+        entries: list[FormHistoryEntry] = []
+        async with form_history_dal_factory() as form_history_dal:
+            after = None
+            while True:
+                chunk = await form_history_dal.get_entries_updated_since(since, after, self._chunk_size)
+                entries.extend(chunk)
+                if len(chunk) < self._chunk_size:
+                    break
+                after = cast(datetime, chunk[-1].updated_at), chunk[-1].id
+
+        if full:
+            self._first, self._last, self._table, self._occurrences = _Names(), _Names(), _Table(), {}
+            self._watermark, self._reload = None, False
+        added = self.apply(entries)
+        self._loaded = True
+        replica_syncs.inc(kind="full" if full else "incremental")
+        return added
+
+    def apply(self, entries: Sequence[FormHistoryEntry]) -> int:
+        """Add submissions of committed rows which the replica doesn't have yet. Returns number of added submissions.
+
+        Rows which are applied again (or with outdated occurrences) add nothing.
+        """
+        if not entries:
+            return 0
+        watermark = max(e.updated_at or e.created_at for e in entries)
+        if self._watermark is None or watermark > self._watermark:
+            self._watermark = watermark
+
+        new_entries: list[FormHistoryEntry] = []
+        missing: list[int] = []
+        for entry in entries:
+            present = self._occurrences.get(entry.id, 0)
+            if entry.occurrences > present:
+                self._occurrences[entry.id] = entry.occurrences
+                new_entries.append(entry)
+                missing.append(entry.occurrences - present)
+        if not new_entries:
+            return 0
+        days = np.fromiter((e.date.toordinal() for e in new_entries), dtype=np.int32, count=len(new_entries))
+        first = self._first.encode([e.first_name for e in new_entries])
+        last = self._last.encode([e.last_name for e in new_entries])
+        self._table = self._append(np.repeat(days, missing), np.repeat(first, missing), np.repeat(last, missing))
+        return sum(missing)
+
+    async def _run(self, form_history_dal_factory: FormHistoryDALFactory, interval: float) -> None:
+        while True:
+            try:
+                await self.sync(form_history_dal_factory)
+            except Exception:
+                replica_syncs.inc(kind="failed")
+                logger.exception("Sync of history replica failed")
+            await asyncio.sleep(interval)
+
+    def _append(
+        self, days: "np.ndarray[Any, Any]", first: "np.ndarray[Any, Any]", last: "np.ndarray[Any, Any]"
+    ) -> _Table:
+        old = self._table
+        table = _Table()
+        table.days = np.concatenate((old.days, days))
+        table.first = np.concatenate((old.first, first))
+        table.last = np.concatenate((old.last, last))
+        new_rows = np.arange(len(old.days), len(table.days), dtype=np.int32)
+
+        person_keys = _pack(table.first, table.last, table.days)
+        table.by_person = _merge(old.by_person, person_keys, new_rows)
+        table.person_keys = person_keys[table.by_person]
+
+        last_keys = _pack(table.last, table.first, table.days)
+        table.by_last = _merge(old.by_last, last_keys, new_rows)
+        table.last_keys = last_keys[table.by_last]
+
+        # Ranks shift when new names appear, but order of the old rows stays the same, so they can be merged as well
+        date_keys = (
+            ((_MAX_DAY - table.days.astype(np.int64)) << (2 * _CODE_BITS))
+            | (self._first.ranks[table.first] << _CODE_BITS)
+            | self._last.ranks[table.last]
+        )
+        table.by_date = _merge(old.by_date, date_keys, new_rows)
+        table.neg_days = -table.days[table.by_date]
+        return table
+
+    # Queries, see FormHistoryDAL
+    # ----------------------------------------------------------------------------------------------------------------
+    def get_history(
+        self,
+        date_filter: date,
+        first_name: str | None = None,
+        last_name: str | None = None,
+        limit: int = 10,
+    ) -> tuple[list[HistoryItem], int]:
+        """Filtered history entries with counts of previous entries, and total number of filtered entries."""
+        table = self._table
+        day = date_filter.toordinal()
+        first = self._first.codes.get(first_name) if first_name else None
+        last = self._last.codes.get(last_name) if last_name else None
+        if (first_name and first is None) or (last_name and last is None):
+            return [], 0
+
+        if first is None and last is None:
+            start = int(np.searchsorted(table.neg_days, -day, side="left"))
+            rows = table.by_date[start : start + limit]
+            total = len(table.by_date) - start
+        elif first is not None and last is not None:
+            lo, hi = np.searchsorted(
+                table.person_keys, [_pack_one(first, last, 0), _pack_one(first, last, day)], "right"
+            )
+            # The same person: ordered just by date, which is ascending in the index
+            rows = table.by_person[max(lo, hi - limit) : hi][::-1]
+            total = int(hi - lo)
+        else:
+            # Rows of one name are a contiguous range of the order starting with it
+            if first is not None:
+                order, keys = table.by_person, table.person_keys
+                lo, hi = np.searchsorted(keys, [_pack_one(first, 0, 0), _pack_one(first + 1, 0, 0)])
+            else:
+                order, keys = table.by_last, table.last_keys
+                lo, hi = np.searchsorted(keys, [_pack_one(cast(int, last), 0, 0), _pack_one(cast(int, last) + 1, 0, 0)])
+            candidates = order[lo:hi]
+            candidates = candidates[table.days[candidates] <= day]
+            total = len(candidates)
+            top = np.lexsort(
+                (
+                    self._last.ranks[table.last[candidates]],
+                    self._first.ranks[table.first[candidates]],
+                    -table.days[candidates],
+                )
+            )[:limit]
+            rows = candidates[top]
+
+        return self._items(table, rows), total
+
+    def get_unique_first_names(self) -> list[str]:
+        return [name for name in self._first.values if name]
+
+    def get_unique_last_names(self) -> list[str]:
+        return [name for name in self._last.values if name]
+
+    def _items(self, table: _Table, rows: "np.ndarray[Any, Any]") -> list[HistoryItem]:
+        days, first, last = table.days[rows], table.first[rows], table.last[rows]
+        # Previous entries of the person are right before the row's day in the (first, last, day) order
+        counts = np.searchsorted(table.person_keys, _pack(first, last, days)) - np.searchsorted(
+            table.person_keys, _pack(first, last, np.zeros_like(days))
+        )
+        return [
+            HistoryItem(date.fromordinal(d), self._first.values[f], self._last.values[ln], c)
+            for d, f, ln, c in zip(days.tolist(), first.tolist(), last.tolist(), counts.tolist())
+        ]
+
+
+def _pack(a: "np.ndarray[Any, Any]", b: "np.ndarray[Any, Any]", days: "np.ndarray[Any, Any]") -> "np.ndarray[Any, Any]":
+    return (a.astype(np.int64) << (_CODE_BITS + _DAY_BITS)) | (b.astype(np.int64) << _DAY_BITS) | days.astype(np.int64)
+
+
+def _pack_one(a: int, b: int, day: int) -> int:
+    return (a << (_CODE_BITS + _DAY_BITS)) | (b << _DAY_BITS) | day
+
+
+def _merge(
+    order: "np.ndarray[Any, Any]", keys: "np.ndarray[Any, Any]", new_rows: "np.ndarray[Any, Any]"
+) -> "np.ndarray[Any, Any]":
+    """Insert new rows into the order sorted by keys, cost is linear instead of sorting everything again."""
+    new_rows = new_rows[np.argsort(keys[new_rows], kind="stable")]
+    positions = np.searchsorted(keys[order], keys[new_rows], side="right")
+    return np.insert(order, positions, new_rows).astype(np.int32, copy=False)
@@ -1,4 +1,7 @@
+import logging
+import time
 from typing import Any
+from typing import Callable
 from typing import Optional
 from typing import Sequence
 from typing import Union
@@ -6,15 +9,29 @@ from uuid import UUID
 
 from sqlalchemy import Table
 from sqlalchemy import delete
+from sqlalchemy import event
 from sqlalchemy import text
 from sqlalchemy import update
+from sqlalchemy.engine import Connection
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine import ExceptionContext
 from sqlalchemy.exc import NoResultFound
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from sqlalchemy.orm import ORMExecuteState
+from sqlalchemy.orm import Session
+from sqlalchemy.orm import SessionTransaction
 from sqlalchemy.orm import load_only
 from sqlalchemy.orm.attributes import InstrumentedAttribute
 
 from project.core.db.postgres.models import Base
+from project.core.timing import record_span
+
+logger = logging.getLogger(__name__)
+
+_ON_COMMIT_KEY = "on_commit_callbacks"
+_CHECKOUT_START_KEY = "checkout_start"
+_QUERY_START_KEY = "query_start"
 
 
 class BaseDAL:
@@ -71,6 +88,10 @@ class BaseDAL:
 
     # Helper actions
     # ----------------------------------------------------------------------------------------------------------------
+    def on_commit(self, callback: Callable[[], None]) -> None:
+        """Call `callback` once the current transaction is committed, it's dropped if the transaction rolls back."""
+        self.session.info.setdefault(_ON_COMMIT_KEY, []).append(callback)
+
     def set_order_by(self, order_by: str) -> None:
         self._default_order_by = text(order_by)
 
@@ -95,3 +116,54 @@ class BaseDAL:
     @property
     def _id_column(self) -> InstrumentedAttribute:  # type: ignore
         return getattr(self.model, self._id_field)
+
+
+@event.listens_for(Session, "after_commit")
+def _run_on_commit_callbacks(session: Session) -> None:
+    for callback in session.info.pop(_ON_COMMIT_KEY, []):
+        try:
+            callback()
+        except Exception:
+            # Data is already committed, a failed side effect must not turn the request into an error
+            logger.exception("On commit callback failed")
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_on_commit_callbacks(session: Session) -> None:
+    session.info.pop(_ON_COMMIT_KEY, None)
+
+
+# Timing spans of requests: pool checkout (from the statement which begins a transaction until it has a connection)
+# and every query
+@event.listens_for(Session, "do_orm_execute")
+def _start_checkout(orm_execute_state: ORMExecuteState) -> None:
+    orm_execute_state.session.info[_CHECKOUT_START_KEY] = time.perf_counter()
+
+
+@event.listens_for(Session, "after_begin")
+def _record_checkout(session: Session, transaction: SessionTransaction, connection: Connection) -> None:
+    start = session.info.pop(_CHECKOUT_START_KEY, None)
+    if start is not None:
+        record_span("db.checkout", start, time.perf_counter())
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _drop_checkout(session: Session, transaction: SessionTransaction) -> None:
+    session.info.pop(_CHECKOUT_START_KEY, None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_query(connection: Connection, *args: Any) -> None:
+    connection.info.setdefault(_QUERY_START_KEY, []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _record_query(connection: Connection, *args: Any) -> None:
+    record_span("db.query", connection.info[_QUERY_START_KEY].pop(), time.perf_counter())
+
+
+@event.listens_for(Engine, "handle_error")
+def _drop_query(context: ExceptionContext) -> None:
+    # Only errors of queries, not of connecting
+    if context.cursor is not None and context.connection is not None and context.connection.info.get(_QUERY_START_KEY):
+        context.connection.info[_QUERY_START_KEY].pop()
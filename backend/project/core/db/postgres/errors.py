@@ -0,0 +1,23 @@
+from sqlalchemy import exc
+
+# Classes of SQLSTATE meaning the server can't take the query now, however valid it is: connection exception,
+# insufficient resources (too many connections, disk full), operator intervention (shutdown, recovery), and a write
+# to a standby which hasn't been promoted yet
+_UNAVAILABLE_SQLSTATES = ("08", "53", "57P", "25006")
+
+
+def is_database_unavailable(error: BaseException) -> bool:
+    """Whether the error means the database is unreachable or can't write now, rather than that the query is wrong.
+
+    Connection errors are raised by asyncpg as is (`OSError` or its own errors), errors of queries are wrapped by
+    SQLAlchemy. An exhausted pool raises `sqlalchemy.exc.TimeoutError`.
+    """
+    if isinstance(error, (OSError, TimeoutError, exc.TimeoutError)):
+        return True
+    if isinstance(error, exc.DBAPIError):
+        if error.connection_invalidated:
+            return True
+        sqlstate = getattr(error.orig, "sqlstate", None)
+    else:
+        sqlstate = getattr(error, "sqlstate", None)
+    return isinstance(sqlstate, str) and sqlstate.startswith(_UNAVAILABLE_SQLSTATES)
@@ -1,36 +1,166 @@
+from collections import Counter
+from contextlib import AbstractAsyncContextManager
 from datetime import date
+from datetime import datetime
+from functools import cache
+from itertools import chain
+from itertools import islice
+from itertools import repeat
+from typing import Any
+from typing import Callable
+from typing import NamedTuple
+from typing import TypeVar
+from uuid import UUID
 
+from sqlalchemy import Select
+from sqlalchemy import Uuid
 from sqlalchemy import and_
+from sqlalchemy import any_
+from sqlalchemy import bindparam
+from sqlalchemy import delete
 from sqlalchemy import func
+from sqlalchemy import literal
 from sqlalchemy import select
+from sqlalchemy import tuple_
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import aliased
 
 from project.core.db.postgres.base import BaseDAL
 from project.core.db.postgres.models import Base
 from project.core.db.postgres.models import FormHistory
+from project.core.db.postgres.models import FormHistoryDateCount
+from project.core.db.postgres.models import FormHistoryPersonDateCount
+from project.core.db.postgres.models import FormHistorySpoolApplied
+from project.core.db.postgres.models import Person
+from project.core.timing import timed
+
+_T = TypeVar("_T")
+
+_HISTORY_ORDER = (FormHistory.date.desc(), FormHistory.first_name.asc(), FormHistory.last_name.asc())
+# Unique key of folded rows, rows of single submissions have NULL `folded` and never conflict
+_FOLDED_KEY = [FormHistory.person_id, FormHistory.date, FormHistory.folded]
+
+
+class FormHistoryEntry(NamedTuple):
+    id: UUID
+    date: date
+    first_name: str
+    last_name: str
+    created_at: datetime
+    occurrences: int = 1
+    # Unknown for entries from notifications
+    updated_at: datetime | None = None
+
+
+class SpooledFormEntry(NamedTuple):
+    """Submission accepted while the database was unavailable, id is of its spool record."""
+
+    id: UUID
+    date: date
+    first_name: str
+    last_name: str
 
 
 class FormHistoryDAL(BaseDAL):
     """Data Access Layer for FormHistory model."""
 
-    def __init__(self, session: AsyncSession, model: Base = FormHistory):
+    def __init__(
+        self,
+        session: AsyncSession,
+        model: Base = FormHistory,
+        fold_repeats: bool = False,
+        names_collation: str | None = None,
+    ):
         super().__init__(session, model, order_by="created_at")
+        self._fold_repeats = fold_repeats
+        # History names are ordered in the collation of their columns unless another one is given
+        self._history_order = _HISTORY_ORDER if names_collation is None else _get_history_order(names_collation)
 
+    @timed
     async def create_form_entry(
         self,
         date: date,
         first_name: str,
         last_name: str,
+        person_id: int | None = None,
     ) -> FormHistory:
-        """Create a new form history entry."""
-        data = {
+        """Create a new form history entry, person is found by the names in the database unless its id is given.
+
+        With folding, repeated submission of the same date and names increases occurrences of the existing entry,
+        which is returned.
+        """
+        data: dict[str, Any] = {
             "date": date,
             "first_name": first_name,
             "last_name": last_name,
+            "folded": True if self._fold_repeats else None,
         }
-        return await self.create(data)
+        if person_id is not None:
+            data["person_id"] = person_id
+        query = insert(FormHistory).values(data)
+        if self._fold_repeats:
+            query = query.on_conflict_do_update(
+                index_elements=_FOLDED_KEY,
+                set_={"occurrences": FormHistory.occurrences + 1, "updated_at": datetime.utcnow()},
+            )
+        result = await self.session.scalars(query.returning(FormHistory), execution_options={"populate_existing": True})
+        return result.one()
+
+    @timed
+    async def add_spooled_entries(self, entries: list[SpooledFormEntry]) -> int:
+        """Add spooled submissions, skipping ones added before by their ids, returns number of added.
 
+        Ids are recorded in the same transaction, so a batch replayed after an interrupted drain adds nothing twice.
+        """
+        if not entries:
+            return 0
+        result = await self.session.scalars(
+            insert(FormHistorySpoolApplied)
+            .values([{"id": entry.id} for entry in entries])
+            .on_conflict_do_nothing()
+            .returning(FormHistorySpoolApplied.id)
+        )
+        new_ids = set(result.all())
+        new_entries = [e for e in entries if e.id in new_ids]
+        if not new_entries:
+            return 0
+        if not self._fold_repeats:
+            await self.session.execute(
+                insert(FormHistory).values(
+                    [
+                        {"date": e.date, "first_name": e.first_name, "last_name": e.last_name, "folded": None}
+                        for e in new_entries
+                    ]
+                )
+            )
+            return len(new_ids)
+        # One row per date and names: an INSERT can't update a row twice
+        occurrences = Counter((e.date, e.first_name, e.last_name) for e in new_entries)
+        query = insert(FormHistory).values(
+            [
+                {"date": date, "first_name": first_name, "last_name": last_name, "occurrences": count}
+                for (date, first_name, last_name), count in occurrences.items()
+            ]
+        )
+        query = query.on_conflict_do_update(
+            index_elements=_FOLDED_KEY,
+            set_={
+                "occurrences": FormHistory.occurrences + query.excluded.occurrences,
+                "updated_at": datetime.utcnow(),
+            },
+        )
+        await self.session.execute(query)
+        return len(new_ids)
+
+    @timed
+    async def forget_spooled_entries(self, ids: list[UUID]) -> None:
+        """Drop ids of added spooled submissions, once they can't be replayed."""
+        # A single array parameter, a segment may have more ids than a query can have parameters
+        ids_param = bindparam("ids", ids, type_=ARRAY(Uuid()))
+        await self.session.execute(delete(FormHistorySpoolApplied).where(FormHistorySpoolApplied.id == any_(ids_param)))
+
+    @timed
     async def get_filtered_history(
         self,
         date_filter: date,
@@ -41,37 +171,34 @@ class FormHistoryDAL(BaseDAL):
         """Get filtered history entries with pagination."""
         query = select(FormHistory).where(FormHistory.date <= date_filter)
 
-        if first_name:
-            query = query.where(FormHistory.first_name == first_name)
-        if last_name:
-            query = query.where(FormHistory.last_name == last_name)
+        if first_name or last_name:
+            query = query.where(FormHistory.person_id.in_(_person_ids(first_name, last_name)))
 
-        query = query.order_by(
-            FormHistory.date.desc(),
-            FormHistory.first_name.asc(),
-            FormHistory.last_name.asc(),
-        ).limit(limit)
+        query = query.order_by(*self._history_order).limit(limit)
 
         result = await self.session.execute(query)
-        return list(result.scalars().all())
+        return _repeat_occurrences([(record, record) for record in result.scalars().all()], limit)
 
+    @timed
     async def count_filtered_history(
         self,
         date_filter: date,
         first_name: str | None = None,
         last_name: str | None = None,
     ) -> int:
-        """Count filtered history entries."""
-        query = select(func.count(FormHistory.id)).where(FormHistory.date <= date_filter)
-
-        if first_name:
-            query = query.where(FormHistory.first_name == first_name)
-        if last_name:
-            query = query.where(FormHistory.last_name == last_name)
+        """Count filtered history entries by summing counts per date (and person) up to the date."""
+        if not first_name and not last_name:
+            query = select(func.sum(FormHistoryDateCount.count)).where(FormHistoryDateCount.date <= date_filter)
+        else:
+            query = select(func.sum(FormHistoryPersonDateCount.count)).where(
+                FormHistoryPersonDateCount.person_id.in_(_person_ids(first_name, last_name)),
+                FormHistoryPersonDateCount.date <= date_filter,
+            )
 
         result = await self.session.execute(query)
         return result.scalar() or 0
 
+    @timed
     async def count_previous_entries(
         self,
         record_date: date,
@@ -79,28 +206,55 @@ class FormHistoryDAL(BaseDAL):
         last_name: str,
     ) -> int:
         """Count entries with same first_name and last_name but earlier date."""
-        query = select(func.count()).where(
+        query = select(func.sum(FormHistoryPersonDateCount.count)).where(
             and_(
-                FormHistory.first_name == first_name,
-                FormHistory.last_name == last_name,
-                FormHistory.date < record_date,
+                FormHistoryPersonDateCount.person_id.in_(_person_ids(first_name, last_name)),
+                FormHistoryPersonDateCount.date < record_date,
             )
         )
         result = await self.session.execute(query)
         return result.scalar() or 0
 
+    @timed
+    async def rebuild_counts(self) -> None:
+        """Recompute counts per date and person from all entries, see `rebuild_form_history_counts()`."""
+        await self.session.execute(select(func.rebuild_form_history_counts()))
+
+    @timed
+    async def ensure_partitions(self, first_month: date, last_month: date) -> int:
+        """Create missing monthly partitions for months in the range and earlier months having rows in the default
+        partition, returns number of created, see `ensure_form_history_partitions()`."""
+        result = await self.session.execute(select(func.ensure_form_history_partitions(first_month, last_month)))
+        return result.scalar() or 0
+
+    @timed
+    async def archive_partitions(self, before: date, tablespace: str | None = None) -> list[str]:
+        """Detach partitions of months ending before the date, returns names of archived tables."""
+        result = await self.session.execute(select(func.archive_form_history_partitions(before, tablespace)))
+        return list(result.scalars().all())
+
+    @timed
     async def get_unique_first_names(self) -> list[str]:
         """Get all unique first names."""
-        query = select(FormHistory.first_name).distinct()
+        query = select(Person.first_name).where(Person.id.in_(_present_person_ids())).distinct()
         result = await self.session.execute(query)
         return [name for name in result.scalars().all() if name]
 
+    @timed
     async def get_unique_last_names(self) -> list[str]:
         """Get all unique last names."""
-        query = select(FormHistory.last_name).distinct()
+        query = select(Person.last_name).where(Person.id.in_(_present_person_ids())).distinct()
         result = await self.session.execute(query)
         return [name for name in result.scalars().all() if name]
 
+    @timed
+    async def get_person_id(self, first_name: str, last_name: str) -> int | None:
+        """Id of the person with the names, if any entry has ever had them."""
+        query = select(Person.id).where(Person.first_name == first_name, Person.last_name == last_name)
+        result = await self.session.execute(query)
+        return result.scalar()
+
+    @timed
     async def get_filtered_history_with_counts(
         self,
         date_filter: date,
@@ -114,17 +268,13 @@ class FormHistoryDAL(BaseDAL):
         Returns list of tuples: (FormHistory record, count of previous entries).
         This eliminates N+1 query problem by using a subquery.
         """
-        # Create alias for the subquery
-        fh2 = aliased(FormHistory)
-
-        # Subquery to count previous entries for each record
+        # Subquery to count previous entries for each record: sum of the person's counts per earlier date
         count_subquery = (
-            select(func.count(fh2.id))
+            select(func.sum(FormHistoryPersonDateCount.count))
             .where(
                 and_(
-                    fh2.first_name == FormHistory.first_name,
-                    fh2.last_name == FormHistory.last_name,
-                    fh2.date < FormHistory.date,
+                    FormHistoryPersonDateCount.person_id == FormHistory.person_id,
+                    FormHistoryPersonDateCount.date < FormHistory.date,
                 )
             )
             .scalar_subquery()
@@ -133,18 +283,74 @@ class FormHistoryDAL(BaseDAL):
         # Main query with count subquery
         query = select(FormHistory, count_subquery.label("count")).where(FormHistory.date <= date_filter)
 
-        if first_name:
-            query = query.where(FormHistory.first_name == first_name)
-        if last_name:
-            query = query.where(FormHistory.last_name == last_name)
+        if first_name or last_name:
+            query = query.where(FormHistory.person_id.in_(_person_ids(first_name, last_name)))
 
-        query = query.order_by(
-            FormHistory.date.desc(),
-            FormHistory.first_name.asc(),
-            FormHistory.last_name.asc(),
-        ).limit(limit)
+        query = query.order_by(*self._history_order).limit(limit)
 
         result = await self.session.execute(query)
 
         # list of tuples: (FormHistory, count)
-        return [(row[0], row[1] or 0) for row in result.all()]
+        return _repeat_occurrences([(row[0], (row[0], row[1] or 0)) for row in result.all()], limit)
+
+    @timed
+    async def get_entries_updated_since(
+        self,
+        since: datetime | None,
+        after: tuple[datetime, UUID] | None = None,
+        limit: int = 10000,
+    ) -> list[FormHistoryEntry]:
+        """Get entries updated at `since` or later ordered by (updated_at, id), for pages: after the given pair."""
+        query = select(
+            FormHistory.id,
+            FormHistory.date,
+            FormHistory.first_name,
+            FormHistory.last_name,
+            FormHistory.created_at,
+            FormHistory.occurrences,
+            FormHistory.updated_at,
+        )
+        if since is not None:
+            query = query.where(FormHistory.updated_at >= since)
+        if after is not None:
+            query = query.where(
+                tuple_(FormHistory.updated_at, FormHistory.id) > tuple_(literal(after[0]), literal(after[1]))
+            )
+        query = query.order_by(FormHistory.updated_at, FormHistory.id).limit(limit)
+
+        result = await self.session.execute(query)
+        return [FormHistoryEntry(*row) for row in result.all()]
+
+
+def _repeat_occurrences(rows: list[tuple[FormHistory, _T]], limit: int) -> list[_T]:
+    """Values of rows, each repeated by occurrences of its record as if every submission were a row, up to `limit`."""
+    return list(islice(chain.from_iterable(repeat(value, record.occurrences) for record, value in rows), limit))
+
+
+@cache
+def _get_history_order(names_collation: str) -> tuple[Any, ...]:
+    """Order of history entries with names compared in the collation."""
+    return (
+        FormHistory.date.desc(),
+        FormHistory.first_name.collate(names_collation).asc(),
+        FormHistory.last_name.collate(names_collation).asc(),
+    )
+
+
+def _person_ids(first_name: str | None, last_name: str | None) -> Select[tuple[int]]:
+    """Ids of persons with the names, empty names don't filter."""
+    query = select(Person.id)
+    if first_name:
+        query = query.where(Person.first_name == first_name)
+    if last_name:
+        query = query.where(Person.last_name == last_name)
+    return query
+
+
+def _present_person_ids() -> Select[tuple[int]]:
+    """Ids of persons having entries, persons are kept after their entries are deleted or archived."""
+    return select(FormHistoryPersonDateCount.person_id).where(FormHistoryPersonDateCount.count > 0)
+
+
+# Opens DAL with its own session, so use cases can run queries outside of request's session
+FormHistoryDALFactory = Callable[[], AbstractAsyncContextManager[FormHistoryDAL]]
@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import random
+from typing import Any
+from typing import Callable
+
+import asyncpg
+
+from project.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Called with payload of every notification, or with None when notifications might have been missed (listener has
+# (re)connected) and consumer has to drop everything it derived from the database
+NotificationConsumer = Callable[[str | None], None]
+
+pg_notifications = registry.counter(
+    "pg_notifications_total", "Notifications received by LISTEN connections.", labelnames=("listener", "channel")
+)
+pg_listener_connects = registry.counter(
+    "pg_listener_connects_total", "Connections opened by LISTEN connections, >1 means reconnects.", ("listener",)
+)
+pg_listener_connected = registry.gauge("pg_listener_connected", "LISTEN connection is up.", labelnames=("listener",))
+
+
+def asyncpg_dsn(database_url: str) -> str:
+    """Convert SQLAlchemy URL to DSN accepted by asyncpg."""
+    return database_url.replace("+asyncpg", "")
+
+
+class PostgresListener:
+    """Dedicated connection (outside of the engine's pool) that LISTENs to channels and dispatches notifications.
+
+    The connection is checked every `keepalive` seconds. When it's lost, the listener reconnects with exponential
+    backoff from `reconnect_min` to `reconnect_max` seconds, and after every (re)connect consumers are called with
+    None, because notifications sent while it was down are lost. Consumers are called in the event loop and must not
+    block.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        dsn: str,
+        reconnect_min: float = 0.5,
+        reconnect_max: float = 30.0,
+        keepalive: float = 30.0,
+    ):
+        self.name = name
+        self._dsn = dsn
+        self._reconnect_min = reconnect_min
+        self._reconnect_max = reconnect_max
+        self._keepalive = keepalive
+        self._consumers: dict[str, list[NotificationConsumer]] = {}
+        self._task: asyncio.Task[None] | None = None
+        self._connection: asyncpg.Connection | None = None
+        self._established = False
+        pg_listener_connected.set_function(lambda: int(self.connected), listener=name)
+
+    @property
+    def connected(self) -> bool:
+        return self._connection is not None and not self._connection.is_closed()
+
+    def subscribe(self, channel: str, consumer: NotificationConsumer) -> None:
+        """Register consumer, must be called before `start()`."""
+        self._consumers.setdefault(channel, []).append(consumer)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name=f"{self.name}_listener")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        delay = self._reconnect_min
+        while True:
+            self._established = False
+            try:
+                await self._listen()
+                logger.warning("LISTEN connection %s lost", self.name)
+            except (OSError, asyncio.TimeoutError, asyncpg.PostgresError, asyncpg.InterfaceError) as e:
+                logger.warning("LISTEN connection %s failed: %r", self.name, e)
+            if self._established:
+                delay = self._reconnect_min
+            # Jitter, so workers don't reconnect all at once after database restart
+            await asyncio.sleep(delay * random.uniform(0.5, 1.0))  # noqa: S311
+            delay = min(delay * 2, self._reconnect_max)
+
+    async def _listen(self) -> None:
+        connection = await asyncio.wait_for(asyncpg.connect(self._dsn), self._keepalive)
+        lost = asyncio.Event()
+        connection.add_termination_listener(lambda _: lost.set())
+        try:
+            for channel in self._consumers:
+                await connection.add_listener(channel, self._on_notification)
+            self._connection = connection
+            self._established = True
+            pg_listener_connects.inc(listener=self.name)
+            self._dispatch_all(None)
+
+            while not lost.is_set():
+                try:
+                    await asyncio.wait_for(lost.wait(), self._keepalive)
+                except asyncio.TimeoutError:
+                    # Notifications don't tell a silently dropped connection from a quiet channel
+                    await asyncio.wait_for(connection.fetchval("SELECT 1"), self._keepalive)
+        finally:
+            self._connection = None
+            connection.terminate()
+
+    def _on_notification(self, connection: Any, pid: int, channel: str, payload: str) -> None:
+        pg_notifications.inc(listener=self.name, channel=channel)
+        self._dispatch(channel, payload)
+
+    def _dispatch_all(self, payload: str | None) -> None:
+        for channel in self._consumers:
+            self._dispatch(channel, payload)
+
+    def _dispatch(self, channel: str, payload: str | None) -> None:
+        for consumer in self._consumers.get(channel, []):
+            try:
+                consumer(payload)
+            except Exception:
+                logger.exception("Consumer of %s notification failed, payload: %r", channel, payload)
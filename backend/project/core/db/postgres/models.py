@@ -2,16 +2,48 @@ from datetime import date
 from datetime import datetime
 from typing import Any
 from uuid import UUID
-from uuid import uuid4
 
+from sqlalchemy import DDL
+from sqlalchemy import Boolean
 from sqlalchemy import Date
 from sqlalchemy import DateTime
+from sqlalchemy import FetchedValue
+from sqlalchemy import ForeignKey
+from sqlalchemy import Index
+from sqlalchemy import Integer
 from sqlalchemy import String
+from sqlalchemy import UniqueConstraint
+from sqlalchemy import event
 from sqlalchemy import orm
+from sqlalchemy import text
+from sqlalchemy import true
 from sqlalchemy.orm import declarative_base
 
+from project.core.db.ids import uuid7
+
 Base: Any = declarative_base()
 
+# UUIDv7 for rows inserted without an id by SQL (Postgres has no built-in generator before 18): milliseconds of the
+# clock replace the first 48 bits of a random UUID and the version is changed from 4 to 7
+_uuid_generate_v7 = DDL(
+    """
+    CREATE OR REPLACE FUNCTION uuid_generate_v7() RETURNS uuid AS $$
+        SELECT encode(set_bit(set_bit(overlay(uuid_send(gen_random_uuid()) PLACING
+            substring(int8send(floor(extract(epoch FROM clock_timestamp()) * 1000)::bigint) FROM 3) FROM 1 FOR 6),
+            52, 1), 53, 1), 'hex')::uuid
+    $$ LANGUAGE sql VOLATILE
+    """
+)
+event.listen(Base.metadata, "before_create", _uuid_generate_v7)
+
+
+class UUIDPrimaryKeyMixin:
+    """Time-ordered UUID primary key, new rows are appended to the right edge of the index (see `uuid7()`)."""
+
+    id: orm.Mapped[UUID] = orm.mapped_column(
+        primary_key=True, default=uuid7, server_default=text("uuid_generate_v7()"), sort_order=-1
+    )
+
 
 class TimestampMixin:
     created_at: orm.Mapped[datetime] = orm.mapped_column(DateTime(timezone=True), default=datetime.utcnow)
@@ -20,10 +52,326 @@ class TimestampMixin:
     )
 
 
-class FormHistory(TimestampMixin, Base):
+class Person(Base):
+    """Distinct pair of names, form_history rows refer to it by a compact integer id. Persons are never deleted."""
+
+    __tablename__ = "person"
+    __table_args__ = (
+        UniqueConstraint("first_name", "last_name", name="uq_person_first_name_last_name"),
+        Index("ix_person_last_name", "last_name"),
+    )
+
+    id: orm.Mapped[int] = orm.mapped_column(Integer, primary_key=True, autoincrement=True)
+    first_name: orm.Mapped[str] = orm.mapped_column(String(length=255))
+    last_name: orm.Mapped[str] = orm.mapped_column(String(length=255))
+
+
+class FormHistory(UUIDPrimaryKeyMixin, TimestampMixin, Base):
+    """Form submissions, partitioned by months of `date` (see `ensure_form_history_partitions()`).
+
+    Primary key of a partitioned table has to include the partition key, so it's (id, date). Names are filtered by
+    `person_id`, which is set by a trigger from the names when it's not given (see `set_form_history_person_id()`).
+
+    With folding (`FormHistoryDAL(fold_repeats=True)`), repeated submissions of the same date and names are stored as
+    one row, `occurrences` is the number of them. Every query weights rows by it, so results are the same as with a row
+    per submission, and folded rows and rows of single submissions can be mixed.
+    """
+
     __tablename__ = "form_history"
+    __table_args__ = (
+        # Incremental sync of the in-memory replica reads rows by updated_at
+        Index("ix_form_history_updated_at", "updated_at"),
+        # Person and date identify a folded row, repeats are added to it by INSERT ... ON CONFLICT. Rows which aren't
+        # folded have NULL `folded` and never conflict.
+        Index("uq_form_history_person_id_date_folded", "person_id", "date", "folded", unique=True),
+        {"postgresql_partition_by": "RANGE (date)"},
+    )
 
-    id: orm.Mapped[UUID] = orm.mapped_column(primary_key=True, default=uuid4)
-    date: orm.Mapped[date] = orm.mapped_column(Date, nullable=False)
+    date: orm.Mapped[date] = orm.mapped_column(Date, primary_key=True)
     first_name: orm.Mapped[str] = orm.mapped_column(String(length=255))
     last_name: orm.Mapped[str] = orm.mapped_column(String(length=255))
+    person_id: orm.Mapped[int] = orm.mapped_column(ForeignKey("person.id"), server_default=FetchedValue())
+    occurrences: orm.Mapped[int] = orm.mapped_column(Integer, default=1, server_default="1")
+    # True or NULL, never false
+    folded: orm.Mapped[bool | None] = orm.mapped_column(Boolean, default=True, server_default=true())
+
+
+class FormHistoryDateCount(Base):
+    """Number of submissions per date, totals filtered only by date are sums over at most one row per day."""
+
+    __tablename__ = "form_history_date_counts"
+
+    date: orm.Mapped[date] = orm.mapped_column(Date, primary_key=True)
+    count: orm.Mapped[int] = orm.mapped_column(Integer, nullable=False)
+
+
+class FormHistoryPersonDateCount(Base):
+    """Number of submissions per person and date, for totals and counts of previous entries of a name."""
+
+    __tablename__ = "form_history_person_date_counts"
+
+    person_id: orm.Mapped[int] = orm.mapped_column(Integer, primary_key=True)
+    date: orm.Mapped[date] = orm.mapped_column(Date, primary_key=True)
+    count: orm.Mapped[int] = orm.mapped_column(Integer, nullable=False)
+
+
+class FormHistorySpoolApplied(Base):
+    """Ids of spooled submissions added to form_history, in the same transaction as the submissions.
+
+    A spool segment replayed after an interrupted drain skips submissions found here. Ids are deleted once their
+    segment is removed from the spool, so the table holds only ids of segments being drained.
+    """
+
+    __tablename__ = "form_history_spool_applied"
+
+    id: orm.Mapped[UUID] = orm.mapped_column(primary_key=True)
+    created_at: orm.Mapped[datetime] = orm.mapped_column(DateTime(timezone=True), server_default=text("now()"))
+
+
+# Every committed change of form_history is announced on this channel (NOTIFY is delivered only on commit), payload is
+# JSON with op (INSERT/UPDATE/DELETE), id, date, first_name, last_name, created_at and occurrences of the row. UPDATE
+# sends both old and new rows. A repeated submission folded into a row is sent as INSERT of the row with its increased
+# occurrences and updated_at (the time of the repeat).
+# Empty payload means that many rows are gone at once (partitions archived).
+FORM_HISTORY_CHANNEL = "form_history_changes"
+
+_notify_form_history_change = DDL(
+    f"""
+    CREATE OR REPLACE FUNCTION notify_form_history_change() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'UPDATE' AND (OLD.date, OLD.first_name, OLD.last_name)
+                IS NOT DISTINCT FROM (NEW.date, NEW.first_name, NEW.last_name) THEN
+            IF NEW.occurrences > OLD.occurrences THEN
+                PERFORM pg_notify('{FORM_HISTORY_CHANNEL}', json_build_object(
+                    'op', 'INSERT', 'id', NEW.id, 'date', NEW.date, 'first_name', NEW.first_name,
+                    'last_name', NEW.last_name, 'created_at', NEW.created_at, 'occurrences', NEW.occurrences,
+                    'updated_at', NEW.updated_at
+                )::text);
+            END IF;
+            RETURN NULL;
+        END IF;
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            PERFORM pg_notify('{FORM_HISTORY_CHANNEL}', json_build_object(
+                'op', TG_OP, 'id', OLD.id, 'date', OLD.date, 'first_name', OLD.first_name,
+                'last_name', OLD.last_name, 'created_at', OLD.created_at, 'occurrences', OLD.occurrences
+            )::text);
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            PERFORM pg_notify('{FORM_HISTORY_CHANNEL}', json_build_object(
+                'op', TG_OP, 'id', NEW.id, 'date', NEW.date, 'first_name', NEW.first_name,
+                'last_name', NEW.last_name, 'created_at', NEW.created_at, 'occurrences', NEW.occurrences
+            )::text);
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """
+)
+_form_history_notify_trigger = DDL(
+    "CREATE TRIGGER form_history_notify AFTER INSERT OR UPDATE OR DELETE ON form_history "
+    "FOR EACH ROW EXECUTE FUNCTION notify_form_history_change()"
+)
+# Migrations create the same trigger, this keeps `metadata.create_all()` (used by tests) in sync with them
+event.listen(FormHistory.__table__, "after_create", _notify_form_history_change)
+event.listen(FormHistory.__table__, "after_create", _form_history_notify_trigger)
+
+# Counts are changed by the same transaction as form_history, so they are always consistent with it. Concurrent
+# transactions adding rows of the same date wait for each other on its count row until commit. Rows count as many
+# submissions as their occurrences.
+_count_form_history_change = DDL(
+    """
+    CREATE OR REPLACE FUNCTION count_form_history_change() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'UPDATE' AND (OLD.date, OLD.person_id) IS NOT DISTINCT FROM (NEW.date, NEW.person_id) THEN
+            -- Repeated submission, the count rows exist since the row does
+            IF NEW.occurrences <> OLD.occurrences THEN
+                UPDATE form_history_date_counts SET count = count + NEW.occurrences - OLD.occurrences
+                WHERE date = NEW.date;
+                UPDATE form_history_person_date_counts SET count = count + NEW.occurrences - OLD.occurrences
+                WHERE person_id = NEW.person_id AND date = NEW.date;
+            END IF;
+            RETURN NULL;
+        END IF;
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            UPDATE form_history_date_counts SET count = count - OLD.occurrences WHERE date = OLD.date;
+            UPDATE form_history_person_date_counts SET count = count - OLD.occurrences
+            WHERE person_id = OLD.person_id AND date = OLD.date;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO form_history_date_counts AS c (date, count) VALUES (NEW.date, NEW.occurrences)
+            ON CONFLICT (date) DO UPDATE SET count = c.count + EXCLUDED.count;
+            INSERT INTO form_history_person_date_counts AS c (person_id, date, count)
+            VALUES (NEW.person_id, NEW.date, NEW.occurrences)
+            ON CONFLICT (person_id, date) DO UPDATE SET count = c.count + EXCLUDED.count;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """
+)
+_form_history_count_trigger = DDL(
+    "CREATE TRIGGER form_history_count AFTER INSERT OR UPDATE OR DELETE ON form_history "
+    "FOR EACH ROW EXECUTE FUNCTION count_form_history_change()"
+)
+# Recomputes counts from scratch (after bulk loads with disabled triggers, or to drop rows of zero counts). Writes to
+# form_history wait until it's done, reads don't.
+_rebuild_form_history_counts = DDL(
+    """
+    CREATE OR REPLACE FUNCTION rebuild_form_history_counts() RETURNS void AS $$
+    BEGIN
+        LOCK TABLE form_history IN SHARE MODE;
+        DELETE FROM form_history_date_counts;
+        DELETE FROM form_history_person_date_counts;
+        INSERT INTO form_history_date_counts (date, count)
+        SELECT date, sum(occurrences) FROM form_history GROUP BY date;
+        INSERT INTO form_history_person_date_counts (person_id, date, count)
+        SELECT person_id, date, sum(occurrences) FROM form_history GROUP BY person_id, date;
+    END;
+    $$ LANGUAGE plpgsql
+    """
+)
+event.listen(FormHistory.__table__, "after_create", _count_form_history_change)
+event.listen(FormHistory.__table__, "after_create", _form_history_count_trigger)
+event.listen(FormHistory.__table__, "after_create", _rebuild_form_history_counts)
+
+# Person of a row is found (or created) by its names, unless the row already has the right one: inserts by
+# `SubmitForm` pass cached ids, and the id is kept on updates which don't change names.
+_set_form_history_person_id = DDL(
+    """
+    CREATE OR REPLACE FUNCTION set_form_history_person_id() RETURNS trigger AS $$
+    BEGIN
+        IF NEW.person_id IS NULL OR (
+            TG_OP = 'UPDATE' AND NEW.person_id = OLD.person_id
+            AND (NEW.first_name, NEW.last_name) IS DISTINCT FROM (OLD.first_name, OLD.last_name)
+        ) THEN
+            -- A concurrent transaction creating the same person is waited for, then its row is found
+            INSERT INTO person (first_name, last_name) VALUES (NEW.first_name, NEW.last_name) ON CONFLICT DO NOTHING;
+            SELECT id INTO NEW.person_id FROM person WHERE first_name = NEW.first_name AND last_name = NEW.last_name;
+        END IF;
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+    """
+)
+_form_history_person_id_trigger = DDL(
+    "CREATE TRIGGER form_history_person_id BEFORE INSERT OR UPDATE ON form_history "
+    "FOR EACH ROW EXECUTE FUNCTION set_form_history_person_id()"
+)
+event.listen(FormHistory.__table__, "after_create", _set_form_history_person_id)
+event.listen(FormHistory.__table__, "after_create", _form_history_person_id_trigger)
+
+# Rows go to monthly partitions form_history_yYYYYmMM, dates without a partition (far past or future) go to the
+# default one. Partitions are created ahead of time by `ensure_form_history_partitions()`, which also creates the
+# partitions of earlier months having rows in the default partition and moves the rows there.
+FORM_HISTORY_PARTITION_FORMAT = "form_history_y%Ym%m"
+
+# DDL statements are %-formatted, so format() placeholders of PL/pgSQL are escaped
+_form_history_default_partition = DDL("CREATE TABLE form_history_default PARTITION OF form_history DEFAULT")
+# Partitions of months in the range, and of months up to the end of it having rows in the default partition (dates
+# submitted out of the range), are created. Rows are moved out of the default partition while it's detached, which
+# takes its triggers away, so counts stay and nothing is notified, but queries to form_history wait until commit. Rows
+# of months already archived stay in the default partition and are reported by a warning.
+_ensure_form_history_partitions = DDL(
+    """
+    CREATE OR REPLACE FUNCTION ensure_form_history_partitions(first_month date, last_month date) RETURNS integer AS $$
+    DECLARE
+        month date;
+        next_month date;
+        partition_name text;
+        columns text;
+        detached boolean := false;
+        created integer := 0;
+    BEGIN
+        -- Workers maintain partitions concurrently
+        PERFORM pg_advisory_xact_lock(hashtext('form_history_partitions'));
+        SELECT string_agg(quote_ident(attname), ', ' ORDER BY attnum) INTO columns FROM pg_attribute
+        WHERE attrelid = 'form_history'::regclass AND attnum > 0 AND NOT attisdropped;
+        FOR month IN
+            SELECT generate_series(
+                date_trunc('month', first_month), date_trunc('month', last_month), interval '1 month'
+            )::date
+            UNION
+            SELECT DISTINCT date_trunc('month', date)::date FROM form_history_default
+            WHERE date < date_trunc('month', last_month) + interval '1 month'
+            ORDER BY 1
+        LOOP
+            next_month := (month + interval '1 month')::date;
+            partition_name := 'form_history_' || to_char(month, '"y"YYYY"m"MM');
+            CONTINUE WHEN to_regclass(partition_name) IS NOT NULL;
+            IF to_regclass('form_history_archive_' || substr(partition_name, 14)) IS NOT NULL THEN
+                IF EXISTS (SELECT FROM form_history_default WHERE date >= month AND date < next_month) THEN
+                    RAISE WARNING 'form_history_default has rows of archived month %%', month;
+                END IF;
+                CONTINUE;
+            END IF;
+            -- Unlike CREATE TABLE ... PARTITION OF, ATTACH doesn't block queries to form_history
+            EXECUTE format('CREATE TABLE %%I (LIKE form_history INCLUDING DEFAULTS)', partition_name);
+            IF EXISTS (SELECT FROM form_history_default WHERE date >= month AND date < next_month) THEN
+                IF NOT detached THEN
+                    ALTER TABLE form_history DETACH PARTITION form_history_default;
+                    detached := true;
+                END IF;
+                EXECUTE format(
+                    'INSERT INTO %%I (%%s) SELECT %%s FROM form_history_default WHERE date >= %%L AND date < %%L',
+                    partition_name, columns, columns, month, next_month
+                );
+                DELETE FROM form_history_default WHERE date >= month AND date < next_month;
+            END IF;
+            EXECUTE format(
+                'ALTER TABLE form_history ATTACH PARTITION %%I FOR VALUES FROM (%%L) TO (%%L)',
+                partition_name, month, next_month
+            );
+            created := created + 1;
+        END LOOP;
+        IF detached THEN
+            ALTER TABLE form_history ATTACH PARTITION form_history_default DEFAULT;
+        END IF;
+        RETURN created;
+    END;
+    $$ LANGUAGE plpgsql
+    """
+)
+# Detaches monthly partitions which end before the date and renames them to form_history_archive_yYYYYmMM, optionally
+# moving them to another tablespace. Archived tables keep the rows for export, they are dropped manually.
+_archive_form_history_partitions = DDL(
+    f"""
+    CREATE OR REPLACE FUNCTION archive_form_history_partitions(before date, archive_tablespace text DEFAULT NULL)
+    RETURNS SETOF text AS $$
+    DECLARE
+        partition_name text;
+        month date;
+        archive_name text;
+        archived integer := 0;
+    BEGIN
+        PERFORM pg_advisory_xact_lock(hashtext('form_history_partitions'));
+        FOR partition_name IN
+            SELECT child.relname FROM pg_inherits
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = 'form_history'::regclass
+                AND child.relname ~ '^form_history_y[0-9]{{4}}m[0-9]{{2}}$'
+            ORDER BY child.relname
+        LOOP
+            month := to_date(substr(partition_name, 14), '"y"YYYY"m"MM');
+            CONTINUE WHEN (month + interval '1 month')::date > before;
+            archive_name := 'form_history_archive_' || substr(partition_name, 14);
+            EXECUTE format('ALTER TABLE form_history DETACH PARTITION %%I', partition_name);
+            EXECUTE format('ALTER TABLE %%I RENAME TO %%I', partition_name, archive_name);
+            IF archive_tablespace IS NOT NULL THEN
+                EXECUTE format('ALTER TABLE %%I SET TABLESPACE %%I', archive_name, archive_tablespace);
+            END IF;
+            -- Rows of the month are gone from form_history, the default partition can't have any
+            DELETE FROM form_history_date_counts WHERE date >= month AND date < month + interval '1 month';
+            DELETE FROM form_history_person_date_counts WHERE date >= month AND date < month + interval '1 month';
+            archived := archived + 1;
+            RETURN NEXT archive_name;
+        END LOOP;
+        IF archived > 0 THEN
+            PERFORM pg_notify('{FORM_HISTORY_CHANNEL}', '');
+        END IF;
+    END;
+    $$ LANGUAGE plpgsql
+    """
+)
+event.listen(FormHistory.__table__, "after_create", _form_history_default_partition)
+event.listen(FormHistory.__table__, "after_create", _ensure_form_history_partitions)
+event.listen(FormHistory.__table__, "after_create", _archive_form_history_partitions)
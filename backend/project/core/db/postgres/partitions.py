@@ -0,0 +1,84 @@
+import asyncio
+import logging
+from datetime import date
+from typing import Callable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from project.core.db.postgres.form_history import FormHistoryDAL
+from project.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+partitions_maintained = registry.counter(
+    "form_history_partitions_total", "Monthly partitions of form_history created or archived.", ("action",)
+)
+
+
+class FormHistoryPartitions:
+    """Keeps monthly partitions of form_history ready `ahead` months ahead of today and archives the old ones.
+
+    With `retention`, partitions of months which ended more than `retention` months ago are detached from the table
+    (and moved to `archive_tablespace` if set). Maintenance of several workers is serialized by Postgres.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        ahead: int,
+        retention: int | None = None,
+        archive_tablespace: str | None = None,
+        today: Callable[[], date] = date.today,
+    ):
+        self._session_factory = session_factory
+        self._ahead = ahead
+        self._retention = retention
+        self._archive_tablespace = archive_tablespace
+        self._today = today
+        self._task: asyncio.Task[None] | None = None
+
+    async def maintain(self) -> tuple[int, list[str]]:
+        """Create missing partitions and archive expired ones, returns number of created and names of archived."""
+        month = self._today().replace(day=1)
+        async with self._session_factory() as session, session.begin():
+            form_history_dal = FormHistoryDAL(session)
+            created = await form_history_dal.ensure_partitions(month, add_months(month, self._ahead))
+            archived = []
+            if self._retention is not None:
+                archived = await form_history_dal.archive_partitions(
+                    add_months(month, -self._retention), self._archive_tablespace
+                )
+        partitions_maintained.inc(created, action="created")
+        partitions_maintained.inc(len(archived), action="archived")
+        if created or archived:
+            logger.info("Created %s partitions of form_history, archived %s", created, archived)
+        return created, archived
+
+    def start(self, interval: float) -> None:
+        """Maintain now and then every `interval` seconds in the background."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(interval), name="form_history_partitions")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self, interval: float) -> None:
+        while True:
+            try:
+                await self.maintain()
+            except Exception:
+                logger.exception("Maintenance of form_history partitions failed")
+            await asyncio.sleep(interval)
+
+
+def add_months(month: date, months: int) -> date:
+    """First day of the month `months` after the month of the date."""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
@@ -0,0 +1,220 @@
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any
+from typing import Awaitable
+from typing import Callable
+from typing import NamedTuple
+from uuid import UUID
+
+from project.core.db.ids import uuid7
+from project.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+spooled_records = registry.counter(
+    "spool_records_total", "Records appended to and drained from spools.", ("spool", "action")
+)
+spool_bytes = registry.gauge("spool_bytes", "Size of segments in the spool directory, as last seen.", ("spool",))
+
+_SUFFIX = ".spool"
+_CREATING_SUFFIX = ".creating"
+
+
+class SpoolFull(Exception):
+    """Spool directory holds `max_bytes` already."""
+
+
+class SpooledRecord(NamedTuple):
+    id: UUID
+    data: dict[str, Any]
+
+
+class Spool:
+    """Durable append-only spool of JSON records, for writes accepted while their database is unavailable.
+
+    Records are appended to a segment file of the directory and fsync'd before `append()` returns. Every process
+    writes its own segment and holds an exclusive `flock` on it, segments of other processes are drained only once
+    they are sealed (or their process is gone). A drained segment is deleted, so records are applied at least once:
+    `apply` must skip records it has applied before by their ids, which it can forget once the segment is deleted.
+    """
+
+    def __init__(self, name: str, directory: str, max_bytes: int):
+        self.name = name
+        self._directory = directory
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._fd: int | None = None
+        self._size = 0
+        self._task: asyncio.Task[None] | None = None
+        os.makedirs(directory, exist_ok=True)
+        self._update_size()
+        spool_bytes.set_function(lambda: self._size, spool=name)
+
+    async def append(self, data: dict[str, Any]) -> UUID:
+        """Write a record durably, returns its id. Raises `SpoolFull` when the directory holds `max_bytes`."""
+        record_id = uuid7()
+        line = json.dumps({"id": str(record_id), "data": data}, separators=(",", ":"), default=str) + "\n"
+        await asyncio.to_thread(self._append, line.encode())
+        spooled_records.inc(spool=self.name, action="appended")
+        return record_id
+
+    async def drain(
+        self,
+        apply: Callable[[list[SpooledRecord]], Awaitable[None]],
+        forget: Callable[[list[UUID]], Awaitable[None]],
+        batch_size: int,
+    ) -> int:
+        """Apply records of all segments no one else writes or drains in batches, returns number of records drained.
+
+        Segments are deleted once all their records are applied, then `forget` gets their ids. The segment of this
+        process is sealed first, the next record starts a new one.
+        """
+        with self._lock:
+            self._seal()
+        drained = 0
+        for path in sorted(self._segments()):
+            fd = await asyncio.to_thread(_claim, path)
+            if fd is None:
+                continue
+            try:
+                records = await asyncio.to_thread(_read, fd, path)
+                for start in range(0, len(records), batch_size):
+                    await apply(records[start : start + batch_size])
+                os.unlink(path)
+            finally:
+                os.close(fd)
+            drained += len(records)
+            spooled_records.inc(len(records), spool=self.name, action="drained")
+            if records:
+                await forget([record.id for record in records])
+        self._update_size()
+        return drained
+
+    def pending(self) -> bool:
+        """Whether there are segments to drain, as last seen by this process."""
+        return self._size > 0
+
+    def start(
+        self,
+        apply: Callable[[list[SpooledRecord]], Awaitable[None]],
+        forget: Callable[[list[UUID]], Awaitable[None]],
+        interval: float,
+        batch_size: int,
+    ) -> None:
+        """Drain every `interval` seconds in the background, while there is something to drain."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(apply, forget, interval, batch_size), name=f"spool_{self.name}")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Unlocked segment is drained by another process or after restart
+        with self._lock:
+            self._seal()
+
+    async def _run(
+        self,
+        apply: Callable[[list[SpooledRecord]], Awaitable[None]],
+        forget: Callable[[list[UUID]], Awaitable[None]],
+        interval: float,
+        batch_size: int,
+    ) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            if not self.pending():
+                # Segments left by other processes show up in the size, which is cheap to refresh
+                await asyncio.to_thread(self._update_size)
+                continue
+            try:
+                drained = await self.drain(apply, forget, batch_size)
+            except Exception as error:
+                logger.warning("Draining spool %s failed, retrying in %ss: %r", self.name, interval, error)
+                continue
+            if drained:
+                logger.info("Drained %s records of spool %s", drained, self.name)
+
+    def _append(self, line: bytes) -> None:
+        with self._lock:
+            if self._size + len(line) > self._max_bytes:
+                raise SpoolFull(f"Spool {self.name} holds {self._size} bytes")
+            fd = self._fd if self._fd is not None else self._open_segment()
+            os.write(fd, line)
+            os.fsync(fd)
+            self._size += len(line)
+
+    def _open_segment(self) -> int:
+        name = f"{time.time_ns()}-{os.getpid()}"
+        # Created under a name drainers don't look at and renamed only once locked: a drainer which could claim an
+        # unlocked new segment would delete it as empty while records are being written to it. A crash before the
+        # rename leaves an empty file which is never drained.
+        creating = os.path.join(self._directory, f"{name}{_CREATING_SUFFIX}")
+        fd = os.open(creating, os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_APPEND, 0o600)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        os.rename(creating, os.path.join(self._directory, f"{name}{_SUFFIX}"))
+        # The file itself must survive a crash too, not only its data
+        dir_fd = os.open(self._directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+        self._fd = fd
+        return fd
+
+    def _seal(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _segments(self) -> list[str]:
+        return [os.path.join(self._directory, n) for n in os.listdir(self._directory) if n.endswith(_SUFFIX)]
+
+    def _update_size(self) -> None:
+        size = 0
+        for path in self._segments():
+            try:
+                size += os.stat(path).st_size
+            except FileNotFoundError:
+                pass
+        self._size = size
+
+
+def _claim(path: str) -> int | None:
+    """Open and lock a segment no other process writes or drains, None if it's busy or already drained."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except FileNotFoundError:
+        return None
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        return None
+    if os.fstat(fd).st_nlink == 0:
+        # Deleted by a drainer which held the lock while this process was opening it
+        os.close(fd)
+        return None
+    return fd
+
+
+def _read(fd: int, path: str) -> list[SpooledRecord]:
+    with os.fdopen(os.dup(fd), "rb") as file:
+        lines = file.read().splitlines()
+    records = []
+    for number, line in enumerate(lines, 1):
+        try:
+            record = json.loads(line)
+            records.append(SpooledRecord(UUID(record["id"]), record["data"]))
+        except (ValueError, KeyError, TypeError):
+            # A crash while appending leaves a torn last line, its record was never acknowledged
+            logger.warning("Skipped broken line %s of spool segment %s", number, path)
+    return records
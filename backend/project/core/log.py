@@ -1,21 +1,176 @@
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+import time
+from datetime import datetime
+from datetime import timezone
 from logging import Filter
+from logging import Formatter
 from logging import LogRecord
 from logging import getLogger
+from logging.handlers import QueueHandler
+from logging.handlers import QueueListener
 from typing import Any
 
+from starlette.types import ASGIApp
+from starlette.types import Message
+from starlette.types import Receive
+from starlette.types import Scope
+from starlette.types import Send
+
+from project.core.settings import settings
+
+access_logger = getLogger("project.access")
+
+# Attributes every record has (and uvicorn's colored message), anything else is passed by `extra` and goes to JSON
+_RECORD_ATTRIBUTES = frozenset(vars(LogRecord("", 0, "", 0, "", None, None))) | {
+    "message",
+    "asctime",
+    "taskName",
+    "color_message",
+}
+
+_listener: QueueListener | None = None
+
 
 class EndpointFilter(Filter):
+    """Drops uvicorn access records of paths ending with the path.
+
+    The path is taken from arguments of the record (`client - "METHOD path HTTP/version" status`), the message isn't
+    formatted.
+    """
+
     def __init__(self, path: str, *args: Any, **kwargs: Any):
         super().__init__(*args, **kwargs)
         self._path = path
 
     def filter(self, record: LogRecord) -> bool:
+        args = record.args
+        if isinstance(args, tuple) and len(args) == 5 and isinstance(args[2], str):
+            return not args[2].partition("?")[0].endswith(self._path)
         return record.getMessage().find(self._path) == -1
 
 
+class JSONFormatter(Formatter):
+    """Record as a JSON line with its `extra` fields."""
+
+    def format(self, record: LogRecord) -> str:
+        data: dict[str, Any] = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        data.update((k, v) for k, v in vars(record).items() if k not in _RECORD_ATTRIBUTES)
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            data["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(data, default=str, ensure_ascii=False)
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """Queue handler which leaves formatting of records to the listener's thread, unlike `QueueHandler`."""
+
+    def prepare(self, record: LogRecord) -> LogRecord:
+        return record
+
+
+class AccessLogMiddleware:
+    """Logs a sample of HTTP requests with their statuses and durations to `project.access`, in place of uvicorn.
+
+    A request is logged with the greater of the rates of its path (the longest matching prefix, the default rate if
+    none) and its status class (`"2xx"`, `"5xx"`, 0 if not set). Rates are decided by the raw path of the request.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        default_rate: float,
+        path_rates: dict[str, float],
+        status_rates: dict[str, float],
+        exclude_paths: list[str],
+    ):
+        self.app = app
+        self.default_rate = default_rate
+        # Longest prefixes first
+        self.path_rates = sorted(path_rates.items(), key=lambda item: -len(item[0]))
+        self.status_rates = status_rates
+        self.exclude_paths = frozenset(exclude_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            if random.random() < self.rate(scope["path"], status):
+                duration = time.perf_counter() - started
+                client = scope.get("client")
+                access_logger.info(
+                    "%s %s %d",
+                    scope["method"],
+                    scope["path"],
+                    status,
+                    extra={
+                        "method": scope["method"],
+                        "path": scope["path"],
+                        "query": scope["query_string"].decode("latin-1"),
+                        "status": status,
+                        "duration_ms": round(duration * 1000, 3),
+                        "client": client[0] if client else None,
+                    },
+                )
+
+    def rate(self, path: str, status: int) -> float:
+        path_rate = next((rate for prefix, rate in self.path_rates if path.startswith(prefix)), self.default_rate)
+        return max(path_rate, self.status_rates.get(f"{status // 100}xx", 0.0))
+
+
 def setup_logging() -> None:
+    if settings.log_json:
+        _setup_json_logging()
+        return
+
     uvicorn_access_logger_name = "uvicorn.access"
 
     uvicorn_logger = getLogger(uvicorn_access_logger_name)
     uvicorn_logger.addFilter(EndpointFilter(path="/metrics"))
     uvicorn_logger.addFilter(EndpointFilter(path="/health"))
+    uvicorn_logger.addFilter(EndpointFilter(path="/ready"))
+
+
+def _setup_json_logging() -> None:
+    """Log JSON lines to stderr from a thread, records are only put to a queue by the code which logs them."""
+    global _listener
+    if _listener is not None:
+        return
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(JSONFormatter())
+    records: queue.SimpleQueue[LogRecord] = queue.SimpleQueue()
+    _listener = QueueListener(records, handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    root = getLogger()
+    root.handlers = [_DeferredQueueHandler(records)]
+    root.setLevel(settings.log_level.upper())
+    # Uvicorn doesn't configure its loggers with JSON logs (see main.py), they go through the root one
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        logger = getLogger(name)
+        logger.handlers = []
+        logger.propagate = True
@@ -0,0 +1,123 @@
+"""Lag of the event loop, and stacks of code which blocks it.
+
+A blocking call in a coroutine (sync I/O, heavy CPU work) stalls every request of the worker. The lag of the loop (how
+late it runs a callback scheduled for a time) is measured by a task and exported as a histogram. A watchdog thread
+notices the loop not running for the threshold and logs the stack of the loop's thread with the task and the route
+which block it.
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Any
+from weakref import WeakKeyDictionary
+
+from starlette.types import ASGIApp
+from starlette.types import Receive
+from starlette.types import Scope
+from starlette.types import Send
+
+from project.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+loop_lag = registry.histogram(
+    "event_loop_lag_seconds",
+    "How late the event loop runs callbacks.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+loop_blocks = registry.counter("event_loop_blocks_total", "Times the event loop was blocked beyond the threshold.")
+
+
+class EventLoopMonitor:
+    def __init__(self, interval: float, block_threshold: float):
+        self._interval = interval
+        self._block_threshold = block_threshold
+        # Route of every task handling a request, for reports of blocks
+        self.routes: WeakKeyDictionary[asyncio.Task[Any], str] = WeakKeyDictionary()
+        self._task: asyncio.Task[None] | None = None
+        self._watchdog: threading.Thread | None = None
+        self._stopped = threading.Event()
+        self._heartbeat = time.monotonic()
+        # Last measured lag, None until measured
+        self.lag: float | None = None
+
+    def start(self) -> None:
+        """Measure lag of the running loop, and watch it from a thread."""
+        if self._task is not None:
+            return
+        loop = asyncio.get_running_loop()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._run(), name="event_loop_monitor")
+        self._watchdog = threading.Thread(
+            target=self._watch, args=(loop, threading.get_ident()), name="event_loop_watchdog", daemon=True
+        )
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            self._stopped.set()
+            await asyncio.to_thread(self._watchdog.join)
+            self._watchdog = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            scheduled = loop.time() + self._interval
+            await asyncio.sleep(self._interval)
+            self.lag = max(loop.time() - scheduled, 0.0)
+            loop_lag.observe(self.lag)
+            self._heartbeat = time.monotonic()
+
+    def _watch(self, loop: asyncio.AbstractEventLoop, loop_thread: int) -> None:
+        reported = None
+        # A block is noticed at most a quarter of the threshold late
+        while not self._stopped.wait(self._block_threshold / 4):
+            heartbeat = self._heartbeat
+            blocked = time.monotonic() - heartbeat - self._interval
+            if blocked < self._block_threshold or reported == heartbeat:
+                continue
+            # Once per block
+            reported = heartbeat
+            loop_blocks.inc()
+            frame = sys._current_frames().get(loop_thread)
+            if frame is None:
+                continue
+            task = asyncio.current_task(loop)
+            route = self.routes.get(task) if task is not None else None
+            logger.warning(
+                "Event loop is blocked for %.3fs by task %s (%s), stack:\n%s",
+                blocked,
+                task.get_name() if task is not None else None,
+                route or "no request",
+                "".join(traceback.format_stack(frame)),
+            )
+
+
+class EventLoopMonitorMiddleware:
+    """Tells the monitor the route of the task handling a request."""
+
+    def __init__(self, app: ASGIApp, monitor: EventLoopMonitor):
+        self.app = app
+        self.monitor = monitor
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        task = asyncio.current_task()
+        if scope["type"] != "http" or task is None:
+            await self.app(scope, receive, send)
+            return
+        self.monitor.routes[task] = f"{scope['method']} {scope['path']}"
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.monitor.routes.pop(task, None)
@@ -10,69 +10,99 @@ from fastapi import Request
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
-from starlette.responses import Response
 from starlette.types import ASGIApp
 from starlette.types import Receive
 from starlette.types import Scope
 from starlette.types import Send
 
 from project.apps.history.models import SubmitFormErrorResponse
+from project.apps.service.api.v1.profiling import profiler
+from project.core.capture import RequestCapture
+from project.core.capture import RequestCaptureMiddleware
+from project.core.compression import CompressionMiddleware
 from project.core.exceptions import AppException
+from project.core.log import AccessLogMiddleware
+from project.core.loop_monitor import EventLoopMonitor
+from project.core.loop_monitor import EventLoopMonitorMiddleware
+from project.core.profiling import ProfilerMiddleware
 from project.core.settings import settings
+from project.core.timing import ServerTimingMiddleware
+
+
+def _render(content: dict[str, Any]) -> bytes:
+    return JSONResponse(content).body
+
+
+_SERVER_ERROR_BODY = _render({"success": False, "error": {"server_error": ["Internal Server Error"]}})
 
 
 class ExceptionTraceHandlerMiddleware:
-    """Middleware for handling exceptions and converting them to proper error responses."""
+    """Middleware for handling exceptions and converting them to proper error responses.
+
+    Invalid forms are a normal, frequent path: an exception is matched without `except*` unless it is a group, and
+    bodies of application errors are serialized once per distinct error and sent as they are.
+    """
+
+    # Distinct application errors are few (field names and messages are fixed), the limit is for unexpected ones
+    _MAX_CACHED_BODIES = 1024
 
     def __init__(self, app: ASGIApp, logger: logging.Logger):
         self.app = app
         self.logger = logger
         self._project_name = settings.service_name
+        self._bodies: dict[tuple[Any, ...], bytes] = {}
 
     async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         if scope["type"] != "http":
             await self.app(scope, receive, send)
             return
 
-        orig_exc = None
-        error_response_sender = None
-
         try:
             await self.app(scope, receive, send)
-        except* AppException as eg:
-            # Get first exception from the group
-            exc = eg.exceptions[0] if eg.exceptions else Exception("Unknown AppException")
-            # Type narrowing: we know it's AppException from the except* clause
-            app_exc: AppException = (
-                exc
-                if isinstance(exc, AppException)
-                else AppException(
-                    error_key="unknown",
-                    error_message=str(exc),
-                    status_code=HTTPStatus.INTERNAL_SERVER_ERROR,
-                )
-            )
-            error_response_sender = self._wrap_application_logic_error(app_exc)
-            orig_exc = app_exc
-        except* Exception as eg:
-            exc = eg.exceptions[0]
-            error_response_sender = self._wrap_to_500_error(exc)
-            orig_exc = exc  # type: ignore
-
-        if orig_exc:
-            if isinstance(orig_exc, AppException):
-                # AppException is expected, log as info
-                self.logger.info(msg=f"App logic exception: {orig_exc.__class__}: {orig_exc}")
-            else:
-                self.logger.exception(msg=f"Caught unhandled {orig_exc.__class__} exception: {orig_exc}")
-
-        if error_response_sender:
-            await error_response_sender(scope, receive, send)
-
-    def _wrap_application_logic_error(self, e: AppException) -> Any:
-        """Wrap application logic exception to error response."""
-        self.logger.info(msg=f"App logic exception happen {e.__class__}: {e}")
+        except Exception as exc:
+            orig_exc = self._unwrap(exc)
+        else:
+            return
+
+        if isinstance(orig_exc, AppException):
+            # AppException is expected, log as info
+            self.logger.info("App logic exception: %s: %s", orig_exc.__class__, orig_exc)
+            await self._send_body(send, orig_exc.status_code, self._application_logic_error_body(orig_exc))
+        else:
+            self.logger.exception("Caught unhandled %s exception: %s", orig_exc.__class__, orig_exc)
+            await self._send_body(send, HTTPStatus.INTERNAL_SERVER_ERROR, self._server_error_body(orig_exc))
+
+    @staticmethod
+    def _unwrap(exc: Exception) -> Exception:
+        """The exception to answer with, the first application one of a group (of task groups), if any."""
+        if not isinstance(exc, BaseExceptionGroup):
+            return exc
+        app_exceptions, rest = exc.split(AppException)
+        found: BaseException | None = app_exceptions or rest
+        while isinstance(found, BaseExceptionGroup):
+            found = found.exceptions[0]
+        return found if isinstance(found, Exception) else Exception("Unknown exception")
+
+    def _application_logic_error_body(self, e: AppException) -> bytes:
+        """Serialized error response of application logic exception, cached by what it is made of."""
+        field_errors = getattr(e, "field_errors", None)
+        field_name = getattr(e, "field_name", None)
+        if field_errors:
+            key: tuple[Any, ...] = (*field_errors.items(),)
+        elif field_name:
+            key = (field_name, e.error_message)
+        else:
+            key = (e.error_key, e.error_message, None)
 
+        body = self._bodies.get(key)
+        if body is None:
+            body = _render(SubmitFormErrorResponse(error=self._error_dict(e)).model_dump())
+            if len(self._bodies) < self._MAX_CACHED_BODIES:
+                self._bodies[key] = body
+        return body
+
+    @staticmethod
+    def _error_dict(e: AppException) -> dict[str, list[str]]:
         error_dict: dict[str, list[str]] = {}
 
         if hasattr(e, "field_errors") and e.field_errors:
@@ -83,43 +113,24 @@ class ExceptionTraceHandlerMiddleware:
         else:
             error_key = e.error_key.replace("form.", "") if e.error_key.startswith("form.") else e.error_key
             error_dict[error_key] = [e.error_message]
+        return error_dict
 
-        error_response = SubmitFormErrorResponse(error=error_dict)
-        response = JSONResponse(
-            status_code=e.status_code,
-            content=error_response.model_dump(),
-        )
-        return self._build_stream_response(response)
-
-    def _wrap_to_500_error(self, e: Exception) -> Any:
-        """Wrap exception to 500 error response."""
-        error_loc = self._get_error_loc(e)
+    def _server_error_body(self, e: Exception) -> bytes:
+        """Serialized 500 error response, with location of the error only in debug."""
+        if not settings.debug:
+            return _SERVER_ERROR_BODY
         error_dict: dict[str, list[str]] = {
-            "server_error": ["Internal Server Error"],
+            "server_error": ["Internal Server Error", str(self._get_error_loc(e))],
         }
-        if settings.debug:
-            error_dict["server_error"].append(str(error_loc))
-
-        error_response: dict[str, Any] = {
-            "success": False,
-            "error": error_dict,
-        }
-
-        response = JSONResponse(
-            status_code=HTTPStatus.INTERNAL_SERVER_ERROR,
-            content=error_response,
-        )
-        return self._build_stream_response(response)
+        return _render({"success": False, "error": error_dict})
 
     def _get_error_loc(self, e: Exception) -> dict[str, Any]:
         """Get error location information."""
-        error_loc = {
+        return {
             "args": list(e.args),
+            "cause": format_exception_only(type(e), e),
+            "trace": self._hide_full_path_in_trace(format_list(extract_tb(e.__traceback__))),
         }
-        if settings.debug:
-            error_loc["cause"] = format_exception_only(type(e), e)
-            error_loc["trace"] = self._hide_full_path_in_trace(format_list(extract_tb(e.__traceback__)))
-        return error_loc
 
     def _hide_full_path_in_trace(self, pathes: list[str]) -> list[str]:
         """Hide full paths in traceback."""
@@ -134,16 +145,28 @@ class ExceptionTraceHandlerMiddleware:
             result.append(cleaned_path)
         return result
 
-    def _build_stream_response(self, response: Response) -> Any:
-        """Build stream response wrapper."""
-
-        async def send_response(scope: Scope, receive: Receive, send: Send) -> None:
-            await response(scope, receive, send)
-
-        return send_response
+    @staticmethod
+    async def _send_body(send: Send, status_code: int, body: bytes) -> None:
+        """Send JSON body as `JSONResponse` would, without building one."""
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status_code,
+                "headers": [
+                    (b"content-length", str(len(body)).encode("latin-1")),
+                    (b"content-type", b"application/json"),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
 
 
-def add_middlewares(app: FastAPI, logger: logging.Logger) -> None:
+def add_middlewares(
+    app: FastAPI,
+    logger: logging.Logger,
+    request_capture: RequestCapture | None = None,
+    loop_monitor: EventLoopMonitor | None = None,
+) -> None:
     """Add middlewares for the application."""
 
     @app.exception_handler(RequestValidationError)
@@ -175,6 +198,41 @@ def add_middlewares(app: FastAPI, logger: logging.Logger) -> None:
 
     app.add_middleware(ExceptionTraceHandlerMiddleware, logger=logger)
 
+    # Captures responses as clients get them, including errors made of exceptions
+    if request_capture is not None:
+        app.add_middleware(RequestCaptureMiddleware, capture=request_capture)
+
+    if loop_monitor is not None:
+        app.add_middleware(EventLoopMonitorMiddleware, monitor=loop_monitor)
+
+    if settings.profiling_endpoints_enabled:
+        app.add_middleware(ProfilerMiddleware, profiler=profiler)
+
+    if settings.log_json:
+        app.add_middleware(
+            AccessLogMiddleware,
+            default_rate=settings.access_log_sample_rate,
+            path_rates=settings.access_log_path_sample_rates,
+            status_rates=settings.access_log_status_sample_rates,
+            exclude_paths=settings.access_log_exclude_paths,
+        )
+
+    if settings.server_timing_enabled or settings.slow_request_threshold is not None:
+        app.add_middleware(
+            ServerTimingMiddleware,
+            sample_rate=settings.server_timing_sample_rate,
+            header=settings.server_timing_enabled,
+            slow_threshold=settings.slow_request_threshold,
+        )
+
+    # Outside of the rest, so they see (and capture, time, log) bodies as the app renders them
+    if settings.compression_enabled:
+        app.add_middleware(
+            CompressionMiddleware,
+            minimum_size=settings.compression_minimum_size,
+            encodings=settings.compression_encodings,
+        )
+
     # CORS middleware - must be the last in result list of middlewares
     # to allow frontend work with errors correctly
     app.add_middleware(
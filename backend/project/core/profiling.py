@@ -0,0 +1,159 @@
+"""On-demand profiling of a live worker: statistical CPU sampling and allocation growth by `tracemalloc`.
+
+Nothing runs until a profile is asked for: the sampler is a thread started for one profile, and `tracemalloc` traces
+only between the first snapshot and `stop()`.
+"""
+import asyncio
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from types import FrameType
+from typing import Any
+
+from starlette.types import ASGIApp
+from starlette.types import Receive
+from starlette.types import Scope
+from starlette.types import Send
+
+
+class ProfilerBusy(Exception):
+    """Another profile of the worker is running."""
+
+
+class SamplingProfiler:
+    """Samples stacks of all threads of the process every interval seconds, as collapsed stacks for flame graphs.
+
+    A stack is `thread;outermost frame;...;innermost frame`, every frame is `module:qualified name of the function`.
+    """
+
+    def __init__(self) -> None:
+        self._stacks: Counter[str] = Counter()
+        self._thread: threading.Thread | None = None
+        self._stopped = threading.Event()
+        self._requests_left: int | None = None
+        self._done: asyncio.Event | None = None
+
+    @property
+    def active(self) -> bool:
+        return self._thread is not None
+
+    async def profile(self, seconds: float, requests: int | None = None, interval: float = 0.005) -> str:
+        """Sample for `seconds` or until `requests` requests are handled, returns collapsed stacks with their counts."""
+        if self._thread is not None:
+            raise ProfilerBusy()
+        self._stacks = Counter()
+        self._requests_left = requests
+        self._done = asyncio.Event()
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._sample, args=(interval,), name="sampling_profiler", daemon=True)
+        self._thread.start()
+        try:
+            await asyncio.wait_for(self._done.wait(), seconds)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._stopped.set()
+            await asyncio.to_thread(self._thread.join)
+            self._thread = None
+            self._done = None
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self._stacks.items()))
+
+    def request_handled(self) -> None:
+        if self._requests_left is not None and self._done is not None:
+            self._requests_left -= 1
+            if self._requests_left <= 0:
+                self._done.set()
+
+    def _sample(self, interval: float) -> None:
+        own = threading.get_ident()
+        names: dict[int, str] = {}
+        while not self._stopped.wait(interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                if ident not in names:
+                    names[ident] = next((t.name for t in threading.enumerate() if t.ident == ident), str(ident))
+                self._stacks[_collapse(names[ident], frame)] += 1
+
+
+def _collapse(thread: str, frame: FrameType | None) -> str:
+    frames = []
+    while frame is not None:
+        frames.append(f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_qualname}")
+        frame = frame.f_back
+    frames.append(thread.replace(";", ":").replace(" ", "_"))
+    return ";".join(reversed(frames))
+
+
+class AllocationTracker:
+    """Snapshots of memory allocated by Python (`tracemalloc`), every one is compared with the previous one."""
+
+    def __init__(self, frames: int):
+        self._frames = frames
+        self._snapshot: tracemalloc.Snapshot | None = None
+        self._started_at: float | None = None
+
+    def snapshot(self, top: int, group_by: str = "lineno") -> dict[str, Any]:
+        """Top allocation sites by size, by growth since the previous snapshot if there is one.
+
+        The first snapshot starts tracing, which slows down allocations until `stop()`.
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self._frames)
+            self._snapshot = None
+            self._started_at = time.time()
+        # Allocations of tracemalloc itself and of imports are noise
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            (
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            )
+        )
+        stats: list[tracemalloc.Statistic] | list[tracemalloc.StatisticDiff]
+        if self._snapshot is None:
+            stats = snapshot.statistics(group_by)
+        else:
+            stats = snapshot.compare_to(self._snapshot, group_by)
+        compared = self._snapshot is not None
+        self._snapshot = snapshot
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "tracing_since": self._started_at,
+            "compared_with_previous": compared,
+            "traced_bytes": current,
+            "traced_peak_bytes": peak,
+            "top": [_stat(s) for s in stats[:top]],
+        }
+
+    def stop(self) -> None:
+        tracemalloc.stop()
+        self._snapshot = None
+        self._started_at = None
+
+
+def _stat(stat: tracemalloc.Statistic | tracemalloc.StatisticDiff) -> dict[str, Any]:
+    data: dict[str, Any] = {
+        "traceback": [f"{f.filename}:{f.lineno}" for f in stat.traceback],
+        "size": stat.size,
+        "count": stat.count,
+    }
+    if isinstance(stat, tracemalloc.StatisticDiff):
+        data |= {"size_diff": stat.size_diff, "count_diff": stat.count_diff}
+    return data
+
+
+class ProfilerMiddleware:
+    """Counts handled HTTP requests for a profile limited by requests."""
+
+    def __init__(self, app: ASGIApp, profiler: SamplingProfiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if scope["type"] == "http" and self.profiler.active:
+                self.profiler.request_handled()
@@ -0,0 +1,130 @@
+"""Readiness of a worker to take requests: its database, connection pool and event loop.
+
+Orchestrators probe readiness often (hundreds of times a second over a fleet), so a probe must not reach the database.
+The database is probed by a background task every interval, and a readiness check only reads the last result, the
+counters of the pool and the last lag of the event loop.
+"""
+import asyncio
+import logging
+import time
+from typing import Any
+from typing import NamedTuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from project.core.loop_monitor import EventLoopMonitor
+from project.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+database_up = registry.gauge("readiness_database_up", "Whether the last probe of the database succeeded.")
+
+
+class DatabaseProbe(NamedTuple):
+    reachable: bool
+    latency: float | None
+    error: str | None
+    checked_at: float
+
+
+class ReadinessProbe:
+    """Readiness of the worker by the database probed in the background, pool saturation and event loop lag.
+
+    Saturation is the part of the pool's connections (pool size and overflow) checked out. The database is probed on a
+    connection of the pool, so with the pool exhausted for the timeout it fails too. A probe older than 3 intervals
+    (the background task is stuck) counts as unreachable.
+    """
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        max_connections: int,
+        timeout: float,
+        max_pool_saturation: float,
+        max_loop_lag: float,
+    ):
+        self._engine = engine
+        self._max_connections = max_connections
+        self._timeout = timeout
+        self._max_pool_saturation = max_pool_saturation
+        self._max_loop_lag = max_loop_lag
+        self._interval: float | None = None
+        self._loop_monitor: EventLoopMonitor | None = None
+        self._database: DatabaseProbe | None = None
+        self._task: asyncio.Task[None] | None = None
+
+    async def probe_database(self) -> DatabaseProbe:
+        """Run `SELECT 1` on a connection of the pool and keep the result for checks."""
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(self._select_one(), self._timeout)
+        except Exception as e:
+            probe = DatabaseProbe(False, None, f"{e.__class__.__name__}: {e}", time.monotonic())
+            if self._database is None or self._database.reachable:
+                logger.warning("Database is unreachable: %s", probe.error)
+        else:
+            probe = DatabaseProbe(True, time.monotonic() - started, None, time.monotonic())
+        database_up.set(probe.reachable)
+        self._database = probe
+        return probe
+
+    async def _select_one(self) -> None:
+        async with self._engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+
+    def check(self) -> tuple[bool, dict[str, Any]]:
+        """Whether the worker is ready, with the state of every check. Doesn't wait for anything."""
+        database = self._database
+        fresh = (
+            database is not None
+            and self._interval is not None
+            and time.monotonic() - database.checked_at <= 3 * self._interval
+        )
+        database_ok = database is not None and database.reachable and fresh
+
+        checked_out = self._engine.pool.checkedout()  # type: ignore[attr-defined]
+        saturation = checked_out / self._max_connections if self._max_connections else 0.0
+        pool_ok = saturation < self._max_pool_saturation
+
+        lag = self._loop_monitor.lag if self._loop_monitor is not None else None
+        loop_ok = lag is None or lag <= self._max_loop_lag
+
+        checks = {
+            "database": {
+                "ok": database_ok,
+                "latency_ms": round(database.latency * 1000, 3) if database and database.latency is not None else None,
+                "error": database.error if database else "not probed yet",
+                "age_s": round(time.monotonic() - database.checked_at, 3) if database else None,
+            },
+            "pool": {
+                "ok": pool_ok,
+                "checked_out": checked_out,
+                "max": self._max_connections,
+                "saturation": round(saturation, 3),
+            },
+            "event_loop": {"ok": loop_ok, "lag_ms": round(lag * 1000, 3) if lag is not None else None},
+        }
+        return database_ok and pool_ok and loop_ok, checks
+
+    def start(self, interval: float, loop_monitor: EventLoopMonitor | None = None) -> None:
+        """Probe the database now and then every `interval` seconds in the background."""
+        self._interval = interval
+        self._loop_monitor = loop_monitor
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(interval), name="readiness_probe")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self, interval: float) -> None:
+        while True:
+            await self.probe_database()
+            await asyncio.sleep(interval)
@@ -26,6 +26,15 @@ class Settings(BaseSettings):
     host: str = "0.0.0.0"  # noqa: S104
     port: int = 8000
     log_level: str = "info"
+    # JSON logs: records are formatted as JSON lines and written to stderr by a thread, the event loop only puts them
+    # to a queue. Uvicorn's access log is replaced by one record (logger project.access) per request but excluded
+    # paths, logged with the greater of the rates of its path (the longest matching prefix, the default rate if none)
+    # and of its status class, e.g. ACCESS_LOG_STATUS_SAMPLE_RATES='{"4xx": 1, "5xx": 1}'.
+    log_json: bool = False
+    access_log_sample_rate: float = 1.0
+    access_log_path_sample_rates: dict[str, float] = {}
+    access_log_status_sample_rates: dict[str, float] = {"5xx": 1.0}
+    access_log_exclude_paths: list[str] = ["/metrics", "/api/v1/health", "/api/v1/ready"]
     reload: bool = False
     debug: bool = False
     generate_docs: bool = True
@@ -42,6 +51,129 @@ class Settings(BaseSettings):
 
     front_domains: list[str] = ["http://localhost:8080"]
 
+    # POST /api/history/batch: max filters per request and how many of them run at once (each on its own connection)
+    history_batch_max_size: int = 50
+    history_batch_concurrency: int = 5
+    # Repeated submissions of the same date and names are added to occurrences of one row instead of adding rows
+    # (smaller table, shorter scans). Folded rows and rows of single submissions are counted alike, so it may be
+    # switched at any time.
+    history_fold_repeats_enabled: bool = False
+    # Concurrent identical reads of history and unique names share one database query (read on a session of its own)
+    history_single_flight_enabled: bool = False
+    # Stale-while-revalidate for history and unique names: the last good response is served (with `Age` header) when
+    # database doesn't answer within latency budget or fails. Values older than max staleness are never served.
+    history_swr_enabled: bool = False
+    history_swr_capacity: int = 1024
+    history_swr_max_staleness: float = 300.0
+    history_swr_latency_budget: float = 0.5
+    # GET /api/history/stream (server-sent events): per-connection queue of undelivered submissions (a client falling
+    # this far behind is disconnected), seconds between heartbeats of an idle connection, connections per worker
+    history_stream_queue_size: int = 100
+    history_stream_heartbeat: float = 15.0
+    history_stream_max_subscribers: int = 10000
+    # Every worker listens to changes of form_history (sent by a trigger) on its own connection outside of the pool,
+    # to drop outdated cached history and stream submissions committed by any worker. Lost connection is re-opened
+    # with backoff from min to max seconds, and checked every keepalive seconds. Without notifications a worker only
+    # streams its own submissions and cached values expire on their own.
+    history_notifications_enabled: bool = False
+    notifications_reconnect_min: float = 0.5
+    notifications_reconnect_max: float = 30.0
+    notifications_keepalive: float = 30.0
+    # Rendered history and unique names shared by all workers of the host through memory-mapped files in the dir
+    # (kept across restarts). Values live for TTL seconds, and when notifications are enabled history a change of
+    # form_history affects and unique names are dropped at once. Values bigger than the slot size minus 56 bytes are
+    # not cached.
+    shared_cache_enabled: bool = False
+    shared_cache_dir: str = "/dev/shm"
+    shared_cache_ttl: float = 5.0
+    history_shared_cache_slots: int = 1024
+    history_shared_cache_slot_size: int = 16384
+    unique_names_shared_cache_slot_size: int = 1048576
+    # In-memory columnar copy of form_history (requires numpy, the `replica` extra) which answers history and unique
+    # names once loaded. It's synced by updated_at every interval seconds, re-reading rows updated within the last
+    # overlap seconds, and gets new submissions from notifications at once.
+    history_replica_enabled: bool = False
+    history_replica_sync_interval: float = 5.0
+    history_replica_sync_overlap: float = 60.0
+    # Bloom filters over known first and last names: history filtered by a name which has never been submitted is
+    # empty without querying the database. Names committed by other workers are added from notifications, so they have
+    # to be enabled with several workers. Filters are rebuilt every interval seconds, sized for max(capacity, twice
+    # the number of names) with the false positive rate (~1.2 MB per filter for 1M names and 1%).
+    history_known_names_enabled: bool = False
+    history_known_names_capacity: int = 100000
+    history_known_names_false_positive_rate: float = 0.01
+    history_known_names_rebuild_interval: float = 3600.0
+    # Monthly partitions of form_history are created ahead months ahead, every interval seconds. With retention,
+    # partitions of months which ended retention months before the current one are detached and kept as
+    # form_history_archive_* tables (moved to the archive tablespace if set) to be exported and dropped manually.
+    # Without maintenance rows of months lacking a partition go to the default one, and are moved out of it once their
+    # partition is created.
+    history_partitions_maintenance_enabled: bool = False
+    history_partitions_maintenance_interval: float = 3600.0
+    history_partitions_ahead_months: int = 3
+    history_partitions_retention_months: int | None = None
+    history_partitions_archive_tablespace: str | None = None
+    # Submissions which the database fails or doesn't take within timeout seconds (failover, exhausted pool) are
+    # appended to a local spool (fsync'd segment files in the dir, which must be on a durable disk) and answered with
+    # 202 as queued. Every worker drains the spool into the database every interval seconds in batches, each spooled
+    # submission is added once even if draining is interrupted. Submissions fail as before once the dir holds max bytes.
+    submit_spool_enabled: bool = False
+    submit_spool_dir: str = "/var/spool/hooligapps_test_backend"
+    submit_spool_timeout: float = 2.0
+    submit_spool_drain_interval: float = 1.0
+    submit_spool_batch_size: int = 500
+    submit_spool_max_bytes: int = 1 << 30
+    # Sampled requests to paths with the prefixes are captured (method, path, query, content type and body, status and
+    # duration of the response) to gzip'd JSON lines files in the dir, to be replayed by `benchmarks.replay`. Files
+    # hold personal data of submissions. Every worker writes its own file every interval seconds and starts a new one
+    # after file bytes of JSON, only the last files of the dir are kept. Requests with bodies over max body and event
+    # streams are not captured.
+    request_capture_enabled: bool = False
+    request_capture_dir: str = "/var/lib/hooligapps_test_backend/capture"
+    request_capture_sample_rate: float = 0.01
+    request_capture_paths: list[str] = ["/api/"]
+    request_capture_max_body: int = 65536
+    request_capture_file_bytes: int = 64 << 20
+    request_capture_files: int = 20
+    request_capture_flush_interval: float = 1.0
+    # Timing spans of a request (validation, pool checkout, queries, use case and DAL calls, commit, rendering) are sent
+    # in `Server-Timing` header of a sample of responses. With a slow threshold (seconds) every request is timed and
+    # the span tree of a slower one is logged as JSON.
+    server_timing_enabled: bool = False
+    server_timing_sample_rate: float = 1.0
+    slow_request_threshold: float | None = None
+    # Endpoints /api/v1/profiling/* profile the worker which gets the request: CPU by sampling stacks of its threads for
+    # up to max seconds, and memory by tracemalloc snapshots (keeping frames per allocation) compared with the previous
+    # one. They are off unless enabled, and require `Authorization: Bearer <token>` when the token is set.
+    profiling_endpoints_enabled: bool = False
+    profiling_token: str | None = None
+    profiling_max_seconds: float = 300.0
+    profiling_tracemalloc_frames: int = 10
+    # Lag of the event loop of every worker (how late it runs a callback scheduled every interval seconds) is exported
+    # as event_loop_lag_seconds. A watchdog thread logs the stack, task and route which block the loop for longer than
+    # the block threshold (seconds).
+    event_loop_monitor_enabled: bool = False
+    event_loop_monitor_interval: float = 0.1
+    event_loop_block_threshold: float = 0.5
+    # /api/v1/ready answers 503 when the database is unreachable, the pool has more than max saturation of its
+    # connections (pool size and overflow) checked out, or the event loop lags more than max lag seconds (only measured
+    # with the event loop monitor). The database is probed with `SELECT 1` (failing after timeout) every interval
+    # seconds in the background, the endpoint only reads the last result, and a result older than 3 intervals counts
+    # as unreachable.
+    readiness_probe_interval: float = 2.0
+    readiness_probe_timeout: float = 1.0
+    readiness_max_pool_saturation: float = 1.0
+    readiness_max_loop_lag: float = 1.0
+    # Response bodies of at least minimum size bytes are compressed with the first of the encodings the client accepts
+    # (br and zstd need `brotli` and `zstandard` packages and are skipped without them). Streamed bodies are compressed
+    # chunk by chunk, event streams never. History and unique names from the shared cache keep compressed variants
+    # next to the plain ones, so repeated hits aren't compressed again.
+    compression_enabled: bool = True
+    compression_minimum_size: int = 1024
+    compression_encodings: list[str] = ["zstd", "br", "gzip"]
+    # Ids of persons (pairs of names) submitted through this worker, to skip their lookup on next submissions
+    person_id_cache_size: int = 100000
+
     @property
     def database_url(self) -> str:
         # Check for DATABASE_URL environment variable first
@@ -0,0 +1,158 @@
+"""Timing spans of a request, sent as `Server-Timing` header and logged for slow requests.
+
+Code marks its parts with `span(name)` or `@timed`. Spans are recorded only within a request timed by
+`ServerTimingMiddleware`, otherwise they cost a lookup of a context variable.
+"""
+import json
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any
+from typing import Awaitable
+from typing import Callable
+from typing import Iterator
+from typing import TypeVar
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp
+from starlette.types import Message
+from starlette.types import Receive
+from starlette.types import Scope
+from starlette.types import Send
+
+logger = logging.getLogger(__name__)
+
+_T = TypeVar("_T")
+
+
+class Span:
+    __slots__ = ("name", "start", "end", "children")
+
+    def __init__(self, name: str, start: float, end: float | None = None):
+        self.name = name
+        self.start = start
+        self.end = end
+        self.children: list[Span] = []
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    def as_dict(self, origin: float) -> dict[str, Any]:
+        """Span tree with times in milliseconds from the origin, for logs."""
+        data: dict[str, Any] = {
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round(self.duration * 1000, 3),
+        }
+        if self.end is None:
+            data["unfinished"] = True
+        if self.children:
+            data["children"] = [child.as_dict(origin) for child in self.children]
+        return data
+
+
+_current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Time the block as a child of the current span."""
+    parent = _current_span.get()
+    if parent is None:
+        yield
+        return
+    child = Span(name, time.perf_counter())
+    parent.children.append(child)
+    token = _current_span.set(child)
+    try:
+        yield
+    finally:
+        child.end = time.perf_counter()
+        _current_span.reset(token)
+
+
+def current_span() -> Span | None:
+    return _current_span.get()
+
+
+def record_span(name: str, start: float, end: float) -> None:
+    """Add a span timed elsewhere (e.g. by events of SQLAlchemy) to the current one."""
+    parent = _current_span.get()
+    if parent is not None:
+        parent.children.append(Span(name, start, end))
+
+
+def timed(func: Callable[..., Awaitable[_T]]) -> Callable[..., Awaitable[_T]]:
+    """Time calls of the coroutine function as spans named by its qualified name."""
+    name = func.__qualname__
+
+    @wraps(func)
+    async def wrapper(*args: Any, **kwargs: Any) -> _T:
+        if _current_span.get() is None:
+            return await func(*args, **kwargs)
+        with span(name):
+            return await func(*args, **kwargs)
+
+    return wrapper
+
+
+def server_timing(root: Span) -> str:
+    """`Server-Timing` value of finished spans under the root, durations of spans with the same name are summed."""
+    durations: dict[str, float] = {}
+    stack = list(root.children)
+    while stack:
+        current = stack.pop()
+        if current.end is not None:
+            durations[current.name] = durations.get(current.name, 0) + current.duration
+        stack.extend(current.children)
+    metrics = [f"{name};dur={duration * 1000:.2f}" for name, duration in sorted(durations.items())]
+    metrics.append(f"total;dur={root.duration * 1000:.2f}")
+    return ", ".join(metrics)
+
+
+class ServerTimingMiddleware:
+    """Times sampled HTTP requests and adds `Server-Timing` header to their responses.
+
+    With a slow threshold every request is timed and the whole span tree of one which took longer is logged as JSON.
+    """
+
+    def __init__(self, app: ASGIApp, sample_rate: float, header: bool, slow_threshold: float | None):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.header = header
+        self.slow_threshold = slow_threshold
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        header = self.header and random.random() < self.sample_rate
+        if scope["type"] != "http" or not (header or self.slow_threshold is not None):
+            await self.app(scope, receive, send)
+            return
+
+        root = Span("total", time.perf_counter())
+        status = 0
+        stream = False
+
+        async def send_timing(message: Message) -> None:
+            nonlocal status, stream
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = MutableHeaders(scope=message)
+                stream = headers.get("content-type", "").startswith("text/event-stream")
+                if header:
+                    headers.append("Server-Timing", server_timing(root))
+            await send(message)
+
+        token = _current_span.set(root)
+        try:
+            await self.app(scope, receive, send_timing)
+        finally:
+            _current_span.reset(token)
+            root.end = time.perf_counter()
+            # A stream lasts as long as its client wants
+            if self.slow_threshold is not None and root.duration >= self.slow_threshold and not stream:
+                log = {"method": scope["method"], "path": scope["path"], "status": status, **root.as_dict(root.start)}
+                logger.warning("Slow request %s", json.dumps(log))
@@ -1,3 +1,5 @@
+from dataclasses import dataclass
+from dataclasses import field
 from functools import wraps
 from typing import Any
 from typing import Optional
@@ -59,6 +61,38 @@ class UCResponse(BaseModel):
     __bool__ = __nonzero__
 
 
+@dataclass(slots=True, kw_only=True)
+class SlotsUCRequest:
+    """Allocation-light alternative to `UCRequest` for hot paths.
+
+    No validation happens here: the API layer has already validated the input, so the use case only needs a plain
+    container. Subclasses must be declared with ``@dataclass(slots=True, kw_only=True)`` as well.
+    """
+
+
+@dataclass(slots=True, kw_only=True)
+class SlotsUCResponse:
+    """Allocation-light alternative to `UCResponse` with the same errors contract."""
+
+    errors: list[Union[Exception, BaseUCError]] = field(default_factory=list)
+    value: Any = None
+
+    @property
+    def first_error(self) -> Optional[Exception]:
+        if bool(self):
+            return None
+        return self.errors[0]
+
+    def add_error(self, error: Exception) -> None:
+        self.errors.append(error)
+
+    def has_errors(self) -> bool:
+        return len(self.errors) > 0
+
+    def __bool__(self) -> bool:
+        return not self.has_errors()
+
+
 class UC:
     """Base class for UseCase"""
 
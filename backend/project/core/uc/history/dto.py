@@ -1,34 +1,101 @@
+from dataclasses import dataclass
 from datetime import date
+from datetime import datetime
+from typing import Literal
+from uuid import UUID
 
-from pydantic import BaseModel
+from project.core.uc.base import SlotsUCRequest
+from project.core.uc.base import SlotsUCResponse
 
-from project.core.uc.base import UCRequest
-from project.core.uc.base import UCResponse
 
-
-class SubmitFormRequest(UCRequest):
+@dataclass(slots=True, kw_only=True)
+class SubmitFormRequest(SlotsUCRequest):
     date: date
     first_name: str
     last_name: str
 
 
-class SubmitFormResponse(UCResponse):
+@dataclass(slots=True, kw_only=True)
+class SubmitFormResponse(SlotsUCResponse):
     success: bool = True
+    # Database was unavailable, the form is spooled to be written later
+    queued: bool = False
+
+
+@dataclass(slots=True, kw_only=True)
+class FormSubmitted:
+    """Published after a submitted form is committed.
 
+    A repeat folded into an existing row has the row's id, its number among the row's occurrences, and the time it
+    was added as `created_at`.
+    """
 
-class GetHistoryRequest(UCRequest):
+    id: UUID
+    date: date
+    first_name: str
+    last_name: str
+    created_at: datetime
+    occurrence: int = 1
+
+    @property
+    def event_id(self) -> str:
+        """Unique per submission, also for repeats folded into one row."""
+        return str(self.id) if self.occurrence == 1 else f"{self.id}.{self.occurrence}"
+
+
+@dataclass(slots=True, kw_only=True)
+class FormHistoryChange:
+    """Row of form_history committed by any worker, as announced by the database."""
+
+    op: Literal["INSERT", "UPDATE", "DELETE"]
+    id: UUID
+    date: date
+    first_name: str
+    last_name: str
+    created_at: datetime
+    # Submissions of the row's date and names, INSERT of a row with more than one is a repeated submission
+    occurrences: int = 1
+    # Sent only for a repeated submission, the time it was added to the row
+    updated_at: datetime | None = None
+
+
+@dataclass(slots=True, kw_only=True)
+class GetHistoryRequest(SlotsUCRequest):
     date_filter: date
     first_name: str | None = None
     last_name: str | None = None
 
 
-class HistoryItem(BaseModel):
+@dataclass(slots=True)
+class HistoryItem:
     date: date
     first_name: str
     last_name: str
     count: int
 
 
-class GetHistoryResponse(UCResponse):
+@dataclass(slots=True, kw_only=True)
+class GetHistoryResponse(SlotsUCResponse):
     items: list[HistoryItem]
     total: int
+    # Seconds since the data was read from database, set only when a stale copy is served
+    age: float | None = None
+
+
+@dataclass(slots=True, kw_only=True)
+class GetHistoryBatchRequest(SlotsUCRequest):
+    requests: list[GetHistoryRequest]
+
+
+@dataclass(slots=True, kw_only=True)
+class GetHistoryBatchResponse(SlotsUCResponse):
+    # Same order as requests, failed items have errors and no data
+    results: list[GetHistoryResponse]
+
+
+@dataclass(slots=True, kw_only=True)
+class GetUniqueNamesResponse(SlotsUCResponse):
+    first_names: list[str]
+    last_names: list[str]
+    # Seconds since the data was read from database, set only when a stale copy is served
+    age: float | None = None
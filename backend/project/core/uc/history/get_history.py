@@ -1,6 +1,16 @@
+from dataclasses import replace
+from datetime import date
 from typing import Any
+from typing import Hashable
+from typing import cast
 
+from project.core.cache.bloom import KnownNames
+from project.core.cache.singleflight import SingleFlight
+from project.core.cache.swr import StaleWhileRevalidate
+from project.core.db.columnar.form_history import FormHistoryReplica
 from project.core.db.postgres.form_history import FormHistoryDAL
+from project.core.db.postgres.form_history import FormHistoryDALFactory
+from project.core.timing import timed
 from project.core.uc.base import UC
 from project.core.uc.history.dto import GetHistoryRequest
 from project.core.uc.history.dto import GetHistoryResponse
@@ -8,13 +18,21 @@ from project.core.uc.history.dto import HistoryItem
 
 
 class GetHistory(UC):
-    """Use case for getting form submission history."""
+    """Use case for getting form submission history.
 
-    def __init__(self, form_history_dal: FormHistoryDAL):
+    With `known_names`, filters by names which have never been submitted are answered without the database.
+    """
+
+    def __init__(self, form_history_dal: FormHistoryDAL, known_names: KnownNames | None = None):
         self._form_history_dal = form_history_dal
+        self._known_names = known_names
 
+    @timed
     async def execute(self, request: GetHistoryRequest, *args: Any, **kwargs: Any) -> GetHistoryResponse:  # type: ignore
         """Get history of form submissions with filtering."""
+        if self._known_names is not None and not self._known_names.might_contain(request.first_name, request.last_name):
+            return GetHistoryResponse(items=[], total=0)
+
         records_with_counts = await self._form_history_dal.get_filtered_history_with_counts(
             date_filter=request.date_filter,
             first_name=request.first_name,
@@ -40,3 +58,81 @@ class GetHistory(UC):
             )
 
         return GetHistoryResponse(items=items, total=total)
+
+
+class CoalescedGetHistory(UC):
+    """`GetHistory` which shares one execution between concurrent requests with the same filters.
+
+    Shared execution opens its own session, because it may outlive the request which started it. Callers get the same
+    response object, so it must be treated as read-only.
+    """
+
+    def __init__(
+        self,
+        form_history_dal_factory: FormHistoryDALFactory,
+        flight: SingleFlight[GetHistoryResponse],
+        known_names: KnownNames | None = None,
+    ):
+        self._form_history_dal_factory = form_history_dal_factory
+        self._flight = flight
+        self._known_names = known_names
+
+    @timed
+    async def execute(self, request: GetHistoryRequest, *args: Any, **kwargs: Any) -> GetHistoryResponse:  # type: ignore
+        """Get history of form submissions with filtering."""
+        return await self._flight.do(get_history_key(request), lambda: self._execute(request))
+
+    async def _execute(self, request: GetHistoryRequest) -> GetHistoryResponse:
+        async with self._form_history_dal_factory() as form_history_dal:
+            return await GetHistory(form_history_dal, self._known_names).execute(request)
+
+
+class StaleWhileRevalidateGetHistory(UC):
+    """`CoalescedGetHistory` which serves the last good response when database is slow or down.
+
+    See `StaleWhileRevalidate` for details, stale responses have `age` set.
+    """
+
+    def __init__(self, get_history: CoalescedGetHistory, cache: StaleWhileRevalidate[GetHistoryResponse]):
+        self._get_history = get_history
+        self._cache = cache
+
+    @timed
+    async def execute(self, request: GetHistoryRequest, *args: Any, **kwargs: Any) -> GetHistoryResponse:  # type: ignore
+        """Get history of form submissions with filtering."""
+        response, age = await self._cache.get(get_history_key(request), lambda: self._get_history.execute(request))
+        return response if age is None else replace(response, age=age)
+
+
+class ReplicaGetHistory(UC):
+    """`GetHistory` answered by the in-memory replica of form_history instead of the database."""
+
+    def __init__(self, replica: FormHistoryReplica):
+        self._replica = replica
+
+    @timed
+    async def execute(self, request: GetHistoryRequest, *args: Any, **kwargs: Any) -> GetHistoryResponse:  # type: ignore
+        """Get history of form submissions with filtering."""
+        items, total = self._replica.get_history(
+            date_filter=request.date_filter,
+            first_name=request.first_name,
+            last_name=request.last_name,
+            limit=10,
+        )
+        return GetHistoryResponse(items=items, total=total)
+
+
+def get_history_key(request: GetHistoryRequest) -> Hashable:
+    """Normalized filters: requests with equal keys always get equal history."""
+    # Empty names don't filter anything in DAL, so they are the same as missing ones
+    return request.date_filter, request.first_name or None, request.last_name or None
+
+
+def is_history_key_affected(key: Hashable, row_date: date, first_name: str, last_name: str) -> bool:
+    """Whether history for `key` (see `get_history_key()`) may change when the row is added, updated or deleted."""
+    date_filter, key_first_name, key_last_name = cast(tuple[date, str | None, str | None], key)
+    return (
+        row_date <= date_filter
+        and (key_first_name is None or key_first_name == first_name)
+        and (key_last_name is None or key_last_name == last_name)
+    )
@@ -0,0 +1,55 @@
+import asyncio
+import logging
+from typing import Any
+
+from project.core.cache.bloom import KnownNames
+from project.core.db.postgres.form_history import FormHistoryDALFactory
+from project.core.timing import timed
+from project.core.uc.base import UC
+from project.core.uc.history.dto import GetHistoryBatchRequest
+from project.core.uc.history.dto import GetHistoryBatchResponse
+from project.core.uc.history.dto import GetHistoryRequest
+from project.core.uc.history.dto import GetHistoryResponse
+from project.core.uc.history.get_history import GetHistory
+from project.core.uc.history.get_history import get_history_key
+
+logger = logging.getLogger(__name__)
+
+
+class GetHistoryBatch(UC):
+    """Use case for getting history for several filters at once.
+
+    Every distinct filter runs as a regular `GetHistory` on its own session, at most `concurrency` of them at the same
+    time, so one batch can't take over the whole connection pool. A failure of one filter doesn't affect the others.
+    """
+
+    def __init__(
+        self,
+        form_history_dal_factory: FormHistoryDALFactory,
+        concurrency: int,
+        known_names: KnownNames | None = None,
+    ):
+        self._form_history_dal_factory = form_history_dal_factory
+        self._concurrency = concurrency
+        self._known_names = known_names
+
+    @timed
+    async def execute(self, request: GetHistoryBatchRequest, *args: Any, **kwargs: Any) -> GetHistoryBatchResponse:  # type: ignore
+        """Get history for every request, results are in the same order as requests."""
+        semaphore = asyncio.Semaphore(self._concurrency)
+        # Dashboards often repeat the same filter in several panels, there is no need to query it twice
+        unique_requests = {get_history_key(r): r for r in request.requests}
+        responses = await asyncio.gather(*(self._execute_one(r, semaphore) for r in unique_requests.values()))
+        by_key = dict(zip(unique_requests.keys(), responses))
+        return GetHistoryBatchResponse(results=[by_key[get_history_key(r)] for r in request.requests])
+
+    async def _execute_one(self, request: GetHistoryRequest, semaphore: asyncio.Semaphore) -> GetHistoryResponse:
+        async with semaphore:
+            try:
+                async with self._form_history_dal_factory() as form_history_dal:
+                    return await GetHistory(form_history_dal, self._known_names).execute(request)
+            except Exception as e:
+                logger.exception("Batch history item %s failed: %s", request, e)
+                response = GetHistoryResponse(items=[], total=0)
+                response.add_error(e)
+                return response
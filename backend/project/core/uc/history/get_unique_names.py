@@ -0,0 +1,74 @@
+from dataclasses import replace
+from typing import Any
+
+from project.core.cache.singleflight import SingleFlight
+from project.core.cache.swr import StaleWhileRevalidate
+from project.core.db.columnar.form_history import FormHistoryReplica
+from project.core.db.postgres.form_history import FormHistoryDAL
+from project.core.db.postgres.form_history import FormHistoryDALFactory
+from project.core.timing import timed
+from project.core.uc.base import UC
+from project.core.uc.history.dto import GetUniqueNamesResponse
+
+
+class GetUniqueNames(UC):
+    """Use case for getting all unique first and last names from history."""
+
+    def __init__(self, form_history_dal: FormHistoryDAL):
+        self._form_history_dal = form_history_dal
+
+    @timed
+    async def execute(self, *args: Any, **kwargs: Any) -> GetUniqueNamesResponse:  # type: ignore
+        """Get all unique first and last names from history."""
+        first_names = await self._form_history_dal.get_unique_first_names()
+        last_names = await self._form_history_dal.get_unique_last_names()
+        return GetUniqueNamesResponse(first_names=first_names, last_names=last_names)
+
+
+UNIQUE_NAMES_KEY = "unique_names"
+
+
+class CoalescedGetUniqueNames(UC):
+    """`GetUniqueNames` which shares one execution between concurrent requests, see `CoalescedGetHistory`."""
+
+    def __init__(self, form_history_dal_factory: FormHistoryDALFactory, flight: SingleFlight[GetUniqueNamesResponse]):
+        self._form_history_dal_factory = form_history_dal_factory
+        self._flight = flight
+
+    @timed
+    async def execute(self, *args: Any, **kwargs: Any) -> GetUniqueNamesResponse:  # type: ignore
+        """Get all unique first and last names from history."""
+        return await self._flight.do(UNIQUE_NAMES_KEY, self._execute)
+
+    async def _execute(self) -> GetUniqueNamesResponse:
+        async with self._form_history_dal_factory() as form_history_dal:
+            return await GetUniqueNames(form_history_dal).execute()
+
+
+class StaleWhileRevalidateGetUniqueNames(UC):
+    """`CoalescedGetUniqueNames` which serves the last good response when database is slow or down."""
+
+    def __init__(self, get_unique_names: CoalescedGetUniqueNames, cache: StaleWhileRevalidate[GetUniqueNamesResponse]):
+        self._get_unique_names = get_unique_names
+        self._cache = cache
+
+    @timed
+    async def execute(self, *args: Any, **kwargs: Any) -> GetUniqueNamesResponse:  # type: ignore
+        """Get all unique first and last names from history."""
+        response, age = await self._cache.get(UNIQUE_NAMES_KEY, self._get_unique_names.execute)
+        return response if age is None else replace(response, age=age)
+
+
+class ReplicaGetUniqueNames(UC):
+    """`GetUniqueNames` answered by the in-memory replica of form_history instead of the database."""
+
+    def __init__(self, replica: FormHistoryReplica):
+        self._replica = replica
+
+    @timed
+    async def execute(self, *args: Any, **kwargs: Any) -> GetUniqueNamesResponse:  # type: ignore
+        """Get all unique first and last names from history."""
+        return GetUniqueNamesResponse(
+            first_names=self._replica.get_unique_first_names(),
+            last_names=self._replica.get_unique_last_names(),
+        )
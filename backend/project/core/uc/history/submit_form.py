@@ -1,20 +1,51 @@
 import asyncio
 import random
+from functools import partial
 from typing import Any
 
+from project.core.broadcast import Broadcast
+from project.core.cache.bloom import KnownNames
+from project.core.cache.lru import LRUCache
+from project.core.db.postgres.errors import is_database_unavailable
 from project.core.db.postgres.form_history import FormHistoryDAL
+from project.core.db.postgres.models import FormHistory
+from project.core.db.spool import Spool
+from project.core.timing import timed
 from project.core.uc.base import UC
 from project.core.uc.base import rollback_db_on_exception
+from project.core.uc.history.dto import FormSubmitted
 from project.core.uc.history.dto import SubmitFormRequest
 from project.core.uc.history.dto import SubmitFormResponse
 
 
 class SubmitForm(UC):
-    """Use case for submitting form data."""
+    """Use case for submitting form data.
 
-    def __init__(self, form_history_dal: FormHistoryDAL):
+    With `person_ids`, ids of persons already seen by the process are passed with entries, so the database doesn't
+    look them up by names.
+
+    With `spool`, a form the database fails to write because it's unavailable, or doesn't write within
+    `spool_timeout` seconds, is spooled and the response is marked as queued. Failures of commit are not spooled:
+    the form may have been written, and it would be counted twice.
+    """
+
+    def __init__(
+        self,
+        form_history_dal: FormHistoryDAL,
+        submissions: Broadcast[FormSubmitted] | None = None,
+        known_names: KnownNames | None = None,
+        person_ids: LRUCache[tuple[str, str], int] | None = None,
+        spool: Spool | None = None,
+        spool_timeout: float | None = None,
+    ):
         self._form_history_dal = form_history_dal
+        self._submissions = submissions
+        self._known_names = known_names
+        self._person_ids = person_ids
+        self._spool = spool
+        self._spool_timeout = spool_timeout
 
+    @timed
     @rollback_db_on_exception
     async def execute(self, request: SubmitFormRequest, *args: Any, **kwargs: Any) -> SubmitFormResponse:  # type: ignore
         """Submit form with validation and random delay up to 3 seconds."""
@@ -35,13 +66,56 @@ class SubmitForm(UC):
         if has_errors:
             return response
 
-        await self._form_history_dal.create_form_entry(
+        names = (request.first_name, request.last_name)
+        person_id = self._person_ids.get(names) if self._person_ids is not None else None
+        if self._spool is None:
+            entry = await self._create_form_entry(request, person_id)
+        else:
+            try:
+                entry = await asyncio.wait_for(self._create_form_entry(request, person_id), self._spool_timeout)
+            except Exception as error:
+                if not is_database_unavailable(error):
+                    raise
+                return await self._spool_form(self._spool, request)
+        if self._person_ids is not None and person_id is None:
+            # Person may have been created by this transaction, its id is valid only once committed
+            self._form_history_dal.on_commit(partial(self._person_ids.put, names, entry.person_id))
+        if self._submissions is not None:
+            # Subscribers must never see a submission that is rolled back later
+            event = FormSubmitted(
+                id=entry.id,
+                date=entry.date,
+                first_name=entry.first_name,
+                last_name=entry.last_name,
+                created_at=entry.updated_at if entry.occurrences > 1 else entry.created_at,
+                occurrence=entry.occurrences,
+            )
+            self._form_history_dal.on_commit(partial(self._submissions.publish, event))
+        if self._known_names is not None:
+            # Right after commit, so the submitter finds the new name in history at once
+            self._form_history_dal.on_commit(partial(self._known_names.add, entry.first_name, entry.last_name))
+
+        return SubmitFormResponse(success=True)
+
+    async def _create_form_entry(self, request: SubmitFormRequest, person_id: int | None) -> FormHistory:
+        return await self._form_history_dal.create_form_entry(
             date=request.date,
             first_name=request.first_name,
             last_name=request.last_name,
+            person_id=person_id,
         )
 
-        return SubmitFormResponse(success=True)
+    async def _spool_form(self, spool: Spool, request: SubmitFormRequest) -> SubmitFormResponse:
+        # Connection is closed without waiting for the server, so the failed transaction can never be committed and
+        # the request's commit has nothing to do
+        await self._form_history_dal.session.invalidate()
+        await spool.append(
+            {"date": request.date.isoformat(), "first_name": request.first_name, "last_name": request.last_name}
+        )
+        if self._known_names is not None:
+            # Filters only have false positives, so the names may be added before they are in the database
+            self._known_names.add(request.first_name, request.last_name)
+        return SubmitFormResponse(success=True, queued=True)
 
     async def _rollback_db(self) -> None:
         await self._form_history_dal.session.rollback()
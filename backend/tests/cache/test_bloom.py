@@ -0,0 +1,123 @@
+import asyncio
+
+import pytest
+
+from project.core.cache.bloom import BloomFilter
+from project.core.cache.bloom import KnownNames
+
+
+class TestBloomFilter:
+    def test_no_false_negatives(self):
+        bloom_filter = BloomFilter(capacity=1000, false_positive_rate=0.01)
+        values = [f"name-{i}" for i in range(1000)]
+        for value in values:
+            bloom_filter.add(value)
+
+        assert all(value in bloom_filter for value in values)
+        # Values which collide with earlier ones entirely are not counted
+        assert 980 <= bloom_filter.count <= 1000
+
+    def test_false_positive_rate(self):
+        bloom_filter = BloomFilter(capacity=10000, false_positive_rate=0.01)
+        for i in range(10000):
+            bloom_filter.add(f"name-{i}")
+
+        false_positives = sum(f"other-{i}" in bloom_filter for i in range(100000))
+
+        assert false_positives / 100000 < 0.015
+        assert 0.005 < bloom_filter.false_positive_rate() < 0.015
+        # ~9.6 bits per value for 1%
+        assert bloom_filter.memory == pytest.approx(10000 * 9.6 / 8, rel=0.01)
+
+    def test_add_existing_value_not_counted(self):
+        bloom_filter = BloomFilter(capacity=10, false_positive_rate=0.01)
+        bloom_filter.add("Ivan")
+        bloom_filter.add("Ivan")
+
+        assert bloom_filter.count == 1
+
+
+class TestKnownNames:
+    @pytest.mark.asyncio
+    async def test_might_contain(self):
+        known_names = KnownNames("test_might_contain", capacity=100, false_positive_rate=0.001)
+
+        # Nothing is known before filters are built
+        assert known_names.might_contain("Nobody", None)
+
+        await known_names.rebuild(lambda: asyncio.sleep(0, (["Ivan", "John"], ["Ivanov", "Smith"])))
+
+        assert known_names.ready
+        assert known_names.might_contain("Ivan", "Smith")
+        assert known_names.might_contain(None, "Ivanov")
+        assert known_names.might_contain("", "")
+        assert not known_names.might_contain("Nobody", None)
+        assert not known_names.might_contain("Ivan", "Nobody")
+
+        known_names.add("Nobody", "Nobodyson")
+
+        assert known_names.might_contain("Nobody", "Nobodyson")
+
+    @pytest.mark.asyncio
+    async def test_names_added_during_rebuild(self):
+        known_names = KnownNames("test_names_added_during_rebuild", capacity=100, false_positive_rate=0.001)
+        loaded = asyncio.Event()
+
+        async def load():
+            # The row was committed after names were read
+            await loaded.wait()
+            return ["Ivan"], ["Ivanov"]
+
+        rebuild = asyncio.create_task(known_names.rebuild(load))
+        await asyncio.sleep(0)
+        known_names.add("John", "Smith")
+        loaded.set()
+        await rebuild
+
+        assert known_names.might_contain("John", "Smith")
+        assert known_names.might_contain("Ivan", "Ivanov")
+
+    @pytest.mark.asyncio
+    async def test_invalidate_during_rebuild(self):
+        known_names = KnownNames("test_invalidate_during_rebuild", capacity=100, false_positive_rate=0.001)
+        loaded = asyncio.Event()
+
+        async def load():
+            await loaded.wait()
+            return ["Ivan"], ["Ivanov"]
+
+        rebuild = asyncio.create_task(known_names.rebuild(load))
+        await asyncio.sleep(0)
+        known_names.invalidate()
+        loaded.set()
+        await rebuild
+
+        # Names loaded before invalidation may miss some, so they are not used
+        assert not known_names.ready
+        assert known_names.might_contain("Nobody", None)
+
+    @pytest.mark.asyncio
+    async def test_background_rebuild_after_invalidate(self):
+        known_names = KnownNames("test_background_rebuild", capacity=100, false_positive_rate=0.001)
+        names = (["Ivan"], ["Ivanov"])
+        loads = 0
+
+        async def load():
+            nonlocal loads
+            loads += 1
+            return names
+
+        known_names.start(load, interval=3600)
+        try:
+            await asyncio.sleep(0.01)
+            assert known_names.ready
+            assert not known_names.might_contain("John", None)
+
+            names = (["Ivan", "John"], ["Ivanov"])
+            known_names.invalidate()
+            await asyncio.sleep(0.01)
+
+            assert loads == 2
+            assert known_names.might_contain("John", None)
+        finally:
+            await known_names.stop()
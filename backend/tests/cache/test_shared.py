@@ -0,0 +1,159 @@
+import fcntl
+import multiprocessing
+import os
+from unittest.mock import patch
+
+import pytest
+
+from project.core.cache.shared import SharedMemoryCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _put_from_other_process(path, key, value):
+    cache = SharedMemoryCache("test", path, slots=16, slot_size=256, ttl=60)
+    cache.put(key, value, cache.generation)
+    cache.close()
+
+
+class TestSharedMemoryCache:
+    def test_get_put(self, tmp_path):
+        """Test that values stored by one worker are read by another."""
+        path = str(tmp_path / "test.cache")
+        first = SharedMemoryCache("test", path, slots=16, slot_size=256, ttl=60)
+        second = SharedMemoryCache("test", path, slots=16, slot_size=256, ttl=60)
+
+        assert first.get(b"key") is None
+        assert first.put(b"key", b"value", first.generation)
+
+        assert second.get(b"key") == b"value"
+        assert second.get(b"other") is None
+
+    def test_other_process(self, tmp_path):
+        """Test that values are shared between processes and survive them."""
+        path = str(tmp_path / "test.cache")
+        cache = SharedMemoryCache("test", path, slots=16, slot_size=256, ttl=60)
+
+        process = multiprocessing.get_context("fork").Process(
+            target=_put_from_other_process, args=(path, b"key", b"value")
+        )
+        process.start()
+        process.join(5)
+
+        assert process.exitcode == 0
+        assert cache.get(b"key") == b"value"
+
+    def test_reopen(self, tmp_path):
+        """Test that restarted worker finds values, and the file is reset when its layout changes."""
+        path = str(tmp_path / "test.cache")
+        cache = SharedMemoryCache("test", path, slots=16, slot_size=256, ttl=60)
+        cache.put(b"key", b"value", cache.generation)
+        cache.close()
+
+        assert SharedMemoryCache("test", path, slots=16, slot_size=256, ttl=60).get(b"key") == b"value"
+        assert SharedMemoryCache("test", path, slots=16, slot_size=512, ttl=60).get(b"key") is None
+
+    def test_layout_change_keeps_open_caches(self, tmp_path):
+        """Test that a file with another layout is replaced, not resized, under workers which still have it mapped."""
+        path = str(tmp_path / "test.cache")
+        old = SharedMemoryCache("test", path, slots=16, slot_size=256, ttl=60)
+        old.put(b"key", b"value", old.generation)
+
+        new = SharedMemoryCache("test", path, slots=16, slot_size=512, ttl=60)
+
+        assert os.fstat(old._fd).st_ino != os.stat(path).st_ino
+        assert os.fstat(old._fd).st_size == len(old._mm)
+        assert old.get(b"key") == b"value"
+        assert old.put(b"other", b"value", old.generation)
+        assert new.get(b"key") is None
+        same = SharedMemoryCache("test", path, slots=16, slot_size=512, ttl=60)
+        assert os.fstat(same._fd).st_ino == os.fstat(new._fd).st_ino
+        assert not list(tmp_path.glob("*.tmp"))
+
+    def test_ttl(self, tmp_path):
+        """Test that values expire."""
+        clock = FakeClock()
+        cache = SharedMemoryCache("test", str(tmp_path / "test.cache"), slots=16, slot_size=256, ttl=5, clock=clock)
+        cache.put(b"key", b"value", cache.generation)
+
+        clock.now += 4
+        assert cache.get(b"key") == b"value"
+        clock.now += 2
+        assert cache.get(b"key") is None
+
+    def test_invalidate(self, tmp_path):
+        """Test that invalidation drops values, including ones computed before it."""
+        cache = SharedMemoryCache("test", str(tmp_path / "test.cache"), slots=16, slot_size=256, ttl=60)
+        generation = cache.generation
+        cache.put(b"key", b"value", generation)
+
+        cache.invalidate()
+
+        assert cache.get(b"key") is None
+        assert not cache.put(b"key", b"value", generation)
+        assert cache.put(b"key", b"new", cache.generation)
+        assert cache.get(b"key") == b"new"
+
+    def test_invalidate_keys(self, tmp_path):
+        """Test that invalidation by keys drops only their values for all workers, but no value computed before it."""
+        path = str(tmp_path / "test.cache")
+        cache = SharedMemoryCache("test", path, slots=16, slot_size=256, ttl=60)
+        other = SharedMemoryCache("test", path, slots=16, slot_size=256, ttl=60)
+        generation = cache.generation
+        cache.put(b"first", b"1", generation)
+        cache.put(b"second", b"2", generation)
+
+        other.invalidate(lambda key: key == b"first")
+
+        assert cache.get(b"first") is None
+        assert cache.get(b"second") == b"2"
+        assert not cache.put(b"third", b"3", generation)
+        assert cache.put(b"third", b"3", cache.generation)
+        assert other.get(b"third") == b"3"
+
+    def test_too_big(self, tmp_path):
+        """Test that value which doesn't fit the slot isn't stored."""
+        cache = SharedMemoryCache("test", str(tmp_path / "test.cache"), slots=16, slot_size=64, ttl=60)
+
+        assert not cache.put(b"key", b"x" * 22, cache.generation)
+        assert cache.put(b"key", b"x" * 21, cache.generation)
+        assert cache.get(b"key") == b"x" * 21
+
+    def test_clock_eviction(self, tmp_path):
+        """Test that full set evicts value which hasn't been read since it was stored."""
+        cache = SharedMemoryCache("test", str(tmp_path / "test.cache"), slots=2, slot_size=64, ttl=60, ways=2)
+        generation = cache.generation
+        cache.put(b"first", b"1", generation)
+        cache.put(b"second", b"2", generation)
+        assert cache.get(b"first") == b"1"
+
+        cache.put(b"third", b"3", generation)
+
+        assert cache.get(b"first") == b"1"
+        assert cache.get(b"second") is None
+        assert cache.get(b"third") == b"3"
+
+    def test_locked_set(self, tmp_path):
+        """Test that write is skipped instead of waiting when another worker writes the set."""
+        cache = SharedMemoryCache("test", str(tmp_path / "test.cache"), slots=16, slot_size=256, ttl=60)
+
+        with patch("project.core.cache.shared.fcntl.lockf", side_effect=BlockingIOError()) as lockf_mock:
+            assert not cache.put(b"key", b"value", cache.generation)
+
+        assert lockf_mock.call_args[0][1] == fcntl.LOCK_EX | fcntl.LOCK_NB
+        assert cache.get(b"key") is None
+
+    @pytest.mark.parametrize("key", [b"", b"k" * 100])
+    def test_keys(self, tmp_path, key):
+        """Test empty and long keys."""
+        cache = SharedMemoryCache("test", str(tmp_path / "test.cache"), slots=16, slot_size=256, ttl=60)
+
+        cache.put(key, b"value", cache.generation)
+
+        assert cache.get(key) == b"value"
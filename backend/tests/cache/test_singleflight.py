@@ -0,0 +1,136 @@
+import asyncio
+
+import pytest
+
+from project.core.cache.singleflight import SingleFlight
+from project.core.cache.singleflight import singleflight_calls
+
+
+class TestSingleFlight:
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_share_execution(self):
+        """Test that concurrent callers with the same key run the function once and get the same result."""
+        flight = SingleFlight("test_share")
+        calls = 0
+
+        async def func():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return object()
+
+        results = await asyncio.gather(*(flight.do("key", func) for _ in range(10)))
+
+        assert calls == 1
+        assert all(r is results[0] for r in results)
+        assert singleflight_calls.get(group="test_share", result="executed") == 1
+        assert singleflight_calls.get(group="test_share", result="coalesced") == 9
+        assert flight.in_flight() == 0
+
+    @pytest.mark.asyncio
+    async def test_different_keys_are_not_coalesced(self):
+        """Test that different keys run separately."""
+        flight = SingleFlight("test_keys")
+
+        async def func(value):
+            await asyncio.sleep(0.01)
+            return value
+
+        results = await asyncio.gather(flight.do("a", lambda: func("a")), flight.do("b", lambda: func("b")))
+
+        assert results == ["a", "b"]
+        assert singleflight_calls.get(group="test_keys", result="coalesced") == 0
+
+    @pytest.mark.asyncio
+    async def test_nothing_is_cached_after_completion(self):
+        """Test that sequential calls run the function every time."""
+        flight = SingleFlight("test_sequential")
+        calls = 0
+
+        async def func():
+            nonlocal calls
+            calls += 1
+            return calls
+
+        assert await flight.do("key", func) == 1
+        assert await flight.do("key", func) == 2
+
+    @pytest.mark.asyncio
+    async def test_exception_is_shared(self):
+        """Test that all waiters get the exception of shared execution."""
+        flight = SingleFlight("test_exception")
+
+        async def func():
+            await asyncio.sleep(0.01)
+            raise ConnectionError("connection refused")
+
+        results = await asyncio.gather(*(flight.do("key", func) for _ in range(3)), return_exceptions=True)
+
+        assert all(isinstance(r, ConnectionError) for r in results)
+        assert flight.in_flight() == 0
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_does_not_cancel_others(self):
+        """Test that cancellation of one waiter (e.g. disconnected client) doesn't affect others."""
+        flight = SingleFlight("test_cancel")
+        finished = asyncio.Event()
+
+        async def func():
+            await asyncio.sleep(0.05)
+            finished.set()
+            return "result"
+
+        leader = asyncio.ensure_future(flight.do("key", func))
+        follower = asyncio.ensure_future(flight.do("key", func))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+
+        assert await follower == "result"
+        assert finished.is_set()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+
+    @pytest.mark.asyncio
+    async def test_shared_execution_cancelled_without_waiters(self):
+        """Test that shared execution is cancelled when all waiters are gone."""
+        flight = SingleFlight("test_cancel_all")
+        started = asyncio.Event()
+        cancelled = asyncio.Event()
+
+        async def func():
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        waiter = asyncio.ensure_future(flight.do("key", func))
+        await started.wait()
+        waiter.cancel()
+        await asyncio.wait_for(cancelled.wait(), timeout=1)
+
+        assert flight.in_flight() == 0
+
+    @pytest.mark.asyncio
+    async def test_new_caller_after_last_waiter_cancelled(self):
+        """Test that a caller coming while the abandoned execution is being cancelled starts a new one."""
+        flight = SingleFlight("test_cancel_then_call")
+        started = asyncio.Event()
+
+        async def slow():
+            started.set()
+            await asyncio.sleep(10)
+
+        async def fast():
+            return "result"
+
+        waiter = asyncio.ensure_future(flight.do("key", slow))
+        await started.wait()
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+        assert await flight.do("key", fast) == "result"
+        assert singleflight_calls.get(group="test_cancel_then_call", result="executed") == 2
+        assert flight.in_flight() == 0
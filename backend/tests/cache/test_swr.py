@@ -0,0 +1,151 @@
+import asyncio
+
+import pytest
+
+from project.core.cache.swr import StaleWhileRevalidate
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeDatabase:
+    """Source with injectable latency and outage."""
+
+    def __init__(self):
+        self.value = "v1"
+        self.latency = 0.0
+        self.down = False
+        self.calls = 0
+
+    async def read(self):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        if self.down:
+            raise ConnectionRefusedError("database is down")
+        return self.value
+
+
+class TestStaleWhileRevalidate:
+    @pytest.mark.asyncio
+    async def test_fresh_value_when_database_is_fast(self):
+        """Test that value is read from database when it answers within latency budget."""
+        db = FakeDatabase()
+        cache = self._get_cache()
+
+        assert await cache.get("key", db.read) == ("v1", None)
+        db.value = "v2"
+        assert await cache.get("key", db.read) == ("v2", None)
+        assert db.calls == 2
+
+    @pytest.mark.asyncio
+    async def test_stale_value_on_outage(self):
+        """Test that the last good value is served with its age when database fails."""
+        db = FakeDatabase()
+        clock = FakeClock()
+        cache = self._get_cache(clock=clock)
+        await cache.get("key", db.read)
+
+        db.down = True
+        clock.now += 42
+
+        assert await cache.get("key", db.read) == ("v1", 42)
+
+    @pytest.mark.asyncio
+    async def test_outage_without_cached_value(self):
+        """Test that database error is raised when there is nothing to serve."""
+        db = FakeDatabase()
+        db.down = True
+        cache = self._get_cache()
+
+        with pytest.raises(ConnectionRefusedError):
+            await cache.get("key", db.read)
+
+    @pytest.mark.asyncio
+    async def test_stale_value_on_latency_and_background_refresh(self):
+        """Test that slow database doesn't delay response and the slow read refreshes cache in background."""
+        db = FakeDatabase()
+        cache = self._get_cache(latency_budget=0.01)
+        await cache.get("key", db.read)
+
+        db.latency = 0.05
+        db.value = "v2"
+        started = asyncio.get_running_loop().time()
+        value, age = await cache.get("key", db.read)
+
+        assert value == "v1"
+        assert age is not None
+        assert asyncio.get_running_loop().time() - started < 0.05
+
+        # Refresh continues in background and brings the new value
+        await asyncio.sleep(0.1)
+        db.latency = 0.0
+        db.down = True
+        assert (await cache.get("key", db.read))[0] == "v2"
+
+    @pytest.mark.asyncio
+    async def test_concurrent_reads_share_refresh(self):
+        """Test that reads of the same key during a slow refresh don't start more database calls."""
+        db = FakeDatabase()
+        cache = self._get_cache(latency_budget=0.01)
+        await cache.get("key", db.read)
+        db.latency = 0.05
+
+        results = await asyncio.gather(*(cache.get("key", db.read) for _ in range(5)))
+
+        assert all(value == "v1" for value, _ in results)
+        assert db.calls == 2
+
+    @pytest.mark.asyncio
+    async def test_max_staleness(self):
+        """Test that values older than max staleness are never served."""
+        db = FakeDatabase()
+        clock = FakeClock()
+        cache = self._get_cache(clock=clock, max_staleness=60)
+        await cache.get("key", db.read)
+
+        db.down = True
+        clock.now += 61
+
+        with pytest.raises(ConnectionRefusedError):
+            await cache.get("key", db.read)
+
+    @pytest.mark.asyncio
+    async def test_capacity(self):
+        """Test that least recently used keys are evicted over capacity."""
+        db = FakeDatabase()
+        cache = self._get_cache(capacity=2)
+        for key in ("a", "b", "c"):
+            await cache.get(key, db.read)
+
+        db.down = True
+
+        with pytest.raises(ConnectionRefusedError):
+            await cache.get("a", db.read)
+        assert (await cache.get("c", db.read))[0] == "v1"
+
+    @pytest.mark.asyncio
+    async def test_invalidate(self):
+        """Test that invalidated values are not served."""
+        db = FakeDatabase()
+        cache = self._get_cache()
+        await cache.get(("2025-01-20", "Ivan"), db.read)
+        await cache.get(("2025-01-20", "John"), db.read)
+
+        cache.invalidate(lambda key: key[1] == "Ivan")
+        db.down = True
+
+        with pytest.raises(ConnectionRefusedError):
+            await cache.get(("2025-01-20", "Ivan"), db.read)
+        assert (await cache.get(("2025-01-20", "John"), db.read))[0] == "v1"
+
+    @staticmethod
+    def _get_cache(capacity=10, max_staleness=300, latency_budget=0.5, clock=None):
+        kwargs = {"clock": clock} if clock else {}
+        return StaleWhileRevalidate(
+            "test", capacity=capacity, max_staleness=max_staleness, latency_budget=latency_budget, **kwargs
+        )
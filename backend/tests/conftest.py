@@ -2,6 +2,7 @@ import logging
 from functools import lru_cache
 
 import pytest
+import pytest_asyncio
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.ext.asyncio import async_sessionmaker
@@ -11,6 +12,8 @@ from sqlalchemy_utils import create_database  # type: ignore
 from sqlalchemy_utils import database_exists
 
 from main import app
+from project.core.db.postgres.listener import PostgresListener
+from project.core.db.postgres.listener import asyncpg_dsn
 from project.core.db.postgres.models import Base as BaseModel
 from project.core.settings import settings
 
@@ -78,6 +81,18 @@ def sync_session(db_engine):
     connection.close()
 
 
+@pytest_asyncio.fixture(scope="function")
+async def pg_listener(db_engine):
+    """LISTEN connection to test database with fast reconnects, test subscribes its consumers and starts it."""
+    listener = PostgresListener(
+        "test", asyncpg_dsn(_get_test_db_url(sync=False)), reconnect_min=0.05, reconnect_max=0.1, keepalive=1
+    )
+
+    yield listener
+
+    await listener.stop()
+
+
 async def get_async_session():
     """Returns async session to test database inside async-test functions directly or in Depends()."""
     test_db = _get_test_db_url(sync=False)
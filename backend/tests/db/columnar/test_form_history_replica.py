@@ -0,0 +1,178 @@
+import random
+from contextlib import asynccontextmanager
+from datetime import date
+from datetime import timedelta
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from project.core.db.postgres.form_history import FormHistoryDAL
+from project.core.db.postgres.form_history import FormHistoryEntry
+from project.core.uc.history.dto import GetHistoryRequest
+from project.core.uc.history.get_history import GetHistory
+from tests.conftest import _get_test_db_url
+
+pytest.importorskip("numpy")
+
+from project.core.db.columnar.form_history import NAMES_COLLATION  # noqa: E402
+from project.core.db.columnar.form_history import FormHistoryReplica  # noqa: E402
+
+# Linguistic collations order names differing by case and accents unlike code points
+_FIRST_NAMES = ["anna", "Anna", "ann", "boris", "Émile", "emile", "ivan", "Ivan", "john", "zoe", "Zoe"]
+_LAST_NAMES = ["ivanov", "Ivanov", "ivanova", "petrov", "Ørsted", "orsted", "smith", "zz"]
+_START = date(2025, 1, 1)
+_LINGUISTIC_COLLATIONS = ["en_US.utf8", "en-x-icu", "und-x-icu"]
+
+
+@pytest_asyncio.fixture
+async def session_factory(db_engine):
+    engine = create_async_engine(_get_test_db_url(sync=False))
+
+    yield async_sessionmaker(engine, expire_on_commit=False)
+
+    await engine.dispose()
+
+
+class TestFormHistoryReplica:
+    @pytest.mark.asyncio
+    async def test_matches_dal(self, session_factory):
+        """Test that replica answers exactly like FormHistoryDAL, after the first load and incremental syncs."""
+        rng = random.Random(42)
+        replica = FormHistoryReplica(overlap=60)
+        dal_factory = self._get_dal_factory(session_factory)
+
+        await self._insert(session_factory, rng, 300)
+        assert await replica.sync(dal_factory) == 300
+        assert replica.ready
+        await self._assert_matches_dal(session_factory, replica)
+
+        await self._insert(session_factory, rng, 100)
+        assert await replica.sync(dal_factory) == 100
+        assert await replica.sync(dal_factory) == 0
+        await self._assert_matches_dal(session_factory, replica)
+
+    @pytest.mark.asyncio
+    async def test_matches_dal_with_linguistic_collation(self, session_factory):
+        """Test that replica answers like FormHistoryDAL used with it when names have a linguistic collation."""
+        async with session_factory() as session:
+            collation = await session.scalar(
+                text(
+                    "SELECT collname FROM pg_collation WHERE collname = ANY(:names) "
+                    "AND collencoding IN (-1, pg_char_to_encoding('UTF8')) ORDER BY collprovider LIMIT 1"
+                ),
+                {"names": _LINGUISTIC_COLLATIONS},
+            )
+            if collation is None:
+                pytest.skip("Postgres has no linguistic collation (no en_US locale nor ICU)")
+            for column in ("first_name", "last_name"):
+                await session.execute(
+                    text(f'ALTER TABLE form_history ALTER COLUMN {column} TYPE varchar(255) COLLATE "{collation}"')
+                )
+            await session.commit()
+        replica = FormHistoryReplica(overlap=60)
+
+        await self._insert(session_factory, random.Random(7), 300)
+        await replica.sync(self._get_dal_factory(session_factory))
+
+        await self._assert_matches_dal(session_factory, replica)
+
+    @pytest.mark.asyncio
+    async def test_apply_and_reload(self, session_factory):
+        """Test that applied rows are not added again by sync, and reload loads the table from scratch."""
+        replica = FormHistoryReplica(overlap=60)
+        dal_factory = self._get_dal_factory(session_factory)
+        await replica.sync(dal_factory)
+        assert replica.ready
+        assert replica.get_history(date(2025, 1, 1)) == ([], 0)
+
+        async with session_factory() as session:
+            entry = await FormHistoryDAL(session).create_form_entry(_START, "ivan", "ivanov")
+            await session.commit()
+            entries = await FormHistoryDAL(session).get_entries_updated_since(None)
+        assert replica.apply(entries) == 1
+        assert replica.apply(entries) == 0
+        assert await replica.sync(dal_factory) == 0
+        assert replica.get_history(_START)[1] == 1
+
+        replica.request_reload()
+        assert not replica.ready
+        async with session_factory() as session:
+            await FormHistoryDAL(session).delete(entry.id)
+            await session.commit()
+        await replica.sync(dal_factory)
+
+        assert replica.ready
+        assert replica.get_history(_START) == ([], 0)
+        assert replica.get_unique_first_names() == []
+
+    @pytest.mark.asyncio
+    async def test_repeated_submissions(self, session_factory):
+        """Test that only occurrences the replica doesn't have are added, whether applied or synced."""
+        replica = FormHistoryReplica(overlap=60)
+        dal_factory = self._get_dal_factory(session_factory)
+        await replica.sync(dal_factory)
+
+        async with session_factory() as session:
+            dal = FormHistoryDAL(session, fold_repeats=True)
+            entry = await dal.create_form_entry(_START, "ivan", "ivanov")
+            await session.commit()
+            assert replica.apply([self._get_entry(entry)]) == 1
+            await dal.create_form_entry(_START, "ivan", "ivanov")
+            entry = await dal.create_form_entry(_START, "ivan", "ivanov")
+            await session.commit()
+
+        assert replica.apply([self._get_entry(entry)._replace(occurrences=2)]) == 1
+        assert replica.apply([self._get_entry(entry)._replace(occurrences=2)]) == 0
+        assert await replica.sync(dal_factory) == 1
+        items, total = replica.get_history(_START + timedelta(days=1))
+        assert total == 3
+        assert [(i.first_name, i.count) for i in items] == [("ivan", 0)] * 3
+
+    async def _assert_matches_dal(self, session_factory, replica):
+        async with session_factory() as session:
+            dal = FormHistoryDAL(session, names_collation=NAMES_COLLATION)
+            for days in (-1, 0, 10, 30, 59, 100):
+                for first_name in [None, "", "ivan", "Ivan", "Émile", "nobody"]:
+                    for last_name in [None, "", "ivanov", "Ørsted", "zz", "nobody"]:
+                        date_filter = _START + timedelta(days=days)
+                        expected = await GetHistory(dal).execute(
+                            GetHistoryRequest(date_filter=date_filter, first_name=first_name, last_name=last_name)
+                        )
+
+                        items, total = replica.get_history(date_filter, first_name, last_name)
+
+                        assert (items, total) == (expected.items, expected.total), (date_filter, first_name, last_name)
+
+            assert sorted(replica.get_unique_first_names()) == sorted(await dal.get_unique_first_names())
+            assert sorted(replica.get_unique_last_names()) == sorted(await dal.get_unique_last_names())
+
+    @staticmethod
+    async def _insert(session_factory, rng, count):
+        async with session_factory() as session:
+            for _ in range(count):
+                # Repeats are folded into rows or stored as rows of their own, the replica has to count both
+                dal = FormHistoryDAL(session, fold_repeats=rng.random() < 0.5)
+                await dal.create_form_entry(
+                    date=_START + timedelta(days=rng.randrange(60)),
+                    first_name=rng.choice(_FIRST_NAMES),
+                    last_name=rng.choice(_LAST_NAMES),
+                )
+            await session.commit()
+
+    @staticmethod
+    def _get_dal_factory(session_factory):
+        @asynccontextmanager
+        async def open_dal():
+            async with session_factory() as session:
+                yield FormHistoryDAL(session)
+
+        return open_dal
+
+    @staticmethod
+    def _get_entry(record):
+        return FormHistoryEntry(
+            record.id, record.date, record.first_name, record.last_name, record.created_at, record.occurrences
+        )
@@ -0,0 +1,33 @@
+import asyncpg
+import pytest
+from sqlalchemy import exc
+
+from project.core.db.postgres.errors import is_database_unavailable
+
+
+class _DBAPIError(Exception):
+    def __init__(self, sqlstate):
+        super().__init__(sqlstate)
+        self.sqlstate = sqlstate
+
+
+class TestIsDatabaseUnavailable:
+    @pytest.mark.parametrize(
+        "error, expected",
+        [
+            (ConnectionRefusedError(), True),
+            (TimeoutError(), True),
+            (exc.TimeoutError("QueuePool limit reached"), True),
+            (asyncpg.CannotConnectNowError(), True),
+            (asyncpg.TooManyConnectionsError(), True),
+            (exc.DBAPIError("INSERT", {}, _DBAPIError("08006")), True),
+            (exc.DBAPIError("INSERT", {}, _DBAPIError("25006")), True),
+            (exc.DBAPIError("INSERT", {}, Exception(), connection_invalidated=True), True),
+            (exc.IntegrityError("INSERT", {}, _DBAPIError("23505")), False),
+            (exc.DBAPIError("INSERT", {}, _DBAPIError("22012")), False),
+            (ValueError(), False),
+        ],
+    )
+    def test_is_database_unavailable(self, error, expected):
+        """Test that only errors of reaching the database or of its state count as unavailable."""
+        assert is_database_unavailable(error) is expected
@@ -1,8 +1,21 @@
 from datetime import date
+from unittest.mock import AsyncMock
+from unittest.mock import MagicMock
 
 import pytest
+from sqlalchemy import func
+from sqlalchemy import select
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine
 
+from project.core.db.ids import uuid7
 from project.core.db.postgres.form_history import FormHistoryDAL
+from project.core.db.postgres.form_history import SpooledFormEntry
+from project.core.db.postgres.models import FormHistory
+from project.core.db.postgres.models import FormHistoryDateCount
+from project.core.db.postgres.models import FormHistorySpoolApplied
+from tests.conftest import _get_test_db_url
 from tests.conftest import get_async_session
 
 
@@ -36,6 +49,26 @@ class TestFormHistoryDAL:
             assert entry_from_db.first_name == test_first_name
             assert entry_from_db.last_name == test_last_name
 
+    @pytest.mark.asyncio
+    async def test_time_ordered_ids(self, sync_session):
+        """Test that ids of new entries are UUIDv7, also when inserted by SQL without an id."""
+        async_session = get_async_session()
+        async with await async_session.__anext__() as session:
+            dal = FormHistoryDAL(session=session)
+
+            first = await dal.create_form_entry(date=date(2025, 1, 15), first_name="Ivan", last_name="Ivanov")
+            await session.execute(
+                text(
+                    "INSERT INTO form_history (date, first_name, last_name, created_at, updated_at) "
+                    "VALUES ('2025-01-10', 'Ivan', 'Ivanov', now(), now())"
+                )
+            )
+            second = (await session.execute(select(FormHistory.id).where(FormHistory.id != first.id))).scalar_one()
+            third = await dal.create_form_entry(date=date(2025, 1, 5), first_name="Ivan", last_name="Ivanov")
+
+            assert first.id.version == second.version == third.id.version == 7
+            assert first.id.int >> 80 <= second.int >> 80 <= third.id.int >> 80
+
     @pytest.mark.asyncio
     async def test_get_filtered_history(self, sync_session):
         """Test filtering history by date, first_name, last_name."""
@@ -104,6 +137,25 @@ class TestFormHistoryDAL:
             assert results[2].first_name == "A"
             assert results[2].last_name == "B"
 
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize(
+        "names_collation,expected",
+        [
+            (None, "form_history.first_name ASC, form_history.last_name ASC"),
+            ("C", 'form_history.first_name COLLATE "C" ASC, form_history.last_name COLLATE "C" ASC'),
+        ],
+    )
+    async def test_get_filtered_history_names_collation(self, names_collation, expected):
+        """Test that names are ordered in the collation of their columns unless another one is given."""
+        session = MagicMock(execute=AsyncMock(return_value=MagicMock()))
+        dal = FormHistoryDAL(session=session, names_collation=names_collation)
+
+        await dal.get_filtered_history(date_filter=date(2025, 1, 20))
+        await dal.get_filtered_history_with_counts(date_filter=date(2025, 1, 20))
+
+        for call in session.execute.await_args_list:
+            assert f"ORDER BY form_history.date DESC, {expected}" in str(call.args[0])
+
     @pytest.mark.asyncio
     async def test_count_filtered_history(self, sync_session):
         """Test counting filtered history entries."""
@@ -131,6 +183,60 @@ class TestFormHistoryDAL:
             )
             assert count == 2
 
+    @pytest.mark.asyncio
+    async def test_counts_follow_updates_deletes_and_rebuild(self, sync_session):
+        """Test that counts per date and person follow changed rows and are recomputed by rebuild."""
+        async_session = get_async_session()
+        async with await async_session.__anext__() as session:
+            dal = FormHistoryDAL(session=session)
+
+            first = await dal.create_form_entry(date=date(2025, 1, 10), first_name="Ivan", last_name="Ivanov")
+            second = await dal.create_form_entry(date=date(2025, 1, 15), first_name="Ivan", last_name="Ivanov")
+            await dal.create_form_entry(date=date(2025, 1, 20), first_name="John", last_name="Smith")
+
+            await dal.update(second.id, {"date": date(2025, 1, 25), "last_name": "Petrov"})
+            await dal.delete(first.id)
+
+            assert await dal.count_filtered_history(date_filter=date(2025, 1, 20)) == 1
+            assert await dal.count_filtered_history(date_filter=date(2025, 1, 25)) == 2
+            assert await dal.count_filtered_history(date_filter=date(2025, 1, 25), first_name="Ivan") == 1
+            assert await dal.count_filtered_history(date_filter=date(2025, 1, 25), last_name="Ivanov") == 0
+            assert await dal.count_filtered_history(date_filter=date(2025, 1, 25), last_name="Petrov") == 1
+
+            # Zero counts are kept until rebuild
+            zero_counts = select(func.count()).select_from(FormHistoryDateCount).where(FormHistoryDateCount.count == 0)
+            assert (await session.execute(zero_counts)).scalar() == 2
+
+            await dal.rebuild_counts()
+
+            assert (await session.execute(zero_counts)).scalar() == 0
+            assert await dal.count_filtered_history(date_filter=date(2025, 1, 25)) == 2
+            assert await dal.count_previous_entries(date(2025, 1, 26), first_name="Ivan", last_name="Petrov") == 1
+
+    @pytest.mark.asyncio
+    async def test_person_id(self, sync_session):
+        """Test that entries of the same names share a person, found by the database unless the id is given."""
+        async_session = get_async_session()
+        async with await async_session.__anext__() as session:
+            dal = FormHistoryDAL(session=session)
+
+            first = await dal.create_form_entry(date=date(2025, 1, 10), first_name="Ivan", last_name="Ivanov")
+            second = await dal.create_form_entry(date=date(2025, 1, 15), first_name="Ivan", last_name="Ivanov")
+            other = await dal.create_form_entry(date=date(2025, 1, 12), first_name="Ivan", last_name="Petrov")
+            cached = await dal.create_form_entry(
+                date=date(2025, 1, 20), first_name="Ivan", last_name="Ivanov", person_id=first.person_id
+            )
+
+            assert first.person_id == second.person_id == cached.person_id != other.person_id
+            assert await dal.get_person_id("Ivan", "Ivanov") == first.person_id
+            assert await dal.get_person_id("John", "Smith") is None
+
+            # Renamed entry moves to another person
+            await dal.update(second.id, {"last_name": "Petrov"})
+            renamed = await dal.get_by_id(second.id)
+            assert renamed.person_id == other.person_id
+            assert await dal.count_previous_entries(date(2025, 1, 20), first_name="Ivan", last_name="Ivanov") == 1
+
     @pytest.mark.asyncio
     async def test_count_previous_entries(self, sync_session):
         """Test counting previous entries with same name combination."""
@@ -272,3 +378,67 @@ class TestFormHistoryDAL:
 
             assert len(results) == 2
             assert all(r.first_name == "Ivan" and r.last_name == "Ivanov" for r, _ in results)
+
+    @pytest.mark.asyncio
+    async def test_on_commit(self, sync_session):
+        """Test that on commit callbacks run after commit and are dropped on rollback."""
+        engine = create_async_engine(_get_test_db_url(sync=False))
+        async with async_sessionmaker(engine)() as session:
+            dal = FormHistoryDAL(session=session)
+            committed = MagicMock()
+            rolled_back = MagicMock()
+
+            await dal.create_form_entry(date=date(2025, 1, 10), first_name="Ivan", last_name="Ivanov")
+            dal.on_commit(rolled_back)
+            await session.rollback()
+
+            await dal.create_form_entry(date=date(2025, 1, 10), first_name="Ivan", last_name="Ivanov")
+            dal.on_commit(committed)
+            committed.assert_not_called()
+            await session.commit()
+
+            committed.assert_called_once_with()
+            rolled_back.assert_not_called()
+        await engine.dispose()
+
+    @pytest.mark.asyncio
+    async def test_add_spooled_entries(self, sync_session):
+        """Test that spooled submissions are added as occurrences once, however many times they are replayed."""
+        async_session = get_async_session()
+        async with await async_session.__anext__() as session:
+            dal = FormHistoryDAL(session=session, fold_repeats=True)
+            await dal.create_form_entry(date=date(2025, 1, 10), first_name="Ivan", last_name="Ivanov")
+            entries = [
+                SpooledFormEntry(uuid7(), date(2025, 1, 10), "Ivan", "Ivanov"),
+                SpooledFormEntry(uuid7(), date(2025, 1, 10), "Ivan", "Ivanov"),
+                SpooledFormEntry(uuid7(), date(2025, 1, 11), "Anna", "Petrova"),
+            ]
+
+            assert await dal.add_spooled_entries(entries[:2]) == 2
+            assert await dal.add_spooled_entries(entries) == 1
+            assert await dal.add_spooled_entries(entries) == 0
+
+            rows = await session.execute(select(FormHistory.first_name, FormHistory.occurrences).order_by("date"))
+            assert rows.all() == [("Ivan", 3), ("Anna", 1)]
+            assert await dal.count_filtered_history(date(2025, 1, 11)) == 4
+
+            await dal.forget_spooled_entries([entry.id for entry in entries])
+
+            assert await session.scalar(select(func.count()).select_from(FormHistorySpoolApplied)) == 0
+
+    @pytest.mark.asyncio
+    async def test_add_spooled_entries_without_folding(self, sync_session):
+        """Test that without folding every spooled submission is added as a row once."""
+        async_session = get_async_session()
+        async with await async_session.__anext__() as session:
+            dal = FormHistoryDAL(session=session)
+            entries = [
+                SpooledFormEntry(uuid7(), date(2025, 1, 10), "Ivan", "Ivanov"),
+                SpooledFormEntry(uuid7(), date(2025, 1, 10), "Ivan", "Ivanov"),
+            ]
+
+            assert await dal.add_spooled_entries(entries) == 2
+            assert await dal.add_spooled_entries(entries) == 0
+
+            rows = await session.execute(select(FormHistory.first_name, FormHistory.occurrences))
+            assert rows.all() == [("Ivan", 1), ("Ivan", 1)]
@@ -0,0 +1,135 @@
+import random
+from datetime import date
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import func
+from sqlalchemy import select
+
+from project.core.db.postgres.form_history import FormHistoryDAL
+from project.core.db.postgres.models import FormHistory
+from tests.conftest import get_async_session
+
+# Lowercase ASCII names are ordered the same way by any collation and by Python
+_FIRST_NAMES = ["anna", "ann", "ivan", "zoe"]
+_LAST_NAMES = ["ivanov", "petrov", "zz"]
+_START = date(2025, 1, 1)
+
+
+class _Reference:
+    """History as it was with a row per submission."""
+
+    def __init__(self, submissions: list[tuple[date, str, str]]):
+        self.submissions = submissions
+
+    def history_with_counts(self, date_filter, first_name=None, last_name=None, limit=10):
+        rows = self._filter(date_filter, first_name, last_name)
+        rows.sort(key=lambda r: (-r[0].toordinal(), r[1], r[2]))
+        return [(d, f, ln, self.count_previous_entries(d, f, ln)) for d, f, ln in rows[:limit]]
+
+    def count_filtered_history(self, date_filter, first_name=None, last_name=None):
+        return len(self._filter(date_filter, first_name, last_name))
+
+    def count_previous_entries(self, record_date, first_name, last_name):
+        return sum(1 for d, f, ln in self.submissions if (f, ln) == (first_name, last_name) and d < record_date)
+
+    def _filter(self, date_filter, first_name, last_name):
+        return [
+            (d, f, ln)
+            for d, f, ln in self.submissions
+            if d <= date_filter and (not first_name or f == first_name) and (not last_name or ln == last_name)
+        ]
+
+
+class TestOccurrences:
+    @pytest.mark.asyncio
+    async def test_repeat_increases_occurrences(self, sync_session):
+        """Test that a repeated submission is added to the existing entry when folding is enabled."""
+        async_session = get_async_session()
+        async with await async_session.__anext__() as session:
+            dal = FormHistoryDAL(session=session, fold_repeats=True)
+
+            first = await dal.create_form_entry(date=_START, first_name="ivan", last_name="ivanov")
+            repeated = await dal.create_form_entry(date=_START, first_name="ivan", last_name="ivanov")
+            other = await dal.create_form_entry(date=_START + timedelta(days=1), first_name="ivan", last_name="ivanov")
+
+            assert repeated.id == first.id
+            assert repeated.occurrences == 2
+            assert other.id != first.id
+            assert other.occurrences == 1
+            assert await dal.count_filtered_history(_START + timedelta(days=1)) == 3
+
+            # Counts follow removal of all occurrences at once
+            await dal.delete(first.id)
+            assert await dal.count_filtered_history(_START + timedelta(days=1)) == 1
+            assert await dal.count_previous_entries(_START + timedelta(days=1), "ivan", "ivanov") == 0
+
+    @pytest.mark.asyncio
+    async def test_repeat_without_folding(self, sync_session):
+        """Test that without folding a repeated submission is a row of its own, also next to a folded one."""
+        async_session = get_async_session()
+        async with await async_session.__anext__() as session:
+            folded = await FormHistoryDAL(session=session, fold_repeats=True).create_form_entry(
+                date=_START, first_name="ivan", last_name="ivanov"
+            )
+            dal = FormHistoryDAL(session=session)
+
+            first = await dal.create_form_entry(date=_START, first_name="ivan", last_name="ivanov")
+            repeated = await dal.create_form_entry(date=_START, first_name="ivan", last_name="ivanov")
+
+            assert len({folded.id, first.id, repeated.id}) == 3
+            assert (first.occurrences, repeated.occurrences) == (1, 1)
+            assert await dal.count_filtered_history(_START) == 3
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("mode", ["rows", "folded", "mixed"])
+    async def test_equivalent_to_row_per_submission(self, sync_session, mode):
+        """Test that every query answers as if each submission were a separate row, with repeats folded or not."""
+        rng = random.Random(7)
+        submissions = [
+            (_START + timedelta(days=rng.randrange(8)), rng.choice(_FIRST_NAMES), rng.choice(_LAST_NAMES))
+            for _ in range(300)
+        ]
+        reference = _Reference(submissions)
+
+        async_session = get_async_session()
+        async with await async_session.__anext__() as session:
+            dal = FormHistoryDAL(session=session)
+            for i, (d, f, ln) in enumerate(submissions):
+                dal = FormHistoryDAL(session=session, fold_repeats=mode == "folded" or mode == "mixed" and i % 2 == 0)
+                await dal.create_form_entry(date=d, first_name=f, last_name=ln)
+
+            rows = (await session.execute(select(func.count(), func.sum(FormHistory.occurrences)))).one()
+            assert rows[1] == len(submissions)
+            if mode != "mixed":
+                assert rows[0] == (len(set(submissions)) if mode == "folded" else len(submissions))
+
+            await dal.rebuild_counts()
+            for days in (-1, 0, 3, 7, 10):
+                date_filter = _START + timedelta(days=days)
+                for first_name in [None, "", "ivan", "nobody"]:
+                    for last_name in [None, "ivanov", "zz"]:
+                        for limit in (1, 10, 50):
+                            history = await dal.get_filtered_history_with_counts(
+                                date_filter, first_name, last_name, limit=limit
+                            )
+                            assert [(r.date, r.first_name, r.last_name, c) for r, c in history] == (
+                                reference.history_with_counts(date_filter, first_name, last_name, limit)
+                            ), (date_filter, first_name, last_name, limit)
+                            records = await dal.get_filtered_history(date_filter, first_name, last_name, limit=limit)
+                            assert [(r.date, r.first_name, r.last_name) for r in records] == [
+                                (d, f, ln)
+                                for d, f, ln, _ in reference.history_with_counts(
+                                    date_filter, first_name, last_name, limit
+                                )
+                            ]
+                        assert await dal.count_filtered_history(date_filter, first_name, last_name) == (
+                            reference.count_filtered_history(date_filter, first_name, last_name)
+                        )
+                for first_name in _FIRST_NAMES:
+                    assert await dal.count_previous_entries(date_filter, first_name, "petrov") == (
+                        reference.count_previous_entries(date_filter, first_name, "petrov")
+                    )
+
+            assert sorted(await dal.get_unique_first_names()) == sorted({f for _, f, _ in submissions})
+            assert sorted(await dal.get_unique_last_names()) == sorted({ln for _, _, ln in submissions})
@@ -0,0 +1,60 @@
+import asyncio
+import json
+from datetime import date
+
+import pytest
+from sqlalchemy import text
+
+from project.core.db.postgres.form_history import FormHistoryDAL
+from project.core.db.postgres.models import FORM_HISTORY_CHANNEL
+from tests.conftest import get_async_session
+
+
+class TestPostgresListener:
+    @pytest.mark.asyncio
+    async def test_notify_on_commit(self, pg_listener):
+        """Test that committed changes of form_history are delivered to consumers."""
+        payloads: asyncio.Queue[str | None] = asyncio.Queue()
+        pg_listener.subscribe(FORM_HISTORY_CHANNEL, payloads.put_nowait)
+        pg_listener.start()
+        # Consumers are told to resync once connection is ready
+        assert await asyncio.wait_for(payloads.get(), 5) is None
+
+        async_session = get_async_session()
+        async with await async_session.__anext__() as session:
+            dal = FormHistoryDAL(session=session)
+            entry = await dal.create_form_entry(date=date(2025, 1, 15), first_name="Ivan", last_name="Ivanov")
+            await asyncio.sleep(0.1)
+            assert payloads.empty()
+
+            await session.commit()
+
+        payload = json.loads(await asyncio.wait_for(payloads.get(), 5))
+        assert payload.pop("created_at")
+        assert payload == {
+            "op": "INSERT",
+            "id": str(entry.id),
+            "date": "2025-01-15",
+            "first_name": "Ivan",
+            "last_name": "Ivanov",
+            "occurrences": 1,
+        }
+
+    @pytest.mark.asyncio
+    async def test_reconnect(self, pg_listener, db_engine):
+        """Test that listener reconnects after losing connection and tells consumers to resync."""
+        payloads: asyncio.Queue[str | None] = asyncio.Queue()
+        pg_listener.subscribe(FORM_HISTORY_CHANNEL, payloads.put_nowait)
+        pg_listener.start()
+        assert await asyncio.wait_for(payloads.get(), 5) is None
+
+        with db_engine.begin() as connection:
+            connection.execute(
+                text("SELECT pg_terminate_backend(pid) FROM pg_stat_activity WHERE query LIKE 'LISTEN%'")
+            )
+
+        assert await asyncio.wait_for(payloads.get(), 5) is None
+        assert pg_listener.connected
+        with db_engine.begin() as connection:
+            connection.execute(text(f"NOTIFY {FORM_HISTORY_CHANNEL}, 'ping'"))
+        assert await asyncio.wait_for(payloads.get(), 5) == "ping"
@@ -0,0 +1,155 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from project.core.db.postgres.form_history import FormHistoryDAL
+from project.core.db.postgres.partitions import FormHistoryPartitions
+from project.core.db.postgres.partitions import add_months
+from tests.conftest import _get_test_db_url
+from tests.conftest import get_async_session
+
+
+async def _get_partitions(session):
+    result = await session.execute(
+        text(
+            "SELECT child.relname FROM pg_inherits JOIN pg_class child ON child.oid = inhrelid "
+            "WHERE inhparent = 'form_history'::regclass ORDER BY 1"
+        )
+    )
+    return list(result.scalars())
+
+
+async def _explain(session, query):
+    """Plans of all statements the DAL coroutine runs."""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    sync_engine = session.bind.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", capture)
+    try:
+        await query
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", capture)
+    connection = await session.connection()
+    plans = []
+    for statement, parameters in statements:
+        result = await connection.exec_driver_sql(f"EXPLAIN {statement}", parameters)
+        plans.append("\n".join(row[0] for row in result))
+    return plans
+
+
+class TestFormHistoryPartitions:
+    @pytest.mark.asyncio
+    async def test_ensure_partitions(self, sync_session):
+        """Test that monthly partitions are created ahead, and rows of earlier months leave the default partition."""
+        async_session = get_async_session()
+        async with await async_session.__anext__() as session:
+            dal = FormHistoryDAL(session=session)
+            for entry_date in (date(2024, 6, 1), date(2025, 2, 10), date(2025, 2, 11), date(2025, 5, 1)):
+                await dal.create_form_entry(date=entry_date, first_name="Ivan", last_name="Ivanov")
+
+            assert await dal.ensure_partitions(date(2025, 1, 15), date(2025, 3, 1)) == 4
+            assert await dal.ensure_partitions(date(2025, 1, 1), date(2025, 3, 1)) == 0
+            assert await _get_partitions(session) == [
+                "form_history_default",
+                "form_history_y2024m06",
+                "form_history_y2025m01",
+                "form_history_y2025m02",
+                "form_history_y2025m03",
+            ]
+
+            await dal.create_form_entry(date=date(2025, 3, 31), first_name="John", last_name="Smith")
+            result = await session.execute(
+                text("SELECT tableoid::regclass::text, date FROM form_history ORDER BY date")
+            )
+            assert result.all() == [
+                ("form_history_y2024m06", date(2024, 6, 1)),
+                ("form_history_y2025m02", date(2025, 2, 10)),
+                ("form_history_y2025m02", date(2025, 2, 11)),
+                ("form_history_y2025m03", date(2025, 3, 31)),
+                # After the last month of the range
+                ("form_history_default", date(2025, 5, 1)),
+            ]
+            # Moved rows are neither counted again nor lost
+            assert await dal.count_filtered_history(date_filter=date(2025, 12, 31)) == 5
+            await dal.rebuild_counts()
+            assert await dal.count_filtered_history(date_filter=date(2025, 12, 31)) == 5
+            assert await dal.count_previous_entries(date(2025, 3, 1), first_name="Ivan", last_name="Ivanov") == 3
+
+    @pytest.mark.asyncio
+    async def test_archive_partitions(self, sync_session):
+        """Test that old partitions are detached, their rows leave history and counts."""
+        async_session = get_async_session()
+        async with await async_session.__anext__() as session:
+            dal = FormHistoryDAL(session=session)
+            await dal.ensure_partitions(date(2025, 1, 1), date(2025, 3, 1))
+            await dal.create_form_entry(date=date(2025, 1, 10), first_name="Ivan", last_name="Ivanov")
+            await dal.create_form_entry(date=date(2025, 2, 10), first_name="Ivan", last_name="Ivanov")
+            await dal.create_form_entry(date=date(2025, 3, 10), first_name="Ivan", last_name="Ivanov")
+
+            assert await dal.archive_partitions(date(2025, 2, 15)) == ["form_history_archive_y2025m01"]
+
+            assert await _get_partitions(session) == [
+                "form_history_default",
+                "form_history_y2025m02",
+                "form_history_y2025m03",
+            ]
+            assert await dal.count_filtered_history(date_filter=date(2025, 3, 31)) == 2
+            assert await dal.count_previous_entries(date(2025, 3, 10), first_name="Ivan", last_name="Ivanov") == 1
+            archived = await session.execute(text("SELECT count(*) FROM form_history_archive_y2025m01"))
+            assert archived.scalar() == 1
+            # Archived month isn't created again
+            assert await dal.ensure_partitions(date(2025, 1, 1), date(2025, 1, 1)) == 0
+
+    @pytest.mark.asyncio
+    async def test_history_queries_are_pruned(self, sync_session):
+        """Test that history queries filtered by date don't read partitions of later months."""
+        async_session = get_async_session()
+        async with await async_session.__anext__() as session:
+            dal = FormHistoryDAL(session=session)
+            await dal.ensure_partitions(date(2025, 1, 1), date(2025, 3, 1))
+
+            for query in (
+                dal.get_filtered_history(date_filter=date(2025, 1, 20)),
+                dal.get_filtered_history_with_counts(date_filter=date(2025, 1, 20), first_name="Ivan"),
+            ):
+                (plan,) = await _explain(session, query)
+                assert "form_history_y2025m01" in plan
+                assert "form_history_y2025m02" not in plan
+                assert "form_history_y2025m03" not in plan
+
+    @pytest.mark.asyncio
+    async def test_maintain(self, sync_session):
+        """Test that maintenance creates partitions ahead and archives the expired ones."""
+        engine = create_async_engine(_get_test_db_url(sync=False))
+        partitions = FormHistoryPartitions(
+            async_sessionmaker(engine), ahead=2, retention=1, today=lambda: date(2025, 3, 20)
+        )
+        try:
+            assert await partitions.maintain() == (3, [])
+
+            partitions._today = lambda: date(2025, 5, 2)
+            assert await partitions.maintain() == (2, ["form_history_archive_y2025m03"])
+        finally:
+            async with engine.begin() as connection:
+                await connection.execute(text("DROP TABLE IF EXISTS form_history_archive_y2025m03"))
+            await engine.dispose()
+
+
+@pytest.mark.parametrize(
+    "month, months, expected",
+    [
+        (date(2025, 1, 1), 0, date(2025, 1, 1)),
+        (date(2025, 11, 15), 3, date(2026, 2, 1)),
+        (date(2025, 1, 31), -1, date(2024, 12, 1)),
+        (date(2025, 3, 1), -15, date(2023, 12, 1)),
+    ],
+)
+def test_add_months(month, months, expected):
+    assert add_months(month, months) == expected
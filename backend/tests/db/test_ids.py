@@ -0,0 +1,34 @@
+import time
+from unittest.mock import patch
+
+from project.core.db import ids
+from project.core.db.ids import uuid7
+
+
+class TestUUID7:
+    def test_version_and_time(self):
+        """Test that ids are version 7 UUIDs of RFC 9562 starting with the current Unix time in ms."""
+        before = time.time_ns() // 1_000_000
+        value = uuid7()
+        after = time.time_ns() // 1_000_000
+
+        assert value.version == 7
+        assert value.variant == "specified in RFC 4122"
+        assert before <= value.int >> 80 <= after + 1
+
+    def test_increasing(self):
+        """Test that ids are strictly increasing, also within one millisecond."""
+        values = [uuid7() for _ in range(10000)]
+
+        assert values == sorted(values)
+        assert len(set(values)) == len(values)
+
+    def test_counter_exhausted_or_clock_back(self):
+        """Test that ids keep increasing when the counter overflows or the clock goes back."""
+        with patch.object(ids.time, "time_ns", return_value=1_000_000_000_000_000):
+            values = [uuid7() for _ in range(5000)]
+        with patch.object(ids.time, "time_ns", return_value=999_000_000_000_000):
+            values.append(uuid7())
+
+        assert values == sorted(values)
+        assert values[-1].int >> 80 > 1_000_000_000
@@ -0,0 +1,111 @@
+import fcntl
+import os
+from unittest.mock import AsyncMock
+
+import pytest
+
+from project.core.db.spool import Spool
+from project.core.db.spool import SpoolFull
+from project.core.db.spool import _claim
+from project.core.db.spool import _read
+
+
+class TestSpool:
+    @pytest.mark.asyncio
+    async def test_drain(self, tmp_path):
+        """Test that records are drained in order of appending in batches, then segments are deleted and forgotten."""
+        spool = Spool("test_drain", str(tmp_path), max_bytes=1 << 20)
+        ids = [await spool.append({"n": n}) for n in range(5)]
+        apply = AsyncMock()
+        forget = AsyncMock()
+
+        assert spool.pending()
+        assert await spool.drain(apply, forget, batch_size=2) == 5
+
+        batches = [call.args[0] for call in apply.await_args_list]
+        assert [[record.data["n"] for record in batch] for batch in batches] == [[0, 1], [2, 3], [4]]
+        assert [record.id for batch in batches for record in batch] == ids
+        forget.assert_awaited_once_with(ids)
+        assert not spool.pending()
+        assert os.listdir(tmp_path) == []
+
+    @pytest.mark.asyncio
+    async def test_failed_drain_is_replayed(self, tmp_path):
+        """Test that a segment stays until all its records are applied, also for a process started later."""
+        spool = Spool("test_failed_drain", str(tmp_path), max_bytes=1 << 20)
+        await spool.append({"n": 0})
+        await spool.append({"n": 1})
+
+        with pytest.raises(ConnectionRefusedError):
+            await spool.drain(AsyncMock(side_effect=[None, ConnectionRefusedError()]), AsyncMock(), batch_size=1)
+        await spool.stop()
+
+        restarted = Spool("test_failed_drain", str(tmp_path), max_bytes=1 << 20)
+        apply = AsyncMock()
+        assert restarted.pending()
+        assert await restarted.drain(apply, AsyncMock(), batch_size=10) == 2
+        assert [record.data["n"] for record in apply.await_args.args[0]] == [0, 1]
+
+    @pytest.mark.asyncio
+    async def test_segment_written_by_other_process_is_skipped(self, tmp_path):
+        """Test that a segment is drained by others only once its writer has sealed it."""
+        writer = Spool("test_writer", str(tmp_path), max_bytes=1 << 20)
+        drainer = Spool("test_drainer", str(tmp_path), max_bytes=1 << 20)
+        await writer.append({"n": 0})
+
+        assert await drainer.drain(AsyncMock(), AsyncMock(), batch_size=10) == 0
+
+        await writer.stop()
+        assert await drainer.drain(AsyncMock(), AsyncMock(), batch_size=10) == 1
+
+    @pytest.mark.asyncio
+    async def test_new_segment_is_not_claimed_before_locked(self, tmp_path, monkeypatch):
+        """Test that a drainer claiming segments while the writer opens a new one doesn't delete it."""
+        writer = Spool("test_writer", str(tmp_path), max_bytes=1 << 20)
+        drainer = Spool("test_drainer", str(tmp_path), max_bytes=1 << 20)
+        flock = fcntl.flock
+        claimed = []
+
+        def claim_then_flock(fd: int, operation: int) -> None:
+            # A drainer runs between creating the writer's segment and locking it, as `drain()` does
+            if operation == fcntl.LOCK_EX:
+                for path in drainer._segments():
+                    claimed_fd = _claim(path)
+                    if claimed_fd is not None:
+                        claimed.append(_read(claimed_fd, path))
+                        os.unlink(path)
+                        os.close(claimed_fd)
+            flock(fd, operation)
+
+        monkeypatch.setattr(fcntl, "flock", claim_then_flock)
+        await writer.append({"n": 0})
+        monkeypatch.undo()
+        await writer.stop()
+
+        assert claimed == []
+        apply = AsyncMock()
+        assert await drainer.drain(apply, AsyncMock(), batch_size=10) == 1
+        assert apply.await_args.args[0][0].data == {"n": 0}
+
+    @pytest.mark.asyncio
+    async def test_torn_line_is_skipped(self, tmp_path):
+        """Test that a line torn by a crash while appending is skipped and the rest is drained."""
+        spool = Spool("test_torn_line", str(tmp_path), max_bytes=1 << 20)
+        await spool.append({"n": 0})
+        await spool.stop()
+        (path,) = tmp_path.iterdir()
+        with open(path, "ab") as file:
+            file.write(b'{"id":"0192')
+
+        apply = AsyncMock()
+        assert await spool.drain(apply, AsyncMock(), batch_size=10) == 1
+        assert [record.data for record in apply.await_args.args[0]] == [{"n": 0}]
+
+    @pytest.mark.asyncio
+    async def test_full(self, tmp_path):
+        """Test that nothing is appended once the directory holds max bytes."""
+        spool = Spool("test_full", str(tmp_path), max_bytes=200)
+        await spool.append({"n": 0})
+
+        with pytest.raises(SpoolFull):
+            await spool.append({"n": "x" * 200})
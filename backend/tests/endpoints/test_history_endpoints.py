@@ -1,11 +1,31 @@
+import json
+import threading
 from datetime import date
+from datetime import datetime
 from http import HTTPStatus
 from unittest.mock import AsyncMock
+from unittest.mock import Mock
+from uuid import uuid4
 
+import pytest
+
+from project.apps.history.api.v1 import endpoints
+from project.apps.history.api.v1.dependencies import get_form_submissions
+from project.apps.history.api.v1.dependencies import get_history_batch_uc
+from project.apps.history.api.v1.dependencies import get_history_shared_cache
 from project.apps.history.api.v1.dependencies import get_history_uc
 from project.apps.history.api.v1.dependencies import get_submit_form_uc
+from project.apps.history.api.v1.dependencies import get_unique_names_shared_cache
+from project.apps.history.api.v1.dependencies import get_unique_names_uc
+from project.apps.history.api.v1.endpoints import stream_submissions
 from project.core.application import _app
+from project.core.broadcast import Broadcast
+from project.core.cache.shared import SharedMemoryCache
+from project.core.settings import settings
+from project.core.uc.history.dto import FormSubmitted
+from project.core.uc.history.dto import GetHistoryBatchResponse
 from project.core.uc.history.dto import GetHistoryResponse
+from project.core.uc.history.dto import GetUniqueNamesResponse
 from project.core.uc.history.dto import HistoryItem
 from project.core.uc.history.dto import SubmitFormResponse
 
@@ -26,6 +46,18 @@ class TestSubmitForm:
 
         _app.dependency_overrides.pop(get_submit_form_uc)
 
+    def test_queued(self, client):
+        """Test that form spooled while database is unavailable is answered with 202."""
+        mocked_uc = self._get_mocked_uc(SubmitFormResponse(success=True, queued=True))
+        _app.dependency_overrides[get_submit_form_uc] = lambda: mocked_uc
+
+        response = client.post(self._url, json=self._get_data())
+
+        assert response.status_code == HTTPStatus.ACCEPTED
+        assert response.json() == {"success": True, "queued": True}
+
+        _app.dependency_overrides.pop(get_submit_form_uc)
+
     def test_validation_error_first_name_whitespace(self, client):
         """Test validation error when first_name contains whitespace."""
         data = self._get_data()
@@ -198,6 +230,55 @@ class TestGetHistory:
 
         _app.dependency_overrides.pop(get_history_uc)
 
+    def test_stale_response_has_age_header(self, client):
+        """Test that stale response served from cache has `Age` header."""
+        mocked_uc = self._get_mocked_uc(GetHistoryResponse(items=[], total=0, age=12.7))
+        _app.dependency_overrides[get_history_uc] = lambda: mocked_uc
+
+        response = client.get(f"{self._url}?date=2025-01-20")
+
+        assert response.status_code == HTTPStatus.OK
+        assert response.headers["Age"] == "12"
+        assert response.json() == {"items": [], "total": 0}
+
+        _app.dependency_overrides.pop(get_history_uc)
+
+    def test_fresh_response_has_no_age_header(self, client):
+        """Test that response read from database has no `Age` header."""
+        mocked_uc = self._get_mocked_uc(GetHistoryResponse(items=[], total=0))
+        _app.dependency_overrides[get_history_uc] = lambda: mocked_uc
+
+        response = client.get(f"{self._url}?date=2025-01-20")
+
+        assert "Age" not in response.headers
+
+        _app.dependency_overrides.pop(get_history_uc)
+
+    def test_shared_cache(self, client, tmp_path):
+        """Test that rendered history is shared through host-wide cache, and stale one isn't stored."""
+        shared_cache = SharedMemoryCache("test", str(tmp_path / "history.cache"), slots=16, slot_size=1024, ttl=60)
+        mocked_uc = self._get_mocked_uc(GetHistoryResponse(items=[], total=0, age=1.0))
+        _app.dependency_overrides[get_history_uc] = lambda: mocked_uc
+        _app.dependency_overrides[get_history_shared_cache] = lambda: shared_cache
+
+        client.get(f"{self._url}?date=2025-01-20&first_name=Ivan")
+        mocked_uc.execute.return_value = GetHistoryResponse(
+            items=[HistoryItem(date(2025, 1, 20), "Ivan", "Ivanov", 0)], total=1
+        )
+        client.get(f"{self._url}?date=2025-01-20&first_name=Ivan")
+        response = client.get(f"{self._url}?date=2025-01-20&first_name=Ivan")
+
+        assert mocked_uc.execute.await_count == 2
+        assert response.status_code == HTTPStatus.OK
+        assert response.headers["Content-Type"] == "application/json"
+        assert response.json() == {
+            "items": [{"date": "2025-01-20", "first_name": "Ivan", "last_name": "Ivanov", "count": 0}],
+            "total": 1,
+        }
+
+        _app.dependency_overrides.pop(get_history_uc)
+        _app.dependency_overrides.pop(get_history_shared_cache)
+
     def test_missing_date_parameter(self, client):
         """Test error when date parameter is missing."""
         response = client.get(self._url)
@@ -240,3 +321,220 @@ class TestGetHistory:
         mock_uc = AsyncMock()
         mock_uc.execute.return_value = mocked_response
         return mock_uc
+
+
+class TestGetHistoryBatch:
+    _url = "/api/history/batch"
+
+    def test_success(self, client):
+        """Test that results are rendered in the same order as filters."""
+        mocked_uc = self._get_mocked_uc(
+            GetHistoryBatchResponse(
+                results=[
+                    GetHistoryResponse(
+                        items=[HistoryItem(date=date(2025, 1, 20), first_name="Ivan", last_name="Ivanov", count=1)],
+                        total=1,
+                    ),
+                    GetHistoryResponse(items=[], total=0),
+                ]
+            )
+        )
+        _app.dependency_overrides[get_history_batch_uc] = lambda: mocked_uc
+
+        response = client.post(
+            self._url,
+            json={"filters": [{"date": "2025-01-20", "first_name": "Ivan"}, {"date": "2025-01-10"}]},
+        )
+
+        assert response.status_code == HTTPStatus.OK
+        assert response.json() == {
+            "results": [
+                {
+                    "items": [{"date": "2025-01-20", "first_name": "Ivan", "last_name": "Ivanov", "count": 1}],
+                    "total": 1,
+                    "error": None,
+                },
+                {"items": [], "total": 0, "error": None},
+            ]
+        }
+        uc_request = mocked_uc.execute.call_args[0][0]
+        assert [r.date_filter for r in uc_request.requests] == [date(2025, 1, 20), date(2025, 1, 10)]
+        assert uc_request.requests[0].first_name == "Ivan"
+
+        _app.dependency_overrides.pop(get_history_batch_uc)
+
+    def test_item_error(self, client):
+        """Test that failed item is rendered with error next to successful ones."""
+        failed = GetHistoryResponse(items=[], total=0)
+        failed.add_error(ConnectionError("connection refused"))
+        mocked_uc = self._get_mocked_uc(
+            GetHistoryBatchResponse(results=[GetHistoryResponse(items=[], total=3), failed])
+        )
+        _app.dependency_overrides[get_history_batch_uc] = lambda: mocked_uc
+
+        response = client.post(self._url, json={"filters": [{"date": "2025-01-20"}, {"date": "2025-01-10"}]})
+
+        assert response.status_code == HTTPStatus.OK
+        results = response.json()["results"]
+        assert results[0] == {"items": [], "total": 3, "error": None}
+        assert results[1]["total"] == 0
+        assert results[1]["error"].startswith("Internal Server Error")
+
+        _app.dependency_overrides.pop(get_history_batch_uc)
+
+    def test_empty_filters(self, client):
+        """Test validation error when no filters are passed."""
+        response = client.post(self._url, json={"filters": []})
+
+        assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+    def test_invalid_date_in_filter(self, client):
+        """Test validation error when one of filters has invalid date."""
+        response = client.post(self._url, json={"filters": [{"date": "2025-01-20"}, {"date": "invalid-date"}]})
+
+        assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+    @staticmethod
+    def _get_mocked_uc(mocked_response):
+        mock_uc = AsyncMock()
+        mock_uc.execute.return_value = mocked_response
+        return mock_uc
+
+
+class TestGetUniqueNames:
+    _url = "/api/unique-names"
+
+    def test_success(self, client):
+        """Test getting unique names."""
+        mocked_uc = AsyncMock()
+        mocked_uc.execute.return_value = GetUniqueNamesResponse(first_names=["Ivan", "John"], last_names=["Ivanov"])
+        _app.dependency_overrides[get_unique_names_uc] = lambda: mocked_uc
+
+        response = client.get(self._url)
+
+        assert response.status_code == HTTPStatus.OK
+        assert response.json() == {"first_names": ["Ivan", "John"], "last_names": ["Ivanov"]}
+
+        _app.dependency_overrides.pop(get_unique_names_uc)
+
+    def test_shared_cache(self, client, tmp_path):
+        """Test that rendered unique names are shared through host-wide cache."""
+        shared_cache = SharedMemoryCache("test", str(tmp_path / "names.cache"), slots=2, slot_size=1024, ttl=60)
+        mocked_uc = AsyncMock()
+        mocked_uc.execute.return_value = GetUniqueNamesResponse(first_names=["Ivan"], last_names=["Ivanov"])
+        _app.dependency_overrides[get_unique_names_uc] = lambda: mocked_uc
+        _app.dependency_overrides[get_unique_names_shared_cache] = lambda: shared_cache
+
+        client.get(self._url)
+        response = client.get(self._url)
+
+        mocked_uc.execute.assert_awaited_once()
+        assert response.json() == {"first_names": ["Ivan"], "last_names": ["Ivanov"]}
+
+        _app.dependency_overrides.pop(get_unique_names_uc)
+        _app.dependency_overrides.pop(get_unique_names_shared_cache)
+
+    def test_shared_cache_compressed(self, client, tmp_path, monkeypatch):
+        """Test that a compressed variant of cached unique names is cached next to them and compressed only once.
+
+        Compression runs in a thread, off the event loop, and a variant is never served for another cached body.
+        """
+        shared_cache = SharedMemoryCache("test", str(tmp_path / "names.cache"), slots=4, slot_size=65536, ttl=60)
+        first_names = [f"Name{i}" for i in range(500)]
+        loop_threads, compress_threads = [], []
+        mocked_uc = AsyncMock()
+        mocked_uc.execute.side_effect = lambda: loop_threads.append(threading.get_ident()) or GetUniqueNamesResponse(
+            first_names=first_names, last_names=["Ivanov"]
+        )
+        _app.dependency_overrides[get_unique_names_uc] = lambda: mocked_uc
+        _app.dependency_overrides[get_unique_names_shared_cache] = lambda: shared_cache
+        compress = endpoints.compress
+        compressed = Mock(side_effect=lambda *args: compress_threads.append(threading.get_ident()) or compress(*args))
+        monkeypatch.setattr(endpoints, "compress", compressed)
+
+        responses = [client.get(self._url, headers={"Accept-Encoding": "gzip"}) for _ in range(3)]
+
+        mocked_uc.execute.assert_awaited_once()
+        compressed.assert_called_once()
+        assert len(compress_threads) == 1 and compress_threads != loop_threads
+        for response in responses:
+            assert response.headers["Content-Encoding"] == "gzip"
+            assert response.json() == {"first_names": first_names, "last_names": ["Ivanov"]}
+
+        # Another worker caches a new body of the same size, its variant is compressed anew
+        body = json.dumps({"first_names": first_names, "last_names": ["Petrov"]}, separators=(",", ":")).encode()
+        endpoints._put_cached_body(shared_cache, endpoints._UNIQUE_NAMES_CACHE_KEY, body, shared_cache.generation)
+        response = client.get(self._url, headers={"Accept-Encoding": "gzip"})
+
+        assert compressed.call_count == 2
+        assert response.json() == {"first_names": first_names, "last_names": ["Petrov"]}
+
+        _app.dependency_overrides.pop(get_unique_names_uc)
+        _app.dependency_overrides.pop(get_unique_names_shared_cache)
+
+
+class TestStreamHistory:
+    _url = "/api/history/stream"
+
+    @pytest.mark.asyncio
+    async def test_stream_submissions(self):
+        """Test that committed submissions are streamed as server-sent events."""
+        submissions = Broadcast[FormSubmitted]("test_stream")
+        stream = stream_submissions(submissions, None, queue_size=10, heartbeat=60)
+
+        assert await stream.__anext__() == b"retry: 3000\n\n"
+        event = self._get_event()
+        submissions.publish(event)
+
+        lines = (await stream.__anext__()).decode().splitlines()
+        assert lines[:2] == ["event: submission", f"id: {event.id}"]
+        assert json.loads(lines[2].removeprefix("data: ")) == {
+            "id": str(event.id),
+            "date": "2025-01-15",
+            "first_name": "Ivan",
+            "last_name": "Ivanov",
+            "created_at": "2025-01-15T10:00:00",
+            "occurrence": 1,
+        }
+
+        await stream.aclose()
+        assert len(submissions) == 0
+
+    @pytest.mark.asyncio
+    async def test_heartbeat_and_overflow(self):
+        """Test that idle stream sends heartbeats and slow client is disconnected."""
+        submissions = Broadcast[FormSubmitted]("test_stream_overflow")
+        stream = stream_submissions(submissions, None, queue_size=1, heartbeat=0.01)
+        await stream.__anext__()
+
+        assert await stream.__anext__() == b": heartbeat\n\n"
+
+        submissions.publish(self._get_event())
+        submissions.publish(self._get_event())
+
+        assert await stream.__anext__() == b"event: overflow\ndata: {}\n\n"
+        with pytest.raises(StopAsyncIteration):
+            await stream.__anext__()
+        assert len(submissions) == 0
+
+    def test_too_many_clients(self, client, monkeypatch):
+        """Test that streaming clients are limited per worker."""
+        monkeypatch.setattr(settings, "history_stream_max_subscribers", 0)
+        _app.dependency_overrides[get_form_submissions] = lambda: Broadcast[FormSubmitted]("test_stream_limit")
+
+        response = client.get(self._url)
+
+        assert response.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+        assert response.headers["Retry-After"] == "5"
+
+        _app.dependency_overrides.pop(get_form_submissions)
+
+    @staticmethod
+    def _get_event():
+        return FormSubmitted(
+            id=uuid4(),
+            date=date(2025, 1, 15),
+            first_name="Ivan",
+            last_name="Ivanov",
+            created_at=datetime(2025, 1, 15, 10),
+        )
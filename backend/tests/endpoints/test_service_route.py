@@ -1,8 +1,54 @@
 from http import HTTPStatus
 
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from project.apps.service.api.v1.profiling import route as profiling
+from project.core.settings import settings
+
 
 def test_health_route(client):
     url = _get_url = "/api/v1/health"
     response = client.get(url)
     assert response.status_code == HTTPStatus.OK, response.json()
     assert response.json() == {"message": "pong"}
+
+
+def test_metrics_route(client):
+    url = "/metrics"
+    response = client.get(url)
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "# TYPE singleflight_calls_total counter" in response.text
+
+
+def test_profiling_routes(monkeypatch):
+    app = FastAPI()
+    app.include_router(profiling)
+    client = TestClient(app)
+    monkeypatch.setattr(settings, "profiling_token", "secret")
+    headers = {"Authorization": "Bearer secret"}
+
+    assert client.get("/api/v1/profiling/cpu").status_code == HTTPStatus.UNAUTHORIZED
+
+    response = client.get("/api/v1/profiling/cpu", params={"seconds": 0.05}, headers=headers)
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers["content-disposition"].endswith('.folded"')
+
+    response = client.post("/api/v1/profiling/memory/snapshot", params={"top": 3}, headers=headers)
+    assert response.status_code == HTTPStatus.OK
+    assert len(response.json()["top"]) <= 3
+    assert client.delete("/api/v1/profiling/memory", headers=headers).status_code == HTTPStatus.NO_CONTENT
+
+
+def test_profiling_routes_disabled(client):
+    assert client.get("/api/v1/profiling/cpu").status_code == HTTPStatus.NOT_FOUND
+
+
+def test_ready_route(client):
+    url = "/api/v1/ready"
+    # Lifespan isn't run by the test client, the database is never probed
+    response = client.get(url)
+    assert response.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    assert response.json()["ready"] is False
+    assert response.json()["checks"]["database"]["error"] == "not probed yet"
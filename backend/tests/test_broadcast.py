@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+from project.core.broadcast import Broadcast
+from project.core.broadcast import SubscriptionOverflow
+
+
+class TestBroadcast:
+    @pytest.mark.asyncio
+    async def test_publish_to_all_subscribers(self):
+        """Test that every subscriber gets every message in order."""
+        broadcast = Broadcast[int]("test_all")
+        first = broadcast.subscribe(queue_size=10)
+        second = broadcast.subscribe(queue_size=10)
+
+        broadcast.publish(1)
+        broadcast.publish(2)
+
+        assert [await first.get(), await first.get()] == [1, 2]
+        assert [await second.get(), await second.get()] == [1, 2]
+
+    @pytest.mark.asyncio
+    async def test_predicate(self):
+        """Test that subscriber gets only messages matching its predicate."""
+        broadcast = Broadcast[int]("test_predicate")
+        subscription = broadcast.subscribe(queue_size=10, predicate=lambda m: m % 2 == 0)
+
+        for message in range(5):
+            broadcast.publish(message)
+
+        assert [await subscription.get() for _ in range(3)] == [0, 2, 4]
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(subscription.get(), 0.01)
+
+    @pytest.mark.asyncio
+    async def test_slow_subscriber_is_dropped(self):
+        """Test that overflowed subscriber is unsubscribed and doesn't affect others."""
+        broadcast = Broadcast[int]("test_overflow")
+        slow = broadcast.subscribe(queue_size=2)
+        fast = broadcast.subscribe(queue_size=10)
+
+        for message in range(3):
+            broadcast.publish(message)
+
+        assert len(broadcast) == 1
+        with pytest.raises(SubscriptionOverflow):
+            await slow.get()
+        assert [await fast.get() for _ in range(3)] == [0, 1, 2]
+
+    def test_unsubscribe(self):
+        """Test that unsubscribed subscriber doesn't get messages."""
+        broadcast = Broadcast[int]("test_unsubscribe")
+        subscription = broadcast.subscribe(queue_size=1)
+
+        broadcast.unsubscribe(subscription)
+        broadcast.publish(1)
+        broadcast.publish(2)
+
+        assert len(broadcast) == 0
+        assert not subscription.overflowed
@@ -0,0 +1,101 @@
+import os
+from typing import Any
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+
+from project.core.capture import RequestCapture
+from project.core.capture import RequestCaptureMiddleware
+from project.core.capture import capture_files
+from project.core.capture import read_capture
+
+
+def make_app(capture: RequestCapture) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/api/submit")
+    async def submit(body: dict[str, Any]) -> dict[str, Any]:
+        return {"success": True}
+
+    @app.get("/api/history/stream")
+    async def stream() -> StreamingResponse:
+        return StreamingResponse(iter([b"data: 1\n\n"]), media_type="text/event-stream")
+
+    @app.get("/metrics")
+    async def metrics() -> dict[str, Any]:
+        return {}
+
+    app.add_middleware(RequestCaptureMiddleware, capture=capture)
+    return app
+
+
+def make_capture(directory: str, **kwargs) -> RequestCapture:
+    params = dict(sample_rate=1.0, paths=["/api/"], max_body=1024, max_file_bytes=1 << 20, files=10) | kwargs
+    return RequestCapture(directory, **params)  # type: ignore[arg-type]
+
+
+class TestRequestCapture:
+    @pytest.mark.asyncio
+    async def test_capture(self, tmp_path):
+        """Test that requests to captured paths are written with their bodies, statuses and durations."""
+        capture = make_capture(str(tmp_path))
+        transport = httpx.ASGITransport(app=make_app(capture))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            await client.post("/api/submit?source=form", json={"first_name": "Иван"})
+            await client.get("/api/history/stream")
+            await client.get("/metrics")
+        await capture.stop()
+
+        [path] = capture_files(str(tmp_path))
+        [request] = list(read_capture(path))
+        assert (request.method, request.path, request.query) == ("POST", "/api/submit", "source=form")
+        assert request.content_type == "application/json"
+        assert request.body.decode() == '{"first_name":"Иван"}'
+        assert request.status == 200
+        assert request.duration > 0
+        assert os.stat(path).st_mode & 0o777 == 0o600
+
+    @pytest.mark.asyncio
+    async def test_body_over_limit_is_skipped(self, tmp_path):
+        """Test that a request with a body over the limit isn't captured."""
+        capture = make_capture(str(tmp_path), max_body=10)
+        transport = httpx.ASGITransport(app=make_app(capture))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post("/api/submit", json={"first_name": "I" * 20})
+        await capture.stop()
+
+        assert response.status_code == 200
+        assert capture_files(str(tmp_path)) == []
+
+    @pytest.mark.asyncio
+    async def test_rotation(self, tmp_path):
+        """Test that a new file is started after the size limit and only the last files are kept."""
+        capture = make_capture(str(tmp_path), max_file_bytes=1, files=2)
+        transport = httpx.ASGITransport(app=make_app(capture))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            for n in range(3):
+                await client.post("/api/submit", json={"n": n})
+                await capture.flush()
+        await capture.stop()
+
+        files = sorted(capture_files(str(tmp_path)))
+        assert [request.body for path in files for request in read_capture(path)] == [b'{"n":1}', b'{"n":2}']
+
+    @pytest.mark.asyncio
+    async def test_read_file_cut_off(self, tmp_path):
+        """Test that requests written before a file was cut off (by a crash while writing) are read."""
+        capture = make_capture(str(tmp_path))
+        transport = httpx.ASGITransport(app=make_app(capture))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            for n in range(3):
+                await client.post("/api/submit", json={"n": n})
+                await capture.flush()
+                if n == 1:
+                    [path] = capture_files(str(tmp_path))
+                    size = os.path.getsize(path)
+
+        os.truncate(path, size + 5)
+        assert [request.body for request in read_capture(path)] == [b'{"n":0}', b'{"n":1}']
+        await capture.stop()
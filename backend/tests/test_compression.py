@@ -0,0 +1,82 @@
+import asyncio
+import gzip
+import zlib
+from typing import Any
+
+import pytest
+from starlette.responses import PlainTextResponse
+from starlette.responses import StreamingResponse
+
+from project.core.compression import CompressionMiddleware
+from project.core.compression import negotiate
+
+BODY = b"history " * 200
+
+
+async def call(app, accept_encoding: str = "gzip") -> list[Any]:
+    """Messages sent by the middleware around the app."""
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": [(b"accept-encoding", accept_encoding.encode())]}
+    messages = []
+
+    async def receive() -> Any:
+        # The client stays connected
+        await asyncio.Event().wait()
+
+    async def send(message: Any) -> None:
+        messages.append(message)
+
+    await CompressionMiddleware(app, minimum_size=100, encodings=["gzip"])(scope, receive, send)
+    return messages
+
+
+def test_negotiate():
+    """Test that our order of encodings wins, and encodings with q=0 or not listed (without `*`) aren't used."""
+    encodings = ("zstd", "br", "gzip")
+
+    assert negotiate("gzip, br;q=0.5", encodings) == "br"
+    assert negotiate("gzip, br;q=0", encodings) == "gzip"
+    assert negotiate("identity", encodings) is None
+    assert negotiate("*;q=0.1, zstd;q=0", encodings) == "br"
+    assert negotiate(None, encodings) is None
+
+
+class TestCompressionMiddleware:
+    @pytest.mark.asyncio
+    async def test_complete_body(self):
+        """Test that a complete body is compressed with its length, and a body below the minimum size is sent as is."""
+        start, body = await call(PlainTextResponse(BODY))
+        headers = dict(start["headers"])
+
+        assert headers[b"content-encoding"] == b"gzip"
+        assert headers[b"vary"] == b"Accept-Encoding"
+        assert int(headers[b"content-length"]) == len(body["body"])
+        assert gzip.decompress(body["body"]) == BODY
+
+        start, body = await call(PlainTextResponse(b"short"))
+        assert b"content-encoding" not in dict(start["headers"])
+        assert body["body"] == b"short"
+
+        start, body = await call(PlainTextResponse(BODY), accept_encoding="identity")
+        assert body["body"] == BODY
+
+    @pytest.mark.asyncio
+    async def test_streaming_body(self):
+        """Test that every chunk of a streamed body is compressed and flushed, and event streams are sent as is."""
+
+        async def chunks():
+            yield BODY
+            yield b"end"
+
+        start, *bodies = await call(StreamingResponse(chunks()))
+        headers = dict(start["headers"])
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+        assert headers[b"content-encoding"] == b"gzip"
+        assert b"content-length" not in headers
+        assert decompressor.decompress(bodies[0]["body"]) == BODY
+        assert decompressor.decompress(b"".join(b["body"] for b in bodies[1:])) == b"end"
+        assert decompressor.eof
+
+        start, *bodies = await call(StreamingResponse(chunks(), media_type="text/event-stream"))
+        assert b"content-encoding" not in dict(start["headers"])
+        assert b"".join(b["body"] for b in bodies) == BODY + b"end"
@@ -0,0 +1,130 @@
+import json
+from datetime import date
+from datetime import datetime
+from unittest.mock import MagicMock
+from unittest.mock import patch
+from uuid import uuid4
+
+from project.apps.history.notifications import on_form_history_change
+from project.core.broadcast import Broadcast
+from project.core.cache.shared import SharedMemoryCache
+from project.core.cache.swr import StaleWhileRevalidate
+from project.core.uc.history.dto import FormSubmitted
+
+_path_to_tested = "project.apps.history.notifications"
+
+
+class TestOnFormHistoryChange:
+    def test_insert(self):
+        """Test that inserted row invalidates affected history and is streamed."""
+        history_swr = self._get_swr([(date(2025, 1, 15), None, None), (date(2025, 1, 10), None, None)])
+        unique_names_swr = self._get_swr(["unique_names"])
+        submissions = Broadcast[FormSubmitted]("test_notifications")
+        subscription = submissions.subscribe(queue_size=10)
+        row_id = uuid4()
+
+        with (
+            patch(f"{_path_to_tested}.history_swr", history_swr),
+            patch(f"{_path_to_tested}.unique_names_swr", unique_names_swr),
+            patch(f"{_path_to_tested}.form_submissions", submissions),
+        ):
+            on_form_history_change(self._get_payload("INSERT", row_id))
+
+        assert list(history_swr._entries) == [(date(2025, 1, 10), None, None)]
+        assert not unique_names_swr._entries
+        event = subscription._queue.get_nowait()
+        assert (event.id, event.date, event.first_name) == (row_id, date(2025, 1, 12), "Ivan")
+
+    def test_insert_shared_cache(self, tmp_path):
+        """Test that inserted row drops affected history from the host-wide cache, compressed variants too."""
+        history_cache = SharedMemoryCache("test", str(tmp_path / "history.cache"), slots=16, slot_size=256, ttl=60)
+        keys = {
+            b'["2025-01-15", null, null]': True,
+            b'["2025-01-15", null, null]\0gzip;0badf00d': True,
+            b'["2025-01-15", "John", null]': False,
+            b'["2025-01-10", null, null]': False,
+            b'["2025-01-12", "Ivan", "Ivanov"]': True,
+        }
+        for key in keys:
+            history_cache.put(key, b"[]", history_cache.generation)
+
+        with patch(f"{_path_to_tested}.history_shared_cache", history_cache):
+            on_form_history_change(self._get_payload("INSERT", uuid4()))
+
+        assert {key: history_cache.get(key) is None for key in keys} == keys
+
+    def test_repeated_submission(self):
+        """Test that repeated submission is streamed and applied to the replica with occurrences of the row."""
+        submissions = Broadcast[FormSubmitted]("test_notifications_repeat")
+        subscription = submissions.subscribe(queue_size=10)
+        replica = MagicMock()
+        payload = json.loads(self._get_payload("INSERT", uuid4()))
+
+        with (
+            patch(f"{_path_to_tested}.form_submissions", submissions),
+            patch(f"{_path_to_tested}.history_replica", replica),
+        ):
+            on_form_history_change(json.dumps({**payload, "occurrences": 3, "updated_at": "2025-01-13T10:00:00"}))
+
+        event = subscription._queue.get_nowait()
+        assert event.first_name == "Ivan"
+        # Not the id of the row, which was streamed with its first submission
+        assert event.event_id == f"{payload['id']}.3"
+        assert event.created_at == datetime(2025, 1, 13, 10)
+        assert replica.apply.call_args.args[0][0].occurrences == 3
+        replica.request_reload.assert_not_called()
+
+    def test_delete_is_not_streamed(self):
+        """Test that deleted row invalidates caches but isn't streamed as a submission."""
+        submissions = Broadcast[FormSubmitted]("test_notifications_delete")
+        subscription = submissions.subscribe(queue_size=10)
+
+        with patch(f"{_path_to_tested}.form_submissions", submissions):
+            on_form_history_change(self._get_payload("DELETE", uuid4()))
+
+        assert subscription._queue.empty()
+
+    def test_resync(self):
+        """Test that all cached values are dropped when notifications might have been missed."""
+        history_swr = self._get_swr([(date(2025, 1, 10), "John", None)])
+        history_cache = MagicMock()
+
+        with (
+            patch(f"{_path_to_tested}.history_swr", history_swr),
+            patch(f"{_path_to_tested}.history_shared_cache", history_cache),
+        ):
+            on_form_history_change(None)
+
+        assert not history_swr._entries
+        history_cache.invalidate.assert_called_once_with()
+
+    def test_partitions_archived(self):
+        """Test that replica is reloaded when many rows are gone at once, but not on resync."""
+        replica = MagicMock()
+
+        with patch(f"{_path_to_tested}.history_replica", replica):
+            on_form_history_change(None)
+            replica.request_reload.assert_not_called()
+
+            on_form_history_change("")
+            replica.request_reload.assert_called_once_with()
+
+    @staticmethod
+    def _get_swr(keys):
+        swr = StaleWhileRevalidate("test_notifications", capacity=10, max_staleness=60, latency_budget=1)
+        for key in keys:
+            swr._entries[key] = object()
+        return swr
+
+    @staticmethod
+    def _get_payload(op, row_id):
+        return json.dumps(
+            {
+                "op": op,
+                "id": str(row_id),
+                "date": "2025-01-12",
+                "first_name": "Ivan",
+                "last_name": "Ivanov",
+                "created_at": "2025-01-12T10:00:00.123456+00:00",
+            }
+        )
@@ -0,0 +1,87 @@
+import json
+import logging
+
+import httpx
+import pytest
+from starlette.responses import PlainTextResponse
+
+from project.core.log import AccessLogMiddleware
+from project.core.log import EndpointFilter
+from project.core.log import JSONFormatter
+
+
+def access_record(path: str) -> logging.LogRecord:
+    return logging.LogRecord(
+        "uvicorn.access", logging.INFO, "", 0, '%s - "%s %s HTTP/%s" %d', ("1.2.3.4:5", "GET", path, "1.1", 200), None
+    )
+
+
+async def echo_status(scope, receive, send) -> None:
+    status = int(scope["path"].rsplit("/", 1)[1])
+    await PlainTextResponse("", status_code=status)(scope, receive, send)
+
+
+class TestEndpointFilter:
+    def test_filter(self):
+        """Test that records are dropped by the path of the request, regardless of its query."""
+        endpoint_filter = EndpointFilter(path="/health")
+
+        assert not endpoint_filter.filter(access_record("/api/v1/health"))
+        assert not endpoint_filter.filter(access_record("/api/v1/health?verbose=1"))
+        assert endpoint_filter.filter(access_record("/api/health/history"))
+
+
+class TestJSONFormatter:
+    def test_format(self):
+        """Test that a record is a JSON line with its extra fields."""
+        record = logging.makeLogRecord(
+            {"name": "project.access", "levelname": "INFO", "msg": "GET %s", "args": ("/api/history",), "status": 200}
+        )
+
+        data = json.loads(JSONFormatter().format(record))
+
+        assert data["logger"] == "project.access"
+        assert data["message"] == "GET /api/history"
+        assert data["status"] == 200
+        assert "args" not in data
+
+
+class TestAccessLogMiddleware:
+    def test_rate(self):
+        """Test that the greater of rates of the longest matching path prefix and of the status class is used."""
+        middleware = AccessLogMiddleware(
+            echo_status,
+            default_rate=0.5,
+            path_rates={"/api": 0.1, "/api/history": 0.0},
+            status_rates={"5xx": 1.0},
+            exclude_paths=[],
+        )
+
+        assert middleware.rate("/metrics", 200) == 0.5
+        assert middleware.rate("/api/v1/health", 200) == 0.1
+        assert middleware.rate("/api/history", 200) == 0.0
+        assert middleware.rate("/api/history", 503) == 1.0
+
+    @pytest.mark.asyncio
+    async def test_sampled_requests_are_logged(self, caplog):
+        """Test that sampled out and excluded requests aren't logged, and the rest are logged with their fields."""
+        middleware = AccessLogMiddleware(
+            echo_status,
+            default_rate=0.0,
+            path_rates={},
+            status_rates={"4xx": 1.0},
+            exclude_paths=["/status/404"],
+        )
+        transport = httpx.ASGITransport(app=middleware)
+
+        with caplog.at_level(logging.INFO, logger="project.access"):
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                await client.get("/status/200")
+                await client.get("/status/404")
+                await client.get("/status/422", params={"page": 2})
+
+        [record] = caplog.records
+        assert record.getMessage() == "GET /status/422 422"
+        assert record.status == 422
+        assert record.query == "page=2"
+        assert record.duration_ms >= 0
@@ -0,0 +1,49 @@
+import asyncio
+import logging
+import time
+
+import pytest
+
+from project.core.loop_monitor import EventLoopMonitor
+from project.core.loop_monitor import loop_blocks
+from project.core.loop_monitor import loop_lag
+
+
+def block_loop(seconds: float) -> None:
+    time.sleep(seconds)
+
+
+class TestEventLoopMonitor:
+    @pytest.mark.asyncio
+    async def test_lag(self):
+        """Test that lag of the loop is observed continuously."""
+        monitor = EventLoopMonitor(interval=0.01, block_threshold=1.0)
+        observed = loop_lag.get_count()
+        monitor.start()
+        await asyncio.sleep(0.1)
+        await monitor.stop()
+
+        assert loop_lag.get_count() - observed >= 5
+
+    @pytest.mark.asyncio
+    async def test_block_is_logged(self, caplog):
+        """Test that a block longer than the threshold is logged once with the stack, task and route blocking it."""
+        monitor = EventLoopMonitor(interval=0.01, block_threshold=0.1)
+        blocks = loop_blocks.get()
+
+        async def handle_request() -> None:
+            monitor.routes[asyncio.current_task()] = "GET /api/history"
+            await asyncio.sleep(0.05)
+            block_loop(0.4)
+
+        monitor.start()
+        with caplog.at_level(logging.WARNING, logger="project.core.loop_monitor"):
+            await asyncio.create_task(handle_request(), name="request")
+            await asyncio.sleep(0.05)
+        await monitor.stop()
+
+        assert loop_blocks.get() == blocks + 1
+        [record] = caplog.records
+        message = record.getMessage()
+        assert "by task request (GET /api/history)" in message
+        assert "in block_loop" in message
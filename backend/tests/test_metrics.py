@@ -0,0 +1,44 @@
+import pytest
+
+from project.core.metrics import MetricsRegistry
+
+
+class TestMetricsRegistry:
+    def test_render_counter_and_gauge(self):
+        """Test Prometheus text format of counters and gauges."""
+        registry = MetricsRegistry()
+        counter = registry.counter("requests_total", "Requests.", labelnames=("route",))
+        gauge = registry.gauge("pool_size", "Pool size.")
+        counter.inc(route="/api/history")
+        counter.inc(2, route="/api/history")
+        gauge.set_function(lambda: 30)
+
+        lines = registry.render().splitlines()
+
+        assert "# TYPE requests_total counter" in lines
+        assert 'requests_total{route="/api/history"} 3' in lines
+        assert "pool_size 30" in lines
+
+    def test_render_histogram(self):
+        """Test that histogram buckets are cumulative."""
+        registry = MetricsRegistry()
+        histogram = registry.histogram("lag_seconds", "Lag.", buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 2.0):
+            histogram.observe(value)
+
+        lines = registry.render().splitlines()
+
+        assert 'lag_seconds_bucket{le="0.1"} 2' in lines
+        assert 'lag_seconds_bucket{le="1"} 3' in lines
+        assert 'lag_seconds_bucket{le="+Inf"} 4' in lines
+        assert "lag_seconds_count 4" in lines
+        assert "lag_seconds_sum 2.65" in lines
+
+    def test_register_twice(self):
+        """Test that metric with the same name is reused, but can't change its type."""
+        registry = MetricsRegistry()
+        counter = registry.counter("calls_total", "Calls.")
+
+        assert registry.counter("calls_total", "Calls.") is counter
+        with pytest.raises(ValueError):
+            registry.gauge("calls_total", "Calls.")
@@ -0,0 +1,77 @@
+import json
+import logging
+
+import httpx
+import pytest
+
+from project.core.exceptions import FormFieldError
+from project.core.exceptions import MultipleFormFieldError
+from project.core.middlewares import ExceptionTraceHandlerMiddleware
+
+logger = logging.getLogger(__name__)
+
+
+async def request(app) -> httpx.Response:
+    transport = httpx.ASGITransport(app=ExceptionTraceHandlerMiddleware(app, logger), raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.post("/api/submit")
+
+
+class TestExceptionTraceHandlerMiddleware:
+    @pytest.mark.asyncio
+    async def test_application_error_bodies(self):
+        """Test that application errors are answered with their statuses and bodies, the same ones every time."""
+        errors = [
+            FormFieldError(field_name="first_name", error_message="No whitespace in first_name is allowed"),
+            MultipleFormFieldError(field_errors={"first_name": "Bad first name", "last_name": "Bad last name"}),
+        ]
+
+        async def fail(scope, receive, send) -> None:
+            raise errors[0]
+
+        first = await request(fail)
+        second = await request(fail)
+        errors.pop(0)
+        multiple = await request(fail)
+
+        assert first.status_code == second.status_code == 400
+        assert first.headers["content-type"] == "application/json"
+        assert first.json() == {"success": False, "error": {"first_name": ["No whitespace in first_name is allowed"]}}
+        assert second.content == first.content
+        assert multiple.json() == {
+            "success": False,
+            "error": {"first_name": ["Bad first name"], "last_name": ["Bad last name"]},
+        }
+
+    @pytest.mark.asyncio
+    async def test_exception_group(self, caplog):
+        """Test that an application error in a group is preferred to other exceptions of the group."""
+
+        async def fail(scope, receive, send) -> None:
+            raise ExceptionGroup(
+                "task group",
+                [RuntimeError("Unexpected"), ExceptionGroup("nested", [FormFieldError("last_name", "Bad last name")])],
+            )
+
+        with caplog.at_level(logging.INFO, logger=__name__):
+            response = await request(fail)
+
+        assert response.status_code == 400
+        assert response.json()["error"] == {"last_name": ["Bad last name"]}
+        [record] = caplog.records
+        assert record.levelno == logging.INFO
+
+    @pytest.mark.asyncio
+    async def test_server_error(self, caplog):
+        """Test that an unexpected error is logged once and answered with 500 without its location."""
+
+        async def fail(scope, receive, send) -> None:
+            raise RuntimeError("Unexpected")
+
+        with caplog.at_level(logging.INFO, logger=__name__):
+            response = await request(fail)
+
+        assert response.status_code == 500
+        assert json.loads(response.content) == {"success": False, "error": {"server_error": ["Internal Server Error"]}}
+        [record] = caplog.records
+        assert record.exc_info
@@ -0,0 +1,68 @@
+import asyncio
+import time
+
+import pytest
+
+from project.core.profiling import AllocationTracker
+from project.core.profiling import ProfilerBusy
+from project.core.profiling import SamplingProfiler
+
+_kept: list[bytes] = []
+
+
+def spin(seconds: float) -> None:
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def allocate() -> None:
+    _kept.extend(bytes(1024) for _ in range(1000))
+
+
+class TestSamplingProfiler:
+    @pytest.mark.asyncio
+    async def test_profile(self):
+        """Test that stacks of a busy thread are collapsed from the thread to the innermost function."""
+        profiler = SamplingProfiler()
+        stacks = await asyncio.gather(profiler.profile(0.2, interval=0.001), asyncio.to_thread(spin, 0.15))
+
+        lines = stacks[0].splitlines()
+        busy = [line for line in lines if line.rsplit(" ", 1)[0].endswith(f"{__name__}:spin")]
+        assert busy
+        assert all(int(line.rsplit(" ", 1)[1]) > 0 for line in lines)
+        assert not profiler.active
+
+    @pytest.mark.asyncio
+    async def test_profile_requests(self):
+        """Test that a profile limited by requests ends once they are handled, and only one profile runs at a time."""
+        profiler = SamplingProfiler()
+        profile = asyncio.create_task(profiler.profile(10, requests=2))
+        await asyncio.sleep(0.01)
+
+        with pytest.raises(ProfilerBusy):
+            await profiler.profile(1)
+        profiler.request_handled()
+        profiler.request_handled()
+
+        await asyncio.wait_for(profile, 1)
+        assert not profiler.active
+
+
+class TestAllocationTracker:
+    def test_snapshot_growth(self):
+        """Test that the second snapshot shows allocation growth since the first one, and stop ends tracing."""
+        tracker = AllocationTracker(frames=1)
+        try:
+            first = tracker.snapshot(top=5)
+            allocate()
+            second = tracker.snapshot(top=5)
+        finally:
+            tracker.stop()
+            _kept.clear()
+
+        assert not first["compared_with_previous"]
+        assert second["compared_with_previous"]
+        [top] = second["top"][:1]
+        assert top["traceback"][0].startswith(__file__)
+        assert top["size_diff"] >= 1000 * 1024
@@ -0,0 +1,80 @@
+import json
+import logging
+from typing import Any
+
+import httpx
+import pytest
+from fastapi import APIRouter
+from fastapi import FastAPI
+
+from project.apps.routing import TimedAPIRoute
+from project.core.timing import ServerTimingMiddleware
+from project.core.timing import span
+from project.core.timing import timed
+
+
+@timed
+async def load() -> int:
+    with span("db.query"):
+        pass
+    with span("db.query"):
+        pass
+    return 1
+
+
+def make_app(header: bool, slow_threshold: float | None) -> FastAPI:
+    app = FastAPI()
+    router = APIRouter(route_class=TimedAPIRoute)
+
+    @router.get("/api/items")
+    async def items(limit: int) -> dict[str, Any]:
+        return {"items": await load()}
+
+    app.include_router(router)
+    app.add_middleware(ServerTimingMiddleware, sample_rate=1.0, header=header, slow_threshold=slow_threshold)
+    return app
+
+
+def server_timing_names(value: str) -> list[str]:
+    return [metric.split(";")[0] for metric in value.split(", ")]
+
+
+class TestServerTiming:
+    @pytest.mark.asyncio
+    async def test_header(self):
+        """Test that spans of a request are summed by name in Server-Timing header."""
+        transport = httpx.ASGITransport(app=make_app(header=True, slow_threshold=None))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.get("/api/items", params={"limit": 10})
+
+        assert response.json() == {"items": 1}
+        assert server_timing_names(response.headers["Server-Timing"]) == [
+            "db.query",
+            "endpoint",
+            "load",
+            "route",
+            "validation",
+            "total",
+        ]
+
+    @pytest.mark.asyncio
+    async def test_slow_request_is_logged(self, caplog):
+        """Test that the span tree of a slow request is logged, without the header unless it's enabled."""
+        transport = httpx.ASGITransport(app=make_app(header=False, slow_threshold=0.0))
+        with caplog.at_level(logging.WARNING, logger="project.core.timing"):
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                response = await client.get("/api/items", params={"limit": 10})
+
+        assert "Server-Timing" not in response.headers
+        [record] = caplog.records
+        log = json.loads(record.getMessage().removeprefix("Slow request "))
+        assert (log["path"], log["status"]) == ("/api/items", 200)
+        [route] = log["children"]
+        assert [child["name"] for child in route["children"]] == ["validation", "endpoint"]
+        [load_span] = route["children"][1]["children"]
+        assert [child["name"] for child in load_span["children"]] == ["db.query", "db.query"]
+
+    @pytest.mark.asyncio
+    async def test_spans_outside_of_request(self):
+        """Test that timed code works as usual without a timed request."""
+        assert await load() == 1
@@ -0,0 +1,29 @@
+from project.core.uc.base import SlotsUCResponse
+from project.core.uc.base import UCResponse
+
+
+class TestSlotsUCResponse:
+    def test_errors_contract_matches_pydantic_response(self):
+        """Test that slots response behaves like pydantic UCResponse."""
+        for response in (UCResponse(), SlotsUCResponse()):
+            assert not response.has_errors()
+            assert bool(response) is True
+            assert response.first_error is None
+
+            error = ValueError("first_name: No whitespace in first_name is allowed")
+            response.add_error(error)
+
+            assert response.has_errors()
+            assert bool(response) is False
+            assert response.first_error is error
+
+    def test_errors_are_not_shared_between_instances(self):
+        """Test that default errors list is created per instance."""
+        first = SlotsUCResponse()
+        first.add_error(ValueError("error"))
+
+        assert SlotsUCResponse().errors == []
+
+    def test_has_no_instance_dict(self):
+        """Test that response is slots-based."""
+        assert not hasattr(SlotsUCResponse(), "__dict__")
@@ -1,13 +1,23 @@
+import asyncio
+from contextlib import asynccontextmanager
 from datetime import date
 from unittest.mock import AsyncMock
 from unittest.mock import MagicMock
 
 import pytest
 
+from project.core.cache.bloom import KnownNames
+from project.core.cache.singleflight import SingleFlight
+from project.core.cache.swr import StaleWhileRevalidate
 from project.core.db.postgres.models import FormHistory
 from project.core.uc.history.dto import GetHistoryRequest
 from project.core.uc.history.dto import HistoryItem
+from project.core.uc.history.get_history import CoalescedGetHistory
 from project.core.uc.history.get_history import GetHistory
+from project.core.uc.history.get_history import ReplicaGetHistory
+from project.core.uc.history.get_history import StaleWhileRevalidateGetHistory
+from project.core.uc.history.get_history import get_history_key
+from project.core.uc.history.get_history import is_history_key_affected
 
 
 class TestGetHistory:
@@ -162,3 +172,152 @@ class TestGetHistory:
         assert len(result.items) == 2
         assert result.items[0].count == 0
         assert result.items[1].count == 1
+
+    @pytest.mark.asyncio
+    async def test_unknown_name_skips_database(self):
+        """Test that filter by a name which has never been submitted doesn't query the database."""
+        known_names = KnownNames("test_get_history", capacity=100, false_positive_rate=0.01)
+        await known_names.rebuild(AsyncMock(return_value=(["Ivan"], ["Ivanov"])))
+        dal_mock = AsyncMock()
+        dal_mock.get_filtered_history_with_counts.return_value = []
+        dal_mock.count_filtered_history.return_value = 0
+        uc = GetHistory(form_history_dal=dal_mock, known_names=known_names)
+
+        result = await uc.execute(GetHistoryRequest(date_filter=date(2025, 1, 20), first_name="Nobody"))
+
+        assert result.items == []
+        assert result.total == 0
+        dal_mock.get_filtered_history_with_counts.assert_not_awaited()
+        dal_mock.count_filtered_history.assert_not_awaited()
+
+        await uc.execute(GetHistoryRequest(date_filter=date(2025, 1, 20), first_name="Ivan", last_name="Ivanov"))
+
+        dal_mock.get_filtered_history_with_counts.assert_awaited_once()
+
+
+class TestCoalescedGetHistory:
+    @pytest.mark.asyncio
+    async def test_same_filters_share_query(self):
+        """Test that concurrent requests with the same normalized filters share one execution."""
+        factory = self._get_dal_factory()
+        flight = SingleFlight("test_history")
+        requests = [
+            GetHistoryRequest(date_filter=date(2025, 1, 20), first_name="Ivan"),
+            GetHistoryRequest(date_filter=date(2025, 1, 20), first_name="Ivan", last_name=""),
+            GetHistoryRequest(date_filter=date(2025, 1, 20), first_name="Ivan", last_name=None),
+        ]
+
+        results = await asyncio.gather(*(CoalescedGetHistory(factory, flight).execute(r) for r in requests))
+
+        assert factory.opened == 1
+        assert all(r is results[0] for r in results)
+        assert results[0].total == 1
+        assert results[0].items[0].first_name == "Ivan"
+
+    @pytest.mark.asyncio
+    async def test_different_filters_run_separately(self):
+        """Test that requests with different filters don't share execution."""
+        factory = self._get_dal_factory()
+        flight = SingleFlight("test_history_different")
+        requests = [
+            GetHistoryRequest(date_filter=date(2025, 1, 20), first_name="Ivan"),
+            GetHistoryRequest(date_filter=date(2025, 1, 20), first_name="John"),
+            GetHistoryRequest(date_filter=date(2025, 1, 21), first_name="Ivan"),
+        ]
+
+        results = await asyncio.gather(*(CoalescedGetHistory(factory, flight).execute(r) for r in requests))
+
+        assert factory.opened == 3
+        assert [r.items[0].first_name for r in results] == ["Ivan", "John", "Ivan"]
+
+    @staticmethod
+    def _get_dal_factory(database=None):
+        async def get_filtered_history_with_counts(date_filter, first_name=None, last_name=None, limit=10):
+            await asyncio.sleep(database.latency if database else 0.01)
+            if database and database.down:
+                raise ConnectionRefusedError("database is down")
+            record = MagicMock(spec=FormHistory)
+            record.date = date_filter
+            record.first_name = first_name
+            record.last_name = "Ivanov"
+            return [(record, 0)]
+
+        @asynccontextmanager
+        async def factory():
+            factory.opened += 1
+            dal_mock = AsyncMock()
+            dal_mock.get_filtered_history_with_counts.side_effect = get_filtered_history_with_counts
+            dal_mock.count_filtered_history.return_value = 1
+            yield dal_mock
+
+        factory.opened = 0
+        return factory
+
+
+class TestStaleWhileRevalidateGetHistory:
+    @pytest.mark.asyncio
+    async def test_database_latency_and_outage(self):
+        """Test that the last good history is served with age when database is slow or down."""
+        database = MagicMock(latency=0.0, down=False)
+        factory = TestCoalescedGetHistory._get_dal_factory(database)
+        cache = StaleWhileRevalidate("test_uc", capacity=10, max_staleness=300, latency_budget=0.02)
+        uc = StaleWhileRevalidateGetHistory(CoalescedGetHistory(factory, SingleFlight("test_uc")), cache)
+        request = GetHistoryRequest(date_filter=date(2025, 1, 20), first_name="Ivan")
+
+        result = await uc.execute(request)
+        assert result.age is None
+        assert result.total == 1
+
+        database.latency = 0.1
+        result = await uc.execute(request)
+        assert result.age is not None
+        assert result.items[0].first_name == "Ivan"
+
+        database.latency = 0.0
+        database.down = True
+        result = await uc.execute(request)
+        assert result.age is not None
+        assert result.total == 1
+
+        with pytest.raises(ConnectionRefusedError):
+            await uc.execute(GetHistoryRequest(date_filter=date(2025, 1, 21)))
+
+
+class TestReplicaGetHistory:
+    @pytest.mark.asyncio
+    async def test_execute(self):
+        """Test that history is answered by the replica."""
+        items = [HistoryItem(date(2025, 1, 15), "Ivan", "Ivanov", 1)]
+        replica = MagicMock()
+        replica.get_history.return_value = (items, 5)
+
+        result = await ReplicaGetHistory(replica).execute(
+            GetHistoryRequest(date_filter=date(2025, 1, 20), first_name="Ivan")
+        )
+
+        assert (result.items, result.total) == (items, 5)
+        replica.get_history.assert_called_once_with(
+            date_filter=date(2025, 1, 20), first_name="Ivan", last_name=None, limit=10
+        )
+
+
+class TestIsHistoryKeyAffected:
+    @pytest.mark.parametrize(
+        "first_name, last_name, row_date, expected",
+        [
+            (None, None, date(2025, 1, 15), True),
+            (None, None, date(2025, 1, 16), False),
+            ("Ivan", None, date(2025, 1, 10), True),
+            ("John", None, date(2025, 1, 10), False),
+            ("Ivan", "Ivanov", date(2025, 1, 10), True),
+            ("Ivan", "Petrov", date(2025, 1, 10), False),
+            ("", "", date(2025, 1, 10), True),
+        ],
+    )
+    def test_affected(self, first_name, last_name, row_date, expected):
+        """Test that only history including the row is affected by its change."""
+        key = get_history_key(
+            GetHistoryRequest(date_filter=date(2025, 1, 15), first_name=first_name, last_name=last_name)
+        )
+
+        assert is_history_key_affected(key, row_date, "Ivan", "Ivanov") is expected
@@ -0,0 +1,120 @@
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import date
+from unittest.mock import AsyncMock
+from unittest.mock import MagicMock
+
+import pytest
+
+from project.core.db.postgres.models import FormHistory
+from project.core.uc.history.dto import GetHistoryBatchRequest
+from project.core.uc.history.dto import GetHistoryRequest
+from project.core.uc.history.get_history_batch import GetHistoryBatch
+
+
+class TestGetHistoryBatch:
+    @pytest.mark.asyncio
+    async def test_results_in_input_order(self):
+        """Test that results are returned in the same order as requests."""
+        uc = GetHistoryBatch(self._get_dal_factory(), concurrency=2)
+        request = GetHistoryBatchRequest(
+            requests=[
+                GetHistoryRequest(date_filter=date(2025, 1, 20), first_name="Ivan"),
+                GetHistoryRequest(date_filter=date(2025, 1, 15)),
+                GetHistoryRequest(date_filter=date(2025, 1, 10), last_name="Smith"),
+            ]
+        )
+
+        result = await uc.execute(request)
+
+        assert [r.items[0].date for r in result.results] == [date(2025, 1, 20), date(2025, 1, 15), date(2025, 1, 10)]
+        assert [r.items[0].first_name for r in result.results] == ["Ivan", "Any", "Any"]
+        assert not any(r.has_errors() for r in result.results)
+
+    @pytest.mark.asyncio
+    async def test_errors_are_isolated_per_item(self):
+        """Test that failed item has an error and doesn't break other items."""
+        uc = GetHistoryBatch(self._get_dal_factory(fail_on=date(2025, 1, 15)), concurrency=2)
+        request = GetHistoryBatchRequest(
+            requests=[
+                GetHistoryRequest(date_filter=date(2025, 1, 20)),
+                GetHistoryRequest(date_filter=date(2025, 1, 15)),
+                GetHistoryRequest(date_filter=date(2025, 1, 10)),
+            ]
+        )
+
+        result = await uc.execute(request)
+
+        assert [r.has_errors() for r in result.results] == [False, True, False]
+        assert isinstance(result.results[1].first_error, ConnectionError)
+        assert result.results[1].items == []
+        assert result.results[1].total == 0
+        assert result.results[2].total == 1
+
+    @pytest.mark.asyncio
+    async def test_concurrency_is_bounded(self):
+        """Test that no more than `concurrency` items run at the same time."""
+        in_flight = 0
+        max_in_flight = 0
+
+        async def on_query():
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+
+        uc = GetHistoryBatch(self._get_dal_factory(on_query=on_query), concurrency=3)
+        request = GetHistoryBatchRequest(
+            requests=[GetHistoryRequest(date_filter=date(2025, 1, 1 + i)) for i in range(10)]
+        )
+
+        result = await uc.execute(request)
+
+        assert len(result.results) == 10
+        assert max_in_flight == 3
+
+    @pytest.mark.asyncio
+    async def test_same_filters_are_queried_once(self):
+        """Test that duplicated filters share one query."""
+        factory = self._get_dal_factory()
+        uc = GetHistoryBatch(factory, concurrency=2)
+        request = GetHistoryBatchRequest(
+            requests=[
+                GetHistoryRequest(date_filter=date(2025, 1, 20), first_name="Ivan"),
+                GetHistoryRequest(date_filter=date(2025, 1, 20)),
+                GetHistoryRequest(date_filter=date(2025, 1, 20), first_name="Ivan", last_name=""),
+            ]
+        )
+
+        result = await uc.execute(request)
+
+        assert len(result.results) == 3
+        assert result.results[0] is result.results[2]
+        assert factory.opened == 2
+
+    @staticmethod
+    def _get_dal_factory(fail_on=None, on_query=None):
+        """Returns DAL factory, which answers with one record dated by the filter."""
+
+        async def get_filtered_history_with_counts(date_filter, first_name=None, last_name=None, limit=10):
+            if on_query:
+                await on_query()
+            if date_filter == fail_on:
+                raise ConnectionError("connection refused")
+            record = MagicMock(spec=FormHistory)
+            record.date = date_filter
+            record.first_name = first_name or "Any"
+            record.last_name = last_name or "Any"
+            return [(record, 0)]
+
+        @asynccontextmanager
+        async def factory():
+            factory.opened += 1
+            dal_mock = AsyncMock()
+            dal_mock.get_filtered_history_with_counts.side_effect = get_filtered_history_with_counts
+            dal_mock.count_filtered_history.return_value = 1
+            yield dal_mock
+
+        factory.opened = 0
+        return factory
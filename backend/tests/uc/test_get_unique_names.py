@@ -0,0 +1,53 @@
+import asyncio
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock
+
+import pytest
+
+from project.core.cache.singleflight import SingleFlight
+from project.core.uc.history.get_unique_names import CoalescedGetUniqueNames
+from project.core.uc.history.get_unique_names import GetUniqueNames
+
+
+class TestGetUniqueNames:
+    @pytest.mark.asyncio
+    async def test_success(self):
+        """Test getting unique first and last names."""
+        dal_mock = AsyncMock()
+        dal_mock.get_unique_first_names.return_value = ["Ivan", "John"]
+        dal_mock.get_unique_last_names.return_value = ["Ivanov"]
+        uc = GetUniqueNames(form_history_dal=dal_mock)
+
+        result = await uc.execute()
+
+        assert result.first_names == ["Ivan", "John"]
+        assert result.last_names == ["Ivanov"]
+        assert not result.has_errors()
+
+
+class TestCoalescedGetUniqueNames:
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_share_query(self):
+        """Test that concurrent requests share one session and one pair of queries."""
+        dal_mock = AsyncMock()
+
+        async def get_unique_first_names():
+            await asyncio.sleep(0.01)
+            return ["Ivan"]
+
+        dal_mock.get_unique_first_names.side_effect = get_unique_first_names
+        dal_mock.get_unique_last_names.return_value = ["Ivanov"]
+        opened = 0
+
+        @asynccontextmanager
+        async def factory():
+            nonlocal opened
+            opened += 1
+            yield dal_mock
+
+        flight = SingleFlight("test_unique_names")
+        results = await asyncio.gather(*(CoalescedGetUniqueNames(factory, flight).execute() for _ in range(5)))
+
+        assert opened == 1
+        assert dal_mock.get_unique_first_names.await_count == 1
+        assert all(r.first_names == ["Ivan"] and r.last_names == ["Ivanov"] for r in results)
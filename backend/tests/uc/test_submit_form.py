@@ -1,9 +1,18 @@
+import asyncio
 from datetime import date
+from datetime import datetime
 from unittest.mock import AsyncMock
+from unittest.mock import MagicMock
 from unittest.mock import patch
+from uuid import uuid4
 
 import pytest
 
+from project.core.broadcast import Broadcast
+from project.core.cache.bloom import KnownNames
+from project.core.cache.lru import LRUCache
+from project.core.db.postgres.models import FormHistory
+from project.core.uc.history.dto import FormSubmitted
 from project.core.uc.history.dto import SubmitFormRequest
 from project.core.uc.history.submit_form import SubmitForm
 
@@ -33,6 +42,7 @@ class TestSubmitForm:
             date=date(2025, 1, 15),
             first_name="Ivan",
             last_name="Ivanov",
+            person_id=None,
         )
 
     @pytest.mark.asyncio
@@ -120,3 +130,143 @@ class TestSubmitForm:
         # Verify delay is between 0 and 3 seconds
         call_args = sleep_mock.call_args[0][0]
         assert 0 <= call_args <= 3
+
+    @pytest.mark.asyncio
+    @patch(f"{_path_to_tested}.asyncio.sleep")
+    async def test_publish_submission_after_commit(self, sleep_mock):
+        """Test that submission is published only when transaction is committed."""
+        entry = FormHistory(
+            id=uuid4(),
+            date=date(2025, 1, 15),
+            first_name="Ivan",
+            last_name="Ivanov",
+            created_at=datetime(2025, 1, 15),
+            occurrences=1,
+        )
+        dal_mock = AsyncMock()
+        dal_mock.create_form_entry.return_value = entry
+        dal_mock.on_commit = MagicMock()
+        submissions = Broadcast[FormSubmitted]("test_submit_form")
+        subscription = submissions.subscribe(queue_size=10)
+        uc = SubmitForm(form_history_dal=dal_mock, submissions=submissions)
+
+        await uc.execute(SubmitFormRequest(date=date(2025, 1, 15), first_name="Ivan", last_name="Ivanov"))
+
+        dal_mock.on_commit.assert_called_once()
+        assert subscription._queue.empty()
+
+        dal_mock.on_commit.call_args[0][0]()
+
+        assert await subscription.get() == FormSubmitted(
+            id=entry.id, date=entry.date, first_name="Ivan", last_name="Ivanov", created_at=entry.created_at
+        )
+
+    @pytest.mark.asyncio
+    @patch(f"{_path_to_tested}.asyncio.sleep")
+    async def test_publish_folded_repeat(self, sleep_mock):
+        """Test that a repeat folded into an existing row is published as a submission of its own."""
+        entry = FormHistory(
+            id=uuid4(),
+            date=date(2025, 1, 15),
+            first_name="Ivan",
+            last_name="Ivanov",
+            created_at=datetime(2025, 1, 15),
+            updated_at=datetime(2025, 1, 16),
+            occurrences=3,
+        )
+        dal_mock = AsyncMock()
+        dal_mock.create_form_entry.return_value = entry
+        dal_mock.on_commit = MagicMock()
+        submissions = Broadcast[FormSubmitted]("test_submit_form_repeat")
+        subscription = submissions.subscribe(queue_size=10)
+        uc = SubmitForm(form_history_dal=dal_mock, submissions=submissions)
+
+        await uc.execute(SubmitFormRequest(date=date(2025, 1, 15), first_name="Ivan", last_name="Ivanov"))
+        dal_mock.on_commit.call_args[0][0]()
+
+        event = await subscription.get()
+        assert event.created_at == datetime(2025, 1, 16)
+        assert event.event_id == f"{entry.id}.3"
+
+    @pytest.mark.asyncio
+    @patch(f"{_path_to_tested}.asyncio.sleep")
+    async def test_add_known_names_after_commit(self, sleep_mock):
+        """Test that names are added to known ones only when transaction is committed."""
+        entry = FormHistory(
+            id=uuid4(), date=date(2025, 1, 15), first_name="Ivan", last_name="Ivanov", created_at=datetime(2025, 1, 15)
+        )
+        dal_mock = AsyncMock()
+        dal_mock.create_form_entry.return_value = entry
+        dal_mock.on_commit = MagicMock()
+        known_names = KnownNames("test_submit_form", capacity=100, false_positive_rate=0.001)
+        await known_names.rebuild(AsyncMock(return_value=([], [])))
+        uc = SubmitForm(form_history_dal=dal_mock, known_names=known_names)
+
+        await uc.execute(SubmitFormRequest(date=date(2025, 1, 15), first_name="Ivan", last_name="Ivanov"))
+
+        assert not known_names.might_contain("Ivan", "Ivanov")
+
+        dal_mock.on_commit.call_args[0][0]()
+
+        assert known_names.might_contain("Ivan", "Ivanov")
+
+    @pytest.mark.asyncio
+    @patch(f"{_path_to_tested}.asyncio.sleep")
+    async def test_person_id_cached_after_commit(self, sleep_mock):
+        """Test that person id is cached once committed and passed with next entries of the same names."""
+        entry = FormHistory(id=uuid4(), date=date(2025, 1, 15), first_name="Ivan", last_name="Ivanov", person_id=7)
+        dal_mock = AsyncMock()
+        dal_mock.create_form_entry.return_value = entry
+        dal_mock.on_commit = MagicMock()
+        person_ids = LRUCache[tuple[str, str], int]("test_submit_form", capacity=10)
+        uc = SubmitForm(form_history_dal=dal_mock, person_ids=person_ids)
+        request = SubmitFormRequest(date=date(2025, 1, 15), first_name="Ivan", last_name="Ivanov")
+
+        await uc.execute(request)
+
+        assert person_ids.get(("Ivan", "Ivanov")) is None
+        dal_mock.on_commit.call_args[0][0]()
+        assert person_ids.get(("Ivan", "Ivanov")) == 7
+
+        dal_mock.on_commit.reset_mock()
+        await uc.execute(request)
+
+        assert dal_mock.create_form_entry.await_args.kwargs["person_id"] == 7
+        dal_mock.on_commit.assert_not_called()
+
+    @pytest.mark.asyncio
+    @patch(f"{_path_to_tested}.asyncio.sleep")
+    async def test_spooled_when_database_unavailable(self, sleep_mock):
+        """Test that form is spooled and answered as queued when database can't be reached or doesn't answer."""
+
+        async def never_answer(**kwargs):
+            await asyncio.Event().wait()
+
+        spool = AsyncMock()
+        request = SubmitFormRequest(date=date(2025, 1, 15), first_name="Ivan", last_name="Ivanov")
+        for failure in (ConnectionRefusedError(), never_answer):
+            dal_mock = AsyncMock()
+            dal_mock.create_form_entry.side_effect = failure
+            uc = SubmitForm(form_history_dal=dal_mock, spool=spool, spool_timeout=0.05)
+
+            result = await uc.execute(request)
+
+            assert result.success is True
+            assert result.queued is True
+            dal_mock.session.invalidate.assert_awaited_once()
+            spool.append.assert_awaited_with({"date": "2025-01-15", "first_name": "Ivan", "last_name": "Ivanov"})
+
+    @pytest.mark.asyncio
+    @patch(f"{_path_to_tested}.asyncio.sleep")
+    async def test_not_spooled_when_query_fails(self, sleep_mock):
+        """Test that failures other than unavailable database are raised, not spooled."""
+        dal_mock = AsyncMock()
+        dal_mock.create_form_entry.side_effect = ValueError("invalid")
+        spool = AsyncMock()
+        uc = SubmitForm(form_history_dal=dal_mock, spool=spool, spool_timeout=1)
+
+        with pytest.raises(ValueError):
+            await uc.execute(SubmitFormRequest(date=date(2025, 1, 15), first_name="Ivan", last_name="Ivanov"))
+
+        spool.append.assert_not_awaited()
+        dal_mock.session.rollback.assert_awaited_once()